@@ -362,6 +362,30 @@ ENABLE_REALTIME_CHAT_SAVE = (
     os.environ.get("ENABLE_REALTIME_CHAT_SAVE", "False").lower() == "true"
 )
 
+# 实时保存时同一条消息两次写库的最小间隔，期间的增量合并为一次写入
+CHAT_REALTIME_SAVE_INTERVAL_MS = os.environ.get(
+    "CHAT_REALTIME_SAVE_INTERVAL_MS", "1000"
+)
+
+if CHAT_REALTIME_SAVE_INTERVAL_MS == "":
+    CHAT_REALTIME_SAVE_INTERVAL_MS = 1000
+else:
+    try:
+        CHAT_REALTIME_SAVE_INTERVAL_MS = max(int(CHAT_REALTIME_SAVE_INTERVAL_MS), 0)
+    except Exception:
+        CHAT_REALTIME_SAVE_INTERVAL_MS = 1000
+
+# 未写库的新增字符数达到该值时不等间隔，立即写入
+CHAT_REALTIME_SAVE_MAX_CHARS = os.environ.get("CHAT_REALTIME_SAVE_MAX_CHARS", "2000")
+
+if CHAT_REALTIME_SAVE_MAX_CHARS == "":
+    CHAT_REALTIME_SAVE_MAX_CHARS = 2000
+else:
+    try:
+        CHAT_REALTIME_SAVE_MAX_CHARS = max(int(CHAT_REALTIME_SAVE_MAX_CHARS), 1)
+    except Exception:
+        CHAT_REALTIME_SAVE_MAX_CHARS = 2000
+
 ENABLE_QUERIES_CACHE = os.environ.get("ENABLE_QUERIES_CACHE", "False").lower() == "true"
 
 ####################################
@@ -563,6 +587,256 @@ else:
         CHAT_RESPONSE_MAX_TOOL_CALL_RETRIES = 30
 
 
+####################################
+# AI GRADING
+####################################
+
+AI_GRADING_MAX_CONCURRENCY = os.environ.get("AI_GRADING_MAX_CONCURRENCY", "5")
+
+if AI_GRADING_MAX_CONCURRENCY == "":
+    AI_GRADING_MAX_CONCURRENCY = 5
+else:
+    try:
+        AI_GRADING_MAX_CONCURRENCY = max(int(AI_GRADING_MAX_CONCURRENCY), 1)
+    except Exception:
+        AI_GRADING_MAX_CONCURRENCY = 5
+
+
+AI_GRADING_TIMEOUT = os.environ.get("AI_GRADING_TIMEOUT", "60")
+
+if AI_GRADING_TIMEOUT == "":
+    AI_GRADING_TIMEOUT = None
+else:
+    try:
+        AI_GRADING_TIMEOUT = float(AI_GRADING_TIMEOUT)
+    except Exception:
+        AI_GRADING_TIMEOUT = 60
+
+
+AI_GRADING_RATE_LIMIT = os.environ.get("AI_GRADING_RATE_LIMIT", "60")
+
+if AI_GRADING_RATE_LIMIT == "":
+    AI_GRADING_RATE_LIMIT = None
+else:
+    try:
+        # Max LLM grading requests per minute across all grading jobs
+        AI_GRADING_RATE_LIMIT = float(AI_GRADING_RATE_LIMIT)
+    except Exception:
+        AI_GRADING_RATE_LIMIT = 60
+
+
+AI_GRADING_BULK_WORKERS = os.environ.get("AI_GRADING_BULK_WORKERS", "4")
+
+if AI_GRADING_BULK_WORKERS == "":
+    AI_GRADING_BULK_WORKERS = 4
+else:
+    try:
+        AI_GRADING_BULK_WORKERS = max(int(AI_GRADING_BULK_WORKERS), 1)
+    except Exception:
+        AI_GRADING_BULK_WORKERS = 4
+
+
+# auto | redis | db | none
+AI_GRADING_CACHE_BACKEND = os.environ.get("AI_GRADING_CACHE_BACKEND", "auto").lower()
+
+AI_GRADING_CACHE_TTL = os.environ.get("AI_GRADING_CACHE_TTL", str(7 * 24 * 60 * 60))
+
+if AI_GRADING_CACHE_TTL == "":
+    AI_GRADING_CACHE_TTL = None
+else:
+    try:
+        AI_GRADING_CACHE_TTL = int(AI_GRADING_CACHE_TTL)
+    except Exception:
+        AI_GRADING_CACHE_TTL = 7 * 24 * 60 * 60
+
+
+AI_GRADING_CACHE_MAX_ENTRIES = os.environ.get("AI_GRADING_CACHE_MAX_ENTRIES", "10000")
+
+if AI_GRADING_CACHE_MAX_ENTRIES == "":
+    AI_GRADING_CACHE_MAX_ENTRIES = None
+else:
+    try:
+        AI_GRADING_CACHE_MAX_ENTRIES = int(AI_GRADING_CACHE_MAX_ENTRIES)
+    except Exception:
+        AI_GRADING_CACHE_MAX_ENTRIES = 10000
+
+
+####################################
+# LEADER DASHBOARD
+####################################
+
+LEADER_DASHBOARD_CACHE_TTL = os.environ.get("LEADER_DASHBOARD_CACHE_TTL", "30")
+
+if LEADER_DASHBOARD_CACHE_TTL == "":
+    LEADER_DASHBOARD_CACHE_TTL = 0
+else:
+    try:
+        LEADER_DASHBOARD_CACHE_TTL = int(LEADER_DASHBOARD_CACHE_TTL)
+    except Exception:
+        LEADER_DASHBOARD_CACHE_TTL = 30
+
+
+####################################
+# TEACHER AI
+####################################
+
+TEACHER_AI_BATCH_CONCURRENCY = os.environ.get("TEACHER_AI_BATCH_CONCURRENCY", "4")
+
+if TEACHER_AI_BATCH_CONCURRENCY == "":
+    TEACHER_AI_BATCH_CONCURRENCY = 4
+else:
+    try:
+        TEACHER_AI_BATCH_CONCURRENCY = max(int(TEACHER_AI_BATCH_CONCURRENCY), 1)
+    except Exception:
+        TEACHER_AI_BATCH_CONCURRENCY = 4
+
+
+# 批量提问时每次 map 调用包含的学生数
+TEACHER_AI_BATCH_SIZE = os.environ.get("TEACHER_AI_BATCH_SIZE", "5")
+
+if TEACHER_AI_BATCH_SIZE == "":
+    TEACHER_AI_BATCH_SIZE = 5
+else:
+    try:
+        TEACHER_AI_BATCH_SIZE = max(int(TEACHER_AI_BATCH_SIZE), 1)
+    except Exception:
+        TEACHER_AI_BATCH_SIZE = 5
+
+
+####################################
+# LLM PROXY
+####################################
+
+# 为 True 时 turn / usage 记录先写入内存缓冲，由后台任务批量落库（session 始终同步写入）
+ENABLE_LLM_PROXY_WRITE_BEHIND = (
+    os.environ.get("ENABLE_LLM_PROXY_WRITE_BEHIND", "True").lower() == "true"
+)
+
+LLM_PROXY_WRITE_BEHIND_INTERVAL_MS = os.environ.get(
+    "LLM_PROXY_WRITE_BEHIND_INTERVAL_MS", "200"
+)
+
+if LLM_PROXY_WRITE_BEHIND_INTERVAL_MS == "":
+    LLM_PROXY_WRITE_BEHIND_INTERVAL_MS = 200
+else:
+    try:
+        LLM_PROXY_WRITE_BEHIND_INTERVAL_MS = max(
+            int(LLM_PROXY_WRITE_BEHIND_INTERVAL_MS), 10
+        )
+    except Exception:
+        LLM_PROXY_WRITE_BEHIND_INTERVAL_MS = 200
+
+
+LLM_PROXY_WRITE_BEHIND_BATCH_SIZE = os.environ.get(
+    "LLM_PROXY_WRITE_BEHIND_BATCH_SIZE", "200"
+)
+
+if LLM_PROXY_WRITE_BEHIND_BATCH_SIZE == "":
+    LLM_PROXY_WRITE_BEHIND_BATCH_SIZE = 200
+else:
+    try:
+        LLM_PROXY_WRITE_BEHIND_BATCH_SIZE = max(
+            int(LLM_PROXY_WRITE_BEHIND_BATCH_SIZE), 1
+        )
+    except Exception:
+        LLM_PROXY_WRITE_BEHIND_BATCH_SIZE = 200
+
+# 缓冲区最多保留的记录数，数据库长时间不可用时超出的记录直接转入死信
+LLM_PROXY_WRITE_BEHIND_MAX_BUFFER = os.environ.get(
+    "LLM_PROXY_WRITE_BEHIND_MAX_BUFFER", "10000"
+)
+
+if LLM_PROXY_WRITE_BEHIND_MAX_BUFFER == "":
+    LLM_PROXY_WRITE_BEHIND_MAX_BUFFER = 10000
+else:
+    try:
+        LLM_PROXY_WRITE_BEHIND_MAX_BUFFER = max(
+            int(LLM_PROXY_WRITE_BEHIND_MAX_BUFFER), 1
+        )
+    except Exception:
+        LLM_PROXY_WRITE_BEHIND_MAX_BUFFER = 10000
+
+# 一批记录连续写入失败多少次后逐条重试，仍失败的记录转入死信
+LLM_PROXY_WRITE_BEHIND_MAX_RETRIES = os.environ.get(
+    "LLM_PROXY_WRITE_BEHIND_MAX_RETRIES", "5"
+)
+
+if LLM_PROXY_WRITE_BEHIND_MAX_RETRIES == "":
+    LLM_PROXY_WRITE_BEHIND_MAX_RETRIES = 5
+else:
+    try:
+        LLM_PROXY_WRITE_BEHIND_MAX_RETRIES = max(
+            int(LLM_PROXY_WRITE_BEHIND_MAX_RETRIES), 1
+        )
+    except Exception:
+        LLM_PROXY_WRITE_BEHIND_MAX_RETRIES = 5
+
+# 模型单价（美元 / 百万 tokens），覆盖或补充内置价格表
+# 例：{"gpt-5": {"input": 1.25, "output": 10.0}}
+LLM_MODEL_PRICES = os.environ.get("LLM_MODEL_PRICES", "")
+if LLM_MODEL_PRICES == "":
+    LLM_MODEL_PRICES = {}
+else:
+    try:
+        LLM_MODEL_PRICES = json.loads(LLM_MODEL_PRICES)
+    except Exception:
+        LLM_MODEL_PRICES = {}
+
+# 模型前缀到 tokenizer 的映射，tiktoken 编码名或 "hf:<仓库名>"
+# 例：{"qwen": "hf:Qwen/Qwen2.5-7B-Instruct"}
+LLM_MODEL_TOKENIZERS = os.environ.get("LLM_MODEL_TOKENIZERS", "")
+if LLM_MODEL_TOKENIZERS == "":
+    LLM_MODEL_TOKENIZERS = {}
+else:
+    try:
+        LLM_MODEL_TOKENIZERS = json.loads(LLM_MODEL_TOKENIZERS)
+    except Exception:
+        LLM_MODEL_TOKENIZERS = {}
+
+
+####################################
+# TURN ARCHIVE
+####################################
+
+# 早于该天数的整月 turn 导出为 Parquet 归档并移出热表，0 表示不归档
+TURN_ARCHIVE_HORIZON_DAYS = os.environ.get("TURN_ARCHIVE_HORIZON_DAYS", "180")
+
+if TURN_ARCHIVE_HORIZON_DAYS == "":
+    TURN_ARCHIVE_HORIZON_DAYS = 180
+else:
+    try:
+        TURN_ARCHIVE_HORIZON_DAYS = max(int(TURN_ARCHIVE_HORIZON_DAYS), 0)
+    except Exception:
+        TURN_ARCHIVE_HORIZON_DAYS = 180
+
+
+TURN_ARCHIVE_BATCH_SIZE = os.environ.get("TURN_ARCHIVE_BATCH_SIZE", "5000")
+
+if TURN_ARCHIVE_BATCH_SIZE == "":
+    TURN_ARCHIVE_BATCH_SIZE = 5000
+else:
+    try:
+        TURN_ARCHIVE_BATCH_SIZE = max(int(TURN_ARCHIVE_BATCH_SIZE), 100)
+    except Exception:
+        TURN_ARCHIVE_BATCH_SIZE = 5000
+
+
+####################################
+# SKILL MASTERY
+####################################
+
+# 技能掌握度 EWMA 的平滑系数，越大越偏重最近的观测
+SKILL_MASTERY_EWMA_ALPHA = os.environ.get("SKILL_MASTERY_EWMA_ALPHA", "0.3")
+
+if SKILL_MASTERY_EWMA_ALPHA == "":
+    SKILL_MASTERY_EWMA_ALPHA = 0.3
+else:
+    try:
+        SKILL_MASTERY_EWMA_ALPHA = min(max(float(SKILL_MASTERY_EWMA_ALPHA), 0.01), 1.0)
+    except Exception:
+        SKILL_MASTERY_EWMA_ALPHA = 0.3
+
+
 ####################################
 # WEBSOCKET SUPPORT
 ####################################
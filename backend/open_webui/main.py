@@ -114,6 +114,7 @@ from open_webui.models.functions import Functions
 from open_webui.models.models import Models
 from open_webui.models.users import UserModel, Users
 from open_webui.models.chats import Chats
+from open_webui.models.turns import Turns
 
 from open_webui.config import (
     # Ollama
@@ -488,6 +489,7 @@ from open_webui.utils.oauth import (
 )
 from open_webui.utils.security_headers import SecurityHeadersMiddleware
 from open_webui.utils.redis import get_redis_connection
+from open_webui.utils.write_behind import LLM_PROXY_RECORDER
 
 from open_webui.tasks import (
     redis_task_command_listener,
@@ -580,6 +582,14 @@ async def lifespan(app: FastAPI):
 
     asyncio.create_task(periodic_usage_pool_cleanup())
 
+    LLM_PROXY_RECORDER.start()
+
+    try:
+        # Postgres 上预建 turn 的月度分区，其他数据库为空操作
+        await asyncio.to_thread(Turns.ensure_partitions)
+    except Exception as e:
+        log.warning(f"Failed to ensure turn partitions: {e}")
+
     if app.state.config.ENABLE_BASE_MODELS_CACHE:
         await get_all_models(
             Request(
@@ -603,6 +613,9 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    # 把 LLM 代理缓冲中的 session / turn / usage 记录写完再退出
+    await LLM_PROXY_RECORDER.stop()
+
     if hasattr(app.state, "redis_task_command_listener"):
         app.state.redis_task_command_listener.cancel()
 
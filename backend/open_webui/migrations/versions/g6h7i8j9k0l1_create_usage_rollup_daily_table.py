@@ -0,0 +1,92 @@
+"""Create usage_rollup_daily table for pre-aggregated usage stats
+
+Revision ID: g6h7i8j9k0l1
+Revises: f5g6h7i8j9k0
+Create Date: 2025-10-06 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "g6h7i8j9k0l1"
+down_revision: Union[str, None] = "f5g6h7i8j9k0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def upgrade():
+    op.create_table(
+        "usage_rollup_daily",
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("day", sa.BigInteger(), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("mode", sa.String(), nullable=False),
+        sa.Column("requests", sa.BigInteger(), server_default="0"),
+        sa.Column("tokens_in", sa.BigInteger(), server_default="0"),
+        sa.Column("tokens_out", sa.BigInteger(), server_default="0"),
+        sa.Column("cost_usd", sa.Float(), server_default="0.0"),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("user_id", "day", "model", "mode"),
+    )
+
+    # 用已有的 usage_log 明细回填日聚合
+    usage_log = sa.table(
+        "usage_log",
+        sa.column("id", sa.String()),
+        sa.column("user_id", sa.String()),
+        sa.column("model", sa.String()),
+        sa.column("mode", sa.String()),
+        sa.column("tokens_in", sa.BigInteger()),
+        sa.column("tokens_out", sa.BigInteger()),
+        sa.column("cost_usd", sa.Float()),
+        sa.column("created_at", sa.BigInteger()),
+    )
+    usage_rollup_daily = sa.table(
+        "usage_rollup_daily",
+        sa.column("user_id", sa.String()),
+        sa.column("day", sa.BigInteger()),
+        sa.column("model", sa.String()),
+        sa.column("mode", sa.String()),
+        sa.column("requests", sa.BigInteger()),
+        sa.column("tokens_in", sa.BigInteger()),
+        sa.column("tokens_out", sa.BigInteger()),
+        sa.column("cost_usd", sa.Float()),
+        sa.column("updated_at", sa.BigInteger()),
+    )
+
+    day = usage_log.c.created_at - usage_log.c.created_at % DAY_SECONDS
+    mode = sa.func.coalesce(usage_log.c.mode, "chat")
+    op.execute(
+        usage_rollup_daily.insert().from_select(
+            [
+                "user_id",
+                "day",
+                "model",
+                "mode",
+                "requests",
+                "tokens_in",
+                "tokens_out",
+                "cost_usd",
+                "updated_at",
+            ],
+            sa.select(
+                usage_log.c.user_id,
+                day,
+                usage_log.c.model,
+                mode,
+                sa.func.count(usage_log.c.id),
+                sa.func.coalesce(sa.func.sum(usage_log.c.tokens_in), 0),
+                sa.func.coalesce(sa.func.sum(usage_log.c.tokens_out), 0),
+                sa.func.coalesce(sa.func.sum(usage_log.c.cost_usd), 0.0),
+                sa.func.max(usage_log.c.created_at),
+            ).group_by(usage_log.c.user_id, day, usage_log.c.model, mode),
+        )
+    )
+
+
+def downgrade():
+    op.drop_table("usage_rollup_daily")
@@ -0,0 +1,40 @@
+"""Create nightly_checkpoint table for resumable nightly batch analysis
+
+Revision ID: h7i8j9k0l1m2
+Revises: g6h7i8j9k0l1
+Create Date: 2025-10-06 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "h7i8j9k0l1m2"
+down_revision: Union[str, None] = "g6h7i8j9k0l1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        "nightly_checkpoint",
+        sa.Column("date", sa.String(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("memory_id", sa.String(), nullable=True),
+        sa.Column("total_turns", sa.BigInteger(), server_default="0"),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("date", "user_id"),
+    )
+
+    # 创建索引
+    op.create_index(
+        "nightly_checkpoint_date_status_idx", "nightly_checkpoint", ["date", "status"]
+    )
+
+
+def downgrade():
+    op.drop_index("nightly_checkpoint_date_status_idx", table_name="nightly_checkpoint")
+    op.drop_table("nightly_checkpoint")
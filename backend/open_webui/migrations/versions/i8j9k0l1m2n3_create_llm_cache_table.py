@@ -0,0 +1,39 @@
+"""Create llm_cache table for AI grading result cache
+
+Revision ID: i8j9k0l1m2n3
+Revises: h7i8j9k0l1m2
+Create Date: 2025-10-07 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "i8j9k0l1m2n3"
+down_revision: Union[str, None] = "h7i8j9k0l1m2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        "llm_cache",
+        sa.Column("key", sa.String(), nullable=False, primary_key=True),
+        sa.Column("namespace", sa.String(), nullable=False),
+        sa.Column("value", sa.JSON(), nullable=False),
+        sa.Column("hits", sa.BigInteger(), server_default="0"),
+        sa.Column("created_at", sa.BigInteger(), nullable=False),
+        sa.Column("accessed_at", sa.BigInteger(), nullable=False),
+        sa.Column("expires_at", sa.BigInteger(), nullable=True),
+    )
+
+    # 创建索引
+    op.create_index("llm_cache_accessed_idx", "llm_cache", ["accessed_at"])
+    op.create_index("llm_cache_expires_idx", "llm_cache", ["expires_at"])
+
+
+def downgrade():
+    op.drop_index("llm_cache_expires_idx", table_name="llm_cache")
+    op.drop_index("llm_cache_accessed_idx", table_name="llm_cache")
+    op.drop_table("llm_cache")
@@ -0,0 +1,28 @@
+"""Add indexes for leader dashboard aggregate queries
+
+Revision ID: j9k0l1m2n3o4
+Revises: i8j9k0l1m2n3
+Create Date: 2025-10-07 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "j9k0l1m2n3o4"
+down_revision: Union[str, None] = "i8j9k0l1m2n3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_index("submission_assignment_idx", "submission", ["assignment_id"])
+    op.create_index("submission_student_idx", "submission", ["student_id"])
+    op.create_index("assignment_teacher_idx", "assignment", ["teacher_id"])
+
+
+def downgrade():
+    op.drop_index("assignment_teacher_idx", table_name="assignment")
+    op.drop_index("submission_student_idx", table_name="submission")
+    op.drop_index("submission_assignment_idx", table_name="submission")
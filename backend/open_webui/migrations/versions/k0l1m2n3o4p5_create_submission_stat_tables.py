@@ -0,0 +1,156 @@
+"""Create submission_stat and teacher_student_stat materialized summary tables
+
+Revision ID: k0l1m2n3o4p5
+Revises: j9k0l1m2n3o4
+Create Date: 2025-10-08 09:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "k0l1m2n3o4p5"
+down_revision: Union[str, None] = "j9k0l1m2n3o4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        "submission_stat",
+        sa.Column("scope", sa.String(), nullable=False),
+        sa.Column("scope_id", sa.String(), nullable=False),
+        sa.Column("submissions_count", sa.BigInteger(), server_default="0"),
+        sa.Column("graded_count", sa.BigInteger(), server_default="0"),
+        sa.Column("student_count", sa.BigInteger(), server_default="0"),
+        sa.Column("score_sum", sa.Float(), server_default="0.0"),
+        sa.Column("score_count", sa.BigInteger(), server_default="0"),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("scope", "scope_id"),
+    )
+    op.create_table(
+        "teacher_student_stat",
+        sa.Column("teacher_id", sa.String(), nullable=False),
+        sa.Column("student_id", sa.String(), nullable=False),
+        sa.Column("submissions_count", sa.BigInteger(), server_default="0"),
+        sa.PrimaryKeyConstraint("teacher_id", "student_id"),
+    )
+
+    # 用已有的 submission 明细回填汇总
+    submission = sa.table(
+        "submission",
+        sa.column("id", sa.Text()),
+        sa.column("assignment_id", sa.Text()),
+        sa.column("student_id", sa.Text()),
+        sa.column("status", sa.Text()),
+        sa.column("score", sa.Float()),
+    )
+    assignment = sa.table(
+        "assignment",
+        sa.column("id", sa.Text()),
+        sa.column("teacher_id", sa.Text()),
+    )
+    submission_stat = sa.table(
+        "submission_stat",
+        sa.column("scope", sa.String()),
+        sa.column("scope_id", sa.String()),
+        sa.column("submissions_count", sa.BigInteger()),
+        sa.column("graded_count", sa.BigInteger()),
+        sa.column("student_count", sa.BigInteger()),
+        sa.column("score_sum", sa.Float()),
+        sa.column("score_count", sa.BigInteger()),
+    )
+    teacher_student_stat = sa.table(
+        "teacher_student_stat",
+        sa.column("teacher_id", sa.String()),
+        sa.column("student_id", sa.String()),
+        sa.column("submissions_count", sa.BigInteger()),
+    )
+
+    columns = [
+        "scope",
+        "scope_id",
+        "submissions_count",
+        "graded_count",
+        "student_count",
+        "score_sum",
+        "score_count",
+    ]
+
+    def aggregates(student_count):
+        return [
+            sa.func.count(submission.c.id),
+            sa.func.coalesce(
+                sa.func.sum(sa.case((submission.c.status == "graded", 1), else_=0)), 0
+            ),
+            student_count,
+            sa.func.coalesce(sa.func.sum(submission.c.score), 0.0),
+            sa.func.count(submission.c.score),
+        ]
+
+    op.execute(
+        submission_stat.insert().from_select(
+            columns,
+            sa.select(
+                sa.literal("school"), sa.literal("all"), *aggregates(sa.literal(0))
+            )
+            .select_from(submission)
+            .having(sa.func.count(submission.c.id) > 0),
+        )
+    )
+    for scope, key in (
+        ("student", submission.c.student_id),
+        ("assignment", submission.c.assignment_id),
+    ):
+        op.execute(
+            submission_stat.insert().from_select(
+                columns,
+                sa.select(sa.literal(scope), key, *aggregates(sa.literal(0)))
+                .where(key.isnot(None))
+                .group_by(key),
+            )
+        )
+
+    op.execute(
+        submission_stat.insert().from_select(
+            columns,
+            sa.select(
+                sa.literal("teacher"),
+                assignment.c.teacher_id,
+                *aggregates(sa.func.count(sa.distinct(submission.c.student_id))),
+            )
+            .select_from(
+                submission.join(
+                    assignment, assignment.c.id == submission.c.assignment_id
+                )
+            )
+            .where(assignment.c.teacher_id.isnot(None))
+            .group_by(assignment.c.teacher_id),
+        )
+    )
+    op.execute(
+        teacher_student_stat.insert().from_select(
+            ["teacher_id", "student_id", "submissions_count"],
+            sa.select(
+                assignment.c.teacher_id,
+                submission.c.student_id,
+                sa.func.count(submission.c.id),
+            )
+            .select_from(
+                submission.join(
+                    assignment, assignment.c.id == submission.c.assignment_id
+                )
+            )
+            .where(
+                assignment.c.teacher_id.isnot(None),
+                submission.c.student_id.isnot(None),
+            )
+            .group_by(assignment.c.teacher_id, submission.c.student_id),
+        )
+    )
+
+
+def downgrade():
+    op.drop_table("teacher_student_stat")
+    op.drop_table("submission_stat")
@@ -0,0 +1,38 @@
+"""Create student_context snapshot table for the teacher AI assistant
+
+Revision ID: l1m2n3o4p5q6
+Revises: k0l1m2n3o4p5
+Create Date: 2025-10-08 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "l1m2n3o4p5q6"
+down_revision: Union[str, None] = "k0l1m2n3o4p5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # 快照在首次写入或访问时由 StudentContexts 从明细重建，这里不做回填
+    op.create_table(
+        "student_context",
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("turn_days", sa.JSON(), server_default="{}"),
+        sa.Column("submissions_count", sa.BigInteger(), server_default="0"),
+        sa.Column("score_sum", sa.Float(), server_default="0.0"),
+        sa.Column("score_count", sa.BigInteger(), server_default="0"),
+        sa.Column("recent_submissions", sa.JSON(), server_default="[]"),
+        sa.Column("profile_id", sa.String(), nullable=True),
+        sa.Column("profile_text", sa.Text(), nullable=True),
+        sa.Column("profile_date", sa.BigInteger(), nullable=True),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("student_context")
@@ -0,0 +1,142 @@
+"""Partition the turn table by month and create the turn_archive table
+
+Revision ID: m2n3o4p5q6r7
+Revises: l1m2n3o4p5q6
+Create Date: 2025-10-09 10:00:00.000000
+
+"""
+
+import time
+from datetime import datetime, timezone
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "m2n3o4p5q6r7"
+down_revision: Union[str, None] = "l1m2n3o4p5q6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 迁移时预建到当前月之后的月数，之后由 Turns.ensure_partitions 在启动时续建
+PARTITION_MONTHS_AHEAD = 2
+
+
+def month_start(ts: int) -> datetime:
+    dt = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(dt: datetime) -> datetime:
+    return dt.replace(year=dt.year + dt.month // 12, month=dt.month % 12 + 1)
+
+
+def upgrade():
+    op.create_table(
+        "turn_archive",
+        sa.Column("id", sa.String(), nullable=False, primary_key=True),
+        sa.Column("period_start", sa.BigInteger(), nullable=False),
+        sa.Column("period_end", sa.BigInteger(), nullable=False),
+        sa.Column("path", sa.Text(), nullable=False),
+        sa.Column("row_count", sa.BigInteger(), server_default="0"),
+        sa.Column("size", sa.BigInteger(), server_default="0"),
+        sa.Column("created_at", sa.BigInteger(), nullable=False),
+    )
+    op.create_index(
+        "turn_archive_period_idx", "turn_archive", ["period_start", "period_end"]
+    )
+
+    conn = op.get_bind()
+    if conn.dialect.name != "postgresql":
+        # SQLite 等没有原生分区，turn 保持单表，由归档任务按月导出后删除旧数据
+        return
+
+    # Postgres：把 turn 重建为按 created_at 的月度范围分区表（主键需包含分区键）
+    op.execute("ALTER TABLE turn RENAME TO turn_unpartitioned")
+    op.execute("ALTER INDEX turn_session_idx RENAME TO turn_unpartitioned_session_idx")
+    op.execute("ALTER INDEX turn_created_idx RENAME TO turn_unpartitioned_created_idx")
+    op.execute(
+        """
+        CREATE TABLE turn (
+            id VARCHAR NOT NULL,
+            session_id VARCHAR NOT NULL,
+            role VARCHAR NOT NULL,
+            content TEXT,
+            tool_calls JSON DEFAULT '[]',
+            model VARCHAR,
+            tokens_in BIGINT DEFAULT 0,
+            tokens_out BIGINT DEFAULT 0,
+            cost BIGINT DEFAULT 0,
+            created_at BIGINT NOT NULL,
+            meta JSON DEFAULT '{}',
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("CREATE TABLE turn_default PARTITION OF turn DEFAULT")
+
+    oldest = conn.execute(
+        sa.text("SELECT MIN(created_at) FROM turn_unpartitioned")
+    ).scalar()
+    now = int(time.time())
+    start = month_start(oldest if oldest is not None else now)
+    end = month_start(now)
+    for _ in range(PARTITION_MONTHS_AHEAD):
+        end = next_month(end)
+
+    while start <= end:
+        upper = next_month(start)
+        op.execute(
+            f"CREATE TABLE turn_p{start:%Y%m} PARTITION OF turn "
+            f"FOR VALUES FROM ({int(start.timestamp())}) TO ({int(upper.timestamp())})"
+        )
+        start = upper
+
+    op.execute("CREATE INDEX turn_session_idx ON turn (session_id)")
+    op.execute("CREATE INDEX turn_created_idx ON turn (created_at)")
+
+    op.execute(
+        """
+        INSERT INTO turn (
+            id, session_id, role, content, tool_calls, model,
+            tokens_in, tokens_out, cost, created_at, meta
+        )
+        SELECT
+            id, session_id, role, content, tool_calls, model,
+            tokens_in, tokens_out, cost, created_at, meta
+        FROM turn_unpartitioned
+        """
+    )
+    op.execute("DROP TABLE turn_unpartitioned")
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == "postgresql":
+        op.execute("ALTER TABLE turn RENAME TO turn_partitioned")
+        op.execute(
+            "ALTER INDEX turn_session_idx RENAME TO turn_partitioned_session_idx"
+        )
+        op.execute(
+            "ALTER INDEX turn_created_idx RENAME TO turn_partitioned_created_idx"
+        )
+        op.create_table(
+            "turn",
+            sa.Column("id", sa.String(), nullable=False, primary_key=True),
+            sa.Column("session_id", sa.String(), nullable=False),
+            sa.Column("role", sa.String(), nullable=False),
+            sa.Column("content", sa.Text(), nullable=True),
+            sa.Column("tool_calls", sa.JSON(), server_default="[]"),
+            sa.Column("model", sa.String(), nullable=True),
+            sa.Column("tokens_in", sa.BigInteger(), server_default="0"),
+            sa.Column("tokens_out", sa.BigInteger(), server_default="0"),
+            sa.Column("cost", sa.BigInteger(), server_default="0"),
+            sa.Column("created_at", sa.BigInteger(), nullable=False),
+            sa.Column("meta", sa.JSON(), server_default="{}"),
+        )
+        op.execute("INSERT INTO turn SELECT * FROM turn_partitioned")
+        op.execute("DROP TABLE turn_partitioned")
+        op.create_index("turn_session_idx", "turn", ["session_id"])
+        op.create_index("turn_created_idx", "turn", ["created_at"])
+
+    op.drop_index("turn_archive_period_idx", table_name="turn_archive")
+    op.drop_table("turn_archive")
@@ -0,0 +1,112 @@
+"""Denormalize user_id, assignment_id and mode from session onto turn
+
+Revision ID: n3o4p5q6r7s8
+Revises: m2n3o4p5q6r7
+Create Date: 2025-10-09 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "n3o4p5q6r7s8"
+down_revision: Union[str, None] = "m2n3o4p5q6r7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade():
+    op.add_column("turn", sa.Column("user_id", sa.String(), nullable=True))
+    op.add_column("turn", sa.Column("assignment_id", sa.String(), nullable=True))
+    op.add_column("turn", sa.Column("mode", sa.String(), nullable=True))
+
+    # 分批从 session 回填，每批一次查询 + 一次批量更新
+    conn = op.get_bind()
+    turn = sa.table(
+        "turn",
+        sa.column("id", sa.String()),
+        sa.column("session_id", sa.String()),
+        sa.column("created_at", sa.BigInteger()),
+        sa.column("user_id", sa.String()),
+        sa.column("assignment_id", sa.String()),
+        sa.column("mode", sa.String()),
+    )
+    session = sa.table(
+        "session",
+        sa.column("id", sa.String()),
+        sa.column("user_id", sa.String()),
+        sa.column("assignment_id", sa.String()),
+        sa.column("mode", sa.String()),
+    )
+
+    # 按 (created_at, id) 键集分页，沿 turn_created_idx 前进，
+    # 不会每批重新扫描已回填的行
+    select_batch = (
+        sa.select(
+            turn.c.id,
+            turn.c.created_at,
+            session.c.user_id,
+            session.c.assignment_id,
+            session.c.mode,
+        )
+        .select_from(turn.join(session, turn.c.session_id == session.c.id))
+        .where(turn.c.user_id.is_(None))
+        .order_by(turn.c.created_at, turn.c.id)
+        .limit(BACKFILL_BATCH_SIZE)
+    )
+    # 带上 created_at，Postgres 分区表上可以裁剪到单个分区
+    update_turn = (
+        turn.update()
+        .where(
+            turn.c.id == sa.bindparam("_id"),
+            turn.c.created_at == sa.bindparam("_created_at"),
+        )
+        .values(
+            user_id=sa.bindparam("_user_id"),
+            assignment_id=sa.bindparam("_assignment_id"),
+            mode=sa.bindparam("_mode"),
+        )
+    )
+
+    last_key = None
+    while True:
+        query = select_batch
+        if last_key is not None:
+            created_at, id = last_key
+            query = query.where(
+                sa.or_(
+                    turn.c.created_at > created_at,
+                    sa.and_(turn.c.created_at == created_at, turn.c.id > id),
+                )
+            )
+        rows = conn.execute(query).fetchall()
+        if not rows:
+            break
+        last_key = (rows[-1].created_at, rows[-1].id)
+        conn.execute(
+            update_turn,
+            [
+                {
+                    "_id": row.id,
+                    "_created_at": row.created_at,
+                    "_user_id": row.user_id,
+                    "_assignment_id": row.assignment_id,
+                    "_mode": row.mode,
+                }
+                for row in rows
+            ],
+        )
+        if len(rows) < BACKFILL_BATCH_SIZE:
+            break
+
+    op.create_index("turn_user_created_idx", "turn", ["user_id", "created_at"])
+
+
+def downgrade():
+    op.drop_index("turn_user_created_idx", table_name="turn")
+    op.drop_column("turn", "mode")
+    op.drop_column("turn", "assignment_id")
+    op.drop_column("turn", "user_id")
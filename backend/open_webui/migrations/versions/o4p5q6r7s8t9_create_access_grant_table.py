@@ -0,0 +1,105 @@
+"""Create the access_grant table and backfill it from access_control
+
+Revision ID: o4p5q6r7s8t9
+Revises: n3o4p5q6r7s8
+Create Date: 2025-10-10 10:00:00.000000
+
+"""
+
+import json
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "o4p5q6r7s8t9"
+down_revision: Union[str, None] = "n3o4p5q6r7s8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+# (resource_type, 表名, 主键列, access_control 为 None 时的公开权限)
+RESOURCES = [
+    ("assignment", "assignment", "id", ("read", "write")),
+    ("knowledge", "knowledge", "id", ("read",)),
+    ("model", "model", "id", ("read",)),
+    ("tool", "tool", "id", ("read",)),
+    ("prompt", "prompt", "command", ("read",)),
+    ("note", "note", "id", ("read",)),
+]
+
+
+def get_grants(access_control, public_permissions):
+    # 与 models/access_grants.get_grants 一致，迁移中保留独立副本
+    if isinstance(access_control, str):
+        access_control = json.loads(access_control) if access_control else None
+    if access_control is None:
+        return [("public", "*", permission) for permission in public_permissions]
+
+    grants = set()
+    for permission in ("read", "write"):
+        access = access_control.get(permission) or {}
+        for group_id in access.get("group_ids") or []:
+            grants.add(("group", group_id, permission))
+        for user_id in access.get("user_ids") or []:
+            grants.add(("user", user_id, permission))
+    return sorted(grants)
+
+
+def upgrade():
+    access_grant = op.create_table(
+        "access_grant",
+        sa.Column("resource_type", sa.String(), nullable=False),
+        sa.Column("resource_id", sa.String(), nullable=False),
+        sa.Column("principal_type", sa.String(), nullable=False),
+        sa.Column("principal_id", sa.String(), nullable=False),
+        sa.Column("permission", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint(
+            "resource_type",
+            "resource_id",
+            "principal_type",
+            "principal_id",
+            "permission",
+        ),
+    )
+    op.create_index(
+        "access_grant_principal_idx",
+        "access_grant",
+        ["resource_type", "permission", "principal_type", "principal_id"],
+    )
+
+    conn = op.get_bind()
+    for resource_type, table_name, id_column, public_permissions in RESOURCES:
+        table = sa.table(
+            table_name,
+            sa.column(id_column, sa.String()),
+            sa.column("access_control", sa.JSON()),
+        )
+        result = conn.execute(
+            sa.select(table.c[id_column], table.c.access_control)
+        ).fetchall()
+
+        rows = []
+        for resource_id, access_control in result:
+            rows.extend(
+                {
+                    "resource_type": resource_type,
+                    "resource_id": resource_id,
+                    "principal_type": principal_type,
+                    "principal_id": principal_id,
+                    "permission": permission,
+                }
+                for principal_type, principal_id, permission in get_grants(
+                    access_control, public_permissions
+                )
+            )
+            if len(rows) >= BACKFILL_BATCH_SIZE:
+                op.bulk_insert(access_grant, rows)
+                rows = []
+        if rows:
+            op.bulk_insert(access_grant, rows)
+
+
+def downgrade():
+    op.drop_index("access_grant_principal_idx", table_name="access_grant")
+    op.drop_table("access_grant")
@@ -0,0 +1,39 @@
+"""Create the skill_mastery table
+
+Revision ID: p5q6r7s8t9u0
+Revises: o4p5q6r7s8t9
+Create Date: 2025-10-11 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "p5q6r7s8t9u0"
+down_revision: Union[str, None] = "o4p5q6r7s8t9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # 历史数据由 POST /api/v1/nightly/mastery/rebuild 从已评分提交和画像回填
+    op.create_table(
+        "skill_mastery",
+        sa.Column("student_id", sa.String(), nullable=False),
+        sa.Column("skill", sa.String(), nullable=False),
+        sa.Column("count", sa.BigInteger(), server_default="0"),
+        sa.Column("score_sum", sa.Float(), server_default="0"),
+        sa.Column("mean", sa.Float(), nullable=True),
+        sa.Column("ewma", sa.Float(), nullable=True),
+        sa.Column("last_score", sa.Float(), nullable=True),
+        sa.Column("last_seen_at", sa.BigInteger(), nullable=True),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("student_id", "skill"),
+    )
+    op.create_index("skill_mastery_skill_idx", "skill_mastery", ["skill", "ewma"])
+
+
+def downgrade():
+    op.drop_index("skill_mastery_skill_idx", table_name="skill_mastery")
+    op.drop_table("skill_mastery")
@@ -0,0 +1,175 @@
+"""Normalize chat history messages into the chat_message table
+
+Revision ID: q6r7s8t9u0v1
+Revises: p5q6r7s8t9u0
+Create Date: 2025-10-12 10:00:00.000000
+
+"""
+
+import time
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "q6r7s8t9u0v1"
+down_revision: Union[str, None] = "p5q6r7s8t9u0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 200
+
+chat_table = sa.table(
+    "chat",
+    sa.column("id", sa.String()),
+    sa.column("chat", sa.JSON()),
+    sa.column("current_message_id", sa.Text()),
+)
+
+chat_message_table = sa.table(
+    "chat_message",
+    sa.column("chat_id", sa.String()),
+    sa.column("id", sa.String()),
+    sa.column("parent_id", sa.String()),
+    sa.column("role", sa.String()),
+    sa.column("data", sa.JSON()),
+    sa.column("created_at", sa.BigInteger()),
+    sa.column("updated_at", sa.BigInteger()),
+)
+
+
+def iter_chat_batches(conn):
+    """(id, chat, current_message_id) in batches, keyset on id"""
+    last_id = None
+    while True:
+        query = sa.select(
+            chat_table.c.id, chat_table.c.chat, chat_table.c.current_message_id
+        )
+        if last_id is not None:
+            query = query.where(chat_table.c.id > last_id)
+        rows = conn.execute(
+            query.order_by(chat_table.c.id).limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield rows
+
+
+update_chat = (
+    chat_table.update()
+    .where(chat_table.c.id == sa.bindparam("_id"))
+    .values(
+        chat=sa.bindparam("_chat"),
+        current_message_id=sa.bindparam("_current_message_id"),
+    )
+)
+
+
+def upgrade():
+    op.add_column("chat", sa.Column("current_message_id", sa.Text(), nullable=True))
+    op.create_table(
+        "chat_message",
+        sa.Column("chat_id", sa.String(), nullable=False),
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("parent_id", sa.String(), nullable=True),
+        sa.Column("role", sa.String(), nullable=True),
+        sa.Column("data", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.BigInteger(), nullable=True),
+        sa.Column("updated_at", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("chat_id", "id"),
+    )
+    op.create_index(
+        "chat_message_chat_id_created_at_idx",
+        "chat_message",
+        ["chat_id", "created_at"],
+    )
+
+    # Move history.messages of every chat into chat_message rows
+    conn = op.get_bind()
+    now = int(time.time())
+    for rows in iter_chat_batches(conn):
+        messages = []
+        chats = []
+        for row in rows:
+            chat = row.chat if isinstance(row.chat, dict) else None
+            history = chat.get("history") if chat else None
+            if not isinstance(history, dict) or not isinstance(
+                history.get("messages"), dict
+            ):
+                continue
+
+            for message_id, message in history["messages"].items():
+                message = message if isinstance(message, dict) else {}
+                timestamp = message.get("timestamp")
+                messages.append(
+                    {
+                        "chat_id": row.id,
+                        "id": message_id,
+                        "parent_id": message.get("parentId"),
+                        "role": message.get("role"),
+                        "data": message,
+                        "created_at": timestamp if isinstance(timestamp, int) else now,
+                        "updated_at": now,
+                    }
+                )
+            chats.append(
+                {
+                    "_id": row.id,
+                    "_chat": {**chat, "history": {**history, "messages": {}}},
+                    "_current_message_id": history.get("currentId"),
+                }
+            )
+
+        if messages:
+            conn.execute(chat_message_table.insert(), messages)
+        if chats:
+            conn.execute(update_chat, chats)
+
+
+def downgrade():
+    # Put the messages back into chat.chat before dropping the table
+    conn = op.get_bind()
+    for rows in iter_chat_batches(conn):
+        chat_ids = [row.id for row in rows]
+        messages_maps = {}
+        for chat_id, message_id, data in conn.execute(
+            sa.select(
+                chat_message_table.c.chat_id,
+                chat_message_table.c.id,
+                chat_message_table.c.data,
+            )
+            .where(chat_message_table.c.chat_id.in_(chat_ids))
+            .order_by(chat_message_table.c.chat_id, chat_message_table.c.created_at)
+        ):
+            messages_maps.setdefault(chat_id, {})[message_id] = data or {}
+
+        chats = []
+        for row in rows:
+            if row.id not in messages_maps and not row.current_message_id:
+                continue
+            chat = row.chat if isinstance(row.chat, dict) else {}
+            history = (
+                chat.get("history") if isinstance(chat.get("history"), dict) else {}
+            )
+            history = {
+                **history,
+                "messages": {
+                    **(history.get("messages") or {}),
+                    **messages_maps.get(row.id, {}),
+                },
+            }
+            if row.current_message_id:
+                history["currentId"] = row.current_message_id
+            chats.append(
+                {
+                    "_id": row.id,
+                    "_chat": {**chat, "history": history},
+                    "_current_message_id": None,
+                }
+            )
+        if chats:
+            conn.execute(update_chat, chats)
+
+    op.drop_index("chat_message_chat_id_created_at_idx", table_name="chat_message")
+    op.drop_table("chat_message")
+    op.drop_column("chat", "current_message_id")
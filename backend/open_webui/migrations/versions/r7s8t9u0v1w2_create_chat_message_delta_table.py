@@ -0,0 +1,82 @@
+"""Add the chat_message_delta append log for streamed message content
+
+Revision ID: r7s8t9u0v1w2
+Revises: q6r7s8t9u0v1
+Create Date: 2025-10-13 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "r7s8t9u0v1w2"
+down_revision: Union[str, None] = "q6r7s8t9u0v1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        "chat_message_delta",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("chat_id", sa.String(), nullable=True),
+        sa.Column("message_id", sa.String(), nullable=True),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.BigInteger(), nullable=True),
+    )
+    op.create_index(
+        "chat_message_delta_message_idx",
+        "chat_message_delta",
+        ["chat_id", "message_id", "id"],
+    )
+
+
+def downgrade():
+    # Fold pending deltas into their messages so no streamed content is lost
+    conn = op.get_bind()
+    delta_table = sa.table(
+        "chat_message_delta",
+        sa.column("id", sa.Integer()),
+        sa.column("chat_id", sa.String()),
+        sa.column("message_id", sa.String()),
+        sa.column("content", sa.Text()),
+    )
+    chat_message_table = sa.table(
+        "chat_message",
+        sa.column("chat_id", sa.String()),
+        sa.column("id", sa.String()),
+        sa.column("data", sa.JSON()),
+    )
+
+    deltas: dict[tuple[str, str], list[str]] = {}
+    for row in conn.execute(
+        sa.select(
+            delta_table.c.chat_id, delta_table.c.message_id, delta_table.c.content
+        ).order_by(delta_table.c.id)
+    ).fetchall():
+        deltas.setdefault((row.chat_id, row.message_id), []).append(row.content or "")
+
+    for (chat_id, message_id), contents in deltas.items():
+        message = conn.execute(
+            sa.select(chat_message_table.c.data).where(
+                chat_message_table.c.chat_id == chat_id,
+                chat_message_table.c.id == message_id,
+            )
+        ).first()
+        if message is None:
+            continue
+
+        data = dict(message.data or {})
+        data["content"] = (data.get("content") or "") + "".join(contents)
+        conn.execute(
+            chat_message_table.update()
+            .where(
+                chat_message_table.c.chat_id == chat_id,
+                chat_message_table.c.id == message_id,
+            )
+            .values(data=data)
+        )
+
+    op.drop_index("chat_message_delta_message_idx", table_name="chat_message_delta")
+    op.drop_table("chat_message_delta")
@@ -0,0 +1,155 @@
+"""Add the chat_search full-text index over chat titles and messages
+
+Revision ID: s8t9u0v1w2x3
+Revises: r7s8t9u0v1w2
+Create Date: 2025-10-14 10:00:00.000000
+
+"""
+
+import logging
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "s8t9u0v1w2x3"
+down_revision: Union[str, None] = "r7s8t9u0v1w2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+
+SQLITE_FTS_STATEMENTS = [
+    # External content table: the text lives in chat_search, FTS5 keeps only the index
+    "CREATE VIRTUAL TABLE chat_search_fts USING fts5("
+    "content, content='chat_search', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER chat_search_ai AFTER INSERT ON chat_search BEGIN "
+    "INSERT INTO chat_search_fts(rowid, content) VALUES (new.id, new.content); "
+    "END",
+    "CREATE TRIGGER chat_search_ad AFTER DELETE ON chat_search BEGIN "
+    "INSERT INTO chat_search_fts(chat_search_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); "
+    "END",
+    "CREATE TRIGGER chat_search_au AFTER UPDATE ON chat_search BEGIN "
+    "INSERT INTO chat_search_fts(chat_search_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); "
+    "INSERT INTO chat_search_fts(rowid, content) VALUES (new.id, new.content); "
+    "END",
+]
+
+chat_table = sa.table(
+    "chat",
+    sa.column("id", sa.String()),
+    sa.column("user_id", sa.String()),
+    sa.column("title", sa.Text()),
+)
+
+chat_message_table = sa.table(
+    "chat_message",
+    sa.column("chat_id", sa.String()),
+    sa.column("id", sa.String()),
+    sa.column("data", sa.JSON()),
+)
+
+chat_search_table = sa.table(
+    "chat_search",
+    sa.column("chat_id", sa.String()),
+    sa.column("message_id", sa.String()),
+    sa.column("content", sa.Text()),
+)
+
+
+def get_content(value) -> str:
+    return value.replace("\x00", "") if isinstance(value, str) else ""
+
+
+def create_text_index(conn):
+    """FTS5 trigram index on SQLite, pg_trgm GIN index on PostgreSQL"""
+    dialect_name = conn.dialect.name
+    try:
+        with conn.begin_nested():
+            if dialect_name == "sqlite":
+                for statement in SQLITE_FTS_STATEMENTS:
+                    conn.execute(sa.text(statement))
+            elif dialect_name == "postgresql":
+                conn.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(
+                    sa.text(
+                        "CREATE INDEX chat_search_content_trgm_idx "
+                        "ON chat_search USING gin (content gin_trgm_ops)"
+                    )
+                )
+    except Exception as e:
+        # Search still works without it, by scanning chat_search
+        log.warning(f"Chat search text index not created: {e}")
+
+
+def upgrade():
+    op.create_table(
+        "chat_search",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("chat_id", sa.String(), nullable=True),
+        sa.Column("message_id", sa.String(), nullable=True),
+        sa.Column("content", sa.Text(), nullable=True),
+    )
+    op.create_index(
+        "chat_search_chat_id_message_id_idx",
+        "chat_search",
+        ["chat_id", "message_id"],
+        unique=True,
+    )
+
+    conn = op.get_bind()
+    create_text_index(conn)
+
+    # Index titles and message contents of every chat except shared copies
+    last_id = None
+    while True:
+        query = sa.select(chat_table.c.id, chat_table.c.title).where(
+            sa.not_(chat_table.c.user_id.like("shared-%"))
+        )
+        if last_id is not None:
+            query = query.where(chat_table.c.id > last_id)
+        chats = conn.execute(
+            query.order_by(chat_table.c.id).limit(BATCH_SIZE)
+        ).fetchall()
+        if not chats:
+            break
+        last_id = chats[-1].id
+
+        rows = [
+            {"chat_id": chat.id, "message_id": "", "content": get_content(chat.title)}
+            for chat in chats
+        ]
+        for chat_id, message_id, data in conn.execute(
+            sa.select(
+                chat_message_table.c.chat_id,
+                chat_message_table.c.id,
+                chat_message_table.c.data,
+            ).where(chat_message_table.c.chat_id.in_([chat.id for chat in chats]))
+        ).fetchall():
+            rows.append(
+                {
+                    "chat_id": chat_id,
+                    "message_id": message_id,
+                    "content": get_content((data or {}).get("content")),
+                }
+            )
+
+        rows = [row for row in rows if row["content"]]
+        if rows:
+            conn.execute(chat_search_table.insert(), rows)
+
+
+def downgrade():
+    conn = op.get_bind()
+    if conn.dialect.name == "sqlite":
+        for name in ("chat_search_ai", "chat_search_ad", "chat_search_au"):
+            conn.execute(sa.text(f"DROP TRIGGER IF EXISTS {name}"))
+        conn.execute(sa.text("DROP TABLE IF EXISTS chat_search_fts"))
+    elif conn.dialect.name == "postgresql":
+        conn.execute(sa.text("DROP INDEX IF EXISTS chat_search_content_trgm_idx"))
+
+    op.drop_index("chat_search_chat_id_message_id_idx", table_name="chat_search")
+    op.drop_table("chat_search")
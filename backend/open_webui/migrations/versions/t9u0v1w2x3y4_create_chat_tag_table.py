@@ -0,0 +1,77 @@
+"""Add the chat_tag junction table and backfill it from chat.meta tags
+
+Revision ID: t9u0v1w2x3y4
+Revises: s8t9u0v1w2x3
+Create Date: 2025-10-15 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "t9u0v1w2x3y4"
+down_revision: Union[str, None] = "s8t9u0v1w2x3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 200
+
+chat_table = sa.table(
+    "chat",
+    sa.column("id", sa.String()),
+    sa.column("user_id", sa.String()),
+    sa.column("meta", sa.JSON()),
+)
+
+chat_tag_table = sa.table(
+    "chat_tag",
+    sa.column("chat_id", sa.String()),
+    sa.column("tag_id", sa.String()),
+    sa.column("user_id", sa.String()),
+)
+
+
+def upgrade():
+    op.create_table(
+        "chat_tag",
+        sa.Column("chat_id", sa.String(), nullable=False),
+        sa.Column("tag_id", sa.String(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("chat_id", "tag_id"),
+    )
+    op.create_index("chat_tag_user_id_tag_id_idx", "chat_tag", ["user_id", "tag_id"])
+
+    # One row per tag in meta.tags of every chat except shared copies
+    conn = op.get_bind()
+    last_id = None
+    while True:
+        query = sa.select(
+            chat_table.c.id, chat_table.c.user_id, chat_table.c.meta
+        ).where(sa.not_(chat_table.c.user_id.like("shared-%")))
+        if last_id is not None:
+            query = query.where(chat_table.c.id > last_id)
+        chats = conn.execute(
+            query.order_by(chat_table.c.id).limit(BATCH_SIZE)
+        ).fetchall()
+        if not chats:
+            break
+        last_id = chats[-1].id
+
+        rows = []
+        for chat in chats:
+            meta = chat.meta if isinstance(chat.meta, dict) else {}
+            tags = meta.get("tags") if isinstance(meta.get("tags"), list) else []
+            rows.extend(
+                {"chat_id": chat.id, "tag_id": tag_id, "user_id": chat.user_id}
+                for tag_id in dict.fromkeys(
+                    tag for tag in tags if isinstance(tag, str) and tag
+                )
+            )
+        if rows:
+            conn.execute(chat_tag_table.insert(), rows)
+
+
+def downgrade():
+    op.drop_index("chat_tag_user_id_tag_id_idx", table_name="chat_tag")
+    op.drop_table("chat_tag")
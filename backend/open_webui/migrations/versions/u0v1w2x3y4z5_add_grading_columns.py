@@ -0,0 +1,48 @@
+"""Add the rubric and grading columns missing from assignment and submission
+
+Revision ID: u0v1w2x3y4z5
+Revises: t9u0v1w2x3y4
+Create Date: 2025-10-16 10:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision: str = "u0v1w2x3y4z5"
+down_revision: Union[str, None] = "t9u0v1w2x3y4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 模型中已有、但此前的迁移没有创建的列（已手动加过的库会跳过）
+COLUMNS = {
+    "assignment": [
+        sa.Column("rubric_json", sa.JSON(), nullable=True),
+        sa.Column("grading_formula_json", sa.JSON(), nullable=True),
+        sa.Column("ai_assist", sa.Boolean(), server_default=sa.false()),
+    ],
+    "submission": [
+        sa.Column("rubric_scores_json", sa.JSON(), nullable=True),
+        sa.Column("ai_feedback_draft", sa.Text(), nullable=True),
+        sa.Column("grader_id", sa.Text(), nullable=True),
+        sa.Column("graded_at", sa.BigInteger(), nullable=True),
+    ],
+}
+
+
+def upgrade():
+    inspector = inspect(op.get_bind())
+    for table, columns in COLUMNS.items():
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        missing = [column for column in columns if column.name not in existing]
+        if missing:
+            with op.batch_alter_table(table, schema=None) as batch_op:
+                for column in missing:
+                    batch_op.add_column(column)
+
+
+def downgrade():
+    # 这些列可能早于本迁移手动添加，降级时保留
+    pass
@@ -0,0 +1,216 @@
+import logging
+from typing import Iterable, Optional
+
+from open_webui.internal.db import Base, get_db
+
+from sqlalchemy import Column, Index, String, insert, or_, and_, select
+
+log = logging.getLogger(__name__)
+
+# access_control 为 None 时的公开授权主体
+PUBLIC_PRINCIPAL = "*"
+
+# 大多数资源 access_control 为 None 表示所有人可读（与 has_access(strict=True) 一致）
+DEFAULT_PUBLIC_PERMISSIONS = ("read",)
+
+####################
+# Access Grant DB Schema
+####################
+
+
+class AccessGrant(Base):
+    """
+    access_control JSON 的规范化索引：每行表示一个主体对一个资源的一项权限
+    资源写入时同步维护，列表查询据此在 SQL 中过滤可见资源
+    """
+
+    __tablename__ = "access_grant"
+
+    # assignment, knowledge, model, tool, prompt, note
+    resource_type = Column(String, primary_key=True)
+    resource_id = Column(String, primary_key=True)
+    principal_type = Column(String, primary_key=True)  # user, group, public
+    principal_id = Column(String, primary_key=True)
+    permission = Column(String, primary_key=True)  # read, write
+
+    __table_args__ = (
+        Index(
+            "access_grant_principal_idx",
+            "resource_type",
+            "permission",
+            "principal_type",
+            "principal_id",
+        ),
+    )
+
+
+def get_grants(
+    access_control: Optional[dict],
+    public_permissions: Iterable[str] = DEFAULT_PUBLIC_PERMISSIONS,
+) -> list[tuple[str, str, str]]:
+    """access_control → [(principal_type, principal_id, permission)]"""
+    if access_control is None:
+        return [
+            ("public", PUBLIC_PRINCIPAL, permission)
+            for permission in public_permissions
+        ]
+
+    grants = set()
+    for permission in ("read", "write"):
+        access = access_control.get(permission) or {}
+        for group_id in access.get("group_ids") or []:
+            grants.add(("group", group_id, permission))
+        for user_id in access.get("user_ids") or []:
+            grants.add(("user", user_id, permission))
+    return sorted(grants)
+
+
+####################
+# AccessGrantsTable
+####################
+
+
+class AccessGrantsTable:
+    def set_grants(
+        self,
+        db,
+        resource_type: str,
+        resource_id: str,
+        access_control: Optional[dict],
+        public_permissions: Iterable[str] = DEFAULT_PUBLIC_PERMISSIONS,
+    ) -> None:
+        """在调用方的事务中用 access_control 覆盖该资源的授权行"""
+        self.delete_grants(db, resource_type, resource_id)
+        rows = [
+            {
+                "resource_type": resource_type,
+                "resource_id": resource_id,
+                "principal_type": principal_type,
+                "principal_id": principal_id,
+                "permission": permission,
+            }
+            for principal_type, principal_id, permission in get_grants(
+                access_control, public_permissions
+            )
+        ]
+        if rows:
+            db.execute(insert(AccessGrant), rows)
+
+    def delete_grants(
+        self, db, resource_type: str, resource_id: Optional[str] = None
+    ) -> None:
+        """在调用方的事务中删除资源的授权行，resource_id 为空时删除该类型的全部"""
+        query = db.query(AccessGrant).filter(AccessGrant.resource_type == resource_type)
+        if resource_id is not None:
+            query = query.filter(AccessGrant.resource_id == resource_id)
+        query.delete(synchronize_session=False)
+
+    def get_access_filter(
+        self,
+        resource_type: str,
+        resource_id_column,
+        user_id: str,
+        permission: str,
+        user_group_ids: Iterable[str],
+    ):
+        """
+        可见性过滤条件：resource_id_column IN (该用户 / 所在组 / 公开 的授权资源)
+        资源的所有者判断由调用方 or_ 在外层
+        """
+        principals = [
+            and_(
+                AccessGrant.principal_type == "user",
+                AccessGrant.principal_id == user_id,
+            ),
+            AccessGrant.principal_type == "public",
+        ]
+        user_group_ids = list(user_group_ids)
+        if user_group_ids:
+            principals.append(
+                and_(
+                    AccessGrant.principal_type == "group",
+                    AccessGrant.principal_id.in_(user_group_ids),
+                )
+            )
+
+        return resource_id_column.in_(
+            select(AccessGrant.resource_id).where(
+                AccessGrant.resource_type == resource_type,
+                AccessGrant.permission == permission,
+                or_(*principals),
+            )
+        )
+
+    def rebuild_grants(self, resource_type: Optional[str] = None) -> int:
+        """从各资源表的 access_control 全量重建授权行（修复或回填用），返回写入的行数"""
+        from open_webui.models.assignments import (
+            ASSIGNMENT_PUBLIC_PERMISSIONS,
+            Assignment,
+        )
+        from open_webui.models.knowledge import Knowledge
+        from open_webui.models.models import Model
+        from open_webui.models.notes import Note
+        from open_webui.models.prompts import Prompt
+        from open_webui.models.tools import Tool
+
+        resources = {
+            "assignment": (
+                Assignment.id,
+                Assignment.access_control,
+                ASSIGNMENT_PUBLIC_PERMISSIONS,
+            ),
+            "knowledge": (
+                Knowledge.id,
+                Knowledge.access_control,
+                DEFAULT_PUBLIC_PERMISSIONS,
+            ),
+            "model": (Model.id, Model.access_control, DEFAULT_PUBLIC_PERMISSIONS),
+            "tool": (Tool.id, Tool.access_control, DEFAULT_PUBLIC_PERMISSIONS),
+            "prompt": (
+                Prompt.command,
+                Prompt.access_control,
+                DEFAULT_PUBLIC_PERMISSIONS,
+            ),
+            "note": (Note.id, Note.access_control, DEFAULT_PUBLIC_PERMISSIONS),
+        }
+
+        count = 0
+        with get_db() as db:
+            for name, (
+                id_column,
+                access_column,
+                public_permissions,
+            ) in resources.items():
+                if resource_type and name != resource_type:
+                    continue
+
+                self.delete_grants(db, name)
+                rows = []
+                for resource_id, access_control in db.query(
+                    id_column, access_column
+                ).all():
+                    rows.extend(
+                        {
+                            "resource_type": name,
+                            "resource_id": resource_id,
+                            "principal_type": principal_type,
+                            "principal_id": principal_id,
+                            "permission": permission,
+                        }
+                        for principal_type, principal_id, permission in get_grants(
+                            access_control, public_permissions
+                        )
+                    )
+                    if len(rows) >= 1000:
+                        db.execute(insert(AccessGrant), rows)
+                        count += len(rows)
+                        rows = []
+                if rows:
+                    db.execute(insert(AccessGrant), rows)
+                    count += len(rows)
+
+            db.commit()
+        return count
+
+
+AccessGrants = AccessGrantsTable()
@@ -5,13 +5,13 @@ from typing import Optional
 from functools import lru_cache
 
 from open_webui.internal.db import Base, get_db
+from open_webui.models.access_grants import AccessGrants
 from open_webui.models.groups import Groups
-from open_webui.utils.access_control import has_access
 from open_webui.models.users import Users, UserResponse
 
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON, Float
+from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON, Float, Index
 from sqlalchemy import or_, func, select, and_, text
 from sqlalchemy.sql import exists
 
@@ -47,6 +47,8 @@ class Assignment(Base):
     created_at = Column(BigInteger)
     updated_at = Column(BigInteger)
 
+    __table_args__ = (Index("assignment_teacher_idx", "teacher_id"),)
+
 
 class AssignmentModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -112,6 +114,10 @@ class AssignmentUserResponse(AssignmentModel):
     graded_count: Optional[int] = 0  # 已批改数量
 
 
+# access_control 为 None 的作业对所有人可读可写（与原有的可见性判断一致）
+ASSIGNMENT_PUBLIC_PERMISSIONS = ("read", "write")
+
+
 class AssignmentTable:
     def insert_new_assignment(
         self,
@@ -132,6 +138,13 @@ class AssignmentTable:
             new_assignment = Assignment(**assignment.model_dump())
 
             db.add(new_assignment)
+            AccessGrants.set_grants(
+                db,
+                "assignment",
+                assignment.id,
+                assignment.access_control,
+                ASSIGNMENT_PUBLIC_PERMISSIONS,
+            )
             db.commit()
             return assignment
 
@@ -172,45 +185,33 @@ class AssignmentTable:
         skip: Optional[int] = None,
         limit: Optional[int] = None,
     ) -> list[AssignmentModel]:
-        with get_db() as db:
-            user_groups = Groups.get_groups_by_member_id(user_id)
-            user_group_ids = {group.id for group in user_groups}
+        """老师本人的作业及通过 access_grant 对该用户可见的作业，按更新时间分页"""
+        user_group_ids = {group.id for group in Groups.get_groups_by_member_id(user_id)}
 
+        with get_db() as db:
             query = (
                 db.query(Assignment)
-                .order_by(Assignment.updated_at.desc())
-                .execution_options(stream_results=True)
-                .yield_per(256)
-            )
-
-            results: list[AssignmentModel] = []
-            n_skipped = 0
-
-            for assignment in query:
-                # Fast-pass #1: owner/teacher
-                if assignment.teacher_id == user_id:
-                    permitted = True
-                # Fast-pass #2: public/open
-                elif assignment.access_control is None:
-                    # Public assignments can be read by everyone
-                    permitted = True
-                else:
-                    permitted = has_access(
-                        user_id, permission, assignment.access_control, user_group_ids
+                .filter(
+                    or_(
+                        Assignment.teacher_id == user_id,
+                        AccessGrants.get_access_filter(
+                            "assignment",
+                            Assignment.id,
+                            user_id,
+                            permission,
+                            user_group_ids,
+                        ),
                     )
+                )
+                .order_by(Assignment.updated_at.desc(), Assignment.id)
+            )
+            if skip is not None:
+                query = query.offset(skip)
+            if limit is not None:
+                query = query.limit(limit)
 
-                if not permitted:
-                    continue
-
-                if skip and n_skipped < skip:
-                    n_skipped += 1
-                    continue
-
-                results.append(AssignmentModel.model_validate(assignment))
-                if limit is not None and len(results) >= limit:
-                    break
-
-            return results
+            assignments = query.all()
+            return [AssignmentModel.model_validate(assignment) for assignment in assignments]
 
     def get_assignment_by_id(self, id: str) -> Optional[AssignmentModel]:
         with get_db() as db:
@@ -230,6 +231,15 @@ class AssignmentTable:
             for key, value in form_data_dict.items():
                 setattr(assignment, key, value)
 
+            if "access_control" in form_data_dict:
+                AccessGrants.set_grants(
+                    db,
+                    "assignment",
+                    id,
+                    assignment.access_control,
+                    ASSIGNMENT_PUBLIC_PERMISSIONS,
+                )
+
             assignment.updated_at = int(time.time())
 
             db.commit()
@@ -238,6 +248,7 @@ class AssignmentTable:
     def delete_assignment_by_id(self, id: str):
         with get_db() as db:
             db.query(Assignment).filter(Assignment.id == id).delete()
+            AccessGrants.delete_grants(db, "assignment", id)
             db.commit()
             return True
 
@@ -0,0 +1,343 @@
+import logging
+import time
+from typing import Iterable, Optional
+
+from open_webui.internal.db import Base
+from open_webui.models.chat_search import ChatSearches
+from open_webui.env import SRC_LOG_LEVELS
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    String,
+    Text,
+    JSON,
+    Index,
+    insert,
+    update,
+)
+
+####################
+# Chat Message DB Schema
+####################
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+class ChatMessage(Base):
+    """
+    chat.chat["history"]["messages"] normalized into one row per message, so a
+    single message can be written without rewriting the whole chat JSON.
+    """
+
+    __tablename__ = "chat_message"
+
+    chat_id = Column(String, primary_key=True)
+    id = Column(String, primary_key=True)  # message id inside the chat history
+
+    parent_id = Column(String, nullable=True)
+    role = Column(String, nullable=True)
+    data = Column(JSON)  # the full message dict as stored in history.messages
+
+    created_at = Column(BigInteger)
+    updated_at = Column(BigInteger)
+
+    __table_args__ = (
+        # WHERE chat_id = ... ORDER BY created_at
+        Index("chat_message_chat_id_created_at_idx", "chat_id", "created_at"),
+    )
+
+
+class ChatMessageDelta(Base):
+    """
+    Append-only log of content deltas for a message that is still streaming.
+    Appending is a single insert regardless of message size; the deltas are
+    folded into chat_message.data["content"] by compaction (stream end, or the
+    next upsert of the message) and applied on read until then.
+    """
+
+    __tablename__ = "chat_message_delta"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # append order
+    chat_id = Column(String)
+    message_id = Column(String)
+    content = Column(Text)
+    created_at = Column(BigInteger)
+
+    __table_args__ = (
+        Index("chat_message_delta_message_idx", "chat_id", "message_id", "id"),
+    )
+
+
+class ChatMessageModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    chat_id: str
+    id: str
+    parent_id: Optional[str] = None
+    role: Optional[str] = None
+    data: dict = {}
+    created_at: int
+    updated_at: int
+
+
+def _get_row(chat_id: str, message_id: str, message: dict, now: int) -> dict:
+    timestamp = message.get("timestamp")
+    return {
+        "chat_id": chat_id,
+        "id": message_id,
+        "parent_id": message.get("parentId"),
+        "role": message.get("role"),
+        "data": message,
+        "created_at": timestamp if isinstance(timestamp, int) else now,
+        "updated_at": now,
+    }
+
+
+def _apply_deltas(message: dict, deltas: list[str]) -> dict:
+    if not deltas:
+        return message
+    return {**message, "content": (message.get("content") or "") + "".join(deltas)}
+
+
+####################
+# ChatMessagesTable
+####################
+
+
+class ChatMessagesTable:
+    """All methods run inside the caller's session; the caller commits."""
+
+    def get_messages_map(self, db, chat_id: str) -> dict:
+        return self.get_messages_maps(db, [chat_id]).get(chat_id, {})
+
+    def get_messages_maps(
+        self, db, chat_ids: Iterable[str], apply_deltas: bool = True
+    ) -> dict[str, dict]:
+        """{chat_id: history.messages} for several chats, with pending deltas applied"""
+        chat_ids = list(chat_ids)
+        if not chat_ids:
+            return {}
+
+        rows = (
+            db.query(ChatMessage.chat_id, ChatMessage.id, ChatMessage.data)
+            .filter(ChatMessage.chat_id.in_(chat_ids))
+            .order_by(ChatMessage.chat_id, ChatMessage.created_at, ChatMessage.id)
+            .all()
+        )
+
+        messages_maps: dict[str, dict] = {}
+        for chat_id, message_id, data in rows:
+            messages_maps.setdefault(chat_id, {})[message_id] = data or {}
+
+        if not apply_deltas:
+            return messages_maps
+
+        for (chat_id, message_id), deltas in self._get_deltas(db, chat_ids).items():
+            messages = messages_maps.get(chat_id, {})
+            if message_id in messages:
+                messages[message_id] = _apply_deltas(messages[message_id], deltas)
+        return messages_maps
+
+    def get_message(self, db, chat_id: str, message_id: str) -> Optional[dict]:
+        message = db.get(ChatMessage, (chat_id, message_id))
+        if message is None:
+            return None
+
+        deltas = self._get_deltas(db, [chat_id], message_id)
+        return _apply_deltas(message.data or {}, deltas.get((chat_id, message_id)))
+
+    def _get_deltas(
+        self, db, chat_ids: list[str], message_id: Optional[str] = None
+    ) -> dict[tuple[str, str], list[str]]:
+        """Pending deltas as {(chat_id, message_id): [content, ...]} in append order"""
+        query = db.query(
+            ChatMessageDelta.chat_id,
+            ChatMessageDelta.message_id,
+            ChatMessageDelta.content,
+        ).filter(ChatMessageDelta.chat_id.in_(chat_ids))
+        if message_id is not None:
+            query = query.filter(ChatMessageDelta.message_id == message_id)
+
+        deltas: dict[tuple[str, str], list[str]] = {}
+        for chat_id, delta_message_id, content in query.order_by(ChatMessageDelta.id):
+            deltas.setdefault((chat_id, delta_message_id), []).append(content or "")
+        return deltas
+
+    def append_content(self, db, chat_id: str, message_id: str, content: str) -> bool:
+        """
+        Append a content delta to an existing message without reading or
+        rewriting it. Returns False if the message does not exist.
+        """
+        exists = (
+            db.query(ChatMessage.id).filter_by(chat_id=chat_id, id=message_id).first()
+        )
+        if exists is None:
+            return False
+
+        if content:
+            db.add(
+                ChatMessageDelta(
+                    chat_id=chat_id,
+                    message_id=message_id,
+                    content=content,
+                    created_at=int(time.time()),
+                )
+            )
+            db.flush()
+        return True
+
+    def compact_message(self, db, chat_id: str, message_id: str) -> Optional[dict]:
+        """Fold pending deltas into the stored message and return it"""
+        message = (
+            db.query(ChatMessage)
+            .filter_by(chat_id=chat_id, id=message_id)
+            .with_for_update()
+            .first()
+        )
+        if self._fold_deltas(db, message, chat_id, message_id) and message:
+            ChatSearches.set_contents(
+                db, chat_id, {message_id: message.data.get("content")}
+            )
+        db.flush()
+        return message.data if message else None
+
+    def _fold_deltas(
+        self, db, message: Optional[ChatMessage], chat_id: str, message_id: str
+    ) -> bool:
+        deltas = (
+            db.query(ChatMessageDelta.id, ChatMessageDelta.content)
+            .filter_by(chat_id=chat_id, message_id=message_id)
+            .order_by(ChatMessageDelta.id)
+            .all()
+        )
+        if not deltas:
+            return False
+
+        if message is not None:
+            message.data = _apply_deltas(
+                message.data or {}, [content or "" for _, content in deltas]
+            )
+            message.updated_at = int(time.time())
+
+        # Only the folded ids, so a delta appended concurrently is kept
+        db.query(ChatMessageDelta).filter(
+            ChatMessageDelta.id.in_([delta_id for delta_id, _ in deltas])
+        ).delete(synchronize_session=False)
+        return True
+
+    def upsert_message(self, db, chat_id: str, message_id: str, message: dict) -> dict:
+        """Merge message into the stored one (or insert it) and return the result"""
+        now = int(time.time())
+        existing = (
+            db.query(ChatMessage)
+            .filter_by(chat_id=chat_id, id=message_id)
+            .with_for_update()
+            .first()
+        )
+
+        if existing:
+            # Pending deltas come first; a "content" in message replaces them
+            folded = self._fold_deltas(db, existing, chat_id, message_id)
+            data = {**(existing.data or {}), **message}
+            existing.data = data
+            existing.parent_id = data.get("parentId")
+            existing.role = data.get("role")
+            existing.updated_at = now
+        else:
+            folded = False
+            data = message
+            db.add(ChatMessage(**_get_row(chat_id, message_id, data, now)))
+
+        if "content" in message or folded:
+            ChatSearches.set_contents(db, chat_id, {message_id: data.get("content")})
+
+        db.flush()
+        return data
+
+    def set_messages(self, db, chat_id: str, messages: dict) -> None:
+        """
+        Replace the chat's messages with `messages`, writing only the rows that
+        were added, changed or removed.
+        """
+        now = int(time.time())
+        existing = self.get_messages_maps(db, [chat_id], apply_deltas=False).get(
+            chat_id, {}
+        )
+
+        inserts = [
+            _get_row(chat_id, message_id, message, now)
+            for message_id, message in messages.items()
+            if message_id not in existing
+        ]
+        updates = [
+            {
+                "chat_id": chat_id,
+                "id": message_id,
+                "parent_id": message.get("parentId"),
+                "role": message.get("role"),
+                "data": message,
+                "updated_at": now,
+            }
+            for message_id, message in messages.items()
+            if message_id in existing and existing[message_id] != message
+        ]
+        deleted = [message_id for message_id in existing if message_id not in messages]
+
+        # `messages` is the full, authoritative history, superseding pending deltas
+        self._delete_deltas(db, [chat_id])
+
+        if deleted:
+            db.query(ChatMessage).filter(
+                ChatMessage.chat_id == chat_id, ChatMessage.id.in_(deleted)
+            ).delete(synchronize_session=False)
+        if inserts:
+            db.execute(insert(ChatMessage), inserts)
+        if updates:
+            db.execute(update(ChatMessage), updates)
+
+        ChatSearches.delete_contents(db, chat_id, deleted)
+        ChatSearches.set_contents(
+            db,
+            chat_id,
+            {
+                message_id: message.get("content")
+                for message_id, message in messages.items()
+                if message_id not in existing
+                or existing[message_id].get("content") != message.get("content")
+            },
+        )
+
+    def copy_messages(self, db, from_chat_id: str, to_chat_id: str) -> None:
+        """Replace the messages of to_chat_id with a copy of from_chat_id's (used for shared chats)"""
+        self.delete_messages(db, [to_chat_id])
+        messages = self.get_messages_map(db, from_chat_id)
+        rows = [
+            {
+                **ChatMessageModel.model_validate(row).model_dump(),
+                "chat_id": to_chat_id,
+                "data": messages.get(row.id, row.data),
+            }
+            for row in db.query(ChatMessage).filter_by(chat_id=from_chat_id).all()
+        ]
+        if rows:
+            db.execute(insert(ChatMessage), rows)
+
+    def delete_messages(self, db, chat_ids) -> None:
+        """chat_ids may be a list or a select of chat ids"""
+        self._delete_deltas(db, chat_ids)
+        ChatSearches.delete_chats(db, chat_ids)
+        db.query(ChatMessage).filter(ChatMessage.chat_id.in_(chat_ids)).delete(
+            synchronize_session=False
+        )
+
+    def _delete_deltas(self, db, chat_ids) -> None:
+        db.query(ChatMessageDelta).filter(
+            ChatMessageDelta.chat_id.in_(chat_ids)
+        ).delete(synchronize_session=False)
+
+
+ChatMessages = ChatMessagesTable()
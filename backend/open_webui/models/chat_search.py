@@ -0,0 +1,129 @@
+import logging
+from typing import Optional
+
+from open_webui.internal.db import Base
+from open_webui.env import SRC_LOG_LEVELS
+
+from sqlalchemy import Column, Index, Integer, String, Text, insert, text
+
+####################
+# Chat Search DB Schema
+####################
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+# message_id of the row that holds the chat title
+TITLE_MESSAGE_ID = ""
+
+# SQLite FTS5 index over chat_search.content (trigram tokenizer, external content)
+SQLITE_FTS_TABLE = "chat_search_fts"
+
+# The trigram tokenizer can only match queries of at least 3 characters
+SQLITE_FTS_MIN_QUERY_LENGTH = 3
+
+SNIPPET_CONTEXT_CHARS = 60
+
+
+class ChatSearch(Base):
+    """
+    Search documents for chats: one row for the title and one per message.
+
+    Kept up to date by ChatMessages and the ChatTable title writes, so a
+    message write reindexes only that message. The text index lives next
+    to it: an FTS5 table kept in sync by triggers on SQLite, a pg_trgm GIN
+    index on content on PostgreSQL (see the migration).
+    """
+
+    __tablename__ = "chat_search"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # FTS5 rowid
+    chat_id = Column(String)
+    message_id = Column(String)  # TITLE_MESSAGE_ID for the title row
+    content = Column(Text)
+
+    __table_args__ = (
+        Index(
+            "chat_search_chat_id_message_id_idx", "chat_id", "message_id", unique=True
+        ),
+    )
+
+
+def get_search_snippet(content: str, search_text: str) -> Optional[str]:
+    """Excerpt of `content` around the first case-insensitive match"""
+    position = content.lower().find(search_text)
+    if position == -1:
+        return None
+
+    start = max(position - SNIPPET_CONTEXT_CHARS, 0)
+    end = min(position + len(search_text) + SNIPPET_CONTEXT_CHARS, len(content))
+    snippet = " ".join(content[start:end].split())
+    return f"{'…' if start > 0 else ''}{snippet}{'…' if end < len(content) else ''}"
+
+
+def _get_content(value) -> str:
+    return value.replace("\x00", "") if isinstance(value, str) else ""
+
+
+####################
+# ChatSearchTable
+####################
+
+
+class ChatSearchTable:
+    """All methods run inside the caller's session; the caller commits."""
+
+    def set_title(self, db, chat_id: str, title: Optional[str]) -> None:
+        self.set_contents(db, chat_id, {TITLE_MESSAGE_ID: title})
+
+    def set_contents(self, db, chat_id: str, contents: dict) -> None:
+        """Reindex {message_id: content} of a chat; empty content drops the row"""
+        if not contents:
+            return
+
+        db.query(ChatSearch).filter(
+            ChatSearch.chat_id == chat_id,
+            ChatSearch.message_id.in_(list(contents)),
+        ).delete(synchronize_session=False)
+
+        rows = [
+            {"chat_id": chat_id, "message_id": message_id, "content": content}
+            for message_id, content in (
+                (message_id, _get_content(value))
+                for message_id, value in contents.items()
+            )
+            if content
+        ]
+        if rows:
+            db.execute(insert(ChatSearch), rows)
+
+    def delete_contents(self, db, chat_id: str, message_ids: list[str]) -> None:
+        if message_ids:
+            db.query(ChatSearch).filter(
+                ChatSearch.chat_id == chat_id, ChatSearch.message_id.in_(message_ids)
+            ).delete(synchronize_session=False)
+
+    def delete_chats(self, db, chat_ids) -> None:
+        """chat_ids may be a list or a select of chat ids"""
+        db.query(ChatSearch).filter(ChatSearch.chat_id.in_(chat_ids)).delete(
+            synchronize_session=False
+        )
+
+    def has_fts(self, db) -> bool:
+        """Whether the SQLite FTS5 index exists (SQLite without trigram support has none)"""
+        if db.bind.dialect.name != "sqlite":
+            return False
+        if not hasattr(self, "_has_fts"):
+            self._has_fts = (
+                db.execute(
+                    text(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+                    ),
+                    {"name": SQLITE_FTS_TABLE},
+                ).first()
+                is not None
+            )
+        return self._has_fts
+
+
+ChatSearches = ChatSearchTable()
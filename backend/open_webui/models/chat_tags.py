@@ -0,0 +1,88 @@
+import logging
+from typing import Iterable
+
+from open_webui.internal.db import Base
+from open_webui.env import SRC_LOG_LEVELS
+
+from sqlalchemy import Column, Index, String, insert, select
+
+####################
+# Chat Tag DB Schema
+####################
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+class ChatTag(Base):
+    """
+    chat.meta["tags"] as one row per (chat, tag), so tag filters and counts
+    are index lookups instead of JSON scans. meta["tags"] is still written
+    alongside and remains what clients see.
+    """
+
+    __tablename__ = "chat_tag"
+
+    chat_id = Column(String, primary_key=True)
+    tag_id = Column(String, primary_key=True)
+    user_id = Column(String)  # owner of the chat
+
+    __table_args__ = (
+        # WHERE user_id = ... AND tag_id = ...
+        Index("chat_tag_user_id_tag_id_idx", "user_id", "tag_id"),
+    )
+
+
+####################
+# ChatTagsTable
+####################
+
+
+class ChatTagsTable:
+    """All methods run inside the caller's session; the caller commits."""
+
+    def set_tags(
+        self, db, chat_id: str, user_id: str, tag_ids: Iterable[str]
+    ) -> list[str]:
+        """Make the chat's rows match tag_ids; returns the tag ids that were removed"""
+        tag_ids = set(tag_ids)
+        existing = {
+            tag_id
+            for (tag_id,) in db.query(ChatTag.tag_id).filter_by(chat_id=chat_id).all()
+        }
+
+        removed = sorted(existing - tag_ids)
+        if removed:
+            db.query(ChatTag).filter(
+                ChatTag.chat_id == chat_id, ChatTag.tag_id.in_(removed)
+            ).delete(synchronize_session=False)
+
+        added = tag_ids - existing
+        if added:
+            db.execute(
+                insert(ChatTag),
+                [
+                    {"chat_id": chat_id, "tag_id": tag_id, "user_id": user_id}
+                    for tag_id in sorted(added)
+                ],
+            )
+        return removed
+
+    def get_chat_ids(self, user_id: str, tag_id: str):
+        """select of the user's chat ids tagged with tag_id"""
+        return select(ChatTag.chat_id).where(
+            ChatTag.user_id == user_id, ChatTag.tag_id == tag_id
+        )
+
+    def get_tagged_chat_ids(self, user_id: str):
+        """select of the user's chat ids that have any tag"""
+        return select(ChatTag.chat_id).where(ChatTag.user_id == user_id)
+
+    def delete_chats(self, db, chat_ids) -> None:
+        """chat_ids may be a list or a select of chat ids"""
+        db.query(ChatTag).filter(ChatTag.chat_id.in_(chat_ids)).delete(
+            synchronize_session=False
+        )
+
+
+ChatTags = ChatTagsTable()
@@ -7,11 +7,22 @@ from typing import Optional
 from open_webui.internal.db import Base, get_db
 from open_webui.models.tags import TagModel, Tag, Tags
 from open_webui.models.folders import Folders
+from open_webui.models.chat_messages import ChatMessages
+from open_webui.models.chat_tags import ChatTag, ChatTags
+from open_webui.models.chat_search import (
+    SQLITE_FTS_MIN_QUERY_LENGTH,
+    SQLITE_FTS_TABLE,
+    TITLE_MESSAGE_ID,
+    ChatSearch,
+    ChatSearches,
+    get_search_snippet,
+)
 from open_webui.env import SRC_LOG_LEVELS
 
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON, Index
-from sqlalchemy import or_, func, select, and_, text
+from sqlalchemy import or_, func, select, and_, text, case, literal, literal_column
+from sqlalchemy import table, column
 from sqlalchemy.sql import exists
 from sqlalchemy.sql.expression import bindparam
 
@@ -41,6 +52,9 @@ class Chat(Base):
     meta = Column(JSON, server_default="{}")
     folder_id = Column(Text, nullable=True)
 
+    # history.currentId, kept out of the JSON so message upserts don't rewrite it
+    current_message_id = Column(Text, nullable=True)
+
     __table_args__ = (
         # Performance indexes for common queries
         # WHERE folder_id = ...
@@ -122,7 +136,76 @@ class ChatTitleIdResponse(BaseModel):
     created_at: int
 
 
+class ChatSearchResponse(ChatTitleIdResponse):
+    snippet: Optional[str] = None  # excerpt of the best matching message
+    score: Optional[float] = None  # higher is more relevant
+
+
+def split_chat_messages(chat: dict) -> tuple[dict, Optional[dict], Optional[str]]:
+    """
+    Split a chat dict into (chat without history.messages, messages, currentId).
+    messages is None when the chat has no history to normalize.
+    """
+    history = chat.get("history")
+    if not isinstance(history, dict) or not isinstance(history.get("messages"), dict):
+        return chat, None, None
+
+    return (
+        {**chat, "history": {**history, "messages": {}}},
+        history["messages"],
+        history.get("currentId"),
+    )
+
+
+def merge_chat_messages(
+    chat: dict, messages: Optional[dict], current_message_id: Optional[str]
+) -> dict:
+    """Inverse of split_chat_messages: put the normalized messages back into history"""
+    if not messages and not current_message_id:
+        return chat
+
+    history = chat.get("history")
+    history = history if isinstance(history, dict) else {}
+    history = {
+        **history,
+        "messages": {**(history.get("messages") or {}), **(messages or {})},
+    }
+    if current_message_id:
+        history["currentId"] = current_message_id
+    return {**chat, "history": history}
+
+
 class ChatTable:
+    def _get_chat_models(self, db, chats) -> list[ChatModel]:
+        """ChatModels with history.messages reassembled from chat_message rows"""
+        chats = list(chats)
+        messages_maps = ChatMessages.get_messages_maps(db, [chat.id for chat in chats])
+
+        chat_models = []
+        for chat in chats:
+            chat_model = ChatModel.model_validate(chat)
+            chat_model.chat = merge_chat_messages(
+                chat_model.chat,
+                messages_maps.get(chat.id),
+                chat.current_message_id,
+            )
+            chat_models.append(chat_model)
+        return chat_models
+
+    def _get_chat_model(self, db, chat) -> Optional[ChatModel]:
+        if chat is None:
+            return None
+        return self._get_chat_models(db, [chat])[0]
+
+    def _set_chat(self, db, chat_item: Chat, chat: dict) -> None:
+        """Write a full chat dict: messages go to chat_message, the rest to chat.chat"""
+        chat, messages, current_message_id = split_chat_messages(chat)
+        chat_item.chat = chat
+        chat_item.current_message_id = current_message_id
+        if messages is not None:
+            db.flush()
+            ChatMessages.set_messages(db, chat_item.id, messages)
+
     def insert_new_chat(self, user_id: str, form_data: ChatForm) -> Optional[ChatModel]:
         with get_db() as db:
             id = str(uuid.uuid4())
@@ -144,9 +227,11 @@ class ChatTable:
 
             result = Chat(**chat.model_dump())
             db.add(result)
+            self._set_chat(db, result, chat.chat)
+            ChatSearches.set_title(db, id, result.title)
             db.commit()
             db.refresh(result)
-            return ChatModel.model_validate(result) if result else None
+            return self._get_chat_model(db, result)
 
     def import_chat(
         self, user_id: str, form_data: ChatImportForm
@@ -181,53 +266,92 @@ class ChatTable:
 
             result = Chat(**chat.model_dump())
             db.add(result)
+            self._set_chat(db, result, chat.chat)
+            ChatSearches.set_title(db, id, result.title)
+            ChatTags.set_tags(db, id, user_id, (result.meta or {}).get("tags", []))
             db.commit()
             db.refresh(result)
-            return ChatModel.model_validate(result) if result else None
+            return self._get_chat_model(db, result)
 
     def update_chat_by_id(self, id: str, chat: dict) -> Optional[ChatModel]:
         try:
             with get_db() as db:
                 chat_item = db.get(Chat, id)
-                chat_item.chat = chat
+                self._set_chat(db, chat_item, chat)
                 chat_item.title = chat["title"] if "title" in chat else "New Chat"
                 chat_item.updated_at = int(time.time())
+                ChatSearches.set_title(db, id, chat_item.title)
                 db.commit()
                 db.refresh(chat_item)
 
-                return ChatModel.model_validate(chat_item)
+                return self._get_chat_model(db, chat_item)
         except Exception:
             return None
 
     def update_chat_title_by_id(self, id: str, title: str) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
-            return None
+        try:
+            with get_db() as db:
+                chat_item = db.get(Chat, id)
+                if chat_item is None:
+                    return None
 
-        chat = chat.chat
-        chat["title"] = title
+                # Only the chat row changes; messages stay where they are
+                chat_item.chat = {**(chat_item.chat or {}), "title": title}
+                chat_item.title = title
+                chat_item.updated_at = int(time.time())
+                ChatSearches.set_title(db, id, title)
+                db.commit()
+                db.refresh(chat_item)
 
-        return self.update_chat_by_id(id, chat)
+                return self._get_chat_model(db, chat_item)
+        except Exception:
+            return None
 
     def update_chat_tags_by_id(
         self, id: str, tags: list[str], user
     ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
-            return None
-
-        self.delete_all_tags_by_id_and_user_id(id, user.id)
-
-        for tag in chat.meta.get("tags", []):
-            if self.count_chats_by_tag_name_and_user_id(tag, user.id) == 0:
-                Tags.delete_tag_by_name_and_user_id(tag, user.id)
-
+        tag_ids = []
         for tag_name in tags:
             if tag_name.lower() == "none":
                 continue
 
-            self.add_chat_tag_by_id_and_user_id_and_tag_name(id, user.id, tag_name)
-        return self.get_chat_by_id(id)
+            tag = Tags.get_tag_by_name_and_user_id(tag_name, user.id)
+            if tag is None:
+                tag = Tags.insert_new_tag(tag_name, user.id)
+            if tag is not None and tag.id not in tag_ids:
+                tag_ids.append(tag.id)
+
+        with get_db() as db:
+            chat = db.get(Chat, id)
+            if chat is None:
+                return None
+
+            chat.meta = {**(chat.meta or {}), "tags": tag_ids}
+            removed = ChatTags.set_tags(db, id, chat.user_id, tag_ids)
+            self._delete_unused_tags(db, user.id, removed)
+            db.commit()
+            db.refresh(chat)
+            return self._get_chat_model(db, chat)
+
+    def _delete_unused_tags(self, db, user_id: str, tag_ids: list[str]) -> None:
+        """Delete the user's tags among tag_ids that no unarchived chat references anymore"""
+        if not tag_ids:
+            return
+
+        used_tag_ids = (
+            select(ChatTag.tag_id)
+            .join(Chat, Chat.id == ChatTag.chat_id)
+            .where(
+                ChatTag.user_id == user_id,
+                ChatTag.tag_id.in_(tag_ids),
+                Chat.archived == False,
+            )
+        )
+        db.query(Tag).filter(
+            Tag.user_id == user_id,
+            Tag.id.in_(tag_ids),
+            Tag.id.notin_(used_tag_ids),
+        ).delete(synchronize_session=False)
 
     def get_chat_title_by_id(self, id: str) -> Optional[str]:
         chat = self.get_chat_by_id(id)
@@ -237,65 +361,93 @@ class ChatTable:
         return chat.chat.get("title", "New Chat")
 
     def get_messages_map_by_chat_id(self, id: str) -> Optional[dict]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
-            return None
+        with get_db() as db:
+            if db.query(Chat.id).filter_by(id=id).first() is None:
+                return None
 
-        return chat.chat.get("history", {}).get("messages", {}) or {}
+            return ChatMessages.get_messages_map(db, id)
 
     def get_message_by_id_and_message_id(
         self, id: str, message_id: str
     ) -> Optional[dict]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
-            return None
+        with get_db() as db:
+            message = ChatMessages.get_message(db, id, message_id)
+            if message is not None:
+                return message
 
-        return chat.chat.get("history", {}).get("messages", {}).get(message_id, {})
+            if db.query(Chat.id).filter_by(id=id).first() is None:
+                return None
+            return {}
 
     def upsert_message_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, message: dict
-    ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
-            return None
-
+    ) -> Optional[dict]:
+        """Merge `message` into one chat_message row and return the stored message"""
         # Sanitize message content for null characters before upserting
         if isinstance(message.get("content"), str):
             message["content"] = message["content"].replace("\x00", "")
 
-        chat = chat.chat
-        history = chat.get("history", {})
+        with get_db() as db:
+            updated = (
+                db.query(Chat)
+                .filter_by(id=id)
+                .update(
+                    {"current_message_id": message_id, "updated_at": int(time.time())},
+                    synchronize_session=False,
+                )
+            )
+            if not updated:
+                return None
 
-        if message_id in history.get("messages", {}):
-            history["messages"][message_id] = {
-                **history["messages"][message_id],
-                **message,
-            }
-        else:
-            history["messages"][message_id] = message
+            message = ChatMessages.upsert_message(db, id, message_id, message)
+            db.commit()
+            return message
 
-        history["currentId"] = message_id
+    def append_message_content_by_id_and_message_id(
+        self, id: str, message_id: str, content: str
+    ) -> bool:
+        """
+        Append a streamed content delta in O(delta): one insert into the delta
+        log, the message row is not read or rewritten until compaction.
+        """
+        content = content.replace("\x00", "")
+        with get_db() as db:
+            appended = ChatMessages.append_content(db, id, message_id, content)
+            db.commit()
+            return appended
 
-        chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+    def compact_message_by_id_and_message_id(
+        self, id: str, message_id: str
+    ) -> Optional[dict]:
+        """Fold the message's pending content deltas into its row (stream end)"""
+        with get_db() as db:
+            message = ChatMessages.compact_message(db, id, message_id)
+            if message is not None:
+                db.query(Chat).filter_by(id=id).update(
+                    {"updated_at": int(time.time())}, synchronize_session=False
+                )
+            db.commit()
+            return message
 
     def add_message_status_to_chat_by_id_and_message_id(
         self, id: str, message_id: str, status: dict
-    ) -> Optional[ChatModel]:
-        chat = self.get_chat_by_id(id)
-        if chat is None:
-            return None
-
-        chat = chat.chat
-        history = chat.get("history", {})
-
-        if message_id in history.get("messages", {}):
-            status_history = history["messages"][message_id].get("statusHistory", [])
-            status_history.append(status)
-            history["messages"][message_id]["statusHistory"] = status_history
-
-        chat["history"] = history
-        return self.update_chat_by_id(id, chat)
+    ) -> Optional[dict]:
+        with get_db() as db:
+            message = ChatMessages.get_message(db, id, message_id)
+            if message is None:
+                return None
+
+            message = ChatMessages.upsert_message(
+                db,
+                id,
+                message_id,
+                {"statusHistory": [*message.get("statusHistory", []), status]},
+            )
+            db.query(Chat).filter_by(id=id).update(
+                {"updated_at": int(time.time())}, synchronize_session=False
+            )
+            db.commit()
+            return message
 
     def insert_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
         with get_db() as db:
@@ -318,8 +470,12 @@ class ChatTable:
                     "updated_at": int(time.time()),
                 }
             )
-            shared_result = Chat(**shared_chat.model_dump())
+            shared_result = Chat(
+                **shared_chat.model_dump(), current_message_id=chat.current_message_id
+            )
             db.add(shared_result)
+            db.flush()
+            ChatMessages.copy_messages(db, chat_id, shared_chat.id)
             db.commit()
             db.refresh(shared_result)
 
@@ -330,7 +486,7 @@ class ChatTable:
                 .update({"share_id": shared_chat.id})
             )
             db.commit()
-            return shared_chat if (shared_result and result) else None
+            return self._get_chat_model(db, shared_result) if result else None
 
     def update_shared_chat_by_chat_id(self, chat_id: str) -> Optional[ChatModel]:
         try:
@@ -345,20 +501,25 @@ class ChatTable:
 
                 shared_chat.title = chat.title
                 shared_chat.chat = chat.chat
+                shared_chat.current_message_id = chat.current_message_id
                 shared_chat.meta = chat.meta
                 shared_chat.pinned = chat.pinned
                 shared_chat.folder_id = chat.folder_id
                 shared_chat.updated_at = int(time.time())
+                ChatMessages.copy_messages(db, chat_id, shared_chat.id)
                 db.commit()
                 db.refresh(shared_chat)
 
-                return ChatModel.model_validate(shared_chat)
+                return self._get_chat_model(db, shared_chat)
         except Exception:
             return None
 
     def delete_shared_chat_by_chat_id(self, chat_id: str) -> bool:
         try:
             with get_db() as db:
+                ChatMessages.delete_messages(
+                    db, select(Chat.id).where(Chat.user_id == f"shared-{chat_id}")
+                )
                 db.query(Chat).filter_by(user_id=f"shared-{chat_id}").delete()
                 db.commit()
 
@@ -384,7 +545,7 @@ class ChatTable:
                 chat.share_id = share_id
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._get_chat_model(db, chat)
         except Exception:
             return None
 
@@ -396,7 +557,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._get_chat_model(db, chat)
         except Exception:
             return None
 
@@ -408,7 +569,7 @@ class ChatTable:
                 chat.updated_at = int(time.time())
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._get_chat_model(db, chat)
         except Exception:
             return None
 
@@ -456,7 +617,7 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models(db, all_chats)
 
     def get_chat_list_by_user_id(
         self,
@@ -495,7 +656,7 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models(db, all_chats)
 
     def get_chat_title_id_list_by_user_id(
         self,
@@ -551,13 +712,13 @@ class ChatTable:
                 .order_by(Chat.updated_at.desc())
                 .all()
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models(db, all_chats)
 
     def get_chat_by_id(self, id: str) -> Optional[ChatModel]:
         try:
             with get_db() as db:
                 chat = db.get(Chat, id)
-                return ChatModel.model_validate(chat)
+                return self._get_chat_model(db, chat)
         except Exception:
             return None
 
@@ -579,7 +740,7 @@ class ChatTable:
         try:
             with get_db() as db:
                 chat = db.query(Chat).filter_by(id=id, user_id=user_id).first()
-                return ChatModel.model_validate(chat)
+                return self._get_chat_model(db, chat)
         except Exception:
             return None
 
@@ -590,7 +751,7 @@ class ChatTable:
                 # .limit(limit).offset(skip)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models(db, all_chats)
 
     def get_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -599,7 +760,7 @@ class ChatTable:
                 .filter_by(user_id=user_id)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models(db, all_chats)
 
     def get_pinned_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -608,7 +769,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, pinned=True, archived=False)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models(db, all_chats)
 
     def get_archived_chats_by_user_id(self, user_id: str) -> list[ChatModel]:
         with get_db() as db:
@@ -617,7 +778,7 @@ class ChatTable:
                 .filter_by(user_id=user_id, archived=True)
                 .order_by(Chat.updated_at.desc())
             )
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models(db, all_chats)
 
     def get_chats_by_user_id_and_search_text(
         self,
@@ -626,16 +787,21 @@ class ChatTable:
         include_archived: bool = False,
         skip: int = 0,
         limit: int = 60,
-    ) -> list[ChatModel]:
+    ) -> list[ChatSearchResponse]:
         """
-        Filters chats based on a search query using Python, allowing pagination using skip and limit.
+        Search the user's chats through the chat_search index, ranked by relevance
+        with a snippet of the best matching message. The tag:, folder:, pinned:,
+        archived: and shared: operators filter on chat columns.
         """
         search_text = search_text.replace("\u0000", "").lower().strip()
 
         if not search_text:
-            return self.get_chat_list_by_user_id(
-                user_id, include_archived, filter={}, skip=skip, limit=limit
-            )
+            return [
+                ChatSearchResponse(**chat.model_dump())
+                for chat in self.get_chat_list_by_user_id(
+                    user_id, include_archived, filter={}, skip=skip, limit=limit
+                )
+            ]
 
         search_text_words = search_text.split(" ")
 
@@ -690,7 +856,9 @@ class ChatTable:
         search_text = " ".join(search_text_words)
 
         with get_db() as db:
-            query = db.query(Chat).filter(Chat.user_id == user_id)
+            query = db.query(
+                Chat.id, Chat.title, Chat.updated_at, Chat.created_at
+            ).filter(Chat.user_id == user_id)
 
             if is_archived is not None:
                 query = query.filter(Chat.archived == is_archived)
@@ -709,114 +877,115 @@ class ChatTable:
             if folder_ids:
                 query = query.filter(Chat.folder_id.in_(folder_ids))
 
-            query = query.order_by(Chat.updated_at.desc())
-
-            # Check if the database dialect is either 'sqlite' or 'postgresql'
-            dialect_name = db.bind.dialect.name
-            if dialect_name == "sqlite":
-                # SQLite case: using JSON1 extension for JSON searching
-                sqlite_content_sql = (
-                    "EXISTS ("
-                    "    SELECT 1 "
-                    "    FROM json_each(Chat.chat, '$.messages') AS message "
-                    "    WHERE LOWER(message.value->>'content') LIKE '%' || :content_key || '%'"
-                    ")"
-                )
-                sqlite_content_clause = text(sqlite_content_sql)
+            # Check if there are any tags to filter, it should have all the tags
+            if "none" in tag_ids:
                 query = query.filter(
-                    or_(
-                        Chat.title.ilike(bindparam("title_key")), sqlite_content_clause
-                    ).params(title_key=f"%{search_text}%", content_key=search_text)
-                )
-
-                # Check if there are any tags to filter, it should have all the tags
-                if "none" in tag_ids:
-                    query = query.filter(
-                        text(
-                            """
-                            NOT EXISTS (
-                                SELECT 1
-                                FROM json_each(Chat.meta, '$.tags') AS tag
-                            )
-                            """
-                        )
-                    )
-                elif tag_ids:
-                    query = query.filter(
-                        and_(
-                            *[
-                                text(
-                                    f"""
-                                    EXISTS (
-                                        SELECT 1
-                                        FROM json_each(Chat.meta, '$.tags') AS tag
-                                        WHERE tag.value = :tag_id_{tag_idx}
-                                    )
-                                    """
-                                ).params(**{f"tag_id_{tag_idx}": tag_id})
-                                for tag_idx, tag_id in enumerate(tag_ids)
-                            ]
-                        )
-                    )
-
-            elif dialect_name == "postgresql":
-                # PostgreSQL relies on proper JSON query for search
-                postgres_content_sql = (
-                    "EXISTS ("
-                    "    SELECT 1 "
-                    "    FROM json_array_elements(Chat.chat->'messages') AS message "
-                    "    WHERE LOWER(message->>'content') LIKE '%' || :content_key || '%'"
-                    ")"
+                    Chat.id.notin_(ChatTags.get_tagged_chat_ids(user_id))
                 )
-                postgres_content_clause = text(postgres_content_sql)
+            elif tag_ids:
                 query = query.filter(
-                    or_(
-                        Chat.title.ilike(bindparam("title_key")),
-                        postgres_content_clause,
-                    ).params(title_key=f"%{search_text}%", content_key=search_text)
+                    and_(
+                        *[
+                            Chat.id.in_(ChatTags.get_chat_ids(user_id, tag_id))
+                            for tag_id in tag_ids
+                        ]
+                    )
                 )
 
-                # Check if there are any tags to filter, it should have all the tags
-                if "none" in tag_ids:
-                    query = query.filter(
-                        text(
-                            """
-                            NOT EXISTS (
-                                SELECT 1
-                                FROM json_array_elements_text(Chat.meta->'tags') AS tag
-                            )
-                            """
-                        )
-                    )
-                elif tag_ids:
-                    query = query.filter(
-                        and_(
-                            *[
-                                text(
-                                    f"""
-                                    EXISTS (
-                                        SELECT 1
-                                        FROM json_array_elements_text(Chat.meta->'tags') AS tag
-                                        WHERE tag = :tag_id_{tag_idx}
-                                    )
-                                    """
-                                ).params(**{f"tag_id_{tag_idx}": tag_id})
-                                for tag_idx, tag_id in enumerate(tag_ids)
-                            ]
-                        )
-                    )
+            if search_text:
+                matches = self._get_search_matches(db, user_id, search_text).subquery()
+                query = (
+                    query.join(matches, matches.c.chat_id == Chat.id)
+                    .add_columns(matches.c.score)
+                    .order_by(matches.c.score.desc(), Chat.updated_at.desc())
+                )
             else:
-                raise NotImplementedError(
-                    f"Unsupported dialect: {db.bind.dialect.name}"
+                query = query.add_columns(literal(None).label("score")).order_by(
+                    Chat.updated_at.desc()
                 )
 
             # Perform pagination at the SQL level
-            all_chats = query.offset(skip).limit(limit).all()
+            rows = query.offset(skip).limit(limit).all()
+            snippets = (
+                self._get_search_snippets(db, [row.id for row in rows], search_text)
+                if search_text
+                else {}
+            )
 
-            log.info(f"The number of chats: {len(all_chats)}")
+            return [
+                ChatSearchResponse(
+                    id=row.id,
+                    title=row.title,
+                    updated_at=row.updated_at,
+                    created_at=row.created_at,
+                    score=row.score,
+                    snippet=snippets.get(row.id),
+                )
+                for row in rows
+            ]
 
-            # Validate and return chats
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+    def _get_search_matches(self, db, user_id: str, search_text: str):
+        """select(chat_id, score) of the user's chats whose title or messages match"""
+        # A title match counts double
+        weight = case((ChatSearch.message_id == TITLE_MESSAGE_ID, 2.0), else_=1.0)
+        user_chat_ids = select(Chat.id).where(Chat.user_id == user_id)
+
+        if ChatSearches.has_fts(db) and len(search_text) >= SQLITE_FTS_MIN_QUERY_LENGTH:
+            # Trigram FTS5: a quoted phrase is a case-insensitive substring match.
+            # The hidden rank column is bm25(), lower for better matches; unlike
+            # bm25() itself it can be aggregated over
+            fts = table(SQLITE_FTS_TABLE, column("rowid"), column("rank"))
+            fts_column = literal_column(SQLITE_FTS_TABLE)
+            phrase = '"' + search_text.replace('"', '""') + '"'
+            ranked = (
+                select(fts.c.rowid, fts.c.rank)
+                .where(fts_column.op("MATCH")(phrase))
+                .subquery()
+            )
+            return (
+                select(
+                    ChatSearch.chat_id,
+                    func.sum(-ranked.c.rank * weight).label("score"),
+                )
+                .join(ranked, ranked.c.rowid == ChatSearch.id)
+                .where(ChatSearch.chat_id.in_(user_chat_ids))
+                .group_by(ChatSearch.chat_id)
+            )
+
+        # PostgreSQL: ILIKE is served by the pg_trgm index on content
+        return (
+            select(ChatSearch.chat_id, func.sum(weight).label("score"))
+            .where(
+                ChatSearch.chat_id.in_(user_chat_ids),
+                ChatSearch.content.ilike(f"%{search_text}%"),
+            )
+            .group_by(ChatSearch.chat_id)
+        )
+
+    def _get_search_snippets(
+        self, db, chat_ids: list[str], search_text: str
+    ) -> dict[str, str]:
+        if not chat_ids:
+            return {}
+
+        rows = (
+            db.query(ChatSearch.chat_id, ChatSearch.content)
+            .filter(
+                ChatSearch.chat_id.in_(chat_ids),
+                ChatSearch.message_id != TITLE_MESSAGE_ID,
+                ChatSearch.content.ilike(f"%{search_text}%"),
+            )
+            .order_by(ChatSearch.id)
+            .all()
+        )
+
+        snippets = {}
+        for chat_id, content in rows:
+            if chat_id not in snippets:
+                snippet = get_search_snippet(content or "", search_text)
+                if snippet:
+                    snippets[chat_id] = snippet
+        return snippets
 
     def get_chats_by_folder_id_and_user_id(
         self, folder_id: str, user_id: str, skip: int = 0, limit: int = 60
@@ -834,7 +1003,7 @@ class ChatTable:
                 query = query.limit(limit)
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models(db, all_chats)
 
     def get_chats_by_folder_ids_and_user_id(
         self, folder_ids: list[str], user_id: str
@@ -849,7 +1018,7 @@ class ChatTable:
             query = query.order_by(Chat.updated_at.desc())
 
             all_chats = query.all()
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models(db, all_chats)
 
     def update_chat_folder_id_by_id_and_user_id(
         self, id: str, user_id: str, folder_id: str
@@ -862,7 +1031,7 @@ class ChatTable:
                 chat.pinned = False
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._get_chat_model(db, chat)
         except Exception:
             return None
 
@@ -876,32 +1045,15 @@ class ChatTable:
         self, user_id: str, tag_name: str, skip: int = 0, limit: int = 50
     ) -> list[ChatModel]:
         with get_db() as db:
-            query = db.query(Chat).filter_by(user_id=user_id)
             tag_id = tag_name.replace(" ", "_").lower()
-
-            log.info(f"DB dialect name: {db.bind.dialect.name}")
-            if db.bind.dialect.name == "sqlite":
-                # SQLite JSON1 querying for tags within the meta JSON field
-                query = query.filter(
-                    text(
-                        f"EXISTS (SELECT 1 FROM json_each(Chat.meta, '$.tags') WHERE json_each.value = :tag_id)"
-                    )
-                ).params(tag_id=tag_id)
-            elif db.bind.dialect.name == "postgresql":
-                # PostgreSQL JSON query for tags within the meta JSON field (for `json` type)
-                query = query.filter(
-                    text(
-                        "EXISTS (SELECT 1 FROM json_array_elements_text(Chat.meta->'tags') elem WHERE elem = :tag_id)"
-                    )
-                ).params(tag_id=tag_id)
-            else:
-                raise NotImplementedError(
-                    f"Unsupported dialect: {db.bind.dialect.name}"
-                )
+            query = db.query(Chat).filter(
+                Chat.user_id == user_id,
+                Chat.id.in_(ChatTags.get_chat_ids(user_id, tag_id)),
+            )
 
             all_chats = query.all()
             log.debug(f"all_chats: {all_chats}")
-            return [ChatModel.model_validate(chat) for chat in all_chats]
+            return self._get_chat_models(db, all_chats)
 
     def add_chat_tag_by_id_and_user_id_and_tag_name(
         self, id: str, user_id: str, tag_name: str
@@ -919,40 +1071,29 @@ class ChatTable:
                         **chat.meta,
                         "tags": list(set(chat.meta.get("tags", []) + [tag_id])),
                     }
+                ChatTags.set_tags(db, id, chat.user_id, chat.meta["tags"])
 
                 db.commit()
                 db.refresh(chat)
-                return ChatModel.model_validate(chat)
+                return self._get_chat_model(db, chat)
         except Exception:
             return None
 
     def count_chats_by_tag_name_and_user_id(self, tag_name: str, user_id: str) -> int:
-        with get_db() as db:  # Assuming `get_db()` returns a session object
-            query = db.query(Chat).filter_by(user_id=user_id, archived=False)
-
+        with get_db() as db:
             # Normalize the tag_name for consistency
             tag_id = tag_name.replace(" ", "_").lower()
 
-            if db.bind.dialect.name == "sqlite":
-                # SQLite JSON1 support for querying the tags inside the `meta` JSON field
-                query = query.filter(
-                    text(
-                        f"EXISTS (SELECT 1 FROM json_each(Chat.meta, '$.tags') WHERE json_each.value = :tag_id)"
-                    )
-                ).params(tag_id=tag_id)
-
-            elif db.bind.dialect.name == "postgresql":
-                # PostgreSQL JSONB support for querying the tags inside the `meta` JSON field
-                query = query.filter(
-                    text(
-                        "EXISTS (SELECT 1 FROM json_array_elements_text(Chat.meta->'tags') elem WHERE elem = :tag_id)"
-                    )
-                ).params(tag_id=tag_id)
-
-            else:
-                raise NotImplementedError(
-                    f"Unsupported dialect: {db.bind.dialect.name}"
+            # Index lookup on chat_tag (user_id, tag_id), archived chats don't count
+            query = (
+                db.query(ChatTag)
+                .join(Chat, Chat.id == ChatTag.chat_id)
+                .filter(
+                    ChatTag.user_id == user_id,
+                    ChatTag.tag_id == tag_id,
+                    Chat.archived == False,
                 )
+            )
 
             # Get the count of matching records
             count = query.count()
@@ -986,6 +1127,7 @@ class ChatTable:
                     **chat.meta,
                     "tags": list(set(tags)),
                 }
+                ChatTags.set_tags(db, id, chat.user_id, chat.meta["tags"])
                 db.commit()
                 return True
         except Exception:
@@ -999,6 +1141,7 @@ class ChatTable:
                     **chat.meta,
                     "tags": [],
                 }
+                ChatTags.set_tags(db, id, chat.user_id, [])
                 db.commit()
 
                 return True
@@ -1008,6 +1151,8 @@ class ChatTable:
     def delete_chat_by_id(self, id: str) -> bool:
         try:
             with get_db() as db:
+                ChatMessages.delete_messages(db, [id])
+                ChatTags.delete_chats(db, [id])
                 db.query(Chat).filter_by(id=id).delete()
                 db.commit()
 
@@ -1018,6 +1163,12 @@ class ChatTable:
     def delete_chat_by_id_and_user_id(self, id: str, user_id: str) -> bool:
         try:
             with get_db() as db:
+                ChatMessages.delete_messages(
+                    db, select(Chat.id).where(Chat.id == id, Chat.user_id == user_id)
+                )
+                ChatTags.delete_chats(
+                    db, select(Chat.id).where(Chat.id == id, Chat.user_id == user_id)
+                )
                 db.query(Chat).filter_by(id=id, user_id=user_id).delete()
                 db.commit()
 
@@ -1030,6 +1181,12 @@ class ChatTable:
             with get_db() as db:
                 self.delete_shared_chats_by_user_id(user_id)
 
+                ChatMessages.delete_messages(
+                    db, select(Chat.id).where(Chat.user_id == user_id)
+                )
+                ChatTags.delete_chats(
+                    db, select(Chat.id).where(Chat.user_id == user_id)
+                )
                 db.query(Chat).filter_by(user_id=user_id).delete()
                 db.commit()
 
@@ -1042,6 +1199,11 @@ class ChatTable:
     ) -> bool:
         try:
             with get_db() as db:
+                chat_ids = select(Chat.id).where(
+                    Chat.user_id == user_id, Chat.folder_id == folder_id
+                )
+                ChatMessages.delete_messages(db, chat_ids)
+                ChatTags.delete_chats(db, chat_ids)
                 db.query(Chat).filter_by(user_id=user_id, folder_id=folder_id).delete()
                 db.commit()
 
@@ -1055,6 +1217,9 @@ class ChatTable:
                 chats_by_user = db.query(Chat).filter_by(user_id=user_id).all()
                 shared_chat_ids = [f"shared-{chat.id}" for chat in chats_by_user]
 
+                ChatMessages.delete_messages(
+                    db, select(Chat.id).where(Chat.user_id.in_(shared_chat_ids))
+                )
                 db.query(Chat).filter(Chat.user_id.in_(shared_chat_ids)).delete()
                 db.commit()
 
@@ -13,9 +13,10 @@ from open_webui.models.users import Users, UserResponse
 
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, JSON
+from sqlalchemy import BigInteger, Column, String, Text, JSON, or_
 
 from open_webui.utils.access_control import has_access
+from open_webui.models.access_grants import AccessGrants
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MODELS"])
@@ -118,6 +119,9 @@ class KnowledgeTable:
             try:
                 result = Knowledge(**knowledge.model_dump())
                 db.add(result)
+                AccessGrants.set_grants(
+                    db, "knowledge", knowledge.id, knowledge.access_control
+                )
                 db.commit()
                 db.refresh(result)
                 if result:
@@ -132,24 +136,26 @@ class KnowledgeTable:
             all_knowledge = (
                 db.query(Knowledge).order_by(Knowledge.updated_at.desc()).all()
             )
+            return self._get_knowledge_user_models(all_knowledge)
 
-            user_ids = list(set(knowledge.user_id for knowledge in all_knowledge))
+    def _get_knowledge_user_models(self, all_knowledge) -> list[KnowledgeUserModel]:
+        user_ids = list(set(knowledge.user_id for knowledge in all_knowledge))
 
-            users = Users.get_users_by_user_ids(user_ids) if user_ids else []
-            users_dict = {user.id: user for user in users}
+        users = Users.get_users_by_user_ids(user_ids) if user_ids else []
+        users_dict = {user.id: user for user in users}
 
-            knowledge_bases = []
-            for knowledge in all_knowledge:
-                user = users_dict.get(knowledge.user_id)
-                knowledge_bases.append(
-                    KnowledgeUserModel.model_validate(
-                        {
-                            **KnowledgeModel.model_validate(knowledge).model_dump(),
-                            "user": user.model_dump() if user else None,
-                        }
-                    )
+        knowledge_bases = []
+        for knowledge in all_knowledge:
+            user = users_dict.get(knowledge.user_id)
+            knowledge_bases.append(
+                KnowledgeUserModel.model_validate(
+                    {
+                        **KnowledgeModel.model_validate(knowledge).model_dump(),
+                        "user": user.model_dump() if user else None,
+                    }
                 )
-            return knowledge_bases
+            )
+        return knowledge_bases
 
     def check_access_by_user_id(self, id, user_id, permission="write") -> bool:
         knowledge = self.get_knowledge_by_id(id)
@@ -163,16 +169,26 @@ class KnowledgeTable:
     def get_knowledge_bases_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[KnowledgeUserModel]:
-        knowledge_bases = self.get_knowledge_bases()
         user_group_ids = {group.id for group in Groups.get_groups_by_member_id(user_id)}
-        return [
-            knowledge_base
-            for knowledge_base in knowledge_bases
-            if knowledge_base.user_id == user_id
-            or has_access(
-                user_id, permission, knowledge_base.access_control, user_group_ids
+        with get_db() as db:
+            all_knowledge = (
+                db.query(Knowledge)
+                .filter(
+                    or_(
+                        Knowledge.user_id == user_id,
+                        AccessGrants.get_access_filter(
+                            "knowledge",
+                            Knowledge.id,
+                            user_id,
+                            permission,
+                            user_group_ids,
+                        ),
+                    )
+                )
+                .order_by(Knowledge.updated_at.desc())
+                .all()
             )
-        ]
+            return self._get_knowledge_user_models(all_knowledge)
 
     def get_knowledge_by_id(self, id: str) -> Optional[KnowledgeModel]:
         try:
@@ -194,6 +210,7 @@ class KnowledgeTable:
                         "updated_at": int(time.time()),
                     }
                 )
+                AccessGrants.set_grants(db, "knowledge", id, form_data.access_control)
                 db.commit()
                 return self.get_knowledge_by_id(id=id)
         except Exception as e:
@@ -222,6 +239,7 @@ class KnowledgeTable:
         try:
             with get_db() as db:
                 db.query(Knowledge).filter_by(id=id).delete()
+                AccessGrants.delete_grants(db, "knowledge", id)
                 db.commit()
                 return True
         except Exception:
@@ -231,6 +249,7 @@ class KnowledgeTable:
         with get_db() as db:
             try:
                 db.query(Knowledge).delete()
+                AccessGrants.delete_grants(db, "knowledge")
                 db.commit()
 
                 return True
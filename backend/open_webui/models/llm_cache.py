@@ -0,0 +1,129 @@
+import logging
+import time
+from typing import Optional
+from sqlalchemy import BigInteger, Column, String, JSON, Index
+from sqlalchemy import func, select
+
+from open_webui.internal.db import Base, get_db
+
+log = logging.getLogger(__name__)
+
+####################
+# LLM Result Cache DB Schema
+####################
+
+
+class LLMCacheEntry(Base):
+    """按内容哈希缓存的LLM结果（AI评分、Rubric生成）"""
+
+    __tablename__ = "llm_cache"
+
+    key = Column(String, primary_key=True)  # sha256(namespace, model, messages)
+    namespace = Column(String, nullable=False)  # grading, grading_all, rubric
+    value = Column(JSON, nullable=False)
+    hits = Column(BigInteger, default=0)
+    created_at = Column(BigInteger)
+    accessed_at = Column(BigInteger)
+    expires_at = Column(BigInteger, nullable=True)
+
+    __table_args__ = (
+        Index("llm_cache_accessed_idx", "accessed_at"),
+        Index("llm_cache_expires_idx", "expires_at"),
+    )
+
+
+####################
+# LLMCacheTable
+####################
+
+
+class LLMCacheTable:
+    def get(self, key: str) -> Optional[dict]:
+        """读取未过期的缓存，并刷新访问时间（LRU）"""
+        now = int(time.time())
+        with get_db() as db:
+            entry = db.query(LLMCacheEntry).filter_by(key=key).first()
+            if not entry:
+                return None
+
+            if entry.expires_at is not None and entry.expires_at <= now:
+                db.delete(entry)
+                db.commit()
+                return None
+
+            entry.hits = (entry.hits or 0) + 1
+            entry.accessed_at = now
+            db.commit()
+            return entry.value
+
+    def set(
+        self, key: str, namespace: str, value: dict, ttl: Optional[int] = None
+    ) -> None:
+        now = int(time.time())
+        with get_db() as db:
+            entry = db.query(LLMCacheEntry).filter_by(key=key).first()
+            if entry:
+                entry.value = value
+                entry.accessed_at = now
+                entry.expires_at = now + ttl if ttl else None
+            else:
+                db.add(
+                    LLMCacheEntry(
+                        key=key,
+                        namespace=namespace,
+                        value=value,
+                        hits=0,
+                        created_at=now,
+                        accessed_at=now,
+                        expires_at=now + ttl if ttl else None,
+                    )
+                )
+            db.commit()
+
+    def evict(self, max_entries: Optional[int] = None) -> int:
+        """删除过期条目；超过 max_entries 时按最近访问时间淘汰最旧的条目"""
+        now = int(time.time())
+        with get_db() as db:
+            removed = (
+                db.query(LLMCacheEntry)
+                .filter(
+                    LLMCacheEntry.expires_at.isnot(None),
+                    LLMCacheEntry.expires_at <= now,
+                )
+                .delete(synchronize_session=False)
+            )
+
+            if max_entries:
+                overflow = (
+                    db.query(func.count(LLMCacheEntry.key)).scalar() - max_entries
+                )
+                if overflow > 0:
+                    oldest = (
+                        select(LLMCacheEntry.key)
+                        .order_by(LLMCacheEntry.accessed_at.asc())
+                        .limit(overflow)
+                    )
+                    removed += (
+                        db.query(LLMCacheEntry)
+                        .filter(LLMCacheEntry.key.in_(oldest))
+                        .delete(synchronize_session=False)
+                    )
+
+            db.commit()
+            return removed
+
+    def count(self) -> int:
+        with get_db() as db:
+            return db.query(func.count(LLMCacheEntry.key)).scalar()
+
+    def clear(self, namespace: Optional[str] = None) -> int:
+        with get_db() as db:
+            query = db.query(LLMCacheEntry)
+            if namespace:
+                query = query.filter_by(namespace=namespace)
+            result = query.delete(synchronize_session=False)
+            db.commit()
+            return result
+
+
+LLMCache = LLMCacheTable()
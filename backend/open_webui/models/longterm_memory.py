@@ -7,6 +7,7 @@ from sqlalchemy import BigInteger, Column, String, Text, JSON, Index, ARRAY
 from sqlalchemy import select
 
 from open_webui.internal.db import Base, get_db
+from open_webui.models.student_context import StudentContexts
 
 log = logging.getLogger(__name__)
 
@@ -79,6 +80,10 @@ class LongtermMemoriesTable:
 
             result = LongtermMemory(**memory.model_dump())
             db.add(result)
+            if memory.namespace == f"profiles:{memory.user_id}":
+                StudentContexts.set_profile(
+                    db, memory.user_id, memory.id, memory.text, memory.created_at
+                )
             db.commit()
             db.refresh(result)
             return LongtermMemoryModel.model_validate(result)
@@ -109,34 +114,61 @@ class LongtermMemoriesTable:
             )
             return LongtermMemoryModel.model_validate(memory) if memory else None
 
-    def search_memories_by_tags(
-        self, user_id: str, tags: List[str], limit: int = 10
-    ) -> List[LongtermMemoryModel]:
-        """根据标签搜索记忆（简化版，实际应使用向量检索）"""
+    def get_memories_by_ids(self, ids: List[str]) -> List[LongtermMemoryModel]:
+        if not ids:
+            return []
         with get_db() as db:
-            # 简化实现：查询所有用户记忆，然后在Python中过滤
-            all_memories = (
+            memories = db.query(LongtermMemory).filter(LongtermMemory.id.in_(ids)).all()
+            return [LongtermMemoryModel.model_validate(mem) for mem in memories]
+
+    def get_memories_by_user_id(self, user_id: str) -> List[LongtermMemoryModel]:
+        with get_db() as db:
+            memories = (
                 db.query(LongtermMemory)
                 .filter_by(user_id=user_id)
                 .order_by(LongtermMemory.updated_at.desc())
-                .limit(limit * 3)  # 取多一些再过滤
                 .all()
             )
-            
-            # 过滤包含任一标签的记忆
+            return [LongtermMemoryModel.model_validate(mem) for mem in memories]
+
+    def search_memories_by_tags(
+        self,
+        user_id: str,
+        tags: List[str],
+        limit: int = 10,
+        namespace: Optional[str] = None,
+        batch_size: int = 200,
+    ) -> List[LongtermMemoryModel]:
+        """
+        按标签过滤记忆（按更新时间倒序），语义检索见 utils/longterm_memory.py
+        tags 存在 JSON 列中无法建索引，这里分批扫描该用户的全部记忆，直到凑够 limit 条
+        """
+        with get_db() as db:
+            query = db.query(LongtermMemory).filter_by(user_id=user_id)
+            if namespace:
+                query = query.filter_by(namespace=namespace)
+            query = query.order_by(LongtermMemory.updated_at.desc())
+
             filtered = []
-            for mem in all_memories:
+            for mem in query.yield_per(batch_size):
                 mem_tags = mem.tags if isinstance(mem.tags, list) else []
-                if any(tag in mem_tags for tag in tags):
+                if not tags or any(tag in mem_tags for tag in tags):
                     filtered.append(LongtermMemoryModel.model_validate(mem))
                     if len(filtered) >= limit:
                         break
-            
+
             return filtered
 
     def update_memory_by_id(
-        self, id: str, text: str, metadata_json: dict = None
+        self,
+        id: str,
+        text: str,
+        metadata_json: dict = None,
+        embedding_function=None,
     ) -> Optional[LongtermMemoryModel]:
+        """更新记忆文本，并同步向量索引（没有 embedding_function 时移除旧向量）"""
+        from open_webui.utils.longterm_memory import update_memory_index
+
         with get_db() as db:
             updates = {
                 "text": text,
@@ -149,12 +181,26 @@ class LongtermMemoriesTable:
             db.commit()
             
             memory = db.query(LongtermMemory).filter_by(id=id).first()
-            return LongtermMemoryModel.model_validate(memory) if memory else None
+            if not memory:
+                return None
+            memory = LongtermMemoryModel.model_validate(memory)
+
+        update_memory_index(embedding_function, memory)
+        return memory
 
     def delete_memory_by_id(self, id: str) -> bool:
+        """删除记忆，并从向量索引中移除"""
+        from open_webui.utils.longterm_memory import delete_memory_from_index
+
         with get_db() as db:
-            result = db.query(LongtermMemory).filter_by(id=id).delete()
+            memory = db.query(LongtermMemory).filter_by(id=id).first()
+            if not memory:
+                return False
+            user_id = memory.user_id
+            db.delete(memory)
             db.commit()
-            return result > 0
+
+        delete_memory_from_index(user_id, id)
+        return True
 
 LongtermMemories = LongtermMemoriesTable()
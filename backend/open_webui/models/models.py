@@ -16,7 +16,7 @@ from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy import BigInteger, Column, Text, JSON, Boolean
 
 
-from open_webui.utils.access_control import has_access
+from open_webui.models.access_grants import AccessGrants
 
 
 log = logging.getLogger(__name__)
@@ -159,6 +159,7 @@ class ModelsTable:
             with get_db() as db:
                 result = Model(**model.model_dump())
                 db.add(result)
+                AccessGrants.set_grants(db, "model", model.id, model.access_control)
                 db.commit()
                 db.refresh(result)
 
@@ -177,24 +178,26 @@ class ModelsTable:
     def get_models(self) -> list[ModelUserResponse]:
         with get_db() as db:
             all_models = db.query(Model).filter(Model.base_model_id != None).all()
+            return self._get_model_user_responses(all_models)
 
-            user_ids = list(set(model.user_id for model in all_models))
+    def _get_model_user_responses(self, all_models) -> list[ModelUserResponse]:
+        user_ids = list(set(model.user_id for model in all_models))
 
-            users = Users.get_users_by_user_ids(user_ids) if user_ids else []
-            users_dict = {user.id: user for user in users}
+        users = Users.get_users_by_user_ids(user_ids) if user_ids else []
+        users_dict = {user.id: user for user in users}
 
-            models = []
-            for model in all_models:
-                user = users_dict.get(model.user_id)
-                models.append(
-                    ModelUserResponse.model_validate(
-                        {
-                            **ModelModel.model_validate(model).model_dump(),
-                            "user": user.model_dump() if user else None,
-                        }
-                    )
+        models = []
+        for model in all_models:
+            user = users_dict.get(model.user_id)
+            models.append(
+                ModelUserResponse.model_validate(
+                    {
+                        **ModelModel.model_validate(model).model_dump(),
+                        "user": user.model_dump() if user else None,
+                    }
                 )
-            return models
+            )
+        return models
 
     def get_base_models(self) -> list[ModelModel]:
         with get_db() as db:
@@ -206,14 +209,22 @@ class ModelsTable:
     def get_models_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[ModelUserResponse]:
-        models = self.get_models()
         user_group_ids = {group.id for group in Groups.get_groups_by_member_id(user_id)}
-        return [
-            model
-            for model in models
-            if model.user_id == user_id
-            or has_access(user_id, permission, model.access_control, user_group_ids)
-        ]
+        with get_db() as db:
+            all_models = (
+                db.query(Model)
+                .filter(Model.base_model_id != None)
+                .filter(
+                    or_(
+                        Model.user_id == user_id,
+                        AccessGrants.get_access_filter(
+                            "model", Model.id, user_id, permission, user_group_ids
+                        ),
+                    )
+                )
+                .all()
+            )
+            return self._get_model_user_responses(all_models)
 
     def get_model_by_id(self, id: str) -> Optional[ModelModel]:
         try:
@@ -249,6 +260,7 @@ class ModelsTable:
                     .filter_by(id=id)
                     .update(model.model_dump(exclude={"id"}))
                 )
+                AccessGrants.set_grants(db, "model", id, model.access_control)
                 db.commit()
 
                 model = db.get(Model, id)
@@ -262,6 +274,7 @@ class ModelsTable:
         try:
             with get_db() as db:
                 db.query(Model).filter_by(id=id).delete()
+                AccessGrants.delete_grants(db, "model", id)
                 db.commit()
 
                 return True
@@ -272,6 +285,7 @@ class ModelsTable:
         try:
             with get_db() as db:
                 db.query(Model).delete()
+                AccessGrants.delete_grants(db, "model")
                 db.commit()
 
                 return True
@@ -307,11 +321,13 @@ class ModelsTable:
                             }
                         )
                         db.add(new_model)
+                    AccessGrants.set_grants(db, "model", model.id, model.access_control)
 
                 # Remove models that are no longer present
                 for model in existing_models:
                     if model.id not in new_model_ids:
                         db.delete(model)
+                        AccessGrants.delete_grants(db, "model", model.id)
 
                 db.commit()
 
@@ -0,0 +1,167 @@
+import logging
+import time
+import uuid
+from typing import Optional, List
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import BigInteger, Column, String, Text, Index
+from sqlalchemy import func
+
+from open_webui.internal.db import Base, get_db
+from open_webui.models.student_context import StudentContexts
+from open_webui.models.skill_mastery import SkillMasteries, SkillObservation
+from open_webui.models.longterm_memory import (
+    LongtermMemory,
+    LongtermMemoryForm,
+    LongtermMemoryModel,
+)
+
+log = logging.getLogger(__name__)
+
+####################
+# Nightly Checkpoint DB Schema
+####################
+
+
+class NightlyCheckpoint(Base):
+    """夜间批量分析的逐用户检查点，进程崩溃后重跑会跳过已完成的用户"""
+
+    __tablename__ = "nightly_checkpoint"
+
+    date = Column(String, primary_key=True)  # YYYY-MM-DD
+    user_id = Column(String, primary_key=True)
+    status = Column(String, nullable=False)  # done, failed
+    memory_id = Column(String, nullable=True)  # 生成的画像记忆ID
+    total_turns = Column(BigInteger, default=0)
+    error = Column(Text, nullable=True)
+    updated_at = Column(BigInteger)
+
+    __table_args__ = (Index("nightly_checkpoint_date_status_idx", "date", "status"),)
+
+
+####################
+# NightlyCheckpoint Forms
+####################
+
+
+class NightlyCheckpointModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    date: str
+    user_id: str
+    status: str
+    memory_id: Optional[str] = None
+    total_turns: int = 0
+    error: Optional[str] = None
+    updated_at: int
+
+
+class NightlyProfileResult(BaseModel):
+    """单个用户的分析结果，等待批量落库"""
+
+    user_id: str
+    total_turns: int
+    memory_form: Optional[LongtermMemoryForm] = None
+    skill_observations: List[SkillObservation] = []
+    error: Optional[str] = None
+
+
+####################
+# NightlyCheckpointsTable
+####################
+
+
+class NightlyCheckpointsTable:
+    def get_done_user_ids(self, date: str) -> set[str]:
+        with get_db() as db:
+            rows = (
+                db.query(NightlyCheckpoint.user_id)
+                .filter_by(date=date, status="done")
+                .all()
+            )
+            return {row.user_id for row in rows}
+
+    def get_status_counts(self, date: str) -> dict:
+        with get_db() as db:
+            rows = (
+                db.query(
+                    NightlyCheckpoint.status, func.count(NightlyCheckpoint.user_id)
+                )
+                .filter_by(date=date)
+                .group_by(NightlyCheckpoint.status)
+                .all()
+            )
+            return {status: count for status, count in rows}
+
+    def commit_results(
+        self, date: str, results: List[NightlyProfileResult]
+    ) -> List[LongtermMemoryModel]:
+        """
+        在同一事务中批量写入画像记忆和检查点，
+        保证不会出现“画像已写入但检查点未记录”导致的重复画像
+        """
+        if not results:
+            return []
+
+        now = int(time.time())
+        user_ids = [r.user_id for r in results]
+
+        with get_db() as db:
+            memories = []
+            checkpoints = []
+
+            for r in results:
+                memory = None
+                if r.memory_form is not None:
+                    memory = LongtermMemoryModel(
+                        id=str(uuid.uuid4()),
+                        **r.memory_form.model_dump(),
+                        created_at=now,
+                        updated_at=now,
+                    )
+                    memories.append(memory)
+
+                checkpoints.append(
+                    {
+                        "date": date,
+                        "user_id": r.user_id,
+                        "status": "done" if r.error is None else "failed",
+                        "memory_id": memory.id if memory else None,
+                        "total_turns": r.total_turns,
+                        "error": r.error,
+                        "updated_at": now,
+                    }
+                )
+
+            # 覆盖之前失败的检查点
+            db.query(NightlyCheckpoint).filter(
+                NightlyCheckpoint.date == date,
+                NightlyCheckpoint.user_id.in_(user_ids),
+            ).delete(synchronize_session=False)
+
+            if memories:
+                db.bulk_insert_mappings(
+                    LongtermMemory, [m.model_dump() for m in memories]
+                )
+            db.bulk_insert_mappings(NightlyCheckpoint, checkpoints)
+            for memory in memories:
+                if memory.namespace == f"profiles:{memory.user_id}":
+                    StudentContexts.set_profile(
+                        db, memory.user_id, memory.id, memory.text, memory.created_at
+                    )
+            for r in results:
+                if r.skill_observations:
+                    SkillMasteries.apply_observations(
+                        db, r.user_id, r.skill_observations
+                    )
+            db.commit()
+
+            return memories
+
+    def delete_checkpoints_by_date(self, date: str) -> int:
+        with get_db() as db:
+            result = db.query(NightlyCheckpoint).filter_by(date=date).delete()
+            db.commit()
+            return result
+
+
+NightlyCheckpoints = NightlyCheckpointsTable()
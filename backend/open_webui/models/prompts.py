@@ -6,9 +6,9 @@ from open_webui.models.groups import Groups
 from open_webui.models.users import Users, UserResponse
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, JSON
+from sqlalchemy import BigInteger, Column, String, Text, JSON, or_
 
-from open_webui.utils.access_control import has_access
+from open_webui.models.access_grants import AccessGrants
 
 ####################
 # Prompts DB Schema
@@ -85,6 +85,9 @@ class PromptsTable:
             with get_db() as db:
                 result = Prompt(**prompt.model_dump())
                 db.add(result)
+                AccessGrants.set_grants(
+                    db, "prompt", prompt.command, prompt.access_control
+                )
                 db.commit()
                 db.refresh(result)
                 if result:
@@ -105,38 +108,52 @@ class PromptsTable:
     def get_prompts(self) -> list[PromptUserResponse]:
         with get_db() as db:
             all_prompts = db.query(Prompt).order_by(Prompt.timestamp.desc()).all()
-
-            user_ids = list(set(prompt.user_id for prompt in all_prompts))
-
-            users = Users.get_users_by_user_ids(user_ids) if user_ids else []
-            users_dict = {user.id: user for user in users}
-
-            prompts = []
-            for prompt in all_prompts:
-                user = users_dict.get(prompt.user_id)
-                prompts.append(
-                    PromptUserResponse.model_validate(
-                        {
-                            **PromptModel.model_validate(prompt).model_dump(),
-                            "user": user.model_dump() if user else None,
-                        }
-                    )
+            return self._get_prompt_user_responses(all_prompts)
+
+    def _get_prompt_user_responses(self, all_prompts) -> list[PromptUserResponse]:
+        user_ids = list(set(prompt.user_id for prompt in all_prompts))
+
+        users = Users.get_users_by_user_ids(user_ids) if user_ids else []
+        users_dict = {user.id: user for user in users}
+
+        prompts = []
+        for prompt in all_prompts:
+            user = users_dict.get(prompt.user_id)
+            prompts.append(
+                PromptUserResponse.model_validate(
+                    {
+                        **PromptModel.model_validate(prompt).model_dump(),
+                        "user": user.model_dump() if user else None,
+                    }
                 )
+            )
 
-            return prompts
+        return prompts
 
     def get_prompts_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[PromptUserResponse]:
-        prompts = self.get_prompts()
         user_group_ids = {group.id for group in Groups.get_groups_by_member_id(user_id)}
 
-        return [
-            prompt
-            for prompt in prompts
-            if prompt.user_id == user_id
-            or has_access(user_id, permission, prompt.access_control, user_group_ids)
-        ]
+        with get_db() as db:
+            all_prompts = (
+                db.query(Prompt)
+                .filter(
+                    or_(
+                        Prompt.user_id == user_id,
+                        AccessGrants.get_access_filter(
+                            "prompt",
+                            Prompt.command,
+                            user_id,
+                            permission,
+                            user_group_ids,
+                        ),
+                    )
+                )
+                .order_by(Prompt.timestamp.desc())
+                .all()
+            )
+            return self._get_prompt_user_responses(all_prompts)
 
     def update_prompt_by_command(
         self, command: str, form_data: PromptForm
@@ -148,6 +165,7 @@ class PromptsTable:
                 prompt.content = form_data.content
                 prompt.access_control = form_data.access_control
                 prompt.timestamp = int(time.time())
+                AccessGrants.set_grants(db, "prompt", command, form_data.access_control)
                 db.commit()
                 return PromptModel.model_validate(prompt)
         except Exception:
@@ -157,6 +175,7 @@ class PromptsTable:
         try:
             with get_db() as db:
                 db.query(Prompt).filter_by(command=command).delete()
+                AccessGrants.delete_grants(db, "prompt", command)
                 db.commit()
 
                 return True
@@ -0,0 +1,335 @@
+import logging
+import time
+from typing import Optional
+
+from open_webui.internal.db import get_db
+from open_webui.models.users import User
+from open_webui.models.assignments import Assignment
+from open_webui.models.submissions import Submission
+from open_webui.models.submission_stats import (
+    SCHOOL_SCOPE_ID,
+    SubmissionStat,
+    TeacherStudentStat,
+)
+
+from pydantic import BaseModel
+from sqlalchemy import func, select, case, and_
+
+log = logging.getLogger(__name__)
+
+####################
+# School Statistics (Leader Dashboard)
+####################
+
+
+class SchoolCountsModel(BaseModel):
+    total_students: int
+    total_teachers: int
+    total_assignments: int
+    total_submissions: int
+
+
+class TeacherStatsModel(BaseModel):
+    teacher_id: str
+    teacher_name: str
+    student_count: int  # 提交过该教师作业的学生数
+    assignment_count: int
+    submission_count: int
+    avg_student_score: float
+
+
+class StudentStatsModel(BaseModel):
+    id: str
+    name: str
+    email: str
+    submissions_count: int
+    graded_count: int
+    avg_score: Optional[float] = None
+
+
+class AssignmentStatsModel(BaseModel):
+    id: str
+    title: str
+    teacher_id: str
+    due_date: Optional[str] = None
+    submissions_count: int
+    graded_count: int
+    avg_score: Optional[float] = None
+
+
+def _paginate(query, skip: Optional[int], limit: Optional[int]):
+    if skip:
+        query = query.offset(skip)
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+def _round(value) -> Optional[float]:
+    return round(float(value), 2) if value is not None else None
+
+
+def _avg_score():
+    return case(
+        (
+            SubmissionStat.score_count > 0,
+            SubmissionStat.score_sum / SubmissionStat.score_count,
+        ),
+        else_=None,
+    )
+
+
+def _stat_join(scope: str, id_column):
+    return and_(SubmissionStat.scope == scope, SubmissionStat.scope_id == id_column)
+
+
+class SchoolStatsTable:
+    """
+    全校维度的统计查询
+    提交相关的计数和平均分读取 submission_stat 物化汇总（由 SubmissionTable 增量维护），
+    用户数和作业数直接在数据库中 COUNT
+    """
+
+    def get_counts(self) -> SchoolCountsModel:
+        with get_db() as db:
+            role_counts = dict(
+                db.query(User.role, func.count(User.id)).group_by(User.role).all()
+            )
+            total_assignments = db.query(func.count(Assignment.id)).scalar()
+            total_submissions = (
+                db.query(SubmissionStat.submissions_count)
+                .filter_by(scope="school", scope_id=SCHOOL_SCOPE_ID)
+                .scalar()
+            )
+
+            return SchoolCountsModel(
+                total_students=role_counts.get("student", 0),
+                total_teachers=role_counts.get("teacher", 0),
+                total_assignments=total_assignments or 0,
+                total_submissions=total_submissions or 0,
+            )
+
+    def count_users_by_role(self, role: str) -> int:
+        with get_db() as db:
+            return db.query(func.count(User.id)).filter(User.role == role).scalar()
+
+    def count_assignments(self) -> int:
+        with get_db() as db:
+            return db.query(func.count(Assignment.id)).scalar()
+
+    def get_teacher_stats(
+        self, skip: Optional[int] = None, limit: Optional[int] = None
+    ) -> list[TeacherStatsModel]:
+        with get_db() as db:
+            assignment_stats = (
+                select(
+                    Assignment.teacher_id.label("teacher_id"),
+                    func.count(Assignment.id).label("assignment_count"),
+                )
+                .group_by(Assignment.teacher_id)
+                .subquery()
+            )
+
+            query = (
+                db.query(
+                    User.id,
+                    User.name,
+                    func.coalesce(assignment_stats.c.assignment_count, 0),
+                    func.coalesce(SubmissionStat.submissions_count, 0),
+                    func.coalesce(SubmissionStat.student_count, 0),
+                    # 沿用原看板口径：总分 / 全部提交数（未评分的提交按 0 分计入）
+                    case(
+                        (
+                            SubmissionStat.submissions_count > 0,
+                            SubmissionStat.score_sum / SubmissionStat.submissions_count,
+                        ),
+                        else_=None,
+                    ),
+                )
+                .outerjoin(assignment_stats, assignment_stats.c.teacher_id == User.id)
+                .outerjoin(SubmissionStat, _stat_join("teacher", User.id))
+                .filter(User.role == "teacher")
+                .order_by(User.name.asc(), User.id.asc())
+            )
+
+            return [
+                TeacherStatsModel(
+                    teacher_id=id,
+                    teacher_name=name,
+                    assignment_count=assignment_count,
+                    submission_count=submission_count,
+                    student_count=student_count,
+                    avg_student_score=_round(avg_score) or 0.0,
+                )
+                for (
+                    id,
+                    name,
+                    assignment_count,
+                    submission_count,
+                    student_count,
+                    avg_score,
+                ) in _paginate(query, skip, limit).all()
+            ]
+
+    def get_student_stats(
+        self, skip: Optional[int] = None, limit: Optional[int] = None
+    ) -> list[StudentStatsModel]:
+        with get_db() as db:
+            query = (
+                db.query(
+                    User.id,
+                    User.name,
+                    User.email,
+                    func.coalesce(SubmissionStat.submissions_count, 0),
+                    func.coalesce(SubmissionStat.graded_count, 0),
+                    _avg_score(),
+                )
+                .outerjoin(SubmissionStat, _stat_join("student", User.id))
+                .filter(User.role == "student")
+                .order_by(User.name.asc(), User.id.asc())
+            )
+
+            return [
+                StudentStatsModel(
+                    id=id,
+                    name=name,
+                    email=email,
+                    submissions_count=submissions_count,
+                    graded_count=graded_count,
+                    avg_score=_round(avg_score),
+                )
+                for (
+                    id,
+                    name,
+                    email,
+                    submissions_count,
+                    graded_count,
+                    avg_score,
+                ) in _paginate(query, skip, limit).all()
+            ]
+
+    def get_assignment_stats(
+        self, skip: Optional[int] = None, limit: Optional[int] = None
+    ) -> list[AssignmentStatsModel]:
+        with get_db() as db:
+            query = (
+                db.query(
+                    Assignment.id,
+                    Assignment.title,
+                    Assignment.teacher_id,
+                    Assignment.due_date,
+                    func.coalesce(SubmissionStat.submissions_count, 0),
+                    func.coalesce(SubmissionStat.graded_count, 0),
+                    _avg_score(),
+                )
+                .outerjoin(SubmissionStat, _stat_join("assignment", Assignment.id))
+                .order_by(Assignment.updated_at.desc(), Assignment.id.asc())
+            )
+
+            return [
+                AssignmentStatsModel(
+                    id=id,
+                    title=title,
+                    teacher_id=teacher_id,
+                    due_date=due_date,
+                    submissions_count=submissions_count,
+                    graded_count=graded_count,
+                    avg_score=_round(avg_score),
+                )
+                for (
+                    id,
+                    title,
+                    teacher_id,
+                    due_date,
+                    submissions_count,
+                    graded_count,
+                    avg_score,
+                ) in _paginate(query, skip, limit).all()
+            ]
+
+    def rebuild_submission_stats(self) -> int:
+        """从 submission 明细全量重建 submission_stat 汇总，用于修复漂移"""
+        with get_db() as db:
+            db.query(SubmissionStat).delete(synchronize_session=False)
+            db.query(TeacherStudentStat).delete(synchronize_session=False)
+
+            aggregates = [
+                func.count(Submission.id),
+                func.sum(case((Submission.status == "graded", 1), else_=0)),
+                func.coalesce(func.sum(Submission.score), 0.0),
+                func.count(Submission.score),
+            ]
+            scopes = [
+                ("school", None),
+                ("student", Submission.student_id),
+                ("assignment", Submission.assignment_id),
+                ("teacher", Assignment.teacher_id),
+            ]
+
+            rows = []
+            for scope, key in scopes:
+                query = db.query(*([key] if key is not None else []), *aggregates)
+                if scope == "teacher":
+                    query = query.join(
+                        Assignment, Assignment.id == Submission.assignment_id
+                    )
+                if key is not None:
+                    # 没有教师的作业等空 ID 不计入对应维度（与增量维护一致）
+                    query = query.filter(key.isnot(None)).group_by(key)
+
+                for row in query.all():
+                    scope_id = row[0] if key is not None else SCHOOL_SCOPE_ID
+                    submissions_count, graded_count, score_sum, score_count = row[-4:]
+                    if scope == "school" and not submissions_count:
+                        continue
+                    rows.append(
+                        {
+                            "scope": scope,
+                            "scope_id": scope_id,
+                            "submissions_count": submissions_count,
+                            "graded_count": graded_count or 0,
+                            "student_count": 0,
+                            "score_sum": score_sum or 0.0,
+                            "score_count": score_count,
+                            "updated_at": int(time.time()),
+                        }
+                    )
+
+            pairs = (
+                db.query(
+                    Assignment.teacher_id,
+                    Submission.student_id,
+                    func.count(Submission.id),
+                )
+                .join(Assignment, Assignment.id == Submission.assignment_id)
+                .filter(
+                    Assignment.teacher_id.isnot(None),
+                    Submission.student_id.isnot(None),
+                )
+                .group_by(Assignment.teacher_id, Submission.student_id)
+                .all()
+            )
+            student_counts: dict[str, int] = {}
+            for teacher_id, _, _ in pairs:
+                student_counts[teacher_id] = student_counts.get(teacher_id, 0) + 1
+            for row in rows:
+                if row["scope"] == "teacher":
+                    row["student_count"] = student_counts.get(row["scope_id"], 0)
+
+            db.bulk_insert_mappings(SubmissionStat, rows)
+            db.bulk_insert_mappings(
+                TeacherStudentStat,
+                [
+                    {
+                        "teacher_id": teacher_id,
+                        "student_id": student_id,
+                        "submissions_count": count,
+                    }
+                    for teacher_id, student_id, count in pairs
+                ],
+            )
+            db.commit()
+            return len(rows)
+
+
+SchoolStats = SchoolStatsTable()
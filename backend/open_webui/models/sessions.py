@@ -4,7 +4,7 @@ import uuid
 from typing import Optional, List
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON, Index
-from sqlalchemy import select
+from sqlalchemy import select, insert
 
 from open_webui.internal.db import Base, get_db
 
@@ -81,6 +81,11 @@ class SessionsTable:
             db.refresh(result)
             return SessionModel.model_validate(result)
 
+    def insert_sessions(self, db, sessions: List[SessionModel]) -> None:
+        """在调用方的事务中多行插入（write-behind 批量落库用）"""
+        if sessions:
+            db.execute(insert(Session), [s.model_dump() for s in sessions])
+
     def get_session_by_id(self, id: str) -> Optional[SessionModel]:
         with get_db() as db:
             session = db.query(Session).filter_by(id=id).first()
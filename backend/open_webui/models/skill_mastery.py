@@ -0,0 +1,333 @@
+import json
+import logging
+import time
+from typing import Iterable, Optional, List
+
+from open_webui.env import SKILL_MASTERY_EWMA_ALPHA
+from open_webui.internal.db import Base, get_db
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import BigInteger, Column, Float, Index, String
+
+log = logging.getLogger(__name__)
+
+# Rubric 未给出 scale 时的默认评分区间
+DEFAULT_RUBRIC_SCALE = (0, 5)
+
+# 计入技能观测的提交状态（教师已评分）
+GRADED_STATUSES = ("graded", "released")
+
+# 夜间画像中弱项 / 强项对应的观测值
+PROFILE_WEAK_SCORE = 0.0
+PROFILE_STRONG_SCORE = 1.0
+
+####################
+# Skill Mastery DB Schema
+####################
+
+
+class SkillMastery(Base):
+    """
+    学生在单个技能上的掌握度，按观测增量维护的运行统计
+    观测值统一归一到 [0, 1]：Rubric 分项得分按 scale 归一，夜间画像弱项 0、强项 1
+    """
+
+    __tablename__ = "skill_mastery"
+
+    student_id = Column(String, primary_key=True)
+    skill = Column(String, primary_key=True)
+
+    count = Column(BigInteger, default=0)  # 观测次数
+    score_sum = Column(Float, default=0.0)
+    mean = Column(Float, nullable=True)  # score_sum / count
+    ewma = Column(Float, nullable=True)  # 指数加权移动平均，反映近期趋势
+    last_score = Column(Float, nullable=True)
+    last_seen_at = Column(BigInteger, nullable=True)  # 最近一次观测的时间
+
+    updated_at = Column(BigInteger)
+
+    __table_args__ = (Index("skill_mastery_skill_idx", "skill", "ewma"),)
+
+
+####################
+# Forms
+####################
+
+
+class SkillMasteryModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    student_id: str
+    skill: str
+    count: int = 0
+    score_sum: float = 0.0
+    mean: Optional[float] = None
+    ewma: Optional[float] = None
+    last_score: Optional[float] = None
+    last_seen_at: Optional[int] = None
+    updated_at: Optional[int] = None
+
+
+class SkillObservation(BaseModel):
+    """一次技能观测，score 已归一到 [0, 1]"""
+
+    skill: str
+    score: float
+    observed_at: int
+
+
+def get_rubric_observations(
+    rubric_json: Optional[dict], rubric_scores: Optional[dict], observed_at: int
+) -> List[SkillObservation]:
+    """
+    Rubric 分项得分 → 技能观测
+    技能名取评分维度的 title（与画像中的技能名同为中文名称），找不到维度时用 key
+    """
+    if not rubric_scores:
+        return []
+
+    criteria = {
+        criterion.get("id"): criterion
+        for criterion in (rubric_json or {}).get("criteria", [])
+        if isinstance(criterion, dict)
+    }
+
+    observations = []
+    for key, score in rubric_scores.items():
+        if isinstance(score, bool) or not isinstance(score, (int, float)):
+            continue
+
+        criterion = criteria.get(key, {})
+        scale = [s for s in criterion.get("scale") or [] if isinstance(s, (int, float))]
+        low, high = (min(scale), max(scale)) if scale else DEFAULT_RUBRIC_SCALE
+        if high <= low:
+            continue
+
+        observations.append(
+            SkillObservation(
+                skill=criterion.get("title") or key,
+                score=min(max((score - low) / (high - low), 0.0), 1.0),
+                observed_at=observed_at,
+            )
+        )
+    return observations
+
+
+def get_profile_observations(profile: dict, observed_at: int) -> List[SkillObservation]:
+    """夜间画像的 weak_skills / strong_skills → 技能观测"""
+    observations = []
+    for skills, score in (
+        (profile.get("weak_skills") or [], PROFILE_WEAK_SCORE),
+        (profile.get("strong_skills") or [], PROFILE_STRONG_SCORE),
+    ):
+        for skill in skills:
+            if isinstance(skill, str) and skill:
+                observations.append(
+                    SkillObservation(skill=skill, score=score, observed_at=observed_at)
+                )
+    return observations
+
+
+def _apply(mastery: SkillMastery, score: float, observed_at: int, alpha: float):
+    mastery.count = (mastery.count or 0) + 1
+    mastery.score_sum = (mastery.score_sum or 0.0) + score
+    mastery.mean = mastery.score_sum / mastery.count
+    mastery.ewma = (
+        score if mastery.ewma is None else alpha * score + (1 - alpha) * mastery.ewma
+    )
+    mastery.last_score = score
+    if mastery.last_seen_at is None or observed_at >= mastery.last_seen_at:
+        mastery.last_seen_at = observed_at
+
+
+def _retract(mastery: SkillMastery, score: float):
+    """撤回一次观测对 count / mean 的贡献；EWMA 无法精确撤回，保持不变"""
+    mastery.count = max((mastery.count or 0) - 1, 0)
+    mastery.score_sum = (mastery.score_sum or 0.0) - score if mastery.count else 0.0
+    mastery.mean = mastery.score_sum / mastery.count if mastery.count else None
+
+
+####################
+# SkillMasteryTable
+####################
+
+
+class SkillMasteryTable:
+    def apply_observations(
+        self,
+        db,
+        student_id: str,
+        observations: Iterable[SkillObservation],
+        retracted: Iterable[SkillObservation] = (),
+    ) -> None:
+        """
+        在调用方的事务中把观测累加到掌握度表
+        retracted 为需要撤回的旧观测（重新评分 / 删除提交时）
+        """
+        observations = sorted(observations, key=lambda o: o.observed_at)
+        retracted = list(retracted)
+        skills = {o.skill for o in observations} | {o.skill for o in retracted}
+        if not skills:
+            return
+
+        rows = {
+            row.skill: row
+            for row in db.query(SkillMastery)
+            .filter(
+                SkillMastery.student_id == student_id,
+                SkillMastery.skill.in_(skills),
+            )
+            .with_for_update()
+            .all()
+        }
+
+        now = int(time.time())
+        for observation in retracted:
+            mastery = rows.get(observation.skill)
+            if mastery is not None:
+                _retract(mastery, observation.score)
+                mastery.updated_at = now
+
+        for observation in observations:
+            mastery = rows.get(observation.skill)
+            if mastery is None:
+                mastery = SkillMastery(
+                    student_id=student_id, skill=observation.skill, count=0
+                )
+                db.add(mastery)
+                rows[observation.skill] = mastery
+            _apply(
+                mastery,
+                observation.score,
+                observation.observed_at,
+                SKILL_MASTERY_EWMA_ALPHA,
+            )
+            mastery.updated_at = now
+        db.flush()
+
+    def add_observations(
+        self, student_id: str, observations: List[SkillObservation]
+    ) -> None:
+        with get_db() as db:
+            self.apply_observations(db, student_id, observations)
+            db.commit()
+
+    def get_mastery_by_student_id(self, student_id: str) -> List[SkillMasteryModel]:
+        with get_db() as db:
+            rows = (
+                db.query(SkillMastery)
+                .filter(SkillMastery.student_id == student_id)
+                .order_by(SkillMastery.skill)
+                .all()
+            )
+            return [SkillMasteryModel.model_validate(row) for row in rows]
+
+    def get_mastery(self, student_id: str, skill: str) -> Optional[SkillMasteryModel]:
+        with get_db() as db:
+            row = db.get(SkillMastery, (student_id, skill))
+            return SkillMasteryModel.model_validate(row) if row else None
+
+    def get_mastery_by_skill(
+        self,
+        skill: str,
+        student_ids: Optional[List[str]] = None,
+        skip: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[SkillMasteryModel]:
+        """某技能下各学生的掌握度，按 EWMA 升序（最需要关注的在前）"""
+        with get_db() as db:
+            query = db.query(SkillMastery).filter(SkillMastery.skill == skill)
+            if student_ids is not None:
+                if not student_ids:
+                    return []
+                query = query.filter(SkillMastery.student_id.in_(student_ids))
+            query = query.order_by(SkillMastery.ewma, SkillMastery.student_id)
+            if skip:
+                query = query.offset(skip)
+            if limit:
+                query = query.limit(limit)
+            return [SkillMasteryModel.model_validate(row) for row in query.all()]
+
+    def rebuild_mastery(self, batch_size: int = 500) -> int:
+        """
+        从已评分提交和历史画像全量重建（修复或回填用），返回写入的行数
+        按学生分批，每个学生的观测按时间顺序重放，EWMA 与增量维护的结果一致
+        """
+        from open_webui.models.assignments import Assignment
+        from open_webui.models.longterm_memory import LongtermMemory
+        from open_webui.models.submissions import Submission
+
+        with get_db() as db:
+            student_ids = sorted(
+                {
+                    student_id
+                    for (student_id,) in db.query(Submission.student_id)
+                    .filter(Submission.status.in_(GRADED_STATUSES))
+                    .distinct()
+                }
+                | {
+                    user_id
+                    for (user_id,) in db.query(LongtermMemory.user_id).distinct()
+                }
+            )
+            db.query(SkillMastery).delete(synchronize_session=False)
+            db.commit()
+
+        count = 0
+        for i in range(0, len(student_ids), batch_size):
+            batch = student_ids[i : i + batch_size]
+            observations: dict[str, List[SkillObservation]] = {}
+
+            with get_db() as db:
+                submissions = (
+                    db.query(
+                        Submission.student_id,
+                        Submission.rubric_scores_json,
+                        Submission.graded_at,
+                        Assignment.rubric_json,
+                    )
+                    .outerjoin(Assignment, Assignment.id == Submission.assignment_id)
+                    .filter(
+                        Submission.student_id.in_(batch),
+                        Submission.status.in_(GRADED_STATUSES),
+                    )
+                    .all()
+                )
+                for student_id, rubric_scores, graded_at, rubric_json in submissions:
+                    observations.setdefault(student_id, []).extend(
+                        get_rubric_observations(
+                            rubric_json, rubric_scores, graded_at or 0
+                        )
+                    )
+
+                profiles = db.query(
+                    LongtermMemory.user_id,
+                    LongtermMemory.text,
+                    LongtermMemory.created_at,
+                ).filter(
+                    LongtermMemory.user_id.in_(batch),
+                    LongtermMemory.namespace == "profiles:" + LongtermMemory.user_id,
+                )
+                for user_id, text, created_at in profiles:
+                    try:
+                        profile = json.loads(text or "{}")
+                    except Exception:
+                        continue
+                    if isinstance(profile, dict):
+                        observations.setdefault(user_id, []).extend(
+                            get_profile_observations(profile, created_at or 0)
+                        )
+
+                for student_id, student_observations in observations.items():
+                    self.apply_observations(db, student_id, student_observations)
+                count += (
+                    db.query(SkillMastery)
+                    .filter(SkillMastery.student_id.in_(batch))
+                    .count()
+                )
+                db.commit()
+
+        return count
+
+
+SkillMasteries = SkillMasteryTable()
@@ -0,0 +1,400 @@
+import logging
+import time
+from typing import Optional, List
+
+from open_webui.internal.db import Base, get_db
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Float,
+    String,
+    Text,
+    JSON,
+    func,
+    literal,
+    select,
+)
+from sqlalchemy.exc import IntegrityError
+
+log = logging.getLogger(__name__)
+
+DAY_SECONDS = 24 * 60 * 60
+
+# 教师 AI 上下文的对话窗口（天）及展示的最近作业数
+CONTEXT_WINDOW_DAYS = 7
+RECENT_SUBMISSIONS_LIMIT = 3
+
+# 简单的关键词主题提取
+TOPIC_KEYWORDS = {
+    "数学": ["数学", "方程"],
+    "作业": ["作业"],
+    "基础概念": ["概念", "定义"],
+}
+
+
+def extract_content_topics(content: Optional[str]) -> List[str]:
+    content = content or ""
+    return [
+        topic
+        for topic, keywords in TOPIC_KEYWORDS.items()
+        if any(keyword in content for keyword in keywords)
+    ]
+
+
+def get_day_start(ts: int) -> int:
+    return ts - ts % DAY_SECONDS
+
+
+def add_turn_days(turn_days: dict, turns: List[tuple[int, str]]) -> dict:
+    """把 turns 累加到按天的桶中，返回丢弃窗口外的桶之后的结果"""
+    for created_at, content in turns:
+        day = str(get_day_start(created_at))
+        bucket = dict(turn_days.get(day, {"turns": 0, "topics": {}}))
+        topics = dict(bucket.get("topics", {}))
+        for topic in extract_content_topics(content):
+            topics[topic] = topics.get(topic, 0) + 1
+        bucket["turns"] = bucket.get("turns", 0) + 1
+        bucket["topics"] = topics
+        turn_days[day] = bucket
+
+    oldest = get_day_start(int(time.time())) - CONTEXT_WINDOW_DAYS * DAY_SECONDS
+    return {day: bucket for day, bucket in turn_days.items() if int(day) >= oldest}
+
+
+####################
+# Student Context Snapshot DB Schema
+####################
+
+
+class StudentContext(Base):
+    """
+    教师 AI 使用的学生上下文快照，随 turn / submission / 画像写入增量维护，
+    提问时一次主键查询即可取到
+    """
+
+    __tablename__ = "student_context"
+
+    user_id = Column(String, primary_key=True)
+
+    # 按天聚合的对话：{"<day_start>": {"turns": 12, "topics": {"数学": 3}}}
+    turn_days = Column(JSON, server_default="{}")
+
+    submissions_count = Column(BigInteger, default=0)
+    score_sum = Column(Float, default=0.0)
+    score_count = Column(BigInteger, default=0)
+    # 最近几次提交：[{"score", "grade", "status", "created_at"}]
+    recent_submissions = Column(JSON, server_default="[]")
+
+    profile_id = Column(String, nullable=True)
+    profile_text = Column(Text, nullable=True)
+    profile_date = Column(BigInteger, nullable=True)
+
+    updated_at = Column(BigInteger)
+
+
+class StudentContextModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    user_id: str
+    turn_days: dict = {}
+    submissions_count: int = 0
+    score_sum: float = 0.0
+    score_count: int = 0
+    recent_submissions: List[dict] = []
+    profile_id: Optional[str] = None
+    profile_text: Optional[str] = None
+    profile_date: Optional[int] = None
+    updated_at: Optional[int] = None
+
+    def get_window_days(self, now: Optional[int] = None) -> dict:
+        now = now or int(time.time())
+        start = get_day_start(now) - (CONTEXT_WINDOW_DAYS - 1) * DAY_SECONDS
+        return {
+            day: bucket for day, bucket in self.turn_days.items() if int(day) >= start
+        }
+
+    def get_turn_count(self, now: Optional[int] = None) -> int:
+        return sum(
+            bucket.get("turns", 0) for bucket in self.get_window_days(now).values()
+        )
+
+    def get_topics(self, now: Optional[int] = None) -> List[str]:
+        topics: dict[str, int] = {}
+        for bucket in self.get_window_days(now).values():
+            for topic, count in bucket.get("topics", {}).items():
+                topics[topic] = topics.get(topic, 0) + count
+        return sorted(topics, key=lambda topic: -topics[topic])
+
+    @property
+    def avg_score(self) -> float:
+        return round(self.score_sum / self.score_count, 1) if self.score_count else 0
+
+
+####################
+# StudentContextsTable
+####################
+
+
+class StudentContextsTable:
+    def _build(self, db, user_ids: List[str]) -> dict[str, dict]:
+        """
+        在调用方的事务中从 turn / submission / longterm_memory 明细重算多个学生的快照
+        每类明细一次 IN 查询，返回 {user_id: 列值}
+        """
+        from open_webui.models.turns import Turn
+        from open_webui.models.longterm_memory import LongtermMemory
+
+        db.flush()
+        now = int(time.time())
+        start = get_day_start(now) - CONTEXT_WINDOW_DAYS * DAY_SECONDS
+
+        turns: dict[str, list[tuple[int, str]]] = {}
+        for user_id, created_at, content in db.query(
+            Turn.user_id, Turn.created_at, Turn.content
+        ).filter(Turn.user_id.in_(user_ids), Turn.created_at >= start):
+            turns.setdefault(user_id, []).append((created_at, content))
+
+        rank = (
+            func.row_number()
+            .over(
+                partition_by=LongtermMemory.user_id,
+                order_by=LongtermMemory.updated_at.desc(),
+            )
+            .label("rank")
+        )
+        latest = (
+            select(
+                LongtermMemory.user_id,
+                LongtermMemory.id,
+                LongtermMemory.text,
+                LongtermMemory.created_at,
+                rank,
+            )
+            .where(
+                LongtermMemory.user_id.in_(user_ids),
+                LongtermMemory.namespace
+                == literal("profiles:").concat(LongtermMemory.user_id),
+            )
+            .subquery()
+        )
+        profiles = {
+            user_id: (id, text, created_at)
+            for user_id, id, text, created_at in db.execute(
+                select(
+                    latest.c.user_id, latest.c.id, latest.c.text, latest.c.created_at
+                ).where(latest.c.rank == 1)
+            )
+        }
+
+        submissions = self._get_submission_stats(db, user_ids)
+
+        built = {}
+        for user_id in user_ids:
+            profile_id, profile_text, profile_date = profiles.get(
+                user_id, (None, None, None)
+            )
+            built[user_id] = {
+                "user_id": user_id,
+                "turn_days": add_turn_days({}, turns.get(user_id, [])),
+                **submissions[user_id],
+                "profile_id": profile_id,
+                "profile_text": profile_text,
+                "profile_date": profile_date,
+                "updated_at": now,
+            }
+        return built
+
+    def _get_submission_stats(self, db, student_ids: List[str]) -> dict[str, dict]:
+        """按 student_id 分组统计作业部分，最近几次提交用窗口函数一次取出"""
+        from open_webui.models.submissions import Submission
+
+        stats = {
+            student_id: {
+                "submissions_count": 0,
+                "score_sum": 0.0,
+                "score_count": 0,
+                "recent_submissions": [],
+            }
+            for student_id in student_ids
+        }
+        for student_id, submissions_count, score_sum, score_count in (
+            db.query(
+                Submission.student_id,
+                func.count(Submission.id),
+                func.coalesce(func.sum(Submission.score), 0.0),
+                func.count(Submission.score),
+            )
+            .filter(Submission.student_id.in_(student_ids))
+            .group_by(Submission.student_id)
+        ):
+            stats[student_id].update(
+                submissions_count=submissions_count,
+                score_sum=score_sum,
+                score_count=score_count,
+            )
+
+        recent = (
+            select(
+                Submission.student_id,
+                Submission.score,
+                Submission.grade,
+                Submission.status,
+                Submission.created_at,
+                func.row_number()
+                .over(
+                    partition_by=Submission.student_id,
+                    order_by=Submission.created_at.desc(),
+                )
+                .label("rank"),
+            )
+            .where(Submission.student_id.in_(student_ids))
+            .subquery()
+        )
+        for student_id, score, grade, status, created_at in db.execute(
+            select(
+                recent.c.student_id,
+                recent.c.score,
+                recent.c.grade,
+                recent.c.status,
+                recent.c.created_at,
+            )
+            .where(recent.c.rank <= RECENT_SUBMISSIONS_LIMIT)
+            .order_by(recent.c.student_id, recent.c.rank)
+        ):
+            stats[student_id]["recent_submissions"].append(
+                {
+                    "score": score,
+                    "grade": grade,
+                    "status": status,
+                    "created_at": created_at,
+                }
+            )
+        return stats
+
+    def _insert(self, db, rows: List[dict]) -> set[str]:
+        """插入重建的快照，已被并发请求创建的行保持不变，返回实际插入的 user_id"""
+        dialect = db.bind.dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+
+            return set(
+                db.execute(
+                    insert(StudentContext)
+                    .values(rows)
+                    .on_conflict_do_nothing(index_elements=["user_id"])
+                    .returning(StudentContext.user_id)
+                )
+                .scalars()
+                .all()
+            )
+
+        # 其他数据库：逐行在保存点中插入，主键冲突说明已被并发请求创建
+        created = set()
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.add(StudentContext(**row))
+                created.add(row["user_id"])
+            except IntegrityError:
+                pass
+        return created
+
+    def _get_or_create(self, db, user_id: str) -> tuple[StudentContext, bool]:
+        """
+        取该学生的快照行并加锁；不存在时从明细重建后插入，返回 (快照, 是否新建)
+        新建的快照已包含调用方事务中刚写入的明细，并发首次访问时只有一方插入成功
+        """
+        query = db.query(StudentContext).filter_by(user_id=user_id).with_for_update()
+        context = query.first()
+        if context is not None:
+            return context, False
+
+        created = self._insert(db, [self._build(db, [user_id])[user_id]])
+        return query.first(), user_id in created
+
+    def add_turns(self, db, user_id: str, turns: List[tuple[int, str]]) -> None:
+        """
+        在调用方的事务中累加新 turns 到按天的桶，并丢弃窗口外的桶
+        turns: [(created_at, content)]，须已在调用方的事务中写入 turn 表
+        """
+        if not turns:
+            return
+
+        context, created = self._get_or_create(db, user_id)
+        if created:
+            # 新建时已从 turn 表重建，其中包含这批 turns
+            return
+
+        context.turn_days = add_turn_days(dict(context.turn_days or {}), turns)
+        context.updated_at = int(time.time())
+
+    def refresh_submissions(self, db, student_id: str) -> None:
+        """在调用方的事务中重算该学生的作业部分（按 student_id 的索引查询）"""
+        db.flush()
+        context, created = self._get_or_create(db, student_id)
+        if not created:
+            for field, value in self._get_submission_stats(db, [student_id])[
+                student_id
+            ].items():
+                setattr(context, field, value)
+            context.updated_at = int(time.time())
+
+    def set_profile(
+        self, db, user_id: str, profile_id: str, text: str, created_at: int
+    ) -> None:
+        context, _ = self._get_or_create(db, user_id)
+        if context.profile_date is None or created_at >= context.profile_date:
+            context.profile_id = profile_id
+            context.profile_text = text
+            context.profile_date = created_at
+            context.updated_at = int(time.time())
+
+    def rebuild(self, user_id: str) -> StudentContextModel:
+        """从 turn / submission / longterm_memory 明细重建快照（首次访问或修复时使用）"""
+        with get_db() as db:
+            context, created = self._get_or_create(db, user_id)
+            if not created:
+                for field, value in self._build(db, [user_id])[user_id].items():
+                    setattr(context, field, value)
+            db.commit()
+            return StudentContextModel.model_validate(context)
+
+    def get_snapshot(self, user_id: str) -> StudentContextModel:
+        with get_db() as db:
+            context = db.query(StudentContext).filter_by(user_id=user_id).first()
+            if context:
+                return StudentContextModel.model_validate(context)
+        return self.rebuild(user_id)
+
+    def get_snapshots(self, user_ids: List[str]) -> dict[str, StudentContextModel]:
+        """一次 IN 查询取多个学生的快照，缺失的一起从明细重建后批量插入"""
+        if not user_ids:
+            return {}
+
+        with get_db() as db:
+            query = db.query(StudentContext)
+            snapshots = {
+                context.user_id: StudentContextModel.model_validate(context)
+                for context in query.filter(StudentContext.user_id.in_(user_ids))
+            }
+
+            missing = [user_id for user_id in user_ids if user_id not in snapshots]
+            if missing:
+                self._insert(db, list(self._build(db, missing).values()))
+                db.commit()
+                # 重新读取，并发请求先插入的行以数据库为准
+                snapshots.update(
+                    {
+                        context.user_id: StudentContextModel.model_validate(context)
+                        for context in query.filter(StudentContext.user_id.in_(missing))
+                    }
+                )
+        return snapshots
+
+
+StudentContexts = StudentContextsTable()
@@ -0,0 +1,257 @@
+import logging
+import time
+from typing import Optional
+
+from open_webui.internal.db import Base, get_db
+
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import BigInteger, Column, Float, String
+
+log = logging.getLogger(__name__)
+
+####################
+# Submission Statistics DB Schema
+####################
+
+SCHOOL_SCOPE_ID = "all"
+
+
+class SubmissionStat(Base):
+    """
+    提交统计的物化汇总，按 (scope, scope_id) 增量维护
+    scope: school / teacher / student / assignment
+    """
+
+    __tablename__ = "submission_stat"
+
+    scope = Column(String, primary_key=True)
+    scope_id = Column(String, primary_key=True)
+
+    submissions_count = Column(BigInteger, default=0)
+    graded_count = Column(BigInteger, default=0)  # status == "graded"
+    student_count = Column(BigInteger, default=0)  # 仅 teacher 维度：提交过作业的学生数
+    score_sum = Column(Float, default=0.0)
+    score_count = Column(BigInteger, default=0)  # 有分数的提交数（用于求平均分）
+
+    updated_at = Column(BigInteger)
+
+
+class TeacherStudentStat(Base):
+    """教师-学生提交计数，用于增量维护教师的去重学生数"""
+
+    __tablename__ = "teacher_student_stat"
+
+    teacher_id = Column(String, primary_key=True)
+    student_id = Column(String, primary_key=True)
+    submissions_count = Column(BigInteger, default=0)
+
+
+class SubmissionStatModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    scope: str
+    scope_id: str
+    submissions_count: int = 0
+    graded_count: int = 0
+    student_count: int = 0
+    score_sum: float = 0.0
+    score_count: int = 0
+    updated_at: Optional[int] = None
+
+    @property
+    def avg_score(self) -> Optional[float]:
+        return self.score_sum / self.score_count if self.score_count else None
+
+
+class SubmissionSnapshot(BaseModel):
+    """影响统计的提交字段"""
+
+    assignment_id: str
+    student_id: str
+    teacher_id: Optional[str] = None
+    status: Optional[str] = None
+    score: Optional[float] = None
+
+
+def _contribution(snapshot: Optional[SubmissionSnapshot]) -> dict:
+    if snapshot is None:
+        return {
+            "submissions_count": 0,
+            "graded_count": 0,
+            "score_sum": 0.0,
+            "score_count": 0,
+        }
+    return {
+        "submissions_count": 1,
+        "graded_count": 1 if snapshot.status == "graded" else 0,
+        "score_sum": snapshot.score if snapshot.score is not None else 0.0,
+        "score_count": 1 if snapshot.score is not None else 0,
+    }
+
+
+def _scopes(snapshot: Optional[SubmissionSnapshot]) -> list[tuple[str, str]]:
+    if snapshot is None:
+        return []
+    scopes = [
+        ("school", SCHOOL_SCOPE_ID),
+        ("assignment", snapshot.assignment_id),
+        ("student", snapshot.student_id),
+    ]
+    if snapshot.teacher_id:
+        scopes.append(("teacher", snapshot.teacher_id))
+    return scopes
+
+
+def _initial(delta: dict) -> dict:
+    return {
+        "submissions_count": 0,
+        "graded_count": 0,
+        "student_count": 0,
+        "score_sum": 0.0,
+        "score_count": 0,
+        **delta,
+    }
+
+
+def _get_insert(db):
+    dialect = db.bind.dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+
+####################
+# SubmissionStatsTable
+####################
+
+
+class SubmissionStatsTable:
+    def apply_delta(
+        self,
+        db,
+        before: Optional[SubmissionSnapshot],
+        after: Optional[SubmissionSnapshot],
+    ) -> None:
+        """
+        在调用方的事务中，把一次提交变更（新增/修改/删除）的差量累加到汇总表
+        before 为 None 表示新增，after 为 None 表示删除
+        """
+        now = int(time.time())
+        deltas: dict[tuple[str, str], dict] = {}
+
+        for snapshot, sign in ((before, -1), (after, 1)):
+            contribution = _contribution(snapshot)
+            for key in _scopes(snapshot):
+                delta = deltas.setdefault(key, {field: 0 for field in contribution})
+                for field, value in contribution.items():
+                    delta[field] += sign * value
+
+        for (scope, scope_id), delta in deltas.items():
+            if any(delta.values()):
+                self._upsert(db, scope, scope_id, delta, now)
+
+        # 教师去重学生数：计数从 0 变 1 时 +1，从 1 变 0 时 -1
+        before_pair = (before.teacher_id, before.student_id) if before else None
+        after_pair = (after.teacher_id, after.student_id) if after else None
+        if before_pair != after_pair:
+            if before_pair and before_pair[0]:
+                self._add_teacher_student(db, *before_pair, -1, now)
+            if after_pair and after_pair[0]:
+                self._add_teacher_student(db, *after_pair, 1, now)
+
+    def _upsert(self, db, scope: str, scope_id: str, delta: dict, now: int):
+        insert = _get_insert(db)
+        if insert is not None:
+            stmt = insert(SubmissionStat).values(
+                scope=scope, scope_id=scope_id, updated_at=now, **_initial(delta)
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["scope", "scope_id"],
+                set_={
+                    **{
+                        field: getattr(SubmissionStat, field) + value
+                        for field, value in delta.items()
+                    },
+                    "updated_at": now,
+                },
+            )
+            db.execute(stmt)
+            return
+
+        # 其他数据库：先更新，不存在再插入
+        updated = (
+            db.query(SubmissionStat)
+            .filter_by(scope=scope, scope_id=scope_id)
+            .update(
+                {
+                    **{
+                        getattr(SubmissionStat, field): getattr(SubmissionStat, field)
+                        + value
+                        for field, value in delta.items()
+                    },
+                    SubmissionStat.updated_at: now,
+                },
+                synchronize_session=False,
+            )
+        )
+        if not updated:
+            db.add(
+                SubmissionStat(
+                    scope=scope, scope_id=scope_id, updated_at=now, **_initial(delta)
+                )
+            )
+            db.flush()
+
+    def _add_teacher_student(
+        self, db, teacher_id: str, student_id: str, delta: int, now: int
+    ):
+        pair = (
+            db.query(TeacherStudentStat)
+            .filter_by(teacher_id=teacher_id, student_id=student_id)
+            .with_for_update()
+            .first()
+        )
+        previous = pair.submissions_count if pair else 0
+        current = max(previous + delta, 0)
+
+        if pair:
+            if current:
+                pair.submissions_count = current
+            else:
+                db.delete(pair)
+        elif current:
+            db.add(
+                TeacherStudentStat(
+                    teacher_id=teacher_id,
+                    student_id=student_id,
+                    submissions_count=current,
+                )
+            )
+        db.flush()
+
+        if (previous == 0) != (current == 0):
+            self._upsert(
+                db,
+                "teacher",
+                teacher_id,
+                {"student_count": 1 if current else -1},
+                now,
+            )
+
+    def get_stat(self, scope: str, scope_id: str) -> SubmissionStatModel:
+        with get_db() as db:
+            stat = (
+                db.query(SubmissionStat)
+                .filter_by(scope=scope, scope_id=scope_id)
+                .first()
+            )
+            if stat:
+                return SubmissionStatModel.model_validate(stat)
+            return SubmissionStatModel(scope=scope, scope_id=scope_id)
+
+
+SubmissionStats = SubmissionStatsTable()
@@ -6,10 +6,18 @@ from functools import lru_cache
 
 from open_webui.internal.db import Base, get_db
 from open_webui.models.users import Users, UserResponse
+from open_webui.models.assignments import Assignment
+from open_webui.models.submission_stats import SubmissionSnapshot, SubmissionStats
+from open_webui.models.student_context import StudentContexts
+from open_webui.models.skill_mastery import (
+    GRADED_STATUSES,
+    SkillMasteries,
+    get_rubric_observations,
+)
 
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON, Integer, Float
-from sqlalchemy import or_, func, select, and_, text
+from sqlalchemy import BigInteger, Boolean, Column, String, Text, JSON, Integer, Float, Index
+from sqlalchemy import or_, func, select, and_, case, text
 
 ####################
 # Submission DB Schema
@@ -49,6 +57,11 @@ class Submission(Base):
     created_at = Column(BigInteger)
     updated_at = Column(BigInteger)
 
+    __table_args__ = (
+        Index("submission_assignment_idx", "assignment_id"),
+        Index("submission_student_idx", "student_id"),
+    )
+
 
 class SubmissionModel(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -114,6 +127,35 @@ class SubmissionResponse(SubmissionModel):
     grader: Optional[UserResponse] = None
 
 
+def _get_snapshot(db, submission) -> SubmissionSnapshot:
+    teacher_id = (
+        db.query(Assignment.teacher_id)
+        .filter(Assignment.id == submission.assignment_id)
+        .scalar()
+    )
+    return SubmissionSnapshot(
+        assignment_id=submission.assignment_id,
+        student_id=submission.student_id,
+        teacher_id=teacher_id,
+        status=submission.status,
+        score=submission.score,
+    )
+
+
+def _get_rubric_observations(db, submission):
+    """已评分提交的 Rubric 分项得分对应的技能观测，未评分时为空"""
+    if submission.status not in GRADED_STATUSES or not submission.rubric_scores_json:
+        return []
+    rubric_json = (
+        db.query(Assignment.rubric_json)
+        .filter(Assignment.id == submission.assignment_id)
+        .scalar()
+    )
+    return get_rubric_observations(
+        rubric_json, submission.rubric_scores_json, submission.graded_at or 0
+    )
+
+
 class SubmissionTable:
     def insert_new_submission(
         self,
@@ -136,6 +178,10 @@ class SubmissionTable:
             new_submission = Submission(**submission.model_dump())
 
             db.add(new_submission)
+            SubmissionStats.apply_delta(
+                db, None, _get_snapshot(db, submission)
+            )
+            StudentContexts.refresh_submissions(db, student_id)
             db.commit()
             return submission
 
@@ -156,6 +202,62 @@ class SubmissionTable:
             )
             return [SubmissionModel.model_validate(s) for s in submissions]
 
+    def get_submissions_by_assignment_ids(
+        self,
+        assignment_ids: list[str],
+        limit: Optional[int] = None,
+        cursor: Optional[tuple[int, str]] = None,
+    ) -> list[SubmissionModel]:
+        """
+        一次查询取多个作业的提交
+        不分页时与逐个作业查询的顺序一致：按 assignment_ids 的顺序分组，
+        组内按 submitted_at 倒序；传入 limit/cursor 时按 (created_at, id) 倒序，
+        cursor 为上一页最后一条的 (created_at, id)，用于键集分页
+        """
+        if not assignment_ids:
+            return []
+
+        with get_db() as db:
+            query = db.query(Submission).filter(
+                Submission.assignment_id.in_(assignment_ids)
+            )
+            if cursor is not None:
+                created_at, id = cursor
+                query = query.filter(
+                    or_(
+                        Submission.created_at < created_at,
+                        and_(Submission.created_at == created_at, Submission.id < id),
+                    )
+                )
+            if limit is None and cursor is None:
+                position = case(
+                    {id: i for i, id in enumerate(assignment_ids)},
+                    value=Submission.assignment_id,
+                )
+                query = query.order_by(position, Submission.submitted_at.desc())
+            else:
+                query = query.order_by(
+                    Submission.created_at.desc(), Submission.id.desc()
+                )
+            if limit:
+                query = query.limit(limit)
+            return [SubmissionModel.model_validate(s) for s in query.all()]
+
+    def get_submissions_by_assignment_id_and_status(
+        self, assignment_id: str, statuses: list[str]
+    ) -> list[SubmissionModel]:
+        with get_db() as db:
+            submissions = (
+                db.query(Submission)
+                .filter(
+                    Submission.assignment_id == assignment_id,
+                    Submission.status.in_(statuses),
+                )
+                .order_by(Submission.submitted_at.asc())
+                .all()
+            )
+            return [SubmissionModel.model_validate(s) for s in submissions]
+
     def get_submission_by_assignment_and_student(
         self, assignment_id: str, student_id: str
     ) -> Optional[SubmissionModel]:
@@ -190,6 +292,8 @@ class SubmissionTable:
             if not submission:
                 return None
 
+            before = _get_snapshot(db, submission)
+            retracted = _get_rubric_observations(db, submission)
             form_data_dict = form_data.model_dump(exclude_unset=True)
 
             for key, value in form_data_dict.items():
@@ -199,8 +303,27 @@ class SubmissionTable:
             if form_data.status == "submitted" and submission.submitted_at is None:
                 submission.submitted_at = int(time.time())
 
+            # 教师评分接口经由此处把状态改为 graded，记录评分时间（技能观测的时间）
+            if submission.status in GRADED_STATUSES and submission.graded_at is None:
+                submission.graded_at = int(time.time())
+
             submission.updated_at = int(time.time())
 
+            after = before.model_copy(
+                update={"status": submission.status, "score": submission.score}
+            )
+            if after != before:
+                SubmissionStats.apply_delta(db, before, after)
+
+            # 状态进入/离开已评分，或已评分提交的 Rubric 得分变化时，
+            # 撤回旧观测并写入新观测
+            observations = _get_rubric_observations(db, submission)
+            if observations != retracted:
+                SkillMasteries.apply_observations(
+                    db, submission.student_id, observations, retracted=retracted
+                )
+            StudentContexts.refresh_submissions(db, submission.student_id)
+
             db.commit()
             return SubmissionModel.model_validate(submission)
     
@@ -217,7 +340,11 @@ class SubmissionTable:
             submission = db.query(Submission).filter(Submission.id == submission_id).first()
             if not submission:
                 return None
-            
+
+            before = _get_snapshot(db, submission)
+            # 重新评分时撤回上次评分的技能观测
+            retracted = _get_rubric_observations(db, submission)
+
             submission.rubric_scores_json = rubric_scores
             submission.feedback = feedback
             submission.score = total_score
@@ -225,13 +352,85 @@ class SubmissionTable:
             submission.graded_at = int(time.time())
             submission.status = "graded"
             submission.updated_at = int(time.time())
-            
+
+            SubmissionStats.apply_delta(
+                db,
+                before,
+                before.model_copy(update={"status": "graded", "score": total_score}),
+            )
+            SkillMasteries.apply_observations(
+                db,
+                submission.student_id,
+                _get_rubric_observations(db, submission),
+                retracted=retracted,
+            )
+            StudentContexts.refresh_submissions(db, submission.student_id)
             db.commit()
             return SubmissionModel.model_validate(submission)
 
+    def update_ai_grades(self, grades: list[dict]) -> int:
+        """
+        批量写回AI评分结果（单个事务），返回实际写入的条数
+        grades: [{"id", "rubric_scores_json", "ai_feedback_draft", "ai_analysis"}]
+
+        只写入仍为 submitted 的提交：任务运行期间已被教师评分的提交
+        保持不变，不会被AI草稿覆盖
+        """
+        if not grades:
+            return 0
+
+        now = int(time.time())
+        with get_db() as db:
+            # submitted → ai_reviewed 不涉及分数和教师评分观测，
+            # 统计与技能掌握度均无需更新
+            updated_ids = []
+            for grade in grades:
+                # 状态条件放在 UPDATE 中，与教师评分并发时也不会覆盖
+                updated = (
+                    db.query(Submission)
+                    .filter(
+                        Submission.id == grade["id"],
+                        Submission.status == "submitted",
+                    )
+                    .update(
+                        {
+                            "rubric_scores_json": grade["rubric_scores_json"],
+                            "ai_feedback_draft": grade["ai_feedback_draft"],
+                            "ai_analysis": grade["ai_analysis"],
+                            "status": "ai_reviewed",
+                            "updated_at": now,
+                        },
+                        synchronize_session=False,
+                    )
+                )
+                if updated:
+                    updated_ids.append(grade["id"])
+
+            if updated_ids:
+                student_ids = (
+                    db.query(Submission.student_id)
+                    .filter(Submission.id.in_(updated_ids))
+                    .distinct()
+                    .all()
+                )
+                for (student_id,) in student_ids:
+                    StudentContexts.refresh_submissions(db, student_id)
+            db.commit()
+            return len(updated_ids)
+
     def delete_submission_by_id(self, id: str):
         with get_db() as db:
-            db.query(Submission).filter(Submission.id == id).delete()
+            submission = db.query(Submission).filter(Submission.id == id).first()
+            if submission:
+                SubmissionStats.apply_delta(db, _get_snapshot(db, submission), None)
+                SkillMasteries.apply_observations(
+                    db,
+                    submission.student_id,
+                    [],
+                    retracted=_get_rubric_observations(db, submission),
+                )
+                db.delete(submission)
+                StudentContexts.refresh_submissions(db, submission.student_id)
             db.commit()
             return True
 
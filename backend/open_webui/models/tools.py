@@ -8,9 +8,9 @@ from open_webui.models.groups import Groups
 
 from open_webui.env import SRC_LOG_LEVELS
 from pydantic import BaseModel, ConfigDict
-from sqlalchemy import BigInteger, Column, String, Text, JSON
+from sqlalchemy import BigInteger, Column, String, Text, JSON, or_
 
-from open_webui.utils.access_control import has_access
+from open_webui.models.access_grants import AccessGrants
 
 
 log = logging.getLogger(__name__)
@@ -128,6 +128,7 @@ class ToolsTable:
             try:
                 result = Tool(**tool.model_dump())
                 db.add(result)
+                AccessGrants.set_grants(db, "tool", tool.id, tool.access_control)
                 db.commit()
                 db.refresh(result)
                 if result:
@@ -149,37 +150,47 @@ class ToolsTable:
     def get_tools(self) -> list[ToolUserModel]:
         with get_db() as db:
             all_tools = db.query(Tool).order_by(Tool.updated_at.desc()).all()
-
-            user_ids = list(set(tool.user_id for tool in all_tools))
-
-            users = Users.get_users_by_user_ids(user_ids) if user_ids else []
-            users_dict = {user.id: user for user in users}
-
-            tools = []
-            for tool in all_tools:
-                user = users_dict.get(tool.user_id)
-                tools.append(
-                    ToolUserModel.model_validate(
-                        {
-                            **ToolModel.model_validate(tool).model_dump(),
-                            "user": user.model_dump() if user else None,
-                        }
-                    )
+            return self._get_tool_user_models(all_tools)
+
+    def _get_tool_user_models(self, all_tools) -> list[ToolUserModel]:
+        user_ids = list(set(tool.user_id for tool in all_tools))
+
+        users = Users.get_users_by_user_ids(user_ids) if user_ids else []
+        users_dict = {user.id: user for user in users}
+
+        tools = []
+        for tool in all_tools:
+            user = users_dict.get(tool.user_id)
+            tools.append(
+                ToolUserModel.model_validate(
+                    {
+                        **ToolModel.model_validate(tool).model_dump(),
+                        "user": user.model_dump() if user else None,
+                    }
                 )
-            return tools
+            )
+        return tools
 
     def get_tools_by_user_id(
         self, user_id: str, permission: str = "write"
     ) -> list[ToolUserModel]:
-        tools = self.get_tools()
         user_group_ids = {group.id for group in Groups.get_groups_by_member_id(user_id)}
 
-        return [
-            tool
-            for tool in tools
-            if tool.user_id == user_id
-            or has_access(user_id, permission, tool.access_control, user_group_ids)
-        ]
+        with get_db() as db:
+            all_tools = (
+                db.query(Tool)
+                .filter(
+                    or_(
+                        Tool.user_id == user_id,
+                        AccessGrants.get_access_filter(
+                            "tool", Tool.id, user_id, permission, user_group_ids
+                        ),
+                    )
+                )
+                .order_by(Tool.updated_at.desc())
+                .all()
+            )
+            return self._get_tool_user_models(all_tools)
 
     def get_tool_valves_by_id(self, id: str) -> Optional[dict]:
         try:
@@ -252,6 +263,8 @@ class ToolsTable:
                 db.query(Tool).filter_by(id=id).update(
                     {**updated, "updated_at": int(time.time())}
                 )
+                if "access_control" in updated:
+                    AccessGrants.set_grants(db, "tool", id, updated["access_control"])
                 db.commit()
 
                 tool = db.query(Tool).get(id)
@@ -264,6 +277,7 @@ class ToolsTable:
         try:
             with get_db() as db:
                 db.query(Tool).filter_by(id=id).delete()
+                AccessGrants.delete_grants(db, "tool", id)
                 db.commit()
 
                 return True
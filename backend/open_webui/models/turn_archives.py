@@ -0,0 +1,100 @@
+import logging
+import time
+import uuid
+from typing import Optional, List
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import BigInteger, Column, String, Text, Index
+
+from open_webui.internal.db import Base, get_db
+
+log = logging.getLogger(__name__)
+
+####################
+# Turn Archive DB Schema
+####################
+
+
+class TurnArchive(Base):
+    """已从 turn 热表移出的一个月的数据，对应存储中的一个 Parquet 文件"""
+
+    __tablename__ = "turn_archive"
+
+    id = Column(String, primary_key=True)
+    period_start = Column(BigInteger, nullable=False)  # 月初 00:00 (UTC)
+    period_end = Column(BigInteger, nullable=False)  # 下月初，不含
+    path = Column(Text, nullable=False)  # Storage 返回的文件路径
+    row_count = Column(BigInteger, default=0)
+    size = Column(BigInteger, default=0)  # 字节
+    created_at = Column(BigInteger, nullable=False)
+
+    __table_args__ = (Index("turn_archive_period_idx", "period_start", "period_end"),)
+
+
+####################
+# TurnArchive Forms
+####################
+
+
+class TurnArchiveModel(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    period_start: int
+    period_end: int
+    path: str
+    row_count: int = 0
+    size: int = 0
+    created_at: int
+
+
+####################
+# TurnArchivesTable
+####################
+
+
+class TurnArchivesTable:
+    def insert_archive(
+        self,
+        db,
+        period_start: int,
+        period_end: int,
+        path: str,
+        row_count: int,
+        size: int,
+    ) -> TurnArchiveModel:
+        """在调用方的事务中登记归档文件（与删除热表数据同一事务）"""
+        archive = TurnArchiveModel(
+            id=str(uuid.uuid4()),
+            period_start=period_start,
+            period_end=period_end,
+            path=path,
+            row_count=row_count,
+            size=size,
+            created_at=int(time.time()),
+        )
+        db.add(TurnArchive(**archive.model_dump()))
+        return archive
+
+    def get_archives(self) -> List[TurnArchiveModel]:
+        with get_db() as db:
+            archives = db.query(TurnArchive).order_by(TurnArchive.period_start).all()
+            return [TurnArchiveModel.model_validate(a) for a in archives]
+
+    def get_archives_in_range(
+        self, start_time: int, end_time: int
+    ) -> List[TurnArchiveModel]:
+        """与 [start_time, end_time) 有交集的归档，按时间排序"""
+        with get_db() as db:
+            archives = (
+                db.query(TurnArchive)
+                .filter(
+                    TurnArchive.period_start < end_time,
+                    TurnArchive.period_end > start_time,
+                )
+                .order_by(TurnArchive.period_start, TurnArchive.created_at)
+                .all()
+            )
+            return [TurnArchiveModel.model_validate(a) for a in archives]
+
+
+TurnArchives = TurnArchivesTable()
@@ -1,15 +1,33 @@
 import logging
 import time
 import uuid
-from typing import Optional, List
+from datetime import datetime, timezone
+from typing import Optional, List, Iterator, Sequence, Union
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy import BigInteger, Column, String, Text, JSON, Index
-from sqlalchemy import select
+from sqlalchemy import select, insert, and_, or_, func, text
 
 from open_webui.internal.db import Base, get_db
+from open_webui.models.student_context import StudentContexts
 
 log = logging.getLogger(__name__)
 
+# Postgres 上 turn 按 created_at 月度分区，启动时预建到当前月之后的月数
+TURN_PARTITION_MONTHS_AHEAD = 2
+
+
+def get_month_start(ts: int) -> int:
+    """时间戳所在自然月 (UTC) 的起始时间戳"""
+    dt = datetime.fromtimestamp(ts, tz=timezone.utc)
+    return int(dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+
+def get_next_month_start(ts: int) -> int:
+    dt = datetime.fromtimestamp(get_month_start(ts), tz=timezone.utc)
+    return int(
+        dt.replace(year=dt.year + dt.month // 12, month=dt.month % 12 + 1).timestamp()
+    )
+
 ####################
 # Turns DB Schema
 ####################
@@ -19,6 +37,10 @@ class Turn(Base):
     
     id = Column(String, primary_key=True)
     session_id = Column(String, nullable=False)
+    # 冗余自 session，按学生读取时间窗口无需关联 session
+    user_id = Column(String, nullable=True)
+    assignment_id = Column(String, nullable=True)
+    mode = Column(String, nullable=True)
     role = Column(String, nullable=False)  # user, assistant, system
     content = Column(Text)
     tool_calls = Column(JSON, server_default="[]")  # 工具调用记录
@@ -32,6 +54,7 @@ class Turn(Base):
     __table_args__ = (
         Index("turn_session_idx", "session_id"),
         Index("turn_created_idx", "created_at"),
+        Index("turn_user_created_idx", "user_id", "created_at"),
     )
 
 ####################
@@ -40,6 +63,10 @@ class Turn(Base):
 
 class TurnForm(BaseModel):
     session_id: str
+    # 为空时写入前从 session 补齐
+    user_id: Optional[str] = None
+    assignment_id: Optional[str] = None
+    mode: Optional[str] = None
     role: str
     content: str
     tool_calls: List[dict] = []
@@ -54,6 +81,9 @@ class TurnModel(BaseModel):
     
     id: str
     session_id: str
+    user_id: Optional[str] = None
+    assignment_id: Optional[str] = None
+    mode: Optional[str] = None
     role: str
     content: str
     tool_calls: List[dict]
@@ -69,6 +99,29 @@ class TurnModel(BaseModel):
 ####################
 
 class TurnsTable:
+    def _fill_session_fields(self, db, turns: List[TurnModel]) -> None:
+        """缺少 user_id 的 turn 从所属 session 补齐 user_id / assignment_id / mode"""
+        session_ids = {turn.session_id for turn in turns if turn.user_id is None}
+        if not session_ids:
+            return
+
+        from open_webui.models.sessions import Session
+
+        sessions = {
+            row.id: row
+            for row in db.query(
+                Session.id, Session.user_id, Session.assignment_id, Session.mode
+            )
+            .filter(Session.id.in_(session_ids))
+            .all()
+        }
+        for turn in turns:
+            session = sessions.get(turn.session_id)
+            if turn.user_id is None and session is not None:
+                turn.user_id = session.user_id
+                turn.assignment_id = session.assignment_id
+                turn.mode = session.mode
+
     def insert_new_turn(
         self, form_data: TurnForm
     ) -> Optional[TurnModel]:
@@ -77,6 +130,9 @@ class TurnsTable:
                 **{
                     "id": str(uuid.uuid4()),
                     "session_id": form_data.session_id,
+                    "user_id": form_data.user_id,
+                    "assignment_id": form_data.assignment_id,
+                    "mode": form_data.mode,
                     "role": form_data.role,
                     "content": form_data.content,
                     "tool_calls": form_data.tool_calls,
@@ -89,12 +145,41 @@ class TurnsTable:
                 }
             )
 
+            self._fill_session_fields(db, [turn])
             result = Turn(**turn.model_dump())
             db.add(result)
+
+            # 同步更新该用户的教师 AI 上下文快照
+            if turn.user_id:
+                StudentContexts.add_turns(
+                    db, turn.user_id, [(turn.created_at, turn.content)]
+                )
+
             db.commit()
             db.refresh(result)
             return TurnModel.model_validate(result)
 
+    def insert_turns(self, db, turns: List[TurnModel]) -> None:
+        """
+        在调用方的事务中多行插入 turns，并按用户批量更新上下文快照
+        （write-behind 批量落库用，同批的 session 需先插入）
+        """
+        if not turns:
+            return
+
+        db.flush()
+        self._fill_session_fields(db, turns)
+        db.execute(insert(Turn), [turn.model_dump() for turn in turns])
+
+        user_turns: dict[str, list] = {}
+        for turn in turns:
+            if turn.user_id:
+                user_turns.setdefault(turn.user_id, []).append(
+                    (turn.created_at, turn.content)
+                )
+        for user_id, items in user_turns.items():
+            StudentContexts.add_turns(db, user_id, items)
+
     def get_turn_by_id(self, id: str) -> Optional[TurnModel]:
         with get_db() as db:
             turn = db.query(Turn).filter_by(id=id).first()
@@ -119,12 +204,9 @@ class TurnsTable:
     ) -> List[TurnModel]:
         """获取某用户在指定时间范围内的所有turns（用于夜间分析）"""
         with get_db() as db:
-            from open_webui.models.sessions import Session
-            
             all_turns = (
                 db.query(Turn)
-                .join(Session, Turn.session_id == Session.id)
-                .filter(Session.user_id == user_id)
+                .filter(Turn.user_id == user_id)
                 .filter(Turn.created_at >= start_time)
                 .filter(Turn.created_at < end_time)
                 .order_by(Turn.created_at.asc())
@@ -132,6 +214,169 @@ class TurnsTable:
             )
             return [TurnModel.model_validate(turn) for turn in all_turns]
 
+    def iter_turns_by_user_and_date(
+        self,
+        user_id: str,
+        start_time: int,
+        end_time: int,
+        batch_size: int = 500,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Iterator[List[Union[TurnModel, dict]]]:
+        """
+        按 (created_at, id) 游标分批读取某用户在时间范围内的 turns
+
+        每批单独查询，内存占用只与 batch_size 相关。指定 columns 时只查询
+        这些列，并以 dict 形式返回（如 ["role", "content", "created_at"]）。
+        """
+        if columns:
+            unknown = [c for c in columns if c not in Turn.__table__.columns]
+            if unknown:
+                raise ValueError(f"Unknown turn columns: {unknown}")
+            # 游标依赖 created_at 和 id，始终查询
+            query_columns = list(dict.fromkeys([*columns, "created_at", "id"]))
+            entities = [getattr(Turn, c) for c in query_columns]
+        else:
+            entities = [Turn]
+
+        cursor = None
+        while True:
+            with get_db() as db:
+                query = (
+                    db.query(*entities)
+                    .filter(Turn.user_id == user_id)
+                    .filter(Turn.created_at >= start_time)
+                    .filter(Turn.created_at < end_time)
+                )
+                if cursor is not None:
+                    last_created_at, last_id = cursor
+                    query = query.filter(
+                        or_(
+                            Turn.created_at > last_created_at,
+                            and_(
+                                Turn.created_at == last_created_at,
+                                Turn.id > last_id,
+                            ),
+                        )
+                    )
+                rows = (
+                    query.order_by(Turn.created_at.asc(), Turn.id.asc())
+                    .limit(batch_size)
+                    .all()
+                )
+
+            if not rows:
+                return
+
+            cursor = (rows[-1].created_at, rows[-1].id)
+            if columns:
+                yield [{c: getattr(row, c) for c in columns} for row in rows]
+            else:
+                yield [TurnModel.model_validate(row) for row in rows]
+
+            if len(rows) < batch_size:
+                return
+
+    def get_active_user_turn_counts(
+        self, start_time: int, end_time: int
+    ) -> dict[str, int]:
+        """一次查询获取时间范围内有对话的所有用户及其 turn 数量"""
+        with get_db() as db:
+            rows = (
+                db.query(Turn.user_id, func.count(Turn.id))
+                .filter(Turn.user_id.isnot(None))
+                .filter(Turn.created_at >= start_time)
+                .filter(Turn.created_at < end_time)
+                .group_by(Turn.user_id)
+                .all()
+            )
+            return {user_id: count for user_id, count in rows}
+
+    def is_partitioned(self, db) -> bool:
+        if db.bind.dialect.name != "postgresql":
+            return False
+        return bool(
+            db.execute(
+                text(
+                    "SELECT 1 FROM pg_partitioned_table "
+                    "WHERE partrelid = to_regclass('turn')"
+                )
+            ).scalar()
+        )
+
+    def ensure_partitions(self, months_ahead: int = TURN_PARTITION_MONTHS_AHEAD) -> int:
+        """
+        Postgres：预建当前月及之后 months_ahead 个月的分区，返回新建数量
+        其他数据库没有原生分区，直接返回 0
+        """
+        with get_db() as db:
+            if not self.is_partitioned(db):
+                return 0
+
+            created = 0
+            start = get_month_start(int(time.time()))
+            for _ in range(months_ahead + 1):
+                end = get_next_month_start(start)
+                name = f"turn_p{datetime.fromtimestamp(start, tz=timezone.utc):%Y%m}"
+                exists = db.execute(
+                    text("SELECT to_regclass(:name)"), {"name": name}
+                ).scalar()
+                if not exists:
+                    try:
+                        db.execute(
+                            text(
+                                f"CREATE TABLE {name} PARTITION OF turn "
+                                f"FOR VALUES FROM ({start}) TO ({end})"
+                            )
+                        )
+                        db.commit()
+                        created += 1
+                    except Exception as e:
+                        # 默认分区里已有该范围的数据时无法建分区，数据仍可正常读写
+                        db.rollback()
+                        log.warning(f"Failed to create turn partition {name}: {e}")
+                start = end
+            return created
+
+    def delete_turns_in_range(
+        self, db, start_time: int, end_time: int, batch_size: int = 5000
+    ) -> int:
+        """
+        在调用方的事务中删除一个自然月 [start_time, end_time) 的 turns（归档后移出热表）
+        Postgres 上该月有独立分区时直接 DROP 分区，否则按主键分批删除
+        """
+        deleted = 0
+        if self.is_partitioned(db):
+            name = f"turn_p{datetime.fromtimestamp(start_time, tz=timezone.utc):%Y%m}"
+            # 分区均按自然月创建，同名分区即覆盖整个 [start_time, end_time)
+            exists = db.execute(
+                text(
+                    "SELECT 1 FROM pg_class "
+                    "WHERE oid = to_regclass(:name) AND relispartition"
+                ),
+                {"name": name},
+            ).scalar()
+            if exists:
+                deleted += db.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+                db.execute(text(f"ALTER TABLE turn DETACH PARTITION {name}"))
+                db.execute(text(f"DROP TABLE {name}"))
+
+        # 落在默认分区 / 未分区表中的行
+        while True:
+            ids = [
+                row.id
+                for row in db.query(Turn.id)
+                .filter(Turn.created_at >= start_time, Turn.created_at < end_time)
+                .limit(batch_size)
+                .all()
+            ]
+            if not ids:
+                return deleted
+            deleted += (
+                db.query(Turn)
+                .filter(Turn.id.in_(ids))
+                .delete(synchronize_session=False)
+            )
+
     def delete_turn_by_id(self, id: str) -> bool:
         with get_db() as db:
             result = db.query(Turn).filter_by(id=id).delete()
@@ -2,14 +2,16 @@ import logging
 import time
 import uuid
 from typing import Optional, List
-from pydantic import BaseModel, ConfigDict
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 from sqlalchemy import BigInteger, Column, String, Float, JSON, Index
-from sqlalchemy import select, func
+from sqlalchemy import select, insert, func
 
 from open_webui.internal.db import Base, get_db
 
 log = logging.getLogger(__name__)
 
+DAY_SECONDS = 24 * 60 * 60
+
 ####################
 # Usage Logs DB Schema
 ####################
@@ -27,7 +29,8 @@ class UsageLog(Base):
     session_id = Column(String, nullable=True)
     turn_id = Column(String, nullable=True)
     created_at = Column(BigInteger)
-    metadata = Column(JSON, server_default="{}")
+    # "metadata" 是 Declarative 保留属性名，列名保持不变
+    metadata_json = Column("metadata", JSON, server_default="{}")
     
     __table_args__ = (
         Index("usage_log_user_idx", "user_id"),
@@ -35,6 +38,21 @@ class UsageLog(Base):
         Index("usage_log_user_created_idx", "user_id", "created_at"),
     )
 
+
+class UsageRollupDaily(Base):
+    """按 (user_id, day, model, mode) 预聚合的日用量，随 insert_new_log 增量维护"""
+    __tablename__ = "usage_rollup_daily"
+    
+    user_id = Column(String, primary_key=True)
+    day = Column(BigInteger, primary_key=True)  # 当天 00:00 (UTC) 的时间戳
+    model = Column(String, primary_key=True)
+    mode = Column(String, primary_key=True)
+    requests = Column(BigInteger, default=0)
+    tokens_in = Column(BigInteger, default=0)
+    tokens_out = Column(BigInteger, default=0)
+    cost_usd = Column(Float, default=0.0)
+    updated_at = Column(BigInteger)
+
 ####################
 # UsageLog Forms
 ####################
@@ -63,7 +81,12 @@ class UsageLogModel(BaseModel):
     session_id: Optional[str] = None
     turn_id: Optional[str] = None
     created_at: int
-    metadata: dict
+    # 属性名避开 Declarative 保留的 metadata，对外序列化仍为 "metadata"
+    metadata_json: dict = Field(
+        default={},
+        validation_alias=AliasChoices("metadata_json", "metadata"),
+        serialization_alias="metadata",
+    )
 
 class UsageStatsModel(BaseModel):
     """用量统计模型"""
@@ -74,6 +97,23 @@ class UsageStatsModel(BaseModel):
     by_model: dict  # {"gpt-5": {"requests": 100, "tokens": 5000, "cost": 0.5}}
     by_mode: dict  # {"chat": {...}, "homework": {...}}
 
+####################
+# Helpers
+####################
+
+def get_day_start(ts: int) -> int:
+    """时间戳所在自然日 (UTC) 的起始时间戳"""
+    return ts - ts % DAY_SECONDS
+
+
+def get_mode(mode: Optional[str]) -> str:
+    """与列默认值一致，空 mode 记为 chat（明细聚合与日聚合共用）"""
+    return mode or "chat"
+
+
+def _empty_bucket() -> dict:
+    return {"requests": 0, "tokens_in": 0, "tokens_out": 0, "cost_usd": 0.0}
+
 ####################
 # UsageLogsTable
 ####################
@@ -95,76 +135,228 @@ class UsageLogsTable:
                     "session_id": form_data.session_id,
                     "turn_id": form_data.turn_id,
                     "created_at": int(time.time()),
-                    "metadata": form_data.metadata,
+                    "metadata_json": form_data.metadata,
                 }
             )
 
             result = UsageLog(**log_entry.model_dump())
             db.add(result)
+            # 与明细写入同一事务更新日聚合，保证两者一致
+            self._add_to_rollup(db, log_entry)
             db.commit()
             db.refresh(result)
             return UsageLogModel.model_validate(result)
 
+    def insert_logs(self, db, entries: List[UsageLogModel]) -> None:
+        """在调用方的事务中多行插入明细并更新日聚合（write-behind 批量落库用）"""
+        if not entries:
+            return
+
+        db.execute(insert(UsageLog), [entry.model_dump() for entry in entries])
+        for entry in entries:
+            self._add_to_rollup(db, entry)
+
+    def _add_to_rollup(self, db, entry: UsageLogModel):
+        day = get_day_start(entry.created_at)
+        mode = get_mode(entry.mode)
+        values = {
+            "user_id": entry.user_id,
+            "day": day,
+            "model": entry.model,
+            "mode": mode,
+            "requests": 1,
+            "tokens_in": entry.tokens_in,
+            "tokens_out": entry.tokens_out,
+            "cost_usd": entry.cost_usd,
+            "updated_at": entry.created_at,
+        }
+
+        dialect = db.bind.dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert
+
+            stmt = insert(UsageRollupDaily).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_id", "day", "model", "mode"],
+                set_={
+                    "requests": UsageRollupDaily.requests + 1,
+                    "tokens_in": UsageRollupDaily.tokens_in + entry.tokens_in,
+                    "tokens_out": UsageRollupDaily.tokens_out + entry.tokens_out,
+                    "cost_usd": UsageRollupDaily.cost_usd + entry.cost_usd,
+                    "updated_at": entry.created_at,
+                },
+            )
+            db.execute(stmt)
+            return
+
+        # 其他数据库：先更新，不存在再插入
+        updated = (
+            db.query(UsageRollupDaily)
+            .filter_by(user_id=entry.user_id, day=day, model=entry.model, mode=mode)
+            .update(
+                {
+                    "requests": UsageRollupDaily.requests + 1,
+                    "tokens_in": UsageRollupDaily.tokens_in + entry.tokens_in,
+                    "tokens_out": UsageRollupDaily.tokens_out + entry.tokens_out,
+                    "cost_usd": UsageRollupDaily.cost_usd + entry.cost_usd,
+                    "updated_at": entry.created_at,
+                },
+                synchronize_session=False,
+            )
+        )
+        if not updated:
+            db.add(UsageRollupDaily(**values))
+
+    def _aggregate_logs(self, db, user_id: str, start_time: int, end_time: int):
+        """在数据库中对 [start_time, end_time) 的明细做 GROUP BY"""
+        mode = func.coalesce(UsageLog.mode, "chat")
+        return (
+            db.query(
+                UsageLog.model,
+                mode,
+                func.count(UsageLog.id),
+                func.coalesce(func.sum(UsageLog.tokens_in), 0),
+                func.coalesce(func.sum(UsageLog.tokens_out), 0),
+                func.coalesce(func.sum(UsageLog.cost_usd), 0.0),
+            )
+            .filter(
+                UsageLog.user_id == user_id,
+                UsageLog.created_at >= start_time,
+                UsageLog.created_at < end_time,
+            )
+            .group_by(UsageLog.model, mode)
+            .all()
+        )
+
+    def _aggregate_rollups(
+        self, db, user_id: str, start_day: Optional[int], end_day: Optional[int]
+    ):
+        """对 [start_day, end_day) 的日聚合做 GROUP BY，None 表示不限"""
+        query = db.query(
+            UsageRollupDaily.model,
+            UsageRollupDaily.mode,
+            func.coalesce(func.sum(UsageRollupDaily.requests), 0),
+            func.coalesce(func.sum(UsageRollupDaily.tokens_in), 0),
+            func.coalesce(func.sum(UsageRollupDaily.tokens_out), 0),
+            func.coalesce(func.sum(UsageRollupDaily.cost_usd), 0.0),
+        ).filter(UsageRollupDaily.user_id == user_id)
+
+        if start_day is not None:
+            query = query.filter(UsageRollupDaily.day >= start_day)
+        if end_day is not None:
+            query = query.filter(UsageRollupDaily.day < end_day)
+
+        return query.group_by(UsageRollupDaily.model, UsageRollupDaily.mode).all()
+
     def get_user_stats(
         self, user_id: str, start_time: int = None, end_time: int = None
     ) -> UsageStatsModel:
-        """获取用户的用量统计"""
+        """
+        获取用户的用量统计
+
+        完整的自然日直接读 usage_rollup_daily，只有首尾不完整的那一天
+        才回到 usage_log 做 GROUP BY，耗时与历史数据量无关。
+        """
+        # end_time 为闭区间，内部统一换成半开区间 [start, end)
+        end_exclusive = end_time + 1 if end_time else None
+
         with get_db() as db:
-            query = db.query(UsageLog).filter_by(user_id=user_id)
-            
-            if start_time:
-                query = query.filter(UsageLog.created_at >= start_time)
-            if end_time:
-                query = query.filter(UsageLog.created_at <= end_time)
-            
-            all_logs = query.all()
-            
-            # 统计
-            total_requests = len(all_logs)
-            total_tokens_in = sum(log.tokens_in for log in all_logs)
-            total_tokens_out = sum(log.tokens_out for log in all_logs)
-            total_cost_usd = sum(log.cost_usd for log in all_logs)
-            
-            # 按模型统计
+            rows = []
+
+            # 区间内第一个完整自然日 / 最后一个完整自然日之后的一天
+            first_day = get_day_start(start_time + DAY_SECONDS - 1) if start_time else None
+            last_day = get_day_start(end_exclusive) if end_exclusive else None
+
+            if first_day is not None and last_day is not None and first_day >= last_day:
+                # 区间内没有完整的自然日，直接聚合明细
+                if end_exclusive > start_time:
+                    rows.extend(
+                        self._aggregate_logs(db, user_id, start_time, end_exclusive)
+                    )
+            else:
+                rows.extend(self._aggregate_rollups(db, user_id, first_day, last_day))
+                if first_day is not None and start_time < first_day:
+                    rows.extend(
+                        self._aggregate_logs(db, user_id, start_time, first_day)
+                    )
+                if last_day is not None and last_day < end_exclusive:
+                    rows.extend(
+                        self._aggregate_logs(db, user_id, last_day, end_exclusive)
+                    )
+
+            # 合并（行数只与 模型数 × 模式数 相关）
             by_model = {}
             by_mode = {}
-            
-            for log in all_logs:
-                # 按模型
-                if log.model not in by_model:
-                    by_model[log.model] = {
-                        "requests": 0,
-                        "tokens_in": 0,
-                        "tokens_out": 0,
-                        "cost_usd": 0.0
-                    }
-                by_model[log.model]["requests"] += 1
-                by_model[log.model]["tokens_in"] += log.tokens_in
-                by_model[log.model]["tokens_out"] += log.tokens_out
-                by_model[log.model]["cost_usd"] += log.cost_usd
-                
-                # 按模式
-                if log.mode not in by_mode:
-                    by_mode[log.mode] = {
-                        "requests": 0,
-                        "tokens_in": 0,
-                        "tokens_out": 0,
-                        "cost_usd": 0.0
-                    }
-                by_mode[log.mode]["requests"] += 1
-                by_mode[log.mode]["tokens_in"] += log.tokens_in
-                by_mode[log.mode]["tokens_out"] += log.tokens_out
-                by_mode[log.mode]["cost_usd"] += log.cost_usd
-            
+            totals = _empty_bucket()
+
+            for model, mode, requests, tokens_in, tokens_out, cost_usd in rows:
+                for bucket in (
+                    totals,
+                    by_model.setdefault(model, _empty_bucket()),
+                    by_mode.setdefault(mode, _empty_bucket()),
+                ):
+                    bucket["requests"] += int(requests or 0)
+                    bucket["tokens_in"] += int(tokens_in or 0)
+                    bucket["tokens_out"] += int(tokens_out or 0)
+                    bucket["cost_usd"] += float(cost_usd or 0.0)
+
             return UsageStatsModel(
-                total_requests=total_requests,
-                total_tokens_in=total_tokens_in,
-                total_tokens_out=total_tokens_out,
-                total_cost_usd=total_cost_usd,
+                total_requests=totals["requests"],
+                total_tokens_in=totals["tokens_in"],
+                total_tokens_out=totals["tokens_out"],
+                total_cost_usd=totals["cost_usd"],
                 by_model=by_model,
                 by_mode=by_mode
             )
 
+    def rebuild_rollups(self, user_id: Optional[str] = None) -> int:
+        """根据 usage_log 明细重建日聚合（用于修复或回填），返回写入的行数"""
+        with get_db() as db:
+            query = db.query(UsageRollupDaily)
+            if user_id:
+                query = query.filter_by(user_id=user_id)
+            query.delete(synchronize_session=False)
+
+            day = UsageLog.created_at - UsageLog.created_at % DAY_SECONDS
+            select_stmt = select(
+                UsageLog.user_id,
+                day,
+                UsageLog.model,
+                func.coalesce(UsageLog.mode, "chat"),
+                func.count(UsageLog.id),
+                func.coalesce(func.sum(UsageLog.tokens_in), 0),
+                func.coalesce(func.sum(UsageLog.tokens_out), 0),
+                func.coalesce(func.sum(UsageLog.cost_usd), 0.0),
+                func.max(UsageLog.created_at),
+            )
+            if user_id:
+                select_stmt = select_stmt.where(UsageLog.user_id == user_id)
+            select_stmt = select_stmt.group_by(
+                UsageLog.user_id, day, UsageLog.model, func.coalesce(UsageLog.mode, "chat")
+            )
+
+            result = db.execute(
+                UsageRollupDaily.__table__.insert().from_select(
+                    [
+                        "user_id",
+                        "day",
+                        "model",
+                        "mode",
+                        "requests",
+                        "tokens_in",
+                        "tokens_out",
+                        "cost_usd",
+                        "updated_at",
+                    ],
+                    select_stmt,
+                )
+            )
+            db.commit()
+            return result.rowcount
+
     def get_logs_by_user(
         self, user_id: str, skip: int = 0, limit: int = 100
     ) -> List[UsageLogModel]:
@@ -70,16 +70,27 @@ class ChromaClient(VectorDBBase):
         # Delete the collection based on the collection name.
         return self.client.delete_collection(name=collection_name)
 
+    supports_search_filter = True
+
     def search(
-        self, collection_name: str, vectors: list[list[float | int]], limit: int
+        self,
+        collection_name: str,
+        vectors: list[list[float | int]],
+        limit: int,
+        filter: Optional[dict] = None,
     ) -> Optional[SearchResult]:
         # Search for the nearest neighbor items based on the vectors and return 'limit' number of results.
+        # An optional metadata filter restricts the candidates before ranking.
+        if filter and len(filter) > 1:
+            # chroma only accepts one condition per where clause
+            filter = {"$and": [{key: value} for key, value in filter.items()]}
         try:
             collection = self.client.get_collection(name=collection_name)
             if collection:
                 result = collection.query(
                     query_embeddings=vectors,
                     n_results=limit,
+                    where=filter or None,
                 )
 
                 # chromadb has cosine distance, 2 (worst) -> 0 (best). Re-odering to 0 -> 1
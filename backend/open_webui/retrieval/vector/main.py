@@ -31,6 +31,10 @@ class VectorDBBase(ABC):
     implement all abstract methods.
     """
 
+    # Backends that set this accept an optional `filter` in search(): a dict of
+    # metadata key/value pairs that must all match, as in query().
+    supports_search_filter: bool = False
+
     @abstractmethod
     def has_collection(self, collection_name: str) -> bool:
         """Check if the collection exists in the vector DB."""
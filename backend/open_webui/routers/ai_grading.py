@@ -1,20 +1,59 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Literal
 from open_webui.models.users import UserModel
-from open_webui.models.submissions import Submissions
+from open_webui.models.submissions import Submissions, SubmissionUpdateForm
 from open_webui.models.assignments import Assignments
+from open_webui.models.skill_mastery import GRADED_STATUSES
+from open_webui.env import (
+    AI_GRADING_MAX_CONCURRENCY,
+    AI_GRADING_TIMEOUT,
+    AI_GRADING_RATE_LIMIT,
+    AI_GRADING_BULK_WORKERS,
+)
+from open_webui.socket.main import sio, USER_POOL
 from open_webui.utils.auth import get_verified_user
 from open_webui.utils.chat import generate_chat_completion
+from open_webui.utils.llm_cache import AI_GRADING_CACHE, get_cache_key
+import asyncio
 import json
+import logging
+import time
+import uuid
+
+log = logging.getLogger(__name__)
 
 router = APIRouter()
 
+class AsyncRateLimiter:
+    """
+    全局速率限制: 保证LLM请求的发起间隔不小于 60/rate_per_minute 秒,
+    所有评分任务共享同一个实例
+    """
+    def __init__(self, rate_per_minute: Optional[float]):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute else 0.0
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+    
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            wait = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+GRADING_RATE_LIMITER = AsyncRateLimiter(AI_GRADING_RATE_LIMIT)
+
 class AIGradeResponse(BaseModel):
     rubric_scores: Dict[str, float]
     feedback_draft: str
     total_score: Optional[float] = None
     confidence: Optional[str] = None
+    # 至少一项评分是LLM失败/超时/格式错误时的默认评分,不是真实评估
+    fallback: bool = False
 
 class GenerateRubricRequest(BaseModel):
     assignment_title: str
@@ -26,6 +65,52 @@ class GenerateRubricResponse(BaseModel):
     explanation: str
     rubric_json: Dict
 
+def parse_llm_json(content: str):
+    """解析LLM返回的JSON,移除可能的markdown代码块标记"""
+    content = content.strip()
+    if content.startswith("```json"):
+        content = content[7:]
+    if content.startswith("```"):
+        content = content[3:]
+    if content.endswith("```"):
+        content = content[:-3]
+    return json.loads(content.strip())
+
+async def call_llm_json(
+    request: Request,
+    user: UserModel,
+    form_data: dict,
+    cache_namespace: str,
+) -> dict:
+    """
+    调用LLM并解析JSON结果
+    
+    相同 (model, prompt) 的结果直接从缓存返回,不占用速率限制;
+    未命中时受全局速率限制,单次调用最长 AI_GRADING_TIMEOUT 秒
+    """
+    key = get_cache_key(cache_namespace, form_data["model"], form_data["messages"])
+    cached = await AI_GRADING_CACHE.get(request, key)
+    if cached is not None:
+        return cached
+    
+    # 速率限制的等待不计入单次调用超时
+    await GRADING_RATE_LIMITER.acquire()
+    res = await asyncio.wait_for(
+        generate_chat_completion(
+            request,
+            form_data=form_data,
+            user=user,
+        ),
+        timeout=AI_GRADING_TIMEOUT,
+    )
+    
+    if not res or "choices" not in res:
+        raise Exception("LLM返回格式错误")
+    
+    result = parse_llm_json(res["choices"][0]["message"]["content"])
+    await AI_GRADING_CACHE.set(request, key, cache_namespace, result)
+    return result
+
 async def call_llm_for_rubric_generation(
     request: Request,
     user: UserModel,
@@ -74,33 +159,9 @@ async def call_llm_for_rubric_generation(
     }
     
     try:
-        res = await generate_chat_completion(
-            request,
-            form_data=form_data,
-            user=user,
-        )
-        
-        if res and "choices" in res:
-            content = res["choices"][0]["message"]["content"]
-            
-            # 尝试解析JSON
-            # 移除可能的markdown代码块标记
-            content = content.strip()
-            if content.startswith("```json"):
-                content = content[7:]
-            if content.startswith("```"):
-                content = content[3:]
-            if content.endswith("```"):
-                content = content[:-3]
-            content = content.strip()
-            
-            result = json.loads(content)
-            return result
-        else:
-            raise Exception("LLM返回格式错误")
-            
+        return await call_llm_json(request, user, form_data, "rubric")
     except Exception as e:
-        print(f"LLM调用失败: {e}")
+        log.warning(f"LLM调用失败: {e}")
         # Fallback到规则匹配
         return fallback_rubric_generation(requirements)
 
@@ -174,36 +235,125 @@ async def call_llm_for_grading(
     }
     
     try:
-        res = await generate_chat_completion(
-            request,
-            form_data=form_data,
-            user=user,
-        )
-        
-        if res and "choices" in res:
-            content = res["choices"][0]["message"]["content"].strip()
-            
-            # 移除markdown标记
-            if content.startswith("```json"):
-                content = content[7:]
-            if content.startswith("```"):
-                content = content[3:]
-            if content.endswith("```"):
-                content = content[:-3]
-            content = content.strip()
-            
-            result = json.loads(content)
-            return result
-        else:
-            raise Exception("LLM返回格式错误")
-            
+        result = await call_llm_json(request, user, form_data, "grading")
     except Exception as e:
-        print(f"LLM评分失败: {e}")
-        # Fallback
-        return {
-            "score": 3.5,
-            "reason": f"根据{criterion_title}标准,该答案表现中等偏上。"
-        }
+        log.warning(f"LLM评分失败: {e}")
+        return fallback_grading(criterion_title)
+    return validate_grading_result(result, criterion_title, criterion_scale)
+
+def fallback_grading(criterion_title: str) -> dict:
+    """备用方案: LLM调用失败或超时时的默认评分,带 fallback 标记"""
+    return {
+        "score": 3.5,
+        "reason": f"根据{criterion_title}标准,该答案表现中等偏上。",
+        "fallback": True,
+    }
+
+def validate_grading_result(result, criterion_title: str, criterion_scale: list) -> dict:
+    """
+    校验LLM返回的单项评分: 分数必须是数字并截断到评分区间内,
+    格式不对时使用默认评分
+    """
+    if not isinstance(result, dict):
+        return fallback_grading(criterion_title)
+    
+    score = result.get("score")
+    if isinstance(score, str):
+        try:
+            score = float(score.strip())
+        except ValueError:
+            score = None
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or score != score:
+        log.warning(f"LLM评分格式错误: {criterion_title} score={result.get('score')!r}")
+        return fallback_grading(criterion_title)
+    
+    low, high = min(criterion_scale), max(criterion_scale)
+    return {
+        "score": min(max(score, low), high),
+        "reason": str(result.get("reason") or ""),
+    }
+
+async def call_llm_for_grading_all(
+    request: Request,
+    user: UserModel,
+    submission_text: str,
+    criteria: list
+) -> Dict[str, dict]:
+    """
+    一次LLM调用为所有评分标准打分,返回 {criterion_id: {"score", "reason"}}
+    缺失或调用失败的标准使用默认评分
+    """
+    
+    criteria_text = "\n".join(
+        f"- {c['id']}: {c['title']} (评分区间 {c.get('scale', [0, 5])[0]}-{c.get('scale', [0, 5])[-1]}分)"
+        for c in criteria
+    )
+    
+    system_prompt = f"""你是一个专业的作业评分助手。根据以下评分标准对学生答案逐项评分。
+
+评分标准:
+{criteria_text}
+
+请返回JSON格式: {{"scores": {{"标准id": {{"score": 分数, "reason": "简要理由"}}, ...}}}}"""
+
+    user_prompt = f"""学生答案:
+{submission_text}
+
+请根据以上所有评分标准逐项评分,返回JSON格式。"""
+
+    form_data = {
+        "model": "gpt-4o-mini",
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "stream": False,
+    }
+    
+    scores = {}
+    try:
+        result = await call_llm_json(request, user, form_data, "grading_all")
+        scores = result.get("scores", {})
+    except Exception as e:
+        log.warning(f"LLM评分失败: {e}")
+    if not isinstance(scores, dict):
+        scores = {}
+    
+    return {
+        criterion["id"]: validate_grading_result(
+            scores.get(criterion["id"]),
+            criterion["title"],
+            criterion.get("scale", [0, 1, 2, 3, 4, 5]),
+        )
+        for criterion in criteria
+    }
+
+async def grade_criteria_concurrently(
+    request: Request,
+    user: UserModel,
+    submission_text: str,
+    criteria: list,
+    max_concurrency: int = AI_GRADING_MAX_CONCURRENCY,
+) -> Dict[str, dict]:
+    """
+    并发地为每个评分标准打分,同时进行的LLM调用数不超过 max_concurrency,
+    单次调用超时(AI_GRADING_TIMEOUT)则使用默认评分
+    """
+    semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+    
+    async def grade(criterion: dict) -> dict:
+        async with semaphore:
+            return await call_llm_for_grading(
+                request,
+                user,
+                submission_text,
+                criterion["id"],
+                criterion["title"],
+                criterion.get("scale", [0, 1, 2, 3, 4, 5])
+            )
+    
+    results = await asyncio.gather(*[grade(c) for c in criteria])
+    return {c["id"]: r for c, r in zip(criteria, results)}
 
 @router.post("/generate-rubric", response_model=GenerateRubricResponse)
 async def generate_rubric(
@@ -227,14 +377,303 @@ async def generate_rubric(
     
     return GenerateRubricResponse(**result)
 
+async def grade_submission_with_rubric(
+    request: Request,
+    user: UserModel,
+    submission_text: str,
+    rubric: dict,
+    max_score: float,
+    mode: str = "per_criterion",
+) -> AIGradeResponse:
+    """按Rubric为一份作业评分,返回各项得分、评语草稿和折算总分"""
+    criteria = rubric.get("criteria", [])
+    
+    if mode == "single_call":
+        results = await call_llm_for_grading_all(
+            request, user, submission_text, criteria
+        )
+    else:
+        results = await grade_criteria_concurrently(
+            request, user, submission_text, criteria
+        )
+    
+    rubric_scores = {}
+    feedback_parts = []
+    fallback = any(results[c["id"]].get("fallback") for c in criteria)
+    for criterion in criteria:
+        result = results[criterion["id"]]
+        rubric_scores[criterion["id"]] = result["score"]
+        feedback_parts.append(f"【{criterion['title']}】{result['reason']}")
+    
+    feedback_draft = "\n".join(feedback_parts)
+    
+    weighted_sum = 0.0
+    total_weight = 0.0
+    for criterion in criteria:
+        criterion_id = criterion["id"]
+        weight = criterion.get("weight", 1.0 / len(criteria))
+        score = rubric_scores.get(criterion_id, 0)
+        weighted_sum += score * weight
+        total_weight += weight
+    
+    normalized_score = weighted_sum / total_weight if total_weight > 0 else 0
+    total_score = (normalized_score / 5.0) * max_score
+    
+    return AIGradeResponse(
+        rubric_scores=rubric_scores,
+        feedback_draft=feedback_draft,
+        total_score=round(total_score, 2),
+        confidence="fallback" if fallback else "medium",
+        fallback=fallback,
+    )
+
+############################
+# Bulk Grading Jobs
+############################
+
+# 请求参数上限,超出的值会被截断
+BULK_GRADE_MAX_WORKERS = 16
+BULK_GRADE_MAX_COMMIT_BATCH_SIZE = 200
+# 已结束的任务保留多久(秒)后从内存中清除
+BULK_GRADE_JOB_TTL = 60 * 60
+
+class BulkGradeRequest(BaseModel):
+    mode: Literal["per_criterion", "single_call"] = "single_call"
+    workers: int = AI_GRADING_BULK_WORKERS
+    commit_batch_size: int = 20
+
+class BulkGradeJob(BaseModel):
+    job_id: str
+    assignment_id: str
+    user_id: str
+    status: str  # queued, running, completed, failed
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    skipped: int = 0  # 任务期间已被教师评分,未写入AI结果
+    started_at: int
+    finished_at: Optional[int] = None
+
+# 运行中/最近的批量评分任务,按 job_id 索引
+BULK_GRADE_JOBS: Dict[str, BulkGradeJob] = {}
+BULK_GRADE_TASKS: Dict[str, asyncio.Task] = {}
+
+def prune_bulk_grade_jobs(now: Optional[int] = None):
+    """清除结束超过 BULK_GRADE_JOB_TTL 秒的任务"""
+    expire_before = (now or int(time.time())) - BULK_GRADE_JOB_TTL
+    for job_id, job in list(BULK_GRADE_JOBS.items()):
+        if job.finished_at is not None and job.finished_at < expire_before:
+            BULK_GRADE_JOBS.pop(job_id, None)
+
+async def emit_bulk_grade_event(job: BulkGradeJob, data: Optional[dict] = None):
+    """通过socket.io向发起任务的教师推送进度"""
+    session_ids = USER_POOL.get(job.user_id, [])
+    await asyncio.gather(
+        *[
+            sio.emit(
+                "ai-grading-events",
+                {"job": job.model_dump(), "data": data or {}},
+                to=session_id,
+            )
+            for session_id in session_ids
+        ]
+    )
+
+async def run_bulk_grade_job(
+    request: Request,
+    user: UserModel,
+    job: BulkGradeJob,
+    assignment,
+    submissions: list,
+    form_data: BulkGradeRequest,
+):
+    """
+    批量评分: 有界worker池消费队列,LLM调用受全局速率限制,
+    结果按 commit_batch_size 分批写回数据库
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for submission in submissions:
+        queue.put_nowait(submission)
+    
+    pending_grades: list = []
+    flush_lock = asyncio.Lock()
+    
+    async def flush():
+        async with flush_lock:
+            if not pending_grades:
+                return
+            grades = pending_grades[:]
+            pending_grades.clear()
+            written = await asyncio.to_thread(Submissions.update_ai_grades, grades)
+            # 评分期间被教师评分的提交不会写入
+            job.completed -= len(grades) - written
+            job.skipped += len(grades) - written
+    
+    async def worker():
+        while True:
+            try:
+                submission = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            
+            # 任务排队期间教师可能已经评分,跳过以免浪费LLM调用
+            current = await asyncio.to_thread(
+                Submissions.get_submission_by_id, submission.id
+            )
+            if not current or current.status != "submitted":
+                job.skipped += 1
+                await emit_bulk_grade_event(
+                    job, {"submission_id": submission.id, "skipped": True}
+                )
+                continue
+            
+            try:
+                result = await grade_submission_with_rubric(
+                    request,
+                    user,
+                    submission.content or "",
+                    assignment.rubric_json,
+                    assignment.max_score,
+                    mode=form_data.mode,
+                )
+                if result.fallback:
+                    # 默认评分不写回,提交保持 submitted 等待重试或人工评分
+                    log.warning(f"Bulk grading fell back to default scores for submission {submission.id}")
+                    job.failed += 1
+                    event = {"submission_id": submission.id, "error": "AI grading failed, default scores discarded"}
+                else:
+                    pending_grades.append(
+                        {
+                            "id": submission.id,
+                            "rubric_scores_json": result.rubric_scores,
+                            "ai_feedback_draft": result.feedback_draft,
+                            "ai_analysis": {
+                                "total_score": result.total_score,
+                                "confidence": result.confidence,
+                                "job_id": job.job_id,
+                            },
+                        }
+                    )
+                    job.completed += 1
+                    event = {"submission_id": submission.id, "total_score": result.total_score}
+            except Exception as e:
+                log.exception(f"Bulk grading failed for submission {submission.id}: {e}")
+                job.failed += 1
+                event = {"submission_id": submission.id, "error": str(e)}
+            
+            if len(pending_grades) >= form_data.commit_batch_size:
+                await flush()
+            await emit_bulk_grade_event(job, event)
+    
+    job.status = "running"
+    await emit_bulk_grade_event(job)
+    
+    try:
+        await asyncio.gather(
+            *[worker() for _ in range(max(1, min(form_data.workers, len(submissions))))]
+        )
+        await flush()
+        job.status = "completed"
+    except Exception as e:
+        log.exception(f"Bulk grading job {job.job_id} failed: {e}")
+        job.status = "failed"
+    finally:
+        job.finished_at = int(time.time())
+        BULK_GRADE_TASKS.pop(job.job_id, None)
+        await emit_bulk_grade_event(job)
+
+@router.post("/assignment/{assignment_id}/grade-all", response_model=BulkGradeJob)
+async def grade_all_submissions(
+    request: Request,
+    assignment_id: str,
+    form_data: Optional[BulkGradeRequest] = None,
+    user: UserModel = Depends(get_verified_user),
+):
+    """
+    为作业的所有未批改提交进行AI评分(后台任务)
+    进度通过socket.io的 ai-grading-events 事件推送
+    """
+    if user.role not in ["teacher", "admin", "leader"]:
+        raise HTTPException(status_code=403, detail="Only teachers/admins/leaders can grade submissions")
+    
+    form_data = form_data or BulkGradeRequest()
+    form_data = form_data.model_copy(
+        update={
+            "workers": min(max(form_data.workers, 1), BULK_GRADE_MAX_WORKERS),
+            "commit_batch_size": min(
+                max(form_data.commit_batch_size, 1), BULK_GRADE_MAX_COMMIT_BATCH_SIZE
+            ),
+        }
+    )
+    
+    assignment = Assignments.get_assignment_by_id(assignment_id)
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    
+    if user.role == "teacher" and assignment.teacher_id != user.id:
+        raise HTTPException(status_code=403, detail="Only the assignment owner can grade submissions")
+    
+    if not assignment.ai_assist:
+        raise HTTPException(status_code=400, detail="AI grading not enabled for this assignment")
+    
+    if not assignment.rubric_json:
+        raise HTTPException(status_code=400, detail="No rubric defined for this assignment")
+    
+    for job_id, task in BULK_GRADE_TASKS.items():
+        if BULK_GRADE_JOBS[job_id].assignment_id == assignment_id and not task.done():
+            raise HTTPException(status_code=409, detail="A grading job is already running for this assignment")
+    
+    submissions = Submissions.get_submissions_by_assignment_id_and_status(
+        assignment_id, ["submitted"]
+    )
+    
+    prune_bulk_grade_jobs()
+    job = BulkGradeJob(
+        job_id=str(uuid.uuid4()),
+        assignment_id=assignment_id,
+        user_id=user.id,
+        status="queued",
+        total=len(submissions),
+        started_at=int(time.time()),
+    )
+    BULK_GRADE_JOBS[job.job_id] = job
+    BULK_GRADE_TASKS[job.job_id] = asyncio.create_task(
+        run_bulk_grade_job(request, user, job, assignment, submissions, form_data)
+    )
+    
+    return job
+
+@router.get("/cache/stats")
+async def get_grading_cache_stats(
+    user: UserModel = Depends(get_verified_user),
+):
+    """AI评分结果缓存的命中/未命中统计"""
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view cache stats")
+    return AI_GRADING_CACHE.get_stats()
+
+@router.get("/jobs/{job_id}", response_model=BulkGradeJob)
+async def get_bulk_grade_job(
+    job_id: str,
+    user: UserModel = Depends(get_verified_user),
+):
+    job = BULK_GRADE_JOBS.get(job_id)
+    if not job or (job.user_id != user.id and user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @router.post("/{submission_id}/ai-grade", response_model=AIGradeResponse)
 async def ai_grade_submission(
     request: Request,
     submission_id: str,
+    mode: Literal["per_criterion", "single_call"] = "per_criterion",
     user: UserModel = Depends(get_verified_user),
 ):
     """
     为提交的作业进行AI辅助评分 - 使用gpt-4o-mini
+    
+    - per_criterion: 每个评分标准单独调用LLM,并发执行
+    - single_call: 一次调用返回所有标准的评分
     """
     if user.role not in ["teacher", "admin", "leader"]:
         raise HTTPException(status_code=403, detail="Only teachers/admins/leaders can grade submissions")
@@ -243,6 +682,10 @@ async def ai_grade_submission(
     if not submission:
         raise HTTPException(status_code=404, detail="Submission not found")
     
+    # 已评分提交的 rubric_scores_json 是教师评分(已计入技能掌握度),不能被AI草稿覆盖
+    if submission.status in GRADED_STATUSES:
+        raise HTTPException(status_code=400, detail="Submission has already been graded")
+    
     assignment = Assignments.get_assignment_by_id(submission.assignment_id)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
@@ -253,49 +696,26 @@ async def ai_grade_submission(
     if not assignment.rubric_json:
         raise HTTPException(status_code=400, detail="No rubric defined for this assignment")
     
-    rubric = assignment.rubric_json
-    rubric_scores = {}
-    feedback_parts = []
-    
-    for criterion in rubric.get("criteria", []):
-        criterion_id = criterion["id"]
-        criterion_title = criterion["title"]
-        criterion_scale = criterion.get("scale", [0, 1, 2, 3, 4, 5])
-        
-        result = await call_llm_for_grading(
-            request,
-            user,
-            submission.answer,
-            criterion_id,
-            criterion_title,
-            criterion_scale
-        )
-        
-        rubric_scores[criterion_id] = result["score"]
-        feedback_parts.append(f"【{criterion_title}】{result['reason']}")
-    
-    feedback_draft = "\n".join(feedback_parts)
-    
-    weighted_sum = 0.0
-    total_weight = 0.0
-    for criterion in rubric.get("criteria", []):
-        criterion_id = criterion["id"]
-        weight = criterion.get("weight", 1.0 / len(rubric["criteria"]))
-        score = rubric_scores.get(criterion_id, 0)
-        weighted_sum += score * weight
-        total_weight += weight
+    result = await grade_submission_with_rubric(
+        request,
+        user,
+        submission.content or "",
+        assignment.rubric_json,
+        assignment.max_score,
+        mode=mode,
+    )
     
-    normalized_score = weighted_sum / total_weight if total_weight > 0 else 0
-    total_score = (normalized_score / 5.0) * assignment.max_score
+    # LLM调用期间教师可能已经评分
+    current = Submissions.get_submission_by_id(submission_id)
+    if not current or current.status in GRADED_STATUSES:
+        raise HTTPException(status_code=409, detail="Submission was graded while AI grading was running")
     
     Submissions.update_submission_by_id(
         submission_id,
-        {"ai_feedback_draft": feedback_draft, "rubric_scores_json": json.dumps(rubric_scores)}
+        SubmissionUpdateForm(
+            ai_feedback_draft=result.feedback_draft,
+            rubric_scores_json=result.rubric_scores,
+        )
     )
     
-    return AIGradeResponse(
-        rubric_scores=rubric_scores,
-        feedback_draft=feedback_draft,
-        total_score=round(total_score, 2),
-        confidence="medium"
-    )
+    return result
@@ -9,6 +9,7 @@ from open_webui.models.chats import (
     ChatImportForm,
     ChatResponse,
     Chats,
+    ChatSearchResponse,
     ChatTitleIdResponse,
 )
 from open_webui.models.tags import TagModel, Tags
@@ -22,6 +23,7 @@ from pydantic import BaseModel
 
 
 from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.chat_save import CHAT_SAVE_STATS
 from open_webui.utils.access_control import has_permission
 
 log = logging.getLogger(__name__)
@@ -169,7 +171,7 @@ async def import_chat(form_data: ChatImportForm, user=Depends(get_verified_user)
 ############################
 
 
-@router.get("/search", response_model=list[ChatTitleIdResponse])
+@router.get("/search", response_model=list[ChatSearchResponse])
 def search_user_chats(
     text: str, page: Optional[int] = None, user=Depends(get_verified_user)
 ):
@@ -179,12 +181,9 @@ def search_user_chats(
     limit = 60
     skip = (page - 1) * limit
 
-    chat_list = [
-        ChatTitleIdResponse(**chat.model_dump())
-        for chat in Chats.get_chats_by_user_id_and_search_text(
-            user.id, text, skip=skip, limit=limit
-        )
-    ]
+    chat_list = Chats.get_chats_by_user_id_and_search_text(
+        user.id, text, skip=skip, limit=limit
+    )
 
     # Delete tag if no chat is found
     words = text.strip().split(" ")
@@ -311,6 +310,16 @@ async def get_all_user_chats_in_db(user=Depends(get_admin_user)):
     return [ChatResponse(**chat.model_dump()) for chat in Chats.get_chats()]
 
 
+############################
+# GetRealtimeSaveStats
+############################
+
+
+@router.get("/realtime-save/stats")
+async def get_realtime_save_stats(user=Depends(get_admin_user)):
+    return CHAT_SAVE_STATS.get_stats()
+
+
 ############################
 # GetArchivedChats
 ############################
@@ -488,7 +497,7 @@ async def update_chat_message_by_id(
             detail=ERROR_MESSAGES.ACCESS_PROHIBITED,
         )
 
-    chat = Chats.upsert_message_to_chat_by_id_and_message_id(
+    Chats.upsert_message_to_chat_by_id_and_message_id(
         id,
         message_id,
         {
@@ -517,6 +526,7 @@ async def update_chat_message_by_id(
             }
         )
 
+    chat = Chats.get_chat_by_id(id)
     return ChatResponse(**chat.model_dump())
 
 
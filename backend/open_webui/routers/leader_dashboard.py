@@ -1,15 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
-from open_webui.models.users import Users, UserModel
-from open_webui.models.submissions import Submissions
-from open_webui.models.assignments import Assignments
-from open_webui.utils.auth import get_verified_user
+from open_webui.models.users import UserModel
+from open_webui.models.school_stats import SchoolStats
+from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.ttl_cache import TTLCache
+from open_webui.env import LEADER_DASHBOARD_CACHE_TTL
 from datetime import datetime, timedelta
+import asyncio
 import time
 
 router = APIRouter()
 
+# 看板数据允许几十秒的延迟，短 TTL 缓存避免反复刷新打到数据库
+LEADER_DASHBOARD_CACHE = TTLCache("leader_dashboard", LEADER_DASHBOARD_CACHE_TTL)
+
 ############################
 # Request/Response Models  
 ############################
@@ -26,6 +31,7 @@ class TeacherPerformance(BaseModel):
     teacher_name: str
     student_count: int
     assignment_count: int
+    submission_count: int = 0
     avg_student_score: float
 
 ############################
@@ -34,6 +40,7 @@ class TeacherPerformance(BaseModel):
 
 @router.get("/statistics", response_model=SchoolStatistics)
 async def get_school_statistics(
+    request: Request,
     user: UserModel = Depends(get_verified_user)
 ):
     """获取全校统计数据 - Leader 专用"""
@@ -43,29 +50,29 @@ async def get_school_statistics(
             detail="Only leaders and admins can access school statistics"
         )
     
-    # 获取统计数据
-    all_users = Users.get_users()
-    students = [u for u in all_users.get("users", []) if u.role == "student"]
-    teachers = [u for u in all_users.get("users", []) if u.role == "teacher"]
-    
-    all_assignments = Assignments.get_assignments()
-    all_submissions = Submissions.get_submissions()
-    
-    # 计算完成率
-    total_possible = len(students) * len(all_assignments) if students and all_assignments else 1
-    completion_rate = (len(all_submissions) / total_possible * 100) if total_possible > 0 else 0
-    
-    return SchoolStatistics(
-        total_students=len(students),
-        total_teachers=len(teachers),
-        total_assignments=len(all_assignments),
-        total_submissions=len(all_submissions),
-        average_completion_rate=round(completion_rate, 2)
-    )
+    def load():
+        counts = SchoolStats.get_counts()
+
+        # 计算完成率
+        total_possible = counts.total_students * counts.total_assignments
+        completion_rate = (counts.total_submissions / total_possible * 100) if total_possible > 0 else 0
+
+        return SchoolStatistics(
+            total_students=counts.total_students,
+            total_teachers=counts.total_teachers,
+            total_assignments=counts.total_assignments,
+            total_submissions=counts.total_submissions,
+            average_completion_rate=round(completion_rate, 2)
+        ).model_dump()
+
+    return await LEADER_DASHBOARD_CACHE.get_or_set(request, "statistics", load)
 
 
 @router.get("/teachers/performance", response_model=List[TeacherPerformance])
 async def get_teachers_performance(
+    request: Request,
+    skip: Optional[int] = None,
+    limit: Optional[int] = None,
     user: UserModel = Depends(get_verified_user)
 ):
     """获取教师绩效数据 - Leader 专用"""
@@ -75,35 +82,21 @@ async def get_teachers_performance(
             detail="Only leaders and admins can access teacher performance data"
         )
     
-    all_users = Users.get_users()
-    teachers = [u for u in all_users.get("users", []) if u.role == "teacher"]
-    students = [u for u in all_users.get("users", []) if u.role == "student"]
-    
-    performance_data = []
-    
-    for teacher in teachers:
-        # 获取该教师的作业
-        teacher_assignments = [a for a in Assignments.get_assignments() if a.teacher_id == teacher.id]
-        
-        # 获取学生平均分
-        teacher_submissions = [s for s in Submissions.get_submissions() 
-                              if any(a.id == s.assignment_id for a in teacher_assignments)]
-        
-        avg_score = sum([s.score for s in teacher_submissions if s.score]) / len(teacher_submissions) if teacher_submissions else 0
-        
-        performance_data.append(TeacherPerformance(
-            teacher_id=teacher.id,
-            teacher_name=teacher.name,
-            student_count=len(students),
-            assignment_count=len(teacher_assignments),
-            avg_student_score=round(avg_score, 2)
-        ))
-    
-    return performance_data
+    return await LEADER_DASHBOARD_CACHE.get_or_set(
+        request,
+        f"teachers:{skip}:{limit}",
+        lambda: [
+            TeacherPerformance(**stats.model_dump()).model_dump()
+            for stats in SchoolStats.get_teacher_stats(skip=skip, limit=limit)
+        ],
+    )
 
 
 @router.get("/students/overview")
 async def get_students_overview(
+    request: Request,
+    skip: Optional[int] = None,
+    limit: Optional[int] = None,
     user: UserModel = Depends(get_verified_user)
 ):
     """获取学生总览 - Leader 专用"""
@@ -113,25 +106,24 @@ async def get_students_overview(
             detail="Only leaders and admins can access student overview"
         )
     
-    all_users = Users.get_users()
-    students = [u for u in all_users.get("users", []) if u.role == "student"]
-    
-    return {
-        "students": [
-            {
-                "id": s.id,
-                "name": s.name,
-                "email": s.email,
-                "submissions_count": len([sub for sub in Submissions.get_submissions() if sub.student_id == s.id])
-            }
-            for s in students
-        ],
-        "total": len(students)
-    }
+    return await LEADER_DASHBOARD_CACHE.get_or_set(
+        request,
+        f"students:{skip}:{limit}",
+        lambda: {
+            "students": [
+                stats.model_dump()
+                for stats in SchoolStats.get_student_stats(skip=skip, limit=limit)
+            ],
+            "total": SchoolStats.count_users_by_role("student"),
+        },
+    )
 
 
 @router.get("/assignments/overview")  
 async def get_assignments_overview(
+    request: Request,
+    skip: Optional[int] = None,
+    limit: Optional[int] = None,
     user: UserModel = Depends(get_verified_user)
 ):
     """获取作业总览 - Leader 专用"""
@@ -141,19 +133,25 @@ async def get_assignments_overview(
             detail="Only leaders and admins can access assignments overview"
         )
     
-    all_assignments = Assignments.get_assignments()
-    all_submissions = Submissions.get_submissions()
-    
-    return {
-        "assignments": [
-            {
-                "id": a.id,
-                "title": a.title,
-                "teacher_id": a.teacher_id,
-                "due_date": a.due_date,
-                "submissions_count": len([s for s in all_submissions if s.assignment_id == a.id])
-            }
-            for a in all_assignments
-        ],
-        "total": len(all_assignments)
-    }
+    return await LEADER_DASHBOARD_CACHE.get_or_set(
+        request,
+        f"assignments:{skip}:{limit}",
+        lambda: {
+            "assignments": [
+                stats.model_dump()
+                for stats in SchoolStats.get_assignment_stats(skip=skip, limit=limit)
+            ],
+            "total": SchoolStats.count_assignments(),
+        },
+    )
+
+
+@router.post("/statistics/rebuild")
+async def rebuild_school_statistics(
+    request: Request,
+    user: UserModel = Depends(get_admin_user)
+):
+    """从提交明细全量重建物化统计并清空看板缓存 - Admin 专用"""
+    rows = await asyncio.to_thread(SchoolStats.rebuild_submission_stats)
+    await LEADER_DASHBOARD_CACHE.invalidate(request)
+    return {"rows": rows}
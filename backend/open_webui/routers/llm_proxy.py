@@ -3,16 +3,31 @@ LLM Proxy Router
 统一代理所有LLM请求，记录sessions和turns用于画像分析
 """
 
+import asyncio
 import logging
 import json
+import time
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from open_webui.models.sessions import Sessions, SessionForm
+from open_webui.models.sessions import Sessions, SessionForm, SessionModel
 from open_webui.models.turns import Turns, TurnForm
+from open_webui.models.turn_archives import TurnArchives
+from open_webui.models.usage_logs import UsageLogForm
 from open_webui.models.users import Users
-from open_webui.utils.auth import get_verified_user
+from open_webui.utils.auth import get_admin_user, get_verified_user
+from open_webui.utils.chat import generate_chat_completion
+from open_webui.utils.models import get_all_models
+from open_webui.utils.token_usage import (
+    backfill_token_usage,
+    compute_cost_usd,
+    count_tokens_batch,
+    usd_to_turn_cost,
+)
+from open_webui.utils.turn_archive import archive_turns
+from open_webui.utils.write_behind import LLM_PROXY_RECORDER
 
 log = logging.getLogger(__name__)
 
@@ -28,6 +43,7 @@ class ProxyMessageRequest(BaseModel):
     assignment_id: Optional[str] = None
     mode: str = "chat"  # chat, homework, deep_think
     model: Optional[str] = None
+    stream: bool = False  # 以 SSE 转发上游的流式输出
     meta: dict = {}
 
 class ProxyMessageResponse(BaseModel):
@@ -37,6 +53,246 @@ class ProxyMessageResponse(BaseModel):
     model: str
     meta: dict = {}
 
+####################
+# Token 统计
+####################
+
+class StreamAccumulator:
+    """
+    从上游的 OpenAI 格式 SSE 流中增量提取回复内容和 usage
+
+    原始 chunk 由调用方原样转发，这里只解析其中的 data 行；
+    不以换行结尾的残片留到下一个 chunk 拼接
+    """
+
+    def __init__(self):
+        self.parts: list[str] = []
+        self.usage: Optional[dict] = None
+        self.finish_reason: Optional[str] = None
+        self.error: Optional[str] = None
+        self.done = False
+        self._pending = ""
+
+    @property
+    def content(self) -> str:
+        return "".join(self.parts)
+
+    def feed(self, chunk) -> None:
+        text = chunk.decode("utf-8", "ignore") if isinstance(chunk, bytes) else chunk
+        if self._pending:
+            text = self._pending + text
+            self._pending = ""
+
+        lines = text.split("\n")
+        if not text.endswith("\n"):
+            self._pending = lines.pop()
+
+        for line in lines:
+            self._feed_line(line.strip())
+
+    def close(self) -> None:
+        if self._pending:
+            self._feed_line(self._pending.strip())
+            self._pending = ""
+
+    def _feed_line(self, line: str) -> None:
+        if not line.startswith("data:"):
+            return
+        data = line[len("data:") :].strip()
+        if data == "[DONE]":
+            self.done = True
+            return
+
+        try:
+            payload = json.loads(data)
+        except json.JSONDecodeError:
+            return
+
+        if payload.get("error"):
+            error = payload["error"]
+            self.error = error.get("message") if isinstance(error, dict) else str(error)
+        if payload.get("usage"):
+            self.usage = payload["usage"]
+
+        for choice in payload.get("choices") or []:
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                self.parts.append(content)
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+
+
+def get_token_usage(
+    usage: Optional[dict], model: str, prompt: str, completion: str
+):
+    """优先使用上游 usage 帧，没有时用该模型的 tokenizer 计数"""
+    if usage and usage.get("prompt_tokens") is not None:
+        return (
+            int(usage.get("prompt_tokens") or 0),
+            int(usage.get("completion_tokens") or 0),
+            "provider",
+        )
+    tokens_in, tokens_out = count_tokens_batch([prompt, completion], model)
+    return tokens_in, tokens_out, "tokenizer"
+
+
+####################
+# 记录辅助
+####################
+
+
+def get_or_create_session(request: ProxyMessageRequest, user) -> SessionModel:
+    session_id = request.meta.get("session_id")
+
+    if not session_id:
+        # 创建新session
+        session_form = SessionForm(
+            user_id=user.id,
+            assignment_id=request.assignment_id,
+            mode=request.mode,
+            policy_snapshot={
+                "model": request.model or "gpt-5",
+                "mode": request.mode,
+            },
+            meta={
+                "chat_id": request.chat_id,
+                **request.meta
+            }
+        )
+        session = LLM_PROXY_RECORDER.record_session(user.id, session_form)
+        log.info(f"Created new session: {session.id} for user {user.id}")
+        return session
+
+    session = Sessions.get_session_by_id(session_id)
+    if not session or session.user_id != user.id:
+        raise HTTPException(status_code=403, detail="Unauthorized session access")
+    return session
+
+
+def record_assistant_turn(
+    request: ProxyMessageRequest,
+    user,
+    session: SessionModel,
+    model_name: str,
+    content: str,
+    usage: Optional[dict] = None,
+    meta: Optional[dict] = None,
+):
+    tokens_in, tokens_out, usage_source = get_token_usage(
+        usage, model_name, request.message, content
+    )
+    cost_usd = compute_cost_usd(model_name, tokens_in, tokens_out)
+
+    assistant_turn = LLM_PROXY_RECORDER.record_turn(
+        TurnForm(
+            session_id=session.id,
+            user_id=session.user_id,
+            assignment_id=session.assignment_id,
+            mode=session.mode,
+            role="assistant",
+            content=content,
+            model=model_name,
+            tokens_in=tokens_in,
+            tokens_out=tokens_out,
+            cost=usd_to_turn_cost(cost_usd),
+            meta={
+                "max_tokens": get_max_tokens(request.mode),
+                "mode": request.mode,
+                "usage_source": usage_source,
+                **(meta or {}),
+            }
+        )
+    )
+    log.info(f"Recorded assistant turn: {assistant_turn.id}")
+
+    LLM_PROXY_RECORDER.record_usage(
+        UsageLogForm(
+            user_id=user.id,
+            model=model_name,
+            mode=request.mode,
+            tokens_in=tokens_in,
+            tokens_out=tokens_out,
+            cost_usd=cost_usd,
+            session_id=session.id,
+            turn_id=assistant_turn.id,
+        )
+    )
+    return assistant_turn
+
+
+def get_max_tokens(mode: str) -> int:
+    return 8000 if mode == "deep_think" else 2000
+
+
+def get_completion_form(request: ProxyMessageRequest, stream: bool) -> dict:
+    form_data = {
+        "model": request.model,
+        "messages": [{"role": "user", "content": request.message}],
+        "max_tokens": get_max_tokens(request.mode),
+        "stream": stream,
+    }
+    if stream:
+        # 让上游在最后一个 chunk 里带上 usage
+        form_data["stream_options"] = {"include_usage": True}
+    return form_data
+
+
+def stream_and_record(
+    response: StreamingResponse,
+    request: ProxyMessageRequest,
+    user,
+    session: SessionModel,
+    user_turn_id: str,
+) -> StreamingResponse:
+    """
+    原样转发上游 SSE chunk（不重新序列化、不缓冲整段回复），
+    同时累积回复内容和 usage；流结束或客户端断开时记录一次 assistant turn
+    """
+    accumulator = StreamAccumulator()
+    started_at = time.monotonic()
+
+    async def body_iterator():
+        first_chunk_ms = None
+        try:
+            async for chunk in response.body_iterator:
+                if first_chunk_ms is None:
+                    first_chunk_ms = round((time.monotonic() - started_at) * 1000, 2)
+                # 先解析再转发：客户端在此 yield 处断开时这一块也已计入
+                accumulator.feed(chunk)
+                yield chunk
+        finally:
+            accumulator.close()
+            try:
+                record_assistant_turn(
+                    request,
+                    user,
+                    session,
+                    request.model,
+                    accumulator.content,
+                    usage=accumulator.usage,
+                    meta={
+                        "stream": True,
+                        "user_turn_id": user_turn_id,
+                        "finish_reason": accumulator.finish_reason,
+                        "completed": accumulator.done,
+                        "first_chunk_ms": first_chunk_ms,
+                        **({"error": accumulator.error} if accumulator.error else {}),
+                    },
+                )
+            except Exception as e:
+                log.error(f"Failed to record streamed turn for {session.id}: {e}")
+
+    return StreamingResponse(
+        body_iterator(),
+        media_type="text/event-stream",
+        headers={
+            "X-Session-Id": session.id,
+            "X-User-Turn-Id": user_turn_id,
+        },
+        background=response.background,
+    )
+
+
 ####################
 # 核心路由
 ####################
@@ -44,6 +300,7 @@ class ProxyMessageResponse(BaseModel):
 @router.post("/proxy", response_model=ProxyMessageResponse)
 async def llm_proxy(
     request: ProxyMessageRequest,
+    http_request: Request,
     user=Depends(get_verified_user),
 ):
     """
@@ -51,74 +308,74 @@ async def llm_proxy(
     - 接收消息和元数据
     - 创建/获取session
     - 记录user turn
-    - 调用实际LLM（这里先mock）
+    - 调用实际LLM（未指定 model 时返回 mock 响应）
     - 记录assistant turn
-    - 返回响应
+    - 返回响应；stream=true 时以 SSE 原样转发上游输出
+
+    turn / usage 记录交给 LLM_PROXY_RECORDER 异步批量落库，
+    不在请求路径上逐条提交；新建的 session 同步写入
     """
     
     try:
+        # 0. 先校验模型，无效请求不创建 session / turn
+        if request.stream and not request.model:
+            raise HTTPException(status_code=400, detail="model is required for streaming")
+        if request.model:
+            if not http_request.app.state.MODELS:
+                await get_all_models(http_request, user=user)
+            if request.model not in http_request.app.state.MODELS:
+                raise HTTPException(status_code=404, detail="Model not found")
+
         # 1. 获取或创建session
-        session_id = request.meta.get("session_id")
-        
-        if not session_id:
-            # 创建新session
-            session_form = SessionForm(
-                user_id=user.id,
-                assignment_id=request.assignment_id,
-                mode=request.mode,
-                policy_snapshot={
-                    "model": request.model or "gpt-5",
-                    "mode": request.mode,
-                },
-                meta={
-                    "chat_id": request.chat_id,
-                    **request.meta
-                }
-            )
-            session = Sessions.insert_new_session(user.id, session_form)
-            session_id = session.id
-            log.info(f"Created new session: {session_id} for user {user.id}")
-        else:
-            session = Sessions.get_session_by_id(session_id)
-            if not session or session.user_id != user.id:
-                raise HTTPException(status_code=403, detail="Unauthorized session access")
+        session = get_or_create_session(request, user)
+        session_id = session.id
         
         # 2. 记录用户消息 turn
         user_turn_form = TurnForm(
             session_id=session_id,
+            user_id=session.user_id,
+            assignment_id=session.assignment_id,
+            mode=session.mode,
             role="user",
             content=request.message,
             meta=request.meta
         )
-        user_turn = Turns.insert_new_turn(user_turn_form)
+        user_turn = LLM_PROXY_RECORDER.record_turn(user_turn_form)
         log.info(f"Recorded user turn: {user_turn.id}")
-        
-        # 3. TODO: 调用实际LLM（这里先mock一个简单响应）
-        # 根据mode选择不同的参数
-        model_name = request.model or "gpt-5"
-        max_tokens = 8000 if request.mode == "deep_think" else 2000
-        
-        # Mock 响应 - 实际应该调用 OpenAI API
-        assistant_response = f"[Mock响应] 我理解了你的问题: {request.message[:50]}..."
-        if request.assignment_id:
-            assistant_response += f" (作业ID: {request.assignment_id})"
+
+        # 3. 调用 LLM
+        usage = None
+        if request.model:
+            res = await generate_chat_completion(
+                http_request,
+                form_data=get_completion_form(request, request.stream),
+                user=user,
+            )
+
+            if request.stream and isinstance(res, StreamingResponse):
+                return stream_and_record(res, request, user, session, user_turn.id)
+
+            if not isinstance(res, dict) or "choices" not in res:
+                raise Exception("LLM返回格式错误")
+            assistant_response = res["choices"][0]["message"]["content"] or ""
+            usage = res.get("usage")
+            model_name = request.model
+        else:
+            # Mock 响应（未指定模型时）
+            model_name = "gpt-5"
+            assistant_response = f"[Mock响应] 我理解了你的问题: {request.message[:50]}..."
+            if request.assignment_id:
+                assistant_response += f" (作业ID: {request.assignment_id})"
         
         # 4. 记录助手响应 turn
-        assistant_turn_form = TurnForm(
-            session_id=session_id,
-            role="assistant",
-            content=assistant_response,
-            model=model_name,
-            tokens_in=len(request.message),  # 简化计算
-            tokens_out=len(assistant_response),
-            cost=0,  # TODO: 实际计算成本
-            meta={
-                "max_tokens": max_tokens,
-                "mode": request.mode,
-            }
+        assistant_turn = record_assistant_turn(
+            request,
+            user,
+            session,
+            model_name,
+            assistant_response,
+            usage=usage,
         )
-        assistant_turn = Turns.insert_new_turn(assistant_turn_form)
-        log.info(f"Recorded assistant turn: {assistant_turn.id}")
         
         # 5. 返回响应
         return ProxyMessageResponse(
@@ -133,6 +390,8 @@ async def llm_proxy(
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         log.error(f"Error in llm_proxy: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -164,7 +423,55 @@ async def get_session_turns(
         raise HTTPException(status_code=403, detail="Unauthorized")
     
     turns = Turns.get_turns_by_session_id(session_id)
+    # 合并本进程中尚未落库的 turns（write-behind 缓冲）
+    turn_ids = {turn.id for turn in turns}
+    pending = [
+        turn
+        for turn in LLM_PROXY_RECORDER.get_pending_turns(session_id)
+        if turn.id not in turn_ids
+    ]
+    if pending:
+        turns = sorted(turns + pending, key=lambda turn: turn.created_at)
     return {
         "session": session,
         "turns": turns
     }
+
+
+@router.get("/recorder/stats")
+async def get_recorder_stats(user=Depends(get_admin_user)):
+    """write-behind 记录器的缓冲和落库统计"""
+    return LLM_PROXY_RECORDER.get_stats()
+
+
+@router.post("/usage/backfill")
+async def backfill_usage(
+    batch_size: int = 500,
+    recount: bool = False,
+    user=Depends(get_admin_user),
+):
+    """按价格表和 tokenizer 分批重算历史 turn / usage_log 的 tokens 与成本 - Admin 专用"""
+    await LLM_PROXY_RECORDER.flush()
+    return await asyncio.to_thread(
+        backfill_token_usage, batch_size=max(batch_size, 1), recount=recount
+    )
+
+
+@router.get("/turns/archives")
+async def get_turn_archives(user=Depends(get_admin_user)):
+    """已归档（移出 turn 热表）的月份 - Admin 专用"""
+    return {"archives": TurnArchives.get_archives()}
+
+
+@router.post("/turns/archive")
+async def run_turn_archive(
+    horizon_days: Optional[int] = None,
+    user=Depends(get_admin_user),
+):
+    """
+    把早于 horizon_days（默认 TURN_ARCHIVE_HORIZON_DAYS）的整月 turns 归档到存储 - Admin 专用
+    实际部署时应由定时任务（cron）每天调用
+    """
+    kwargs = {"horizon_days": horizon_days} if horizon_days is not None else {}
+    archives = await asyncio.to_thread(archive_turns, **kwargs)
+    return {"archives": archives}
@@ -3,19 +3,35 @@ Nightly Analysis Router
 夜间画像分析任务
 """
 
+import asyncio
 import logging
 import json
 import time
 from datetime import datetime, timedelta
-from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Callable, Optional, List, Iterable
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 
-from open_webui.models.turns import Turns
 from open_webui.models.sessions import Sessions
 from open_webui.models.longterm_memory import LongtermMemories, LongtermMemoryForm
+from open_webui.models.nightly_checkpoints import (
+    NightlyCheckpoints,
+    NightlyProfileResult,
+)
+from open_webui.models.skill_mastery import (
+    SkillMasteries,
+    SkillMasteryModel,
+    get_profile_observations,
+)
 from open_webui.models.users import Users
 from open_webui.utils.auth import get_verified_user, get_admin_user
+from open_webui.utils.longterm_memory import (
+    LongtermMemorySearchResult,
+    index_memories,
+    reindex_user_memories,
+    search_longterm_memories,
+)
+from open_webui.utils import turn_archive
 
 log = logging.getLogger(__name__)
 
@@ -40,21 +56,60 @@ class ProfileAnalysisResult(BaseModel):
     recommendations: List[str]
     profile_memory_id: Optional[str] = None
 
+class NightlyBatchRequest(BaseModel):
+    date: Optional[str] = None  # YYYY-MM-DD format, 默认为昨天
+    concurrency: int = 8  # 同时分析的用户数
+    commit_batch_size: int = 50  # 每批写入的画像数
+    background: bool = False  # 为 True 时后台运行，立即返回
+
+class NightlyBatchResult(BaseModel):
+    date: str
+    status: str  # started, running, completed, failed
+    error: Optional[str] = None
+    total_users: int = 0
+    processed_users: int = 0
+    skipped_users: int = 0  # 检查点中已完成、本次跳过
+    failed_users: int = 0
+    total_turns: int = 0
+    elapsed_seconds: float = 0.0
+    users_per_second: float = 0.0
+    turns_per_second: float = 0.0
+
+class MemorySearchRequest(BaseModel):
+    query: Optional[str] = None  # 为空时只按标签过滤
+    tags: List[str] = []
+    namespace: Optional[str] = None
+    k: int = 5
+
 ####################
 # 核心函数
 ####################
 
-def analyze_student_profile(user_id: str, turns: List[dict]) -> dict:
+# 夜间分析只需要这些列，避免读取 tool_calls / meta 等大字段
+ANALYSIS_TURN_COLUMNS = ["id", "role", "content", "created_at"]
+
+
+def analyze_student_profile(user_id: str, turn_batches: Iterable[List[dict]]) -> dict:
     """
     分析学生画像
+
+    turn_batches 为按时间排序的 turns 分批迭代器，逐批消费，不会把
+    整天的对话一次性加载到内存。
     
     TODO: 实际应调用 GPT-5 进行分析
     这里先返回一个mock结果
     """
     
-    # 统计信息
-    total_messages = len([t for t in turns if t['role'] == 'user'])
-    total_content = '\n'.join([t['content'] for t in turns])
+    # 统计信息（增量累计）
+    total_turns = 0
+    total_messages = 0
+    first_turn = None
+    
+    for batch in turn_batches:
+        if first_turn is None and batch:
+            first_turn = batch[0]
+        total_turns += len(batch)
+        total_messages += sum(1 for t in batch if t['role'] == 'user')
     
     # Mock 画像结果
     profile = {
@@ -63,10 +118,10 @@ def analyze_student_profile(user_id: str, turns: List[dict]) -> dict:
         "strong_skills": ["基础概念理解", "积极提问"],
         "evidence": [
             {
-                "turn_id": turns[0]['id'] if turns else None,
+                "turn_id": first_turn['id'] if first_turn else None,
                 "skill": "数学推理",
                 "evidence_text": "在解题时出现逻辑推理错误...",
-                "timestamp": turns[0]['created_at'] if turns else None
+                "timestamp": first_turn['created_at'] if first_turn else None
             }
         ],
         "recommendations": [
@@ -75,7 +130,7 @@ def analyze_student_profile(user_id: str, turns: List[dict]) -> dict:
             "多做类似题型巩固"
         ],
         "metadata": {
-            "total_turns": len(turns),
+            "total_turns": total_turns,
             "total_messages": total_messages,
             "analysis_timestamp": int(time.time()),
             "model": "gpt-5",  # 未来实际使用的模型
@@ -84,12 +139,216 @@ def analyze_student_profile(user_id: str, turns: List[dict]) -> dict:
     
     return profile
 
+def get_analysis_window(date: Optional[str] = None) -> tuple[datetime, int, int]:
+    """分析日期及其时间范围 [当天 00:00, 次日 00:00)，默认为昨天"""
+    if date:
+        target_date = datetime.strptime(date, "%Y-%m-%d")
+    else:
+        target_date = datetime.now() - timedelta(days=1)
+
+    day_start = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    start_time = int(day_start.timestamp())
+    end_time = int((day_start + timedelta(days=1)).timestamp())
+    return target_date, start_time, end_time
+
+
+def build_profile_memory_form(
+    user_id: str, date: str, profile: dict, total_turns: int
+) -> LongtermMemoryForm:
+    return LongtermMemoryForm(
+        user_id=user_id,
+        namespace=f"profiles:{user_id}",
+        tags=["daily_profile", date] + profile['weak_skills'],
+        text=json.dumps(profile, ensure_ascii=False),
+        metadata_json={
+            "date": date,
+            "total_turns": total_turns,
+            "analysis_version": "v1.0",
+        }
+    )
+
+####################
+# 批量任务
+####################
+
+# 正在运行/最近完成的批量任务，按日期索引
+BATCH_RUNS: dict[str, NightlyBatchResult] = {}
+BATCH_TASKS: dict[str, asyncio.Task] = {}
+
+
+def analyze_user_for_window(
+    user_id: str, date: str, start_time: int, end_time: int
+) -> NightlyProfileResult:
+    """分析单个用户（同步，在线程中执行）"""
+    try:
+        turn_batches = turn_archive.iter_turns_by_user_and_date(
+            user_id, start_time, end_time, columns=ANALYSIS_TURN_COLUMNS
+        )
+        profile = analyze_student_profile(user_id, turn_batches)
+        total_turns = profile['metadata']['total_turns']
+
+        return NightlyProfileResult(
+            user_id=user_id,
+            total_turns=total_turns,
+            memory_form=(
+                build_profile_memory_form(user_id, date, profile, total_turns)
+                if total_turns
+                else None
+            ),
+            skill_observations=(
+                get_profile_observations(profile, int(time.time()))
+                if total_turns
+                else []
+            ),
+        )
+    except Exception as e:
+        log.exception(f"Nightly analysis failed for user {user_id}: {e}")
+        return NightlyProfileResult(user_id=user_id, total_turns=0, error=str(e))
+
+
+async def run_nightly_batch(
+    date: Optional[str] = None,
+    concurrency: int = 8,
+    commit_batch_size: int = 50,
+    embedding_function: Optional[Callable] = None,
+) -> NightlyBatchResult:
+    """
+    对分析窗口内所有有对话的用户生成画像
+
+    - 一次查询找出活跃用户
+    - 有界并发分析，结果按批在同一事务中写入画像和检查点
+    - 已有 done 检查点的用户直接跳过，崩溃后重跑即可续跑
+    - 出现异常时状态记为 failed 并记录错误，已提交的批次保留，重跑时续跑
+    """
+    target_date, start_time, end_time = get_analysis_window(date)
+    date = target_date.strftime("%Y-%m-%d")
+
+    result = NightlyBatchResult(date=date, status="running")
+    BATCH_RUNS[date] = result
+    started_at = time.monotonic()
+
+    try:
+        await _run_nightly_batch(
+            result,
+            start_time,
+            end_time,
+            concurrency,
+            commit_batch_size,
+            embedding_function,
+            started_at,
+        )
+    except (Exception, asyncio.CancelledError) as e:
+        result.status = "failed"
+        result.error = str(e) or type(e).__name__
+        result.elapsed_seconds = round(time.monotonic() - started_at, 3)
+        log.exception(f"Nightly batch {date} failed: {e}")
+        raise
+
+    return result
+
+
+async def _run_nightly_batch(
+    result: NightlyBatchResult,
+    start_time: int,
+    end_time: int,
+    concurrency: int,
+    commit_batch_size: int,
+    embedding_function: Optional[Callable],
+    started_at: float,
+) -> None:
+    date = result.date
+
+    active_users = await asyncio.to_thread(
+        turn_archive.get_active_user_turn_counts, start_time, end_time
+    )
+    done_user_ids = await asyncio.to_thread(NightlyCheckpoints.get_done_user_ids, date)
+    pending_user_ids = [uid for uid in active_users if uid not in done_user_ids]
+
+    result.total_users = len(active_users)
+    result.skipped_users = len(active_users) - len(pending_user_ids)
+
+    log.info(
+        f"Nightly batch {date}: {len(pending_user_ids)} users to analyze, "
+        f"{result.skipped_users} already done"
+    )
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for user_id in pending_user_ids:
+        queue.put_nowait(user_id)
+
+    buffer: list[NightlyProfileResult] = []
+    flush_lock = asyncio.Lock()
+
+    def update_metrics():
+        result.elapsed_seconds = round(time.monotonic() - started_at, 3)
+        if result.elapsed_seconds > 0:
+            result.users_per_second = round(
+                result.processed_users / result.elapsed_seconds, 2
+            )
+            result.turns_per_second = round(
+                result.total_turns / result.elapsed_seconds, 2
+            )
+
+    async def flush():
+        async with flush_lock:
+            if not buffer:
+                return
+            pending = buffer[:]
+            buffer.clear()
+            memories = await asyncio.to_thread(
+                NightlyCheckpoints.commit_results, date, pending
+            )
+            # 写入向量索引，供长期记忆的语义检索使用
+            await asyncio.to_thread(index_memories, embedding_function, memories)
+
+            result.processed_users += len(pending)
+            result.failed_users += len([r for r in pending if r.error])
+            result.total_turns += sum(r.total_turns for r in pending)
+            update_metrics()
+
+    async def worker():
+        while True:
+            try:
+                user_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            profile_result = await asyncio.to_thread(
+                analyze_user_for_window, user_id, date, start_time, end_time
+            )
+            buffer.append(profile_result)
+            if len(buffer) >= commit_batch_size:
+                await flush()
+
+    await asyncio.gather(
+        *[worker() for _ in range(max(1, min(concurrency, len(pending_user_ids))))]
+    )
+    await flush()
+
+    update_metrics()
+    result.status = "completed"
+
+    log.info(
+        f"Nightly batch {date} completed: {result.processed_users} users, "
+        f"{result.total_turns} turns in {result.elapsed_seconds}s "
+        f"({result.users_per_second} users/s, {result.turns_per_second} turns/s)"
+    )
+
+
+async def run_nightly_batch_in_background(*args, **kwargs) -> None:
+    """后台任务入口：失败已记录在 BATCH_RUNS 中，不再向事件循环抛出"""
+    try:
+        await run_nightly_batch(*args, **kwargs)
+    except Exception:
+        pass
+
 ####################
 # 路由
 ####################
 
 @router.post("/run", response_model=ProfileAnalysisResult)
 async def run_nightly_analysis(
+    http_request: Request,
     request: NightlyAnalysisRequest,
     user=Depends(get_admin_user),  # 仅管理员可手动触发
 ):
@@ -99,55 +358,44 @@ async def run_nightly_analysis(
     """
     
     try:
-        # 1. 确定分析日期
-        if request.date:
-            target_date = datetime.strptime(request.date, "%Y-%m-%d")
-        else:
-            target_date = datetime.now() - timedelta(days=1)  # 昨天
-        
-        # 计算时间范围（当天 00:00 到 23:59）
-        start_time = int(target_date.replace(hour=0, minute=0, second=0).timestamp())
-        end_time = int(target_date.replace(hour=23, minute=59, second=59).timestamp())
+        # 1. 确定分析日期及时间范围
+        target_date, start_time, end_time = get_analysis_window(request.date)
         
         log.info(f"Analyzing profile for user {request.user_id} on {target_date.strftime('%Y-%m-%d')}")
         
-        # 2. 获取当天所有 turns
-        turns = Turns.get_turns_by_user_and_date(request.user_id, start_time, end_time)
+        # 2. 分批读取当天 turns 并分析画像
+        turn_batches = turn_archive.iter_turns_by_user_and_date(
+            request.user_id, start_time, end_time, columns=ANALYSIS_TURN_COLUMNS
+        )
+        profile = analyze_student_profile(request.user_id, turn_batches)
+        total_turns = profile['metadata']['total_turns']
         
-        if not turns:
+        if not total_turns:
             raise HTTPException(
                 status_code=404,
                 detail=f"No turns found for user {request.user_id} on {target_date.strftime('%Y-%m-%d')}"
             )
         
-        # 转换为dict列表
-        turns_data = [turn.model_dump() for turn in turns]
-        
-        # 3. 分析画像
-        profile = analyze_student_profile(request.user_id, turns_data)
-        
-        # 4. 写入长期记忆
-        memory_form = LongtermMemoryForm(
-            user_id=request.user_id,
-            namespace=f"profiles:{request.user_id}",
-            tags=["daily_profile", target_date.strftime("%Y-%m-%d")] + profile['weak_skills'],
-            text=json.dumps(profile, ensure_ascii=False),
-            metadata_json={
-                "date": target_date.strftime("%Y-%m-%d"),
-                "total_turns": len(turns),
-                "analysis_version": "v1.0",
-            }
+        # 3. 写入长期记忆
+        memory_form = build_profile_memory_form(
+            request.user_id, target_date.strftime("%Y-%m-%d"), profile, total_turns
         )
         
         memory = LongtermMemories.insert_new_memory(memory_form)
-        
+        SkillMasteries.add_observations(
+            request.user_id, get_profile_observations(profile, memory.created_at)
+        )
+        await asyncio.to_thread(
+            index_memories, http_request.app.state.EMBEDDING_FUNCTION, [memory]
+        )
+
         log.info(f"Profile memory created: {memory.id}")
         
-        # 5. 返回结果
+        # 4. 返回结果
         return ProfileAnalysisResult(
             user_id=request.user_id,
             date=target_date.strftime("%Y-%m-%d"),
-            total_turns=len(turns),
+            total_turns=total_turns,
             summary=profile['summary'],
             weak_skills=profile['weak_skills'],
             strong_skills=profile['strong_skills'],
@@ -161,6 +409,63 @@ async def run_nightly_analysis(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/run-batch", response_model=NightlyBatchResult)
+async def run_nightly_batch_analysis(
+    http_request: Request,
+    request: NightlyBatchRequest,
+    user=Depends(get_admin_user),
+):
+    """
+    批量分析当天所有活跃学生，可由定时任务调用
+    background=True 时立即返回，进度通过 /run-batch/{date}/status 查询
+    """
+    target_date, _, _ = get_analysis_window(request.date)
+    date = target_date.strftime("%Y-%m-%d")
+    embedding_function = http_request.app.state.EMBEDDING_FUNCTION
+
+    task = BATCH_TASKS.get(date)
+    if task and not task.done():
+        raise HTTPException(
+            status_code=409, detail=f"Nightly batch for {date} is already running"
+        )
+
+    if request.background:
+        BATCH_TASKS[date] = asyncio.create_task(
+            run_nightly_batch_in_background(
+                date,
+                request.concurrency,
+                request.commit_batch_size,
+                embedding_function,
+            )
+        )
+        return NightlyBatchResult(date=date, status="started")
+
+    BATCH_TASKS[date] = asyncio.current_task()
+    try:
+        return await run_nightly_batch(
+            date, request.concurrency, request.commit_batch_size, embedding_function
+        )
+    finally:
+        BATCH_TASKS.pop(date, None)
+
+
+@router.get("/run-batch/{date}/status")
+async def get_nightly_batch_status(
+    date: str,
+    user=Depends(get_admin_user),
+):
+    """查询批量任务进度及检查点统计"""
+    task = BATCH_TASKS.get(date)
+    run = BATCH_RUNS.get(date)
+
+    return {
+        "date": date,
+        "running": bool(task and not task.done()),
+        "run": run,
+        "checkpoints": NightlyCheckpoints.get_status_counts(date),
+    }
+
+
 @router.get("/profile/latest/{user_id}")
 async def get_latest_profile(
     user_id: str,
@@ -190,6 +495,56 @@ async def get_latest_profile(
     }
 
 
+@router.get("/mastery/{user_id}", response_model=List[SkillMasteryModel])
+async def get_user_skill_mastery(
+    user_id: str,
+    current_user=Depends(get_verified_user),
+):
+    """获取学生各技能的掌握度（count / mean / EWMA / 最近观测时间）"""
+
+    # 权限检查：本人、教师、校领导或管理员
+    if current_user.id != user_id and current_user.role not in [
+        "admin",
+        "teacher",
+        "leader",
+    ]:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    return SkillMasteries.get_mastery_by_student_id(user_id)
+
+
+@router.get("/mastery/skill/{skill}", response_model=List[SkillMasteryModel])
+async def get_skill_mastery_by_students(
+    skill: str,
+    student_ids: Optional[str] = None,  # 逗号分隔，为空时返回所有学生
+    skip: Optional[int] = None,
+    limit: Optional[int] = 50,
+    current_user=Depends(get_verified_user),
+):
+    """某技能下各学生的掌握度，EWMA 低的在前"""
+
+    if current_user.role not in ["admin", "teacher", "leader"]:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    return SkillMasteries.get_mastery_by_skill(
+        skill,
+        student_ids=(
+            [sid for sid in student_ids.split(",") if sid]
+            if student_ids is not None
+            else None
+        ),
+        skip=skip,
+        limit=limit,
+    )
+
+
+@router.post("/mastery/rebuild")
+async def rebuild_skill_mastery(current_user=Depends(get_admin_user)):
+    """从已评分提交和历史画像全量重建技能掌握度"""
+    rows = await asyncio.to_thread(SkillMasteries.rebuild_mastery)
+    return {"rows": rows}
+
+
 @router.get("/memories/{user_id}")
 async def get_user_memories(
     user_id: str,
@@ -219,3 +574,40 @@ async def get_user_memories(
         "memories": memories,
         "total": len(memories)
     }
+
+
+@router.post("/memories/{user_id}/search", response_model=List[LongtermMemorySearchResult])
+async def search_user_memories(
+    http_request: Request,
+    user_id: str,
+    request: MemorySearchRequest,
+    current_user=Depends(get_verified_user),
+):
+    """混合检索用户的长期记忆：语义 top-k + 标签/namespace 过滤"""
+
+    # 权限检查
+    if current_user.id != user_id and current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    return await asyncio.to_thread(
+        search_longterm_memories,
+        http_request.app.state.EMBEDDING_FUNCTION,
+        user_id,
+        query=request.query,
+        tags=request.tags,
+        namespace=request.namespace,
+        k=request.k,
+    )
+
+
+@router.post("/memories/{user_id}/reindex")
+async def reindex_user_memory_vectors(
+    http_request: Request,
+    user_id: str,
+    current_user=Depends(get_admin_user),
+):
+    """重建用户长期记忆的向量索引"""
+    indexed = await asyncio.to_thread(
+        reindex_user_memories, http_request.app.state.EMBEDDING_FUNCTION, user_id
+    )
+    return {"user_id": user_id, "indexed": indexed}
@@ -27,52 +27,72 @@ log.setLevel(SRC_LOG_LEVELS["MODELS"])
 
 router = APIRouter()
 
+
+def get_submission_responses(
+    submissions: list[SubmissionModel],
+) -> list[SubmissionResponse]:
+    """批量加载学生信息（一次 IN 查询），避免逐条查询用户"""
+    student_ids = list({s.student_id for s in submissions if s.student_id})
+    students = {
+        student.id: UserResponse(**student.model_dump())
+        for student in Users.get_users_by_user_ids(student_ids)
+    } if student_ids else {}
+
+    return [
+        SubmissionResponse(
+            **{
+                **submission.model_dump(),
+                "student": students.get(submission.student_id),
+            }
+        )
+        for submission in submissions
+    ]
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[tuple[int, str]]:
+    if not cursor:
+        return None
+    try:
+        created_at, id = cursor.split(":", 1)
+        return int(created_at), id
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor, expected '<created_at>:<id>'",
+        )
+
+
 ############################
 # GetSubmissions
 ############################
 
 
 @router.get("/", response_model=list[SubmissionResponse])
-async def get_submissions(request: Request, user=Depends(get_verified_user)):
+async def get_submissions(
+    request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    user=Depends(get_verified_user),
+):
     """
     Get submissions:
     - Teachers/Admins: Get all submissions for their assignments
     - Students: Get only their own submissions
+
+    Teachers/Admins can page with `limit` and `cursor`, where cursor is
+    "<created_at>:<id>" of the last submission of the previous page.
     """
     if user.role in ["admin", "teacher"]:
         # For teachers, get all submissions for assignments they created
         assignments = Assignments.get_assignments_by_permission(user.id, "write")
-        assignment_ids = [a.id for a in assignments]
-        
-        all_submissions = []
-        for assignment_id in assignment_ids:
-            submissions = Submissions.get_submissions_by_assignment_id(assignment_id)
-            all_submissions.extend(submissions)
-        
-        # Add student info
-        submissions_with_user = [
-            SubmissionResponse(
-                **{
-                    **submission.model_dump(),
-                    "student": UserResponse(**Users.get_user_by_id(submission.student_id).model_dump()),
-                }
-            )
-            for submission in all_submissions
-        ]
+        submissions = Submissions.get_submissions_by_assignment_ids(
+            [a.id for a in assignments], limit=limit, cursor=parse_cursor(cursor)
+        )
     else:
         # Students only see their own submissions
         submissions = Submissions.get_submissions_by_student_id(user.id)
-        submissions_with_user = [
-            SubmissionResponse(
-                **{
-                    **submission.model_dump(),
-                    "student": UserResponse(**Users.get_user_by_id(submission.student_id).model_dump()),
-                }
-            )
-            for submission in submissions
-        ]
 
-    return submissions_with_user
+    return get_submission_responses(submissions)
 
 
 ############################
@@ -104,18 +124,7 @@ async def get_submissions_by_assignment(
         )
 
     submissions = Submissions.get_submissions_by_assignment_id(assignment_id)
-    
-    submissions_with_user = [
-        SubmissionResponse(
-            **{
-                **submission.model_dump(),
-                "student": UserResponse(**Users.get_user_by_id(submission.student_id).model_dump()) if submission.student_id else None,
-            }
-        )
-        for submission in submissions
-    ]
-
-    return submissions_with_user
+    return get_submission_responses(submissions)
 
 
 ############################
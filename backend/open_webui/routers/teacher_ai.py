@@ -1,15 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 from open_webui.models.users import Users
-from open_webui.models.turns import Turns
-from open_webui.models.submissions import Submissions
-from open_webui.models.longterm_memory import LongtermMemories
+from open_webui.models.groups import Groups
+from open_webui.models.student_context import (
+    CONTEXT_WINDOW_DAYS,
+    RECENT_SUBMISSIONS_LIMIT,
+    StudentContextModel,
+    StudentContexts,
+)
+from open_webui.utils.longterm_memory import search_longterm_memories
 from open_webui.utils.auth import get_verified_user
 from open_webui.models.users import UserModel
+from open_webui.env import TEACHER_AI_BATCH_CONCURRENCY, TEACHER_AI_BATCH_SIZE
+import asyncio
+import json
+import logging
 import time
 from datetime import datetime, timedelta
 
+log = logging.getLogger(__name__)
+
 router = APIRouter()
 
 ############################
@@ -32,29 +44,17 @@ class TeacherAIResponse(BaseModel):
     data_sources: DataSource
     student_name: str
 
+class TeacherAIBatchRequest(BaseModel):
+    question: str
+    group_id: Optional[str] = None  # 班级（用户组）
+    student_ids: Optional[List[str]] = None  # 或直接指定学生
+    batch_size: Optional[int] = None  # 每次 map 调用的学生数，不超过 BATCH_MAX_SIZE
+    concurrency: Optional[int] = None  # 同时进行的 LLM 调用数，不超过 TEACHER_AI_BATCH_CONCURRENCY
+
 ############################
 # Helper Functions
 ############################
 
-def extract_topics(turns: List[Dict]) -> List[str]:
-    """从对话中提取主要主题（简化版）"""
-    topics = []
-    for turn in turns:
-        content = turn.get("content", "")
-        # 简单的关键词提取
-        if "数学" in content or "方程" in content:
-            topics.append("数学")
-        if "作业" in content:
-            topics.append("作业")
-        if "概念" in content or "定义" in content:
-            topics.append("基础概念")
-    return list(set(topics)) if topics else ["通用学习"]
-
-def calculate_avg_score(submissions: List[Dict]) -> float:
-    """计算平均分"""
-    scores = [s.get("score", 0) for s in submissions if s.get("score") is not None]
-    return round(sum(scores) / len(scores), 1) if scores else 0
-
 def format_recent_submissions(submissions: List[Dict], limit: int = 3) -> str:
     """格式化最近的作业提交"""
     if not submissions:
@@ -69,6 +69,42 @@ def format_recent_submissions(submissions: List[Dict], limit: int = 3) -> str:
         result.append(f"  - {date}: {score}分 ({grade})")
     return "\n".join(result)
 
+def format_topics(snapshot: StudentContextModel) -> str:
+    return ", ".join(snapshot.get_topics()) or "通用学习"
+
+def build_student_context(
+    student: UserModel,
+    snapshot: StudentContextModel,
+    related_memories: Optional[List[str]] = None,
+) -> str:
+    """用学生上下文快照渲染提示词中的学生数据部分"""
+    last_active = datetime.fromtimestamp(student.last_active_at).strftime("%Y-%m-%d %H:%M") if student.last_active_at else "未知"
+    profile_text = snapshot.profile_text or "暂无 AI 学习画像"
+    related_memories_text = "\n".join(f"- {text}" for text in related_memories or []) or "无"
+
+    return f"""
+学生信息：
+- 姓名：{student.name}
+- 邮箱：{student.email}
+- 最后登录：{last_active}
+
+最近学习画像（AI 夜间分析）：
+{profile_text}
+
+与问题相关的历史记忆：
+{related_memories_text}
+
+最近 {CONTEXT_WINDOW_DAYS} 天对话情况：
+- 总对话轮数：{snapshot.get_turn_count()}
+- 主要讨论主题：{format_topics(snapshot)}
+
+作业完成情况：
+- 总作业数：{snapshot.submissions_count}
+- 平均分：{snapshot.avg_score}
+- 最近 {RECENT_SUBMISSIONS_LIMIT} 次作业：
+{format_recent_submissions(snapshot.recent_submissions)}
+"""
+
 async def call_gpt5_deep_think(system_prompt: str, user_message: str, mode: str = "deep_think") -> Dict[str, Any]:
     """
     调用 GPT-5 Deep Think 模式
@@ -101,12 +137,145 @@ _此分析基于近期对话记录和作业表现生成_
         "tokens": 500
     }
 
+TEACHER_AI_SYSTEM_PROMPT = """你是一位资深教学顾问 AI。
+教师会向你询问学生的学习情况。
+请基于提供的数据，给出专业、具体、可操作的分析。
+必须引用具体数据支撑你的结论。
+回答要结构化，使用 Markdown 格式。"""
+
+BATCH_REDUCE_SYSTEM_PROMPT = """你是一位资深教学顾问 AI。
+下面是对同一个班级不同学生分组分析的结果。
+请合并为一份针对教师问题的班级整体回答：列出需要关注的学生及依据，并给出班级层面的建议。
+回答要结构化，使用 Markdown 格式。"""
+
+# reduce 阶段每次合并的部分结果数
+BATCH_REDUCE_FAN_IN = 10
+# 每次 map 调用的学生数上限，避免单次 prompt 过长
+BATCH_MAX_SIZE = 20
+
+
+def get_batch_student_ids(form_data: TeacherAIBatchRequest) -> List[str]:
+    if form_data.student_ids:
+        return list(dict.fromkeys(form_data.student_ids))
+
+    if form_data.group_id:
+        group = Groups.get_group_by_id(form_data.group_id)
+        if not group:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="班级不存在"
+            )
+        return list(dict.fromkeys(group.user_ids or []))
+
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="需要提供 group_id 或 student_ids"
+    )
+
+
+def format_sse_event(data: dict) -> str:
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def reduce_partial_answers(
+    question: str, answers: List[str], semaphore: asyncio.Semaphore
+) -> str:
+    """分层合并 map 阶段的结果，每次最多合并 BATCH_REDUCE_FAN_IN 条"""
+
+    async def reduce_group(group: List[str]) -> Dict[str, Any]:
+        async with semaphore:
+            return await call_gpt5_deep_think(
+                system_prompt=BATCH_REDUCE_SYSTEM_PROMPT,
+                user_message="\n\n---\n\n".join(group)
+                + f"\n\n教师的问题：{question}",
+                mode="deep_think",
+            )
+
+    while len(answers) > 1:
+        groups = [
+            answers[i : i + BATCH_REDUCE_FAN_IN]
+            for i in range(0, len(answers), BATCH_REDUCE_FAN_IN)
+        ]
+        responses = await asyncio.gather(*[reduce_group(group) for group in groups])
+        answers = [response["content"] for response in responses]
+
+    return answers[0] if answers else ""
+
+
+async def stream_batch_answers(
+    question: str,
+    students: List[UserModel],
+    snapshots: Dict[str, StudentContextModel],
+    batch_size: int,
+    concurrency: int,
+):
+    """
+    map：每批学生的上下文 + 问题调用一次 LLM，有界并发，完成一批推送一批
+    reduce：合并所有部分结果后推送班级整体回答
+    """
+    started_at = time.monotonic()
+    batches = [
+        students[i : i + batch_size] for i in range(0, len(students), batch_size)
+    ]
+    yield format_sse_event(
+        {"type": "start", "student_count": len(students), "batch_count": len(batches)}
+    )
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def map_batch(batch: List[UserModel]) -> tuple[List[UserModel], Optional[str], Optional[str]]:
+        contexts = "\n\n".join(
+            build_student_context(student, snapshots[student.id]) for student in batch
+        )
+        async with semaphore:
+            try:
+                response = await call_gpt5_deep_think(
+                    system_prompt=TEACHER_AI_SYSTEM_PROMPT,
+                    user_message=f"{contexts}\n\n教师的问题：{question}",
+                    mode="deep_think",
+                )
+                return batch, response["content"], None
+            except Exception as e:
+                log.exception(f"Teacher AI batch map failed: {e}")
+                return batch, None, str(e)
+
+    partial_answers = []
+    for task in asyncio.as_completed([map_batch(batch) for batch in batches]):
+        batch, answer, error = await task
+        students_data = [{"id": s.id, "name": s.name} for s in batch]
+        if error is not None:
+            yield format_sse_event(
+                {"type": "error", "students": students_data, "error": error}
+            )
+            continue
+
+        partial_answers.append(answer)
+        yield format_sse_event(
+            {"type": "partial", "students": students_data, "answer": answer}
+        )
+
+    try:
+        summary = await reduce_partial_answers(question, partial_answers, semaphore)
+        yield format_sse_event({"type": "summary", "answer": summary})
+    except Exception as e:
+        log.exception(f"Teacher AI batch reduce failed: {e}")
+        yield format_sse_event({"type": "error", "error": str(e)})
+
+    yield format_sse_event(
+        {
+            "type": "done",
+            "elapsed_seconds": round(time.monotonic() - started_at, 3),
+        }
+    )
+    yield "data: [DONE]\n\n"
+
 ############################
 # API Endpoints
 ############################
 
 @router.post("/ask-ai", response_model=TeacherAIResponse)
 async def ask_teacher_ai(
+    http_request: Request,
     request: TeacherAIRequest,
     user: UserModel = Depends(get_verified_user)
 ):
@@ -128,78 +297,31 @@ async def ask_teacher_ai(
             detail="学生不存在"
         )
     
-    # 3. 收集学生数据
-    # 获取最近7天的对话
-    now_ts = int(time.time())
-    seven_days_ago = now_ts - (7 * 24 * 60 * 60)
-    
+    # 3. 读取学生上下文快照（随对话、作业、画像写入增量维护）
+    snapshot = StudentContexts.get_snapshot(request.student_id)
+
+    # 与问题最相关的长期记忆（语义检索，不含已作为画像展示的那条）
     try:
-        recent_turns = Turns.get_turns_by_user_and_date(
+        results = await asyncio.to_thread(
+            search_longterm_memories,
+            http_request.app.state.EMBEDDING_FUNCTION,
             request.student_id,
-            start_time=seven_days_ago,
-            end_time=now_ts
+            query=request.question,
+            k=3,
         )
-    except Exception:
-        recent_turns = []
-    
-    # 获取作业记录
-    try:
-        submissions = Submissions.get_submissions_by_student_id(request.student_id)
-        submissions_data = [
-            {
-                "score": s.score,
-                "grade": s.grade,
-                "created_at": s.created_at,
-                "status": s.status
-            }
-            for s in submissions
+        related_memories = [
+            result.memory.text
+            for result in results
+            if result.memory.id != snapshot.profile_id
         ]
     except Exception:
-        submissions_data = []
-    
-    # 获取最新学习画像
-    try:
-        profile = LongtermMemories.get_latest_profile(request.student_id)
-        profile_text = profile.text if profile else "暂无 AI 学习画像"
-        profile_date = profile.created_at if profile else None
-    except Exception:
-        profile_text = "暂无 AI 学习画像"
-        profile_date = None
-    
-    # 4. 构建上下文
-    turns_data = [{"content": t.content, "role": t.role} for t in recent_turns] if recent_turns else []
-    topics = extract_topics(turns_data)
-    avg_score = calculate_avg_score(submissions_data)
-    recent_submissions_text = format_recent_submissions(submissions_data)
-    
-    last_active = datetime.fromtimestamp(student.last_active_at).strftime("%Y-%m-%d %H:%M") if student.last_active_at else "未知"
-    
-    context = f"""
-学生信息：
-- 姓名：{student.name}
-- 邮箱：{student.email}
-- 最后登录：{last_active}
-
-最近学习画像（AI 夜间分析）：
-{profile_text}
-
-最近 7 天对话情况：
-- 总对话轮数：{len(turns_data)}
-- 主要讨论主题：{", ".join(topics)}
+        related_memories = []
 
-作业完成情况：
-- 总作业数：{len(submissions_data)}
-- 平均分：{avg_score}
-- 最近 3 次作业：
-{recent_submissions_text}
-"""
+    # 4. 构建上下文
+    context = build_student_context(student, snapshot, related_memories)
     
     # 5. 调用 GPT-5 Deep Think
-    system_prompt = """你是一位资深教学顾问 AI。
-教师会向你询问学生的学习情况。
-请基于提供的数据，给出专业、具体、可操作的分析。
-必须引用具体数据支撑你的结论。
-回答要结构化，使用 Markdown 格式。"""
+    system_prompt = TEACHER_AI_SYSTEM_PROMPT
     
     user_message = f"{context}\n\n教师的问题：{request.question}"
     
@@ -214,13 +336,65 @@ async def ask_teacher_ai(
         answer=response["content"],
         student_name=student.name,
         data_sources=DataSource(
-            conversation_count=len(turns_data),
-            assignment_count=len(submissions_data),
-            profile_date=profile_date,
-            date_range="最近 7 天"
+            conversation_count=snapshot.get_turn_count(),
+            assignment_count=snapshot.submissions_count,
+            profile_date=snapshot.profile_date,
+            date_range=f"最近 {CONTEXT_WINDOW_DAYS} 天"
         )
     )
 
+@router.post("/ask-ai/batch")
+async def ask_teacher_ai_batch(
+    form_data: TeacherAIBatchRequest,
+    user: UserModel = Depends(get_verified_user)
+):
+    """
+    教师 AI 助手 - 对整个班级提问（如“本周哪些学生代数有困难”）
+    以 SSE 流式返回每批学生的部分结果和最终的班级汇总
+    """
+    if user.role not in ["teacher", "admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="只有教师和管理员可以使用此功能"
+        )
+
+    # 一次 IN 查询取学生信息和上下文快照
+    student_ids = get_batch_student_ids(form_data)
+    students = [
+        student
+        for student in Users.get_users_by_user_ids(student_ids)
+        if student.role == "student"
+    ]
+    if not students:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="班级中没有学生"
+        )
+    students.sort(key=lambda s: (s.name, s.id))
+
+    snapshots = await asyncio.to_thread(
+        StudentContexts.get_snapshots, [s.id for s in students]
+    )
+
+    return StreamingResponse(
+        stream_batch_answers(
+            form_data.question,
+            students,
+            snapshots,
+            batch_size=max(
+                min(form_data.batch_size or TEACHER_AI_BATCH_SIZE, BATCH_MAX_SIZE), 1
+            ),
+            concurrency=max(
+                min(
+                    form_data.concurrency or TEACHER_AI_BATCH_CONCURRENCY,
+                    TEACHER_AI_BATCH_CONCURRENCY,
+                ),
+                1,
+            ),
+        ),
+        media_type="text/event-stream",
+    )
+
 @router.get("/students", response_model=List[Dict[str, Any]])
 async def get_teacher_students(
     user: UserModel = Depends(get_verified_user)
@@ -677,22 +677,21 @@ def get_event_emitter(request_info, update_db=True):
                 )
 
             if "type" in event_data and event_data["type"] == "message":
-                message = Chats.get_message_by_id_and_message_id(
+                # Append-only: the delta is logged and folded in at stream end
+                Chats.append_message_content_by_id_and_message_id(
                     request_info["chat_id"],
                     request_info["message_id"],
+                    event_data.get("data", {}).get("content", ""),
                 )
 
-                if message:
-                    content = message.get("content", "")
-                    content += event_data.get("data", {}).get("content", "")
-
-                    Chats.upsert_message_to_chat_by_id_and_message_id(
-                        request_info["chat_id"],
-                        request_info["message_id"],
-                        {
-                            "content": content,
-                        },
-                    )
+            if event_data.get("type") == "chat:tasks:cancel" or (
+                event_data.get("type") == "chat:completion"
+                and (event_data.get("data") or {}).get("done")
+            ):
+                Chats.compact_message_by_id_and_message_id(
+                    request_info["chat_id"],
+                    request_info["message_id"],
+                )
 
             if "type" in event_data and event_data["type"] == "replace":
                 content = event_data.get("data", {}).get("content", "")
@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrate_database():
+    """
+    Bring the configured database to the alembic head, as run_migrations()
+    does at startup. Model tests write to and clear their tables, so point
+    DATABASE_URL at a scratch database, e.g.
+
+        DATABASE_URL=sqlite:////tmp/webui-test.db pytest open_webui/test/apps/webui/models
+    """
+    from alembic import command
+    from alembic.config import Config
+    from open_webui.env import OPEN_WEBUI_DIR
+
+    alembic_cfg = Config(OPEN_WEBUI_DIR / "alembic.ini")
+    alembic_cfg.set_main_option("script_location", str(OPEN_WEBUI_DIR / "migrations"))
+    command.upgrade(alembic_cfg, "head")
@@ -0,0 +1,112 @@
+import pytest
+from open_webui.internal.db import get_db
+from open_webui.models.access_grants import AccessGrant, AccessGrants
+from open_webui.models.assignments import Assignment, AssignmentForm, Assignments
+from open_webui.models.knowledge import Knowledge, KnowledgeForm, Knowledges
+from open_webui.utils.access_control import has_access
+
+OWNER_ID = "access-grant-test-owner"
+GROUP_ID = "access-grant-test-group"
+
+ACCESS_CONTROLS = [
+    None,
+    {},
+    {"read": {"user_ids": ["reader"]}},
+    {"read": {"group_ids": [GROUP_ID]}, "write": {"user_ids": ["writer"]}},
+    {
+        "read": {"user_ids": ["reader"], "group_ids": []},
+        "write": {"group_ids": [GROUP_ID], "user_ids": []},
+    },
+    {"write": {"user_ids": ["reader", "writer"]}},
+]
+
+# (user_id, group ids the user belongs to)
+USERS = [
+    ("reader", set()),
+    ("writer", set()),
+    ("member", {GROUP_ID}),
+    ("outsider", {"access-grant-test-other-group"}),
+]
+
+
+def get_visible_ids(model, resource_type, resources, user_id, permission, group_ids):
+    with get_db() as db:
+        return {
+            id
+            for (id,) in db.query(model.id).filter(
+                model.id.in_([resource.id for resource in resources]),
+                AccessGrants.get_access_filter(
+                    resource_type, model.id, user_id, permission, group_ids
+                ),
+            )
+        }
+
+
+class TestAccessGrantParity:
+    def setup_method(self):
+        self.knowledge = [
+            Knowledges.insert_new_knowledge(
+                OWNER_ID,
+                KnowledgeForm(
+                    name=f"kb {i}", description="", access_control=access_control
+                ),
+            )
+            for i, access_control in enumerate(ACCESS_CONTROLS)
+        ]
+        self.assignments = [
+            Assignments.insert_new_assignment(
+                AssignmentForm(
+                    title=f"assignment {i}",
+                    due_date="2025-01-01",
+                    access_control=access_control,
+                ),
+                OWNER_ID,
+            )
+            for i, access_control in enumerate(ACCESS_CONTROLS)
+        ]
+
+    def teardown_method(self):
+        with get_db() as db:
+            ids = [k.id for k in self.knowledge] + [a.id for a in self.assignments]
+            db.query(AccessGrant).filter(AccessGrant.resource_id.in_(ids)).delete()
+            db.query(Knowledge).filter_by(user_id=OWNER_ID).delete()
+            db.query(Assignment).filter_by(teacher_id=OWNER_ID).delete()
+            db.commit()
+
+    @pytest.mark.parametrize("permission", ["read", "write"])
+    @pytest.mark.parametrize("user_id,group_ids", USERS)
+    def test_filter_matches_has_access(self, permission, user_id, group_ids):
+        for model, resource_type, resources, strict in [
+            (Knowledge, "knowledge", self.knowledge, True),
+            # A NULL access_control leaves assignments open for read and write
+            (Assignment, "assignment", self.assignments, False),
+        ]:
+            expected = {
+                resource.id
+                for resource in resources
+                if has_access(
+                    user_id, permission, resource.access_control, group_ids, strict
+                )
+            }
+            assert (
+                get_visible_ids(
+                    model, resource_type, resources, user_id, permission, group_ids
+                )
+                == expected
+            ), resource_type
+
+    def test_rebuild_matches_incremental_grants(self):
+        def get_rows():
+            ids = [k.id for k in self.knowledge]
+            with get_db() as db:
+                return sorted(
+                    (row.resource_id, row.principal_id, row.permission)
+                    for row in db.query(AccessGrant).filter(
+                        AccessGrant.resource_type == "knowledge",
+                        AccessGrant.resource_id.in_(ids),
+                    )
+                )
+
+        incremental = get_rows()
+        AccessGrants.rebuild_grants("knowledge")
+        assert get_rows() == incremental
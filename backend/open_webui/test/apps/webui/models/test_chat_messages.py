@@ -0,0 +1,110 @@
+from open_webui.internal.db import get_db
+from open_webui.models.chat_messages import ChatMessage, ChatMessageDelta
+from open_webui.models.chats import Chat, ChatForm, Chats
+
+USER_ID = "chat-messages-test-user"
+
+
+def get_delta_count(chat_id: str) -> int:
+    with get_db() as db:
+        return db.query(ChatMessageDelta).filter_by(chat_id=chat_id).count()
+
+
+def get_message_ids(chat_id: str) -> list[str]:
+    with get_db() as db:
+        return sorted(
+            message_id
+            for (message_id,) in db.query(ChatMessage.id).filter_by(chat_id=chat_id)
+        )
+
+
+class TestChatMessages:
+    def setup_method(self):
+        self.history = {
+            "currentId": "m2",
+            "messages": {
+                "m1": {
+                    "id": "m1",
+                    "parentId": None,
+                    "childrenIds": ["m2"],
+                    "role": "user",
+                    "content": "What is a fraction?",
+                    "timestamp": 1000,
+                },
+                "m2": {
+                    "id": "m2",
+                    "parentId": "m1",
+                    "childrenIds": [],
+                    "role": "assistant",
+                    "content": "A part of a whole.",
+                    "timestamp": 1001,
+                },
+            },
+        }
+        self.chat = Chats.insert_new_chat(
+            USER_ID, ChatForm(chat={"title": "Fractions", "history": self.history})
+        )
+
+    def teardown_method(self):
+        Chats.delete_chats_by_user_id(USER_ID)
+
+    def test_history_is_reassembled_from_message_rows(self):
+        assert get_message_ids(self.chat.id) == ["m1", "m2"]
+        with get_db() as db:
+            stored = db.get(Chat, self.chat.id).chat
+        assert stored["history"]["messages"] == {}
+
+        chat = Chats.get_chat_by_id(self.chat.id)
+        assert chat.chat["history"] == self.history
+        assert chat.chat["title"] == "Fractions"
+
+        Chats.upsert_message_to_chat_by_id_and_message_id(
+            self.chat.id,
+            "m3",
+            {"id": "m3", "parentId": "m2", "role": "user", "content": "And 1/2?"},
+        )
+        history = Chats.get_chat_by_id(self.chat.id).chat["history"]
+        assert history["currentId"] == "m3"
+        assert history["messages"]["m3"]["content"] == "And 1/2?"
+        assert history["messages"]["m1"] == self.history["messages"]["m1"]
+
+        # A full update replaces the stored messages, dropping m3
+        Chats.update_chat_by_id(
+            self.chat.id, {"title": "Fractions", "history": self.history}
+        )
+        assert get_message_ids(self.chat.id) == ["m1", "m2"]
+        assert Chats.get_chat_by_id(self.chat.id).chat["history"] == self.history
+
+    def test_deltas_are_applied_on_read_and_folded_by_compaction(self):
+        chat_id = self.chat.id
+        for content in [" Like", " 1/2."]:
+            assert Chats.append_message_content_by_id_and_message_id(
+                chat_id, "m2", content
+            )
+        assert not Chats.append_message_content_by_id_and_message_id(
+            chat_id, "missing", "lost"
+        )
+        assert get_delta_count(chat_id) == 2
+
+        expected = "A part of a whole. Like 1/2."
+        message = Chats.get_message_by_id_and_message_id(chat_id, "m2")
+        assert message["content"] == expected
+        assert Chats.get_messages_map_by_chat_id(chat_id)["m2"]["content"] == expected
+
+        compacted = Chats.compact_message_by_id_and_message_id(chat_id, "m2")
+        assert compacted["content"] == expected
+        assert get_delta_count(chat_id) == 0
+        assert Chats.get_message_by_id_and_message_id(chat_id, "m2") == compacted
+        assert Chats.get_chat_by_id(chat_id).chat["history"]["messages"]["m2"] == {
+            **self.history["messages"]["m2"],
+            "content": expected,
+        }
+
+        # An upsert folds pending deltas before merging
+        Chats.append_message_content_by_id_and_message_id(chat_id, "m2", " Done.")
+        message = Chats.upsert_message_to_chat_by_id_and_message_id(
+            chat_id, "m2", {"done": True}
+        )
+        assert message["content"] == f"{expected} Done."
+        assert message["done"]
+        assert get_delta_count(chat_id) == 0
@@ -0,0 +1,76 @@
+from open_webui.internal.db import get_db
+from open_webui.models.chat_search import ChatSearches
+from open_webui.models.chats import ChatForm, Chats
+
+USER_ID = "chat-search-test-user"
+OTHER_USER_ID = "chat-search-test-other-user"
+
+
+def get_chat(title: str, contents: list[str]) -> dict:
+    messages = {
+        f"m{i}": {"id": f"m{i}", "role": "user", "content": content}
+        for i, content in enumerate(contents)
+    }
+    return {"title": title, "history": {"messages": messages}}
+
+
+class TestChatSearch:
+    def setup_method(self):
+        self.photosynthesis, self.plants, self.algebra = [
+            Chats.insert_new_chat(USER_ID, ChatForm(chat=get_chat(title, contents)))
+            for title, contents in [
+                ("Photosynthesis", ["How does photosynthesis work?"]),
+                ("Plants", ["Do plants need light?", "Explain Photosynthesis again"]),
+                ("Algebra", ["Solve x + 2 = 5"]),
+            ]
+        ]
+        Chats.insert_new_chat(
+            OTHER_USER_ID, ChatForm(chat=get_chat("Photosynthesis", []))
+        )
+
+    def teardown_method(self):
+        Chats.delete_chats_by_user_id(USER_ID)
+        Chats.delete_chats_by_user_id(OTHER_USER_ID)
+
+    def search(self, search_text):
+        return Chats.get_chats_by_user_id_and_search_text(USER_ID, search_text)
+
+    def test_uses_the_fts_index(self):
+        with get_db() as db:
+            assert ChatSearches.has_fts(db)
+
+    def test_results_are_ranked_with_snippets(self):
+        results = self.search("photosynthesis")
+
+        # The title match counts double, and the other user's chat is excluded
+        assert [result.id for result in results] == [
+            self.photosynthesis.id,
+            self.plants.id,
+        ]
+        assert all(result.score > 0 for result in results)
+        assert results[0].snippet == "How does photosynthesis work?"
+        assert results[1].snippet == "Explain Photosynthesis again"
+
+    def test_message_writes_are_reindexed(self):
+        assert self.search("quadratic") == []
+
+        Chats.upsert_message_to_chat_by_id_and_message_id(
+            self.algebra.id,
+            "m1",
+            {"id": "m1", "role": "assistant", "content": "A quadratic has x^2"},
+        )
+        assert [result.id for result in self.search("quadratic")] == [self.algebra.id]
+
+        Chats.update_chat_by_id(self.algebra.id, get_chat("Algebra", []))
+        assert self.search("quadratic") == []
+        assert [result.id for result in self.search("algebra")] == [self.algebra.id]
+        assert self.search("algebra")[0].snippet is None
+
+    def test_operators_without_text_skip_the_index(self):
+        results = self.search("pinned:false")
+        assert {result.id for result in results} == {
+            self.photosynthesis.id,
+            self.plants.id,
+            self.algebra.id,
+        }
+        assert all(result.score is None for result in results)
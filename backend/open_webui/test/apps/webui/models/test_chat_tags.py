@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+from open_webui.internal.db import get_db
+from open_webui.models.chat_tags import ChatTag
+from open_webui.models.chats import ChatForm, Chats
+from open_webui.models.tags import Tag, Tags
+
+USER_ID = "chat-tags-test-user"
+
+
+def get_chat_tag_ids(chat_id: str) -> list[str]:
+    with get_db() as db:
+        return sorted(
+            tag_id for (tag_id,) in db.query(ChatTag.tag_id).filter_by(chat_id=chat_id)
+        )
+
+
+class TestChatTags:
+    def setup_method(self):
+        self.user = SimpleNamespace(id=USER_ID)
+        self.first, self.second = [
+            Chats.insert_new_chat(USER_ID, ChatForm(chat={"title": title}))
+            for title in ["First", "Second"]
+        ]
+
+    def teardown_method(self):
+        Chats.delete_chats_by_user_id(USER_ID)
+        with get_db() as db:
+            db.query(Tag).filter_by(user_id=USER_ID).delete()
+            db.commit()
+
+    def get_tagged_chat_ids(self, tag_name: str) -> list[str]:
+        return sorted(
+            chat.id
+            for chat in Chats.get_chat_list_by_user_id_and_tag_name(USER_ID, tag_name)
+        )
+
+    def test_tag_writes_keep_chat_tag_in_sync(self):
+        chat = Chats.update_chat_tags_by_id(
+            self.first.id, ["Homework", "Math", "none"], self.user
+        )
+        assert sorted(chat.meta["tags"]) == ["homework", "math"]
+        assert get_chat_tag_ids(self.first.id) == ["homework", "math"]
+
+        Chats.add_chat_tag_by_id_and_user_id_and_tag_name(
+            self.second.id, USER_ID, "Math"
+        )
+        assert get_chat_tag_ids(self.second.id) == ["math"]
+        assert self.get_tagged_chat_ids("Math") == sorted(
+            [self.first.id, self.second.id]
+        )
+        assert Chats.count_chats_by_tag_name_and_user_id("Math", USER_ID) == 2
+
+        assert Chats.delete_tag_by_id_and_user_id_and_tag_name(
+            self.first.id, USER_ID, "Math"
+        )
+        assert get_chat_tag_ids(self.first.id) == ["homework"]
+        assert self.get_tagged_chat_ids("math") == [self.second.id]
+
+        assert Chats.delete_all_tags_by_id_and_user_id(self.second.id, USER_ID)
+        assert get_chat_tag_ids(self.second.id) == []
+        assert Chats.count_chats_by_tag_name_and_user_id("math", USER_ID) == 0
+
+    def test_search_filters_and_unused_tag_cleanup(self):
+        Chats.update_chat_tags_by_id(self.first.id, ["Homework"], self.user)
+
+        results = Chats.get_chats_by_user_id_and_search_text(USER_ID, "tag:homework")
+        assert [result.id for result in results] == [self.first.id]
+        results = Chats.get_chats_by_user_id_and_search_text(USER_ID, "tag:none")
+        assert [result.id for result in results] == [self.second.id]
+
+        # Archived chats don't count, and a tag no chat uses anymore is deleted
+        Chats.toggle_chat_archive_by_id(self.first.id)
+        assert Chats.count_chats_by_tag_name_and_user_id("homework", USER_ID) == 0
+
+        Chats.update_chat_tags_by_id(self.first.id, [], self.user)
+        assert get_chat_tag_ids(self.first.id) == []
+        assert Tags.get_tag_by_name_and_user_id("homework", USER_ID) is None
+
+        # Deleting a chat deletes its rows
+        Chats.update_chat_tags_by_id(self.second.id, ["Math"], self.user)
+        assert Chats.delete_chat_by_id(self.second.id)
+        assert get_chat_tag_ids(self.second.id) == []
@@ -0,0 +1,94 @@
+from open_webui.internal.db import get_db
+from open_webui.models.longterm_memory import (
+    LongtermMemories,
+    LongtermMemory,
+    LongtermMemoryForm,
+)
+from open_webui.retrieval.vector.factory import VECTOR_DB_CLIENT
+from open_webui.utils.longterm_memory import (
+    get_collection_name,
+    index_memories,
+    search_longterm_memories,
+)
+
+USER_ID = "longterm-memory-test-user"
+TOPICS = ["fractions", "geometry", "essays"]
+
+
+def embed(text: str) -> list[float]:
+    # One axis per topic plus a small constant so no vector is all zeros
+    return [float(topic in text) for topic in TOPICS] + [0.1]
+
+
+def embedding_function(texts, prefix=None, user=None):
+    if isinstance(texts, str):
+        return embed(texts)
+    return [embed(text) for text in texts]
+
+
+def get_indexed_ids() -> list[str]:
+    result = VECTOR_DB_CLIENT.get(get_collection_name(USER_ID))
+    return sorted(result.ids[0]) if result else []
+
+
+class TestLongtermMemoryIndex:
+    def setup_method(self):
+        self.memories = [
+            LongtermMemories.insert_new_memory(
+                LongtermMemoryForm(
+                    user_id=USER_ID,
+                    namespace=f"skills:{USER_ID}",
+                    tags=tags,
+                    text=text,
+                )
+            )
+            for text, tags in [
+                ("struggles with fractions", ["math"]),
+                ("good at geometry proofs", ["math", "proofs"]),
+                ("essays need structure", ["writing"]),
+            ]
+        ]
+        index_memories(embedding_function, self.memories)
+
+    def teardown_method(self):
+        try:
+            VECTOR_DB_CLIENT.delete_collection(get_collection_name(USER_ID))
+        except Exception:
+            pass
+        with get_db() as db:
+            db.query(LongtermMemory).filter_by(user_id=USER_ID).delete()
+            db.commit()
+
+    def search(self, query, tags=None, k=5):
+        return [
+            result.memory.id
+            for result in search_longterm_memories(
+                embedding_function, USER_ID, query=query, tags=tags, k=k
+            )
+            if result.score is not None
+        ]
+
+    def test_tag_filter_is_applied_by_the_vector_search(self):
+        fractions, geometry, essays = self.memories
+
+        assert self.search("essays", tags=["math"], k=1) in (
+            [fractions.id],
+            [geometry.id],
+        )
+        assert self.search("essays", tags=["writing"], k=1) == [essays.id]
+        assert self.search("geometry", tags=["proofs", "writing"], k=1) == [geometry.id]
+
+    def test_update_and_delete_keep_the_index_in_sync(self):
+        fractions, geometry, essays = self.memories
+
+        LongtermMemories.update_memory_by_id(
+            fractions.id, "fractions and essays", embedding_function=embedding_function
+        )
+        assert self.search("essays", tags=["math"], k=1) == [fractions.id]
+
+        LongtermMemories.update_memory_by_id(geometry.id, "geometry without vectors")
+        assert geometry.id not in get_indexed_ids()
+
+        assert LongtermMemories.delete_memory_by_id(essays.id)
+        assert get_indexed_ids() == [fractions.id]
+        assert not LongtermMemories.delete_memory_by_id(essays.id)
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from open_webui.internal.db import get_db
+from open_webui.models.longterm_memory import LongtermMemories, LongtermMemory
+from open_webui.models.nightly_checkpoints import NightlyCheckpoint, NightlyCheckpoints
+from open_webui.models.skill_mastery import SkillMastery
+from open_webui.models.student_context import StudentContext
+from open_webui.models.turns import Turn, TurnModel, Turns
+from open_webui.routers import nightly_analysis
+
+DATE = "2025-03-02"
+USER_IDS = ["nightly-test-u1", "nightly-test-u2", "nightly-test-u3"]
+
+
+def seed_turns():
+    _, start_time, _ = nightly_analysis.get_analysis_window(DATE)
+    turns = [
+        TurnModel(
+            id=f"{user_id}-turn-{i}",
+            session_id=f"{user_id}-session",
+            user_id=user_id,
+            role="user",
+            content=f"question {i}",
+            tool_calls=[],
+            tokens_in=0,
+            tokens_out=0,
+            cost=0,
+            created_at=start_time + 60 * i,
+            meta={},
+        )
+        for user_id in USER_IDS
+        for i in range(2)
+    ]
+    with get_db() as db:
+        Turns.insert_turns(db, turns)
+        db.commit()
+
+
+class TestNightlyBatchResume:
+    def setup_method(self):
+        seed_turns()
+
+    def teardown_method(self):
+        nightly_analysis.BATCH_RUNS.pop(DATE, None)
+        with get_db() as db:
+            for model in (Turn, LongtermMemory, StudentContext):
+                db.query(model).filter(model.user_id.in_(USER_IDS)).delete()
+            db.query(SkillMastery).filter(
+                SkillMastery.student_id.in_(USER_IDS)
+            ).delete()
+            db.query(NightlyCheckpoint).filter_by(date=DATE).delete()
+            db.commit()
+
+    def test_rerun_only_analyzes_failed_users(self, monkeypatch):
+        calls = []
+        analyze_student_profile = nightly_analysis.analyze_student_profile
+
+        def flaky_analyze(user_id, turn_batches):
+            calls.append(user_id)
+            if user_id == USER_IDS[1] and calls.count(user_id) == 1:
+                raise RuntimeError("model unavailable")
+            return analyze_student_profile(user_id, turn_batches)
+
+        monkeypatch.setattr(nightly_analysis, "analyze_student_profile", flaky_analyze)
+
+        first = asyncio.run(
+            nightly_analysis.run_nightly_batch(DATE, concurrency=2, commit_batch_size=2)
+        )
+        assert first.status == "completed"
+        assert (first.processed_users, first.failed_users) == (3, 1)
+        assert NightlyCheckpoints.get_status_counts(DATE) == {"done": 2, "failed": 1}
+
+        second = asyncio.run(nightly_analysis.run_nightly_batch(DATE))
+        assert second.status == "completed"
+        assert (second.skipped_users, second.processed_users) == (2, 1)
+        assert second.failed_users == 0
+        assert NightlyCheckpoints.get_status_counts(DATE) == {"done": 3}
+
+        assert sorted(calls) == sorted(USER_IDS + [USER_IDS[1]])
+        for user_id in USER_IDS:
+            assert len(LongtermMemories.get_memories_by_user_id(user_id)) == 1
+
+    def test_unexpected_error_marks_the_run_failed(self, monkeypatch):
+        def commit_results(date, results):
+            raise RuntimeError("database unavailable")
+
+        monkeypatch.setattr(NightlyCheckpoints, "commit_results", commit_results)
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(nightly_analysis.run_nightly_batch(DATE))
+
+        run = nightly_analysis.BATCH_RUNS[DATE]
+        assert run.status == "failed"
+        assert run.error == "database unavailable"
+
+        # The background entry point records the failure without raising
+        asyncio.run(nightly_analysis.run_nightly_batch_in_background(DATE))
+        assert nightly_analysis.BATCH_RUNS[DATE].status == "failed"
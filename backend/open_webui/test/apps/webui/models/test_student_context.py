@@ -0,0 +1,105 @@
+import time
+
+from open_webui.internal.db import get_db
+from open_webui.models.longterm_memory import LongtermMemory
+from open_webui.models.student_context import StudentContext, StudentContexts
+from open_webui.models.turns import Turn, TurnModel, Turns
+
+USER_ID = "student-context-test-user"
+
+
+def make_turn(i: int, content: str) -> TurnModel:
+    return TurnModel(
+        id=f"{USER_ID}-turn-{i}",
+        session_id=f"{USER_ID}-session",
+        user_id=USER_ID,
+        role="user",
+        content=content,
+        tool_calls=[],
+        tokens_in=0,
+        tokens_out=0,
+        cost=0,
+        created_at=int(time.time()) - i,
+        meta={},
+    )
+
+
+class TestStudentContextFirstAccess:
+    def setup_method(self):
+        # History written before the snapshot table existed
+        now = int(time.time())
+        with get_db() as db:
+            db.add_all(
+                [
+                    Turn(**make_turn(i, "数学 question").model_dump())
+                    for i in range(1, 3)
+                ]
+            )
+            db.add(
+                LongtermMemory(
+                    id=f"{USER_ID}-profile",
+                    user_id=USER_ID,
+                    namespace=f"profiles:{USER_ID}",
+                    tags=[],
+                    text="profile text",
+                    metadata_json={},
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+            db.commit()
+
+    def teardown_method(self):
+        with get_db() as db:
+            for model in (Turn, LongtermMemory, StudentContext):
+                db.query(model).filter(model.user_id == USER_ID).delete()
+            db.commit()
+
+    def test_first_write_rebuilds_existing_history(self):
+        with get_db() as db:
+            Turns.insert_turns(db, [make_turn(0, "作业 question")])
+            db.commit()
+
+        snapshot = StudentContexts.get_snapshot(USER_ID)
+        assert snapshot.get_turn_count() == 3
+        assert snapshot.get_topics() == ["数学", "作业"]
+        assert snapshot.profile_text == "profile text"
+
+        with get_db() as db:
+            Turns.insert_turns(db, [make_turn(3, "another question")])
+            db.commit()
+        assert StudentContexts.get_snapshot(USER_ID).get_turn_count() == 4
+
+    def test_missing_snapshots_are_rebuilt_together(self):
+        other_id = f"{USER_ID}-other"
+        StudentContexts.rebuild(other_id)
+        try:
+            snapshots = StudentContexts.get_snapshots([USER_ID, other_id])
+            assert snapshots[USER_ID].get_turn_count() == 2
+            assert snapshots[USER_ID].profile_text == "profile text"
+            assert snapshots[other_id].get_turn_count() == 0
+
+            with get_db() as db:
+                assert db.query(StudentContext).filter_by(user_id=USER_ID).count() == 1
+        finally:
+            with get_db() as db:
+                db.query(StudentContext).filter_by(user_id=other_id).delete()
+                db.commit()
+
+    def test_concurrent_first_access_keeps_the_winning_row(self, monkeypatch):
+        build = StudentContexts._build
+
+        def build_after_concurrent_insert(db, user_ids):
+            # Another request creates the snapshot between our lookup and insert
+            with get_db() as other:
+                other.add(StudentContext(user_id=USER_ID, turn_days={}))
+                other.commit()
+            return build(db, user_ids)
+
+        monkeypatch.setattr(StudentContexts, "_build", build_after_concurrent_insert)
+
+        with get_db() as db:
+            context, created = StudentContexts._get_or_create(db, USER_ID)
+            assert not created
+            assert context.turn_days == {}
+            db.commit()
@@ -0,0 +1,396 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from open_webui.internal.db import get_db
+from open_webui.models.assignments import AssignmentForm, Assignments
+from open_webui.models.school_stats import SchoolStats
+from open_webui.models.skill_mastery import SkillMasteries, SkillMastery
+from open_webui.models.student_context import StudentContext
+from open_webui.models.submission_stats import (
+    SubmissionStat,
+    SubmissionStats,
+    TeacherStudentStat,
+)
+from open_webui.models.users import User, Users
+from open_webui.models.submissions import (
+    Submission,
+    SubmissionForm,
+    SubmissionUpdateForm,
+    Submissions,
+)
+
+TEACHER_ID = "submission-test-teacher"
+STUDENT_IDS = ["submission-test-s1", "submission-test-s2"]
+
+RUBRIC = {
+    "criteria": [
+        {"id": "logic", "title": "逻辑性", "weight": 1.0, "scale": [0, 1, 2, 3, 4, 5]}
+    ]
+}
+
+
+def ai_grade(submission_id: str, score: float) -> dict:
+    return {
+        "id": submission_id,
+        "rubric_scores_json": {"logic": score},
+        "ai_feedback_draft": "AI draft",
+        "ai_analysis": {"total_score": score * 20, "confidence": "medium"},
+    }
+
+
+class TestBulkAIGrades:
+    def setup_method(self):
+        self.assignment = Assignments.insert_new_assignment(
+            AssignmentForm(
+                title="Bulk grading",
+                due_date="2025-01-01",
+                rubric_json=RUBRIC,
+                ai_assist=True,
+            ),
+            TEACHER_ID,
+        )
+        self.submissions = []
+        for student_id in STUDENT_IDS:
+            submission = Submissions.insert_new_submission(
+                SubmissionForm(assignment_id=self.assignment.id, content="answer"),
+                student_id,
+            )
+            Submissions.update_submission_by_id(
+                submission.id, SubmissionUpdateForm(status="submitted")
+            )
+            self.submissions.append(submission)
+
+    def teardown_method(self):
+        for submission in self.submissions:
+            Submissions.delete_submission_by_id(submission.id)
+        Assignments.delete_assignment_by_id(self.assignment.id)
+        with get_db() as db:
+            db.query(SubmissionStat).filter(
+                SubmissionStat.scope_id.in_(
+                    [TEACHER_ID, self.assignment.id, *STUDENT_IDS]
+                )
+            ).delete()
+            db.query(TeacherStudentStat).filter_by(teacher_id=TEACHER_ID).delete()
+            db.query(StudentContext).filter(
+                StudentContext.user_id.in_(STUDENT_IDS)
+            ).delete()
+            db.query(SkillMastery).filter(
+                SkillMastery.student_id.in_(STUDENT_IDS)
+            ).delete()
+            db.commit()
+
+    def test_teacher_grade_is_not_overwritten(self):
+        submitted, graded = self.submissions
+        Submissions.grade_submission(
+            graded.id, TEACHER_ID, {"logic": 5}, "teacher feedback", 100.0
+        )
+
+        written = Submissions.update_ai_grades(
+            [ai_grade(submitted.id, 2), ai_grade(graded.id, 1)]
+        )
+        assert written == 1
+
+        submitted = Submissions.get_submission_by_id(submitted.id)
+        assert submitted.status == "ai_reviewed"
+        assert submitted.rubric_scores_json == {"logic": 2}
+        assert submitted.ai_feedback_draft == "AI draft"
+
+        graded = Submissions.get_submission_by_id(graded.id)
+        assert graded.status == "graded"
+        assert graded.rubric_scores_json == {"logic": 5}
+        assert graded.score == 100.0
+        assert graded.ai_feedback_draft is None
+
+    def test_ai_grades_leave_stats_unchanged(self):
+        submitted, graded = self.submissions
+        Submissions.grade_submission(
+            graded.id, TEACHER_ID, {"logic": 5}, "teacher feedback", 100.0
+        )
+        before = SubmissionStats.get_stat("assignment", self.assignment.id)
+        assert (before.graded_count, before.score_count) == (1, 1)
+
+        Submissions.update_ai_grades(
+            [ai_grade(submitted.id, 2), ai_grade(graded.id, 1)]
+        )
+
+        after = SubmissionStats.get_stat("assignment", self.assignment.id)
+        assert after.model_dump(exclude={"updated_at"}) == before.model_dump(
+            exclude={"updated_at"}
+        )
+
+    def test_ai_grades_keep_teacher_skill_observations(self):
+        submitted, graded = self.submissions
+        Submissions.grade_submission(
+            graded.id, TEACHER_ID, {"logic": 5}, "teacher feedback", 100.0
+        )
+        before = SkillMasteries.get_mastery_by_student_id(graded.student_id)
+        assert [mastery.count for mastery in before] == [1]
+
+        Submissions.update_ai_grades(
+            [ai_grade(submitted.id, 2), ai_grade(graded.id, 1)]
+        )
+
+        assert SkillMasteries.get_mastery_by_student_id(graded.student_id) == before
+        assert SkillMasteries.get_mastery_by_student_id(submitted.student_id) == []
+
+    def test_grading_through_update_keeps_skill_mastery_in_sync(self):
+        submission = self.submissions[1]
+
+        def get_mastery():
+            return [
+                (mastery.skill, mastery.count, mastery.score_sum)
+                for mastery in SkillMasteries.get_mastery_by_student_id(
+                    submission.student_id
+                )
+            ]
+
+        # The teacher grading route writes the rubric scores and status directly
+        Submissions.update_submission_by_id(
+            submission.id,
+            SubmissionUpdateForm(rubric_scores_json={"logic": 5}, status="graded"),
+        )
+        assert get_mastery() == [("逻辑性", 1, 1.0)]
+
+        Submissions.update_submission_by_id(
+            submission.id, SubmissionUpdateForm(rubric_scores_json={"logic": 2})
+        )
+        assert get_mastery() == [("逻辑性", 1, 0.4)]
+
+        Submissions.update_submission_by_id(
+            submission.id, SubmissionUpdateForm(status="released", feedback="ok")
+        )
+        assert get_mastery() == [("逻辑性", 1, 0.4)]
+
+        Submissions.update_submission_by_id(
+            submission.id, SubmissionUpdateForm(status="submitted")
+        )
+        assert get_mastery() == [("逻辑性", 0, 0.0)]
+
+        Submissions.grade_submission(submission.id, TEACHER_ID, {"logic": 4})
+        Submissions.delete_submission_by_id(submission.id)
+        assert get_mastery() == [("逻辑性", 0, 0.0)]
+
+    def test_rebuild_matches_incremental_stats(self):
+        Submissions.grade_submission(
+            self.submissions[1].id, TEACHER_ID, {"logic": 5}, None, 100.0
+        )
+        scopes = [("assignment", self.assignment.id), ("teacher", TEACHER_ID)]
+        incremental = [SubmissionStats.get_stat(*scope) for scope in scopes]
+
+        SchoolStats.rebuild_submission_stats()
+
+        with get_db() as db:
+            assert (
+                db.query(SubmissionStat)
+                .filter(SubmissionStat.scope_id.is_(None))
+                .count()
+                == 0
+            )
+        for scope, stat in zip(scopes, incremental):
+            assert SubmissionStats.get_stat(*scope).model_dump(
+                exclude={"updated_at"}
+            ) == stat.model_dump(exclude={"updated_at"})
+
+    def test_teacher_average_counts_ungraded_submissions(self):
+        Users.insert_new_user(
+            TEACHER_ID, "Teacher", "submission-test@example.com", role="teacher"
+        )
+        try:
+            Submissions.grade_submission(
+                self.submissions[1].id, TEACHER_ID, {"logic": 5}, None, 90.0
+            )
+            (stats,) = [
+                stats
+                for stats in SchoolStats.get_teacher_stats()
+                if stats.teacher_id == TEACHER_ID
+            ]
+            assert stats.submission_count == 2
+            assert stats.avg_student_score == 45.0
+        finally:
+            with get_db() as db:
+                db.query(User).filter_by(id=TEACHER_ID).delete()
+                db.commit()
+
+    def test_unpaged_submissions_keep_per_assignment_order(self):
+        other = Assignments.insert_new_assignment(
+            AssignmentForm(title="Other", due_date="2025-01-01"), TEACHER_ID
+        )
+        late = Submissions.insert_new_submission(
+            SubmissionForm(assignment_id=other.id, content="answer"), STUDENT_IDS[0]
+        )
+        try:
+            with get_db() as db:
+                for submitted_at, submission in enumerate(self.submissions, 1):
+                    db.query(Submission).filter_by(id=submission.id).update(
+                        {"submitted_at": submitted_at, "created_at": 10 - submitted_at}
+                    )
+                db.query(Submission).filter_by(id=late.id).update(
+                    {"submitted_at": 0, "created_at": 0}
+                )
+                db.commit()
+
+            ids = [
+                submission.id
+                for submission in Submissions.get_submissions_by_assignment_ids(
+                    [other.id, self.assignment.id]
+                )
+            ]
+            assert ids == [late.id, self.submissions[1].id, self.submissions[0].id]
+
+            page = Submissions.get_submissions_by_assignment_ids(
+                [other.id, self.assignment.id], limit=2
+            )
+            assert [submission.id for submission in page] == [
+                self.submissions[0].id,
+                self.submissions[1].id,
+            ]
+        finally:
+            Submissions.delete_submission_by_id(late.id)
+            Assignments.delete_assignment_by_id(other.id)
+
+    def test_only_submitted_rows_are_written(self):
+        Submissions.update_submission_by_id(
+            self.submissions[1].id, SubmissionUpdateForm(status="draft")
+        )
+
+        assert Submissions.update_ai_grades([]) == 0
+        assert (
+            Submissions.update_ai_grades(
+                [ai_grade(submission.id, 3) for submission in self.submissions]
+            )
+            == 1
+        )
+        assert Submissions.get_submission_by_id(self.submissions[1].id).status == (
+            "draft"
+        )
+
+    def test_bulk_job_skips_submissions_graded_while_queued(self, monkeypatch):
+        from open_webui.routers import ai_grading
+
+        queued = Submissions.get_submissions_by_assignment_id_and_status(
+            self.assignment.id, ["submitted"]
+        )
+        Submissions.grade_submission(
+            self.submissions[1].id, TEACHER_ID, {"logic": 5}, None, 100.0
+        )
+
+        graded_texts = []
+
+        async def grade_submission_with_rubric(request, user, text, *args, **kwargs):
+            graded_texts.append(text)
+            return ai_grading.AIGradeResponse(
+                rubric_scores={"logic": 2},
+                feedback_draft="AI draft",
+                total_score=40.0,
+                confidence="medium",
+            )
+
+        async def emit_bulk_grade_event(job, data=None):
+            pass
+
+        monkeypatch.setattr(
+            ai_grading, "grade_submission_with_rubric", grade_submission_with_rubric
+        )
+        monkeypatch.setattr(ai_grading, "emit_bulk_grade_event", emit_bulk_grade_event)
+
+        job = ai_grading.BulkGradeJob(
+            job_id="submission-test-job",
+            assignment_id=self.assignment.id,
+            user_id=TEACHER_ID,
+            status="queued",
+            total=len(queued),
+            started_at=0,
+        )
+        asyncio.run(
+            ai_grading.run_bulk_grade_job(
+                None,
+                None,
+                job,
+                self.assignment,
+                queued,
+                ai_grading.BulkGradeRequest(workers=2),
+            )
+        )
+
+        assert job.status == "completed"
+        assert (job.completed, job.skipped, job.failed) == (1, 1, 0)
+        assert len(graded_texts) == 1
+        assert Submissions.get_submission_by_id(self.submissions[1].id).status == (
+            "graded"
+        )
+
+    def test_ai_grade_refuses_graded_submissions(self, monkeypatch):
+        from open_webui.routers import ai_grading
+
+        submission = self.submissions[1]
+        Submissions.grade_submission(submission.id, TEACHER_ID, {"logic": 5})
+        before = SkillMasteries.get_mastery_by_student_id(submission.student_id)
+
+        async def grade_submission_with_rubric(*args, **kwargs):
+            raise AssertionError("graded submissions must not reach the LLM")
+
+        monkeypatch.setattr(
+            ai_grading, "grade_submission_with_rubric", grade_submission_with_rubric
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(
+                ai_grading.ai_grade_submission(
+                    None, submission.id, user=SimpleNamespace(role="teacher")
+                )
+            )
+        assert exc_info.value.status_code == 400
+        assert Submissions.get_submission_by_id(submission.id).rubric_scores_json == {
+            "logic": 5
+        }
+        assert SkillMasteries.get_mastery_by_student_id(submission.student_id) == before
+
+    def test_bulk_job_discards_fallback_scores(self, monkeypatch):
+        from open_webui.routers import ai_grading
+
+        async def call_llm_json(*args, **kwargs):
+            raise TimeoutError()
+
+        async def emit_bulk_grade_event(job, data=None):
+            pass
+
+        monkeypatch.setattr(ai_grading, "call_llm_json", call_llm_json)
+        monkeypatch.setattr(ai_grading, "emit_bulk_grade_event", emit_bulk_grade_event)
+
+        result = asyncio.run(
+            ai_grading.grade_submission_with_rubric(None, None, "answer", RUBRIC, 100)
+        )
+        assert result.fallback
+        assert result.confidence == "fallback"
+
+        queued = Submissions.get_submissions_by_assignment_id_and_status(
+            self.assignment.id, ["submitted"]
+        )
+        job = ai_grading.BulkGradeJob(
+            job_id="submission-test-fallback-job",
+            assignment_id=self.assignment.id,
+            user_id=TEACHER_ID,
+            status="queued",
+            total=len(queued),
+            started_at=0,
+        )
+        asyncio.run(
+            ai_grading.run_bulk_grade_job(
+                None,
+                None,
+                job,
+                self.assignment,
+                queued,
+                ai_grading.BulkGradeRequest(workers=2),
+            )
+        )
+
+        assert job.status == "completed"
+        assert (job.completed, job.skipped, job.failed) == (0, 0, 2)
+        for submission in self.submissions:
+            submission = Submissions.get_submission_by_id(submission.id)
+            assert submission.status == "submitted"
+            assert submission.rubric_scores_json is None
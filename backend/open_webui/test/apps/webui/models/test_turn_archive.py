@@ -0,0 +1,81 @@
+from open_webui.internal.db import get_db
+from open_webui.models.student_context import StudentContext
+from open_webui.models.turn_archives import TurnArchive, TurnArchives
+from open_webui.models.turns import Turn, TurnModel, Turns
+from open_webui.storage.provider import Storage
+from open_webui.utils import turn_archive
+
+USER_ID = "turn-archive-test-user"
+
+# 2020-01-01 00:00 UTC
+PERIOD_START = 1577836800
+PERIOD_END = 1580515200
+
+
+def make_turn(i: int, created_at: int) -> TurnModel:
+    return TurnModel(
+        id=f"{USER_ID}-turn-{i}",
+        session_id=f"{USER_ID}-session",
+        user_id=USER_ID,
+        role="user",
+        content=f"question {i}",
+        tool_calls=[{"name": "search"}],
+        tokens_in=1,
+        tokens_out=2,
+        cost=0,
+        created_at=created_at,
+        meta={"i": i},
+    )
+
+
+def insert_turns(turns):
+    with get_db() as db:
+        Turns.insert_turns(db, turns)
+        db.commit()
+
+
+def count_hot_turns() -> int:
+    with get_db() as db:
+        return db.query(Turn).filter_by(user_id=USER_ID).count()
+
+
+class TestArchiveMonth:
+    def setup_method(self):
+        insert_turns([make_turn(i, PERIOD_START + i * 3600) for i in range(3)])
+
+    def teardown_method(self):
+        with get_db() as db:
+            for archive in db.query(TurnArchive).filter(
+                TurnArchive.period_start == PERIOD_START
+            ):
+                Storage.delete_file(archive.path)
+                db.delete(archive)
+            for model in (Turn, StudentContext):
+                db.query(model).filter(model.user_id == USER_ID).delete()
+            db.commit()
+
+    def test_archived_turns_are_read_back_from_storage(self):
+        archive = turn_archive.archive_month(PERIOD_START, batch_size=2)
+
+        assert archive.row_count == 3
+        assert count_hot_turns() == 0
+        turns = turn_archive.get_turns_by_user_and_date(
+            USER_ID, PERIOD_START, PERIOD_END
+        )
+        assert [turn.id for turn in turns] == [f"{USER_ID}-turn-{i}" for i in range(3)]
+        assert turns[0].tool_calls == [{"name": "search"}]
+        assert turns[2].meta == {"i": 2}
+
+    def test_rows_written_after_export_roll_back_the_archive(self, monkeypatch):
+        delete_turns_in_range = Turns.delete_turns_in_range
+
+        def delete_with_late_write(db, *args, **kwargs):
+            # A turn for the month lands between the export and the delete
+            insert_turns([make_turn(3, PERIOD_START + 4 * 3600)])
+            return delete_turns_in_range(db, *args, **kwargs)
+
+        monkeypatch.setattr(Turns, "delete_turns_in_range", delete_with_late_write)
+
+        assert turn_archive.archive_month(PERIOD_START) is None
+        assert count_hot_turns() == 4
+        assert TurnArchives.get_archives_in_range(PERIOD_START, PERIOD_END) == []
@@ -0,0 +1,127 @@
+import pytest
+from open_webui.internal.db import get_db
+from open_webui.models.usage_logs import (
+    DAY_SECONDS,
+    UsageLog,
+    UsageLogModel,
+    UsageLogs,
+    UsageRollupDaily,
+)
+
+USER_ID = "usage-test-user"
+
+# 2025-01-10 00:00 UTC
+DAY = 1736467200
+
+
+def make_log(i: int, created_at: int, model: str = "gpt", mode="chat"):
+    return UsageLogModel.model_construct(
+        id=f"usage-test-{i}",
+        user_id=USER_ID,
+        model=model,
+        mode=mode,
+        tokens_in=10 + i,
+        tokens_out=100 + i,
+        cost_usd=0.25,
+        session_id=None,
+        turn_id=None,
+        created_at=created_at,
+        metadata_json={"i": i},
+    )
+
+
+LOGS = [
+    make_log(0, DAY - 1),
+    make_log(1, DAY),
+    make_log(2, DAY + 1, mode="homework"),
+    make_log(3, DAY + DAY_SECONDS - 1, model="claude"),
+    make_log(4, DAY + DAY_SECONDS),
+    make_log(5, DAY + 2 * DAY_SECONDS + 5, mode=None),
+    make_log(6, DAY + 3 * DAY_SECONDS + 7, model="claude", mode=None),
+    make_log(7, DAY + 3 * DAY_SECONDS + 7, model="claude", mode="chat"),
+]
+
+
+def expected_stats(start_time, end_time) -> dict:
+    logs = [
+        log
+        for log in LOGS
+        if (start_time is None or log.created_at >= start_time)
+        and (end_time is None or log.created_at <= end_time)
+    ]
+    by_mode = {}
+    for log in logs:
+        by_mode[log.mode or "chat"] = by_mode.get(log.mode or "chat", 0) + 1
+    return {
+        "total_requests": len(logs),
+        "total_tokens_in": sum(log.tokens_in for log in logs),
+        "total_tokens_out": sum(log.tokens_out for log in logs),
+        "by_mode": by_mode,
+    }
+
+
+def get_rollups() -> list[tuple]:
+    with get_db() as db:
+        return sorted(
+            (row.day, row.model, row.mode, row.requests, row.tokens_in, row.tokens_out)
+            for row in db.query(UsageRollupDaily).filter_by(user_id=USER_ID).all()
+        )
+
+
+class TestUsageRollups:
+    def setup_method(self):
+        with get_db() as db:
+            UsageLogs.insert_logs(db, LOGS)
+            db.commit()
+
+    def teardown_method(self):
+        with get_db() as db:
+            db.query(UsageLog).filter_by(user_id=USER_ID).delete()
+            db.query(UsageRollupDaily).filter_by(user_id=USER_ID).delete()
+            db.commit()
+
+    def test_incremental_rollup_matches_rebuild(self):
+        incremental = get_rollups()
+        assert (DAY + 3 * DAY_SECONDS, "claude", "chat", 2, 33, 213) in incremental
+
+        UsageLogs.rebuild_rollups(USER_ID)
+        assert get_rollups() == incremental
+
+    def test_rollup_upsert_accumulates(self):
+        with get_db() as db:
+            UsageLogs.insert_logs(db, [make_log(8, DAY + 5)])
+            db.commit()
+
+        assert (DAY, "gpt", "chat", 2, 29, 209) in get_rollups()
+
+    @pytest.mark.parametrize(
+        "start_time,end_time",
+        [
+            (None, None),
+            (DAY, None),
+            (None, DAY + DAY_SECONDS - 1),
+            (DAY, DAY + DAY_SECONDS - 1),
+            (DAY + 1, DAY + DAY_SECONDS),
+            (DAY - 1, DAY + 2 * DAY_SECONDS + 5),
+            (DAY + 2, DAY + DAY_SECONDS - 2),
+            (DAY + DAY_SECONDS - 1, DAY + DAY_SECONDS),
+            (DAY + 1, DAY + 4 * DAY_SECONDS),
+        ],
+    )
+    def test_partial_days_are_aggregated_from_logs(self, start_time, end_time):
+        stats = UsageLogs.get_user_stats(USER_ID, start_time, end_time)
+        expected = expected_stats(start_time, end_time)
+
+        assert stats.total_requests == expected["total_requests"]
+        assert stats.total_tokens_in == expected["total_tokens_in"]
+        assert stats.total_tokens_out == expected["total_tokens_out"]
+        assert {
+            mode: bucket["requests"] for mode, bucket in stats.by_mode.items()
+        } == expected["by_mode"]
+
+    def test_metadata_is_serialized_under_its_api_name(self):
+        with get_db() as db:
+            log = UsageLogModel.model_validate(db.get(UsageLog, "usage-test-4"))
+
+        assert log.metadata_json == {"i": 4}
+        assert log.model_dump(by_alias=True)["metadata"] == {"i": 4}
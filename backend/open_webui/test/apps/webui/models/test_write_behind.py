@@ -0,0 +1,98 @@
+import asyncio
+
+from open_webui.internal.db import get_db
+from open_webui.models.sessions import Session, SessionForm, Sessions
+from open_webui.models.student_context import StudentContext
+from open_webui.models.turns import Turn, TurnForm, Turns
+from open_webui.models.usage_logs import UsageLog, UsageLogForm, UsageRollupDaily
+from open_webui.utils.write_behind import WriteBehindRecorder
+
+USER_ID = "write-behind-test-user"
+
+
+def make_recorder(**kwargs) -> WriteBehindRecorder:
+    # A long interval so only explicit flushes write
+    return WriteBehindRecorder(
+        interval_ms=60_000, batch_size=1000, **{"max_retries": 2, **kwargs}
+    )
+
+
+def turn_form(session_id: str, content: str) -> TurnForm:
+    return TurnForm(
+        session_id=session_id, user_id=USER_ID, role="user", content=content
+    )
+
+
+class TestWriteBehindRecorder:
+    def teardown_method(self):
+        with get_db() as db:
+            for model in (Session, Turn, UsageLog, UsageRollupDaily, StudentContext):
+                db.query(model).filter(model.user_id == USER_ID).delete()
+            db.commit()
+
+    def test_buffered_turns_are_readable_before_the_flush(self):
+        async def run():
+            recorder = make_recorder()
+            recorder.start()
+            session = recorder.record_session(USER_ID, SessionForm(user_id=USER_ID))
+            # Sessions are written synchronously, so other workers see them
+            assert Sessions.get_session_by_id(session.id) is not None
+
+            turn = recorder.record_turn(turn_form(session.id, "hello"))
+            recorder.record_usage(UsageLogForm(user_id=USER_ID, model="gpt"))
+            assert Turns.get_turns_by_session_id(session.id) == []
+            assert recorder.get_pending_turns(session.id) == [turn]
+
+            await recorder.stop()
+            assert recorder.get_pending_turns(session.id) == []
+            assert [t.id for t in Turns.get_turns_by_session_id(session.id)] == [
+                turn.id
+            ]
+            assert recorder.get_stats()["records"] == 2
+
+        asyncio.run(run())
+
+    def test_failing_records_are_dead_lettered_after_retries(self, monkeypatch):
+        insert_turns = Turns.insert_turns
+
+        def failing_insert_turns(db, turns):
+            if any(turn.content == "poison" for turn in turns):
+                raise RuntimeError("bad row")
+            insert_turns(db, turns)
+
+        monkeypatch.setattr(Turns, "insert_turns", failing_insert_turns)
+
+        async def run():
+            recorder = make_recorder()
+            recorder.start()
+            session = recorder.record_session(USER_ID, SessionForm(user_id=USER_ID))
+            good = recorder.record_turn(turn_form(session.id, "good"))
+            poison = recorder.record_turn(turn_form(session.id, "poison"))
+
+            assert not await recorder.flush()
+            assert len(recorder) == 2
+
+            assert not await recorder.flush()
+            assert len(recorder) == 0
+            assert list(recorder.dead_letters) == [poison]
+            assert recorder.get_stats()["dead_lettered"] == 1
+
+            await recorder.stop()
+            return session, good
+
+        session, good = asyncio.run(run())
+        assert [t.id for t in Turns.get_turns_by_session_id(session.id)] == [good.id]
+
+    def test_full_buffer_dead_letters_new_records(self):
+        async def run():
+            recorder = make_recorder(max_buffer=2)
+            recorder.start()
+            turns = [
+                recorder.record_turn(turn_form("write-behind-test-session", str(i)))
+                for i in range(3)
+            ]
+            assert len(recorder) == 2
+            assert list(recorder.dead_letters) == [turns[2]]
+            await recorder.stop()
+
+        asyncio.run(run())
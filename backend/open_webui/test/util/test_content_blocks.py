@@ -0,0 +1,154 @@
+import random
+import time
+
+import pytest
+from open_webui.utils.content_blocks import (
+    ContentBlockSerializer,
+    render_content_blocks,
+)
+
+
+def stream_blocks(steps: int, seed: int = 0):
+    """
+    Yield the content block list the way the streaming handler mutates it:
+    deltas appended to the tail block, new blocks opened, reasoning closed
+    with a duration, tool call results attached and the tail replaced.
+    """
+    rng = random.Random(seed)
+    content_blocks = [{"type": "text", "content": ""}]
+    words = ["alpha", "beta\n", "> quoted\n", "```", "\r\n", "\n\n", "gamma ", ""]
+
+    for _ in range(steps):
+        tail = content_blocks[-1]
+        action = rng.random()
+
+        if action < 0.7 and isinstance(tail["content"], str):
+            tail["content"] += rng.choice(words)
+        elif action < 0.78:
+            content_blocks.append(
+                {"type": "reasoning", "content": "", "start_tag": "<think>"}
+            )
+        elif action < 0.82:
+            if tail["type"] == "reasoning":
+                tail["duration"] = rng.randint(1, 9)
+            content_blocks.append({"type": "text", "content": ""})
+        elif action < 0.86:
+            content_blocks.append(
+                {
+                    "type": "tool_calls",
+                    "content": [{"id": "call", "function": {"name": "f"}}],
+                }
+            )
+        elif action < 0.9:
+            for block in content_blocks:
+                if block["type"] == "tool_calls" and not block.get("results"):
+                    block["results"] = [{"tool_call_id": "call", "content": "ok"}]
+                    break
+        elif action < 0.93:
+            content_blocks.append(
+                {
+                    "type": "code_interpreter",
+                    "content": "print(1)",
+                    "attributes": {"lang": "python"},
+                }
+            )
+        elif action < 0.96 and len(content_blocks) > 1:
+            content_blocks.pop()
+        elif isinstance(tail["content"], str):
+            tail["content"] = tail["content"][: len(tail["content"]) // 2]
+
+        yield content_blocks
+
+
+class TestContentBlockSerializer:
+    @pytest.mark.parametrize("raw", [False, True])
+    @pytest.mark.parametrize("seed", range(20))
+    def test_matches_full_render(self, raw, seed):
+        serializer = ContentBlockSerializer(raw=raw)
+        for content_blocks in stream_blocks(300, seed):
+            assert serializer.serialize(content_blocks) == render_content_blocks(
+                content_blocks, raw
+            )
+
+    def test_reasoning_tail_is_quoted_incrementally(self):
+        serializer = ContentBlockSerializer()
+        block = {"type": "reasoning", "content": ""}
+        content_blocks = [{"type": "text", "content": "hi"}, block]
+
+        for line in ["first\n", "> second", " still second\n", "\n", "third"]:
+            block["content"] += line
+            assert serializer.serialize(content_blocks) == render_content_blocks(
+                content_blocks
+            )
+
+    def test_only_tail_is_rendered_per_delta(self):
+        serializer = ContentBlockSerializer()
+        content_blocks = [
+            {"type": "reasoning", "content": "thinking\n" * 100, "duration": 3},
+            {"type": "text", "content": "answer"},
+        ]
+        serializer.serialize(content_blocks)
+
+        rendered = serializer.metrics["rendered_blocks"]
+        for _ in range(100):
+            content_blocks[-1]["content"] += " more"
+            serializer.serialize(content_blocks)
+
+        assert serializer.metrics["rendered_blocks"] - rendered == 100
+        assert serializer.metrics["prefix_resets"] == 0
+
+    def test_changed_finalized_block_is_rerendered(self):
+        serializer = ContentBlockSerializer()
+        tool_block = {"type": "tool_calls", "content": [{"id": "call"}]}
+        content_blocks = [tool_block, {"type": "text", "content": "x"}]
+        serializer.serialize(content_blocks)
+
+        tool_block["results"] = [{"tool_call_id": "call", "content": "done"}]
+        assert serializer.serialize(content_blocks) == render_content_blocks(
+            content_blocks
+        )
+        assert "Tool Executed" in serializer.serialize(content_blocks)
+
+
+def benchmark(deltas: int = 20000, report_every: int = 2000):
+    """
+    Per-delta cost of streaming one long reasoning trace followed by an
+    answer, full re-render vs. ContentBlockSerializer.
+
+        python -m open_webui.test.util.test_content_blocks
+    """
+    reasoning = {"type": "reasoning", "content": "", "start_tag": "<think>"}
+    answer = {"type": "text", "content": ""}
+    serializer = ContentBlockSerializer()
+
+    print(f"{'deltas':>8} {'chars':>9} {'full us/delta':>14} {'incr us/delta':>14}")
+    full_total = incremental_total = 0.0
+    for i in range(1, deltas + 1):
+        if i == deltas // 2:
+            reasoning["duration"] = 12
+        if i < deltas // 2:
+            reasoning["content"] += "step %d of the reasoning trace\n" % i
+            content_blocks = [reasoning]
+        else:
+            answer["content"] += "token "
+            content_blocks = [reasoning, answer]
+
+        started_at = time.perf_counter()
+        render_content_blocks(content_blocks)
+        full_total += time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        serializer.serialize(content_blocks)
+        incremental_total += time.perf_counter() - started_at
+
+        if i % report_every == 0:
+            chars = len(reasoning["content"]) + len(answer["content"])
+            print(
+                f"{i:>8} {chars:>9} {full_total / report_every * 1e6:>14.1f}"
+                f" {incremental_total / report_every * 1e6:>14.1f}"
+            )
+            full_total = incremental_total = 0.0
+
+
+if __name__ == "__main__":
+    benchmark()
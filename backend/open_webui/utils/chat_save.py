@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from open_webui.env import (
+    CHAT_REALTIME_SAVE_INTERVAL_MS,
+    CHAT_REALTIME_SAVE_MAX_CHARS,
+    SRC_LOG_LEVELS,
+)
+from open_webui.models.chats import Chats
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+class ChatSaveStats:
+    """Process-wide counters for realtime chat saves, exposed to admins"""
+
+    def __init__(self, window: int = 1000):
+        self.updates = 0  # deltas handed to a buffer
+        self.flushes = 0  # actual database writes
+        self.flushed_chars = 0
+        self.errors = 0
+        self.total_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.latencies: deque[float] = deque(maxlen=window)
+
+    def record_flush(self, elapsed_ms: float, chars: int) -> None:
+        self.flushes += 1
+        self.flushed_chars += chars
+        self.total_flush_ms += elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.latencies.append(elapsed_ms)
+
+    def get_stats(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)], 3)
+
+        return {
+            "interval_ms": CHAT_REALTIME_SAVE_INTERVAL_MS,
+            "max_chars": CHAT_REALTIME_SAVE_MAX_CHARS,
+            "updates": self.updates,
+            "flushes": self.flushes,
+            "flushed_chars": self.flushed_chars,
+            "errors": self.errors,
+            # 每次写库平均合并了多少个增量
+            "updates_per_flush": (
+                round(self.updates / self.flushes, 2) if self.flushes else 0.0
+            ),
+            "avg_flush_ms": (
+                round(self.total_flush_ms / self.flushes, 3) if self.flushes else 0.0
+            ),
+            "p50_flush_ms": percentile(0.5),
+            "p95_flush_ms": percentile(0.95),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
+
+
+CHAT_SAVE_STATS = ChatSaveStats()
+
+
+class ChatMessageSaveBuffer:
+    """
+    Debounced persistence of one streaming message (chat_id, message_id).
+
+    `update()` is called on every delta with a callable that builds the
+    message fields to save; the callable only runs when a flush happens, so
+    the content is serialized once per flush instead of once per token.
+    A flush happens when `interval_ms` has passed since the last one or
+    `max_chars` characters arrived, and a timer flushes whatever is still
+    pending once the interval elapses even if the stream stalls. `close()`
+    always writes the final message, on completion as well as on cancel.
+    """
+
+    def __init__(
+        self,
+        chat_id: str,
+        message_id: str,
+        interval_ms: int = CHAT_REALTIME_SAVE_INTERVAL_MS,
+        max_chars: int = CHAT_REALTIME_SAVE_MAX_CHARS,
+        stats: ChatSaveStats = CHAT_SAVE_STATS,
+    ):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.interval = interval_ms / 1000
+        self.max_chars = max_chars
+        self.stats = stats
+
+        self._pending: Optional[Callable[[], dict]] = None
+        self._pending_chars = 0
+        self._last_flush = time.monotonic()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def update(self, get_message: Callable[[], dict], chars: int = 0) -> None:
+        self.stats.updates += 1
+        self._pending = get_message
+        self._pending_chars += chars
+
+        if (
+            time.monotonic() - self._last_flush >= self.interval
+            or self._pending_chars >= self.max_chars
+        ):
+            await self.flush()
+        elif self._timer is None:
+            delay = max(self.interval - (time.monotonic() - self._last_flush), 0)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._timer_task = asyncio.create_task(self.flush())
+
+    def _cancel_timer(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def flush(self) -> None:
+        async with self._lock:
+            self._cancel_timer()
+            if self._pending is None:
+                return
+
+            get_message, self._pending = self._pending, None
+            self._pending_chars = 0
+            self._last_flush = time.monotonic()
+
+            try:
+                message = get_message()
+                started_at = time.perf_counter()
+                await asyncio.to_thread(
+                    Chats.upsert_message_to_chat_by_id_and_message_id,
+                    self.chat_id,
+                    self.message_id,
+                    message,
+                )
+                self.stats.record_flush(
+                    (time.perf_counter() - started_at) * 1000,
+                    len(message.get("content") or ""),
+                )
+            except Exception as e:
+                self.stats.errors += 1
+                log.exception(
+                    f"Realtime save failed for {self.chat_id}/{self.message_id}: {e}"
+                )
+
+    async def close(self, message: Optional[dict] = None) -> None:
+        """Write `message` (or whatever is pending) and stop the timer"""
+        if message is not None:
+            self._pending = lambda: message
+
+        if self._timer_task is not None and not self._timer_task.done():
+            await asyncio.shield(self._timer_task)
+        await asyncio.shield(self.flush())
@@ -0,0 +1,251 @@
+import html
+import json
+from typing import Optional
+
+
+def split_content_and_whitespace(content):
+    content_stripped = content.rstrip()
+    original_whitespace = (
+        content[len(content_stripped) :] if len(content) > len(content_stripped) else ""
+    )
+    return content_stripped, original_whitespace
+
+
+def is_opening_code_block(content):
+    # An odd number of ``` means the last backticks are opening a new block
+    # (same as an even number of segments in content.split("```"), without the copies)
+    return content.count("```") % 2 == 1
+
+
+def get_reasoning_display_content(reasoning: str) -> str:
+    return "\n".join(
+        (f"> {line}" if not line.startswith(">") else line)
+        for line in reasoning.splitlines()
+    )
+
+
+def render_content_block(
+    content: str,
+    block: dict,
+    raw: bool = False,
+    reasoning_display_content: Optional[str] = None,
+) -> str:
+    """Append the rendering of one content block to `content` and return it"""
+    if block["type"] == "text":
+        block_content = block["content"].strip()
+        if block_content:
+            content = f"{content}{block_content}\n"
+    elif block["type"] == "tool_calls":
+        attributes = block.get("attributes", {})
+
+        tool_calls = block.get("content", [])
+        results = block.get("results", [])
+
+        if content and not content.endswith("\n"):
+            content += "\n"
+
+        if results:
+
+            tool_calls_display_content = ""
+            for tool_call in tool_calls:
+
+                tool_call_id = tool_call.get("id", "")
+                tool_name = tool_call.get("function", {}).get("name", "")
+                tool_arguments = tool_call.get("function", {}).get("arguments", "")
+
+                tool_result = None
+                tool_result_files = None
+                for result in results:
+                    if tool_call_id == result.get("tool_call_id", ""):
+                        tool_result = result.get("content", None)
+                        tool_result_files = result.get("files", None)
+                        break
+
+                if tool_result is not None:
+                    tool_result_embeds = result.get("embeds", "")
+                    tool_calls_display_content = f'{tool_calls_display_content}<details type="tool_calls" done="true" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}" result="{html.escape(json.dumps(tool_result, ensure_ascii=False))}" files="{html.escape(json.dumps(tool_result_files)) if tool_result_files else ""}" embeds="{html.escape(json.dumps(tool_result_embeds))}">\n<summary>Tool Executed</summary>\n</details>\n'
+                else:
+                    tool_calls_display_content = f'{tool_calls_display_content}<details type="tool_calls" done="false" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}">\n<summary>Executing...</summary>\n</details>\n'
+
+            if not raw:
+                content = f"{content}{tool_calls_display_content}"
+        else:
+            tool_calls_display_content = ""
+
+            for tool_call in tool_calls:
+                tool_call_id = tool_call.get("id", "")
+                tool_name = tool_call.get("function", {}).get("name", "")
+                tool_arguments = tool_call.get("function", {}).get("arguments", "")
+
+                tool_calls_display_content = f'{tool_calls_display_content}\n<details type="tool_calls" done="false" id="{tool_call_id}" name="{tool_name}" arguments="{html.escape(json.dumps(tool_arguments))}">\n<summary>Executing...</summary>\n</details>\n'
+
+            if not raw:
+                content = f"{content}{tool_calls_display_content}"
+
+    elif block["type"] == "reasoning":
+        if reasoning_display_content is None:
+            reasoning_display_content = get_reasoning_display_content(block["content"])
+
+        reasoning_duration = block.get("duration", None)
+
+        start_tag = block.get("start_tag", "")
+        end_tag = block.get("end_tag", "")
+
+        if content and not content.endswith("\n"):
+            content += "\n"
+
+        if reasoning_duration is not None:
+            if raw:
+                content = f'{content}{start_tag}{block["content"]}{end_tag}\n'
+            else:
+                content = f'{content}<details type="reasoning" done="true" duration="{reasoning_duration}">\n<summary>Thought for {reasoning_duration} seconds</summary>\n{reasoning_display_content}\n</details>\n'
+        else:
+            if raw:
+                content = f'{content}{start_tag}{block["content"]}{end_tag}\n'
+            else:
+                content = f'{content}<details type="reasoning" done="false">\n<summary>Thinking…</summary>\n{reasoning_display_content}\n</details>\n'
+
+    elif block["type"] == "code_interpreter":
+        attributes = block.get("attributes", {})
+        output = block.get("output", None)
+        lang = attributes.get("lang", "")
+
+        content_stripped, original_whitespace = split_content_and_whitespace(content)
+        if is_opening_code_block(content_stripped):
+            # Remove trailing backticks that would open a new block
+            content = content_stripped.rstrip("`").rstrip() + original_whitespace
+        else:
+            # Keep content as is - either closing backticks or no backticks
+            content = content_stripped + original_whitespace
+
+        if content and not content.endswith("\n"):
+            content += "\n"
+
+        if output:
+            output = html.escape(json.dumps(output))
+
+            if raw:
+                content = f'{content}<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n```output\n{output}\n```\n'
+            else:
+                content = f'{content}<details type="code_interpreter" done="true" output="{output}">\n<summary>Analyzed</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
+        else:
+            if raw:
+                content = f'{content}<code_interpreter type="code" lang="{lang}">\n{block["content"]}\n</code_interpreter>\n'
+            else:
+                content = f'{content}<details type="code_interpreter" done="false">\n<summary>Analyzing...</summary>\n```{lang}\n{block["content"]}\n```\n</details>\n'
+
+    else:
+        block_content = str(block["content"]).strip()
+        if block_content:
+            content = f"{content}{block['type']}: {block_content}\n"
+
+    return content
+
+
+def render_content_blocks(content_blocks: list, raw: bool = False) -> str:
+    """Render all content blocks from scratch"""
+    content = ""
+    for block in content_blocks:
+        content = render_content_block(content, block, raw)
+    return content.strip()
+
+
+def _get_block_signature(block: dict) -> tuple:
+    """
+    Cheap fingerprint of the block fields that affect its rendering, used to
+    detect a cached block that was changed in place after it was rendered.
+    Lengths rather than contents, so checking it does not depend on the
+    size of the response.
+    """
+    content = block.get("content")
+    return (
+        block.get("type"),
+        len(content) if isinstance(content, (str, list)) else repr(content),
+        block.get("duration"),
+        len(block.get("results") or []),
+        id(block.get("output")),
+        id(block.get("attributes")),
+    )
+
+
+class ContentBlockSerializer:
+    """
+    Incremental `render_content_blocks` for one streaming response.
+
+    Every block except the last is treated as finalized: its rendering is
+    appended once to a cached prefix and only the open tail block is
+    re-rendered per call. For an open reasoning block the quoted lines that
+    are complete are cached as well, so a long reasoning trace is not
+    re-quoted on every delta. Cached blocks are checked by identity and a
+    cheap signature, and anything that no longer matches (a block replaced,
+    removed or changed in place) falls back to rendering the prefix again,
+    so the output is always identical to `render_content_blocks`.
+    """
+
+    def __init__(self, raw: bool = False):
+        self.raw = raw
+
+        self._prefix = ""
+        self._prefix_blocks: list[tuple[dict, tuple]] = []
+
+        # (block, its content, end of its complete lines, their display content)
+        # for the open reasoning block
+        self._reasoning: Optional[tuple[dict, str, int, str]] = None
+
+        self.metrics = {"calls": 0, "rendered_blocks": 0, "prefix_resets": 0}
+
+    def _is_prefix_valid(self, content_blocks: list) -> bool:
+        if len(content_blocks) - 1 < len(self._prefix_blocks):
+            return False
+        for (block, signature), current in zip(self._prefix_blocks, content_blocks):
+            if block is not current or signature != _get_block_signature(current):
+                return False
+        return True
+
+    def _get_reasoning_display_content(self, block: dict) -> str:
+        reasoning = block["content"]
+        boundary = reasoning.rfind("\n") + 1
+
+        # Lines up to the last newline are complete and quoted only once
+        cached = self._reasoning
+        if cached and cached[0] is block and reasoning.startswith(cached[1]):
+            _, _, cached_boundary, display = cached
+            if boundary > cached_boundary:
+                added = get_reasoning_display_content(
+                    reasoning[cached_boundary:boundary]
+                )
+                display = (
+                    f"{display}\n{added}" if display and added else display + added
+                )
+        else:
+            display = get_reasoning_display_content(reasoning[:boundary])
+        self._reasoning = (block, reasoning, boundary, display)
+
+        rest = get_reasoning_display_content(reasoning[boundary:])
+        return f"{display}\n{rest}" if display and rest else display + rest
+
+    def serialize(self, content_blocks: list) -> str:
+        self.metrics["calls"] += 1
+
+        if not self._is_prefix_valid(content_blocks):
+            self.metrics["prefix_resets"] += 1
+            self._prefix = ""
+            self._prefix_blocks = []
+
+        for block in content_blocks[len(self._prefix_blocks) : -1]:
+            self._prefix = render_content_block(self._prefix, block, self.raw)
+            self._prefix_blocks.append((block, _get_block_signature(block)))
+            self.metrics["rendered_blocks"] += 1
+
+        if not content_blocks:
+            return self._prefix.strip()
+
+        tail = content_blocks[-1]
+        reasoning_display_content = None
+        if tail.get("type") == "reasoning" and isinstance(tail.get("content"), str):
+            reasoning_display_content = self._get_reasoning_display_content(tail)
+
+        self.metrics["rendered_blocks"] += 1
+        return render_content_block(
+            self._prefix, tail, self.raw, reasoning_display_content
+        ).strip()
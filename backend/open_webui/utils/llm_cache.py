@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Optional
+
+from open_webui.env import (
+    AI_GRADING_CACHE_BACKEND,
+    AI_GRADING_CACHE_MAX_ENTRIES,
+    AI_GRADING_CACHE_TTL,
+    REDIS_KEY_PREFIX,
+    SRC_LOG_LEVELS,
+)
+from open_webui.models.llm_cache import LLMCache
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+REDIS_CACHE_KEY = f"{REDIS_KEY_PREFIX}:llm_cache"
+REDIS_CACHE_LRU_KEY = f"{REDIS_KEY_PREFIX}:llm_cache:lru"
+
+# The database backend counts rows to evict, so run it once per this many sets
+DB_EVICT_INTERVAL = 100
+
+
+def get_cache_key(namespace: str, model: str, messages: list) -> str:
+    """Content hash of everything that determines the model output."""
+    payload = json.dumps(
+        {"namespace": namespace, "model": model, "messages": messages},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResultCache:
+    """
+    Persistent cache for deterministic LLM results (AI grading, rubric generation).
+
+    Entries are stored in Redis when available, otherwise in the database.
+    Both backends expire entries after `ttl` seconds and evict the least
+    recently used entries beyond `max_entries`. Database eviction runs
+    every `DB_EVICT_INTERVAL` sets, so the table may briefly exceed
+    `max_entries` by that many rows.
+    """
+
+    def __init__(
+        self,
+        backend: str = "auto",
+        ttl: Optional[int] = None,
+        max_entries: Optional[int] = None,
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "sets": 0, "errors": 0}
+        self._sets_since_evict = 0
+
+    def _get_redis(self, request):
+        if self.backend not in ("auto", "redis") or request is None:
+            return None
+        return getattr(request.app.state, "redis", None)
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend != "none"
+
+    async def get(self, request, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+
+        try:
+            redis = self._get_redis(request)
+            if redis is not None:
+                value = await redis.get(f"{REDIS_CACHE_KEY}:{key}")
+                if value is not None:
+                    await redis.zadd(REDIS_CACHE_LRU_KEY, {key: time.time()})
+                    value = json.loads(value)
+            else:
+                value = await asyncio.to_thread(LLMCache.get, key)
+        except Exception as e:
+            log.warning(f"LLM cache get failed: {e}")
+            self.stats["errors"] += 1
+            value = None
+
+        self.stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    async def set(self, request, key: str, namespace: str, value: dict) -> None:
+        if not self.enabled:
+            return
+
+        try:
+            redis = self._get_redis(request)
+            if redis is not None:
+                await redis.set(
+                    f"{REDIS_CACHE_KEY}:{key}",
+                    json.dumps(value, ensure_ascii=False),
+                    ex=self.ttl,
+                )
+                now = time.time()
+                await redis.zadd(REDIS_CACHE_LRU_KEY, {key: now})
+                if self.ttl:
+                    # Values expire on their own; drop LRU members that were not
+                    # touched within the ttl so they don't count toward the cap
+                    await redis.zremrangebyscore(
+                        REDIS_CACHE_LRU_KEY, "-inf", now - self.ttl
+                    )
+                if self.max_entries:
+                    overflow = await redis.zcard(REDIS_CACHE_LRU_KEY) - self.max_entries
+                    if overflow > 0:
+                        evicted = await redis.zpopmin(REDIS_CACHE_LRU_KEY, overflow)
+                        if evicted:
+                            await redis.delete(
+                                *[f"{REDIS_CACHE_KEY}:{k}" for k, _ in evicted]
+                            )
+            else:
+                await asyncio.to_thread(LLMCache.set, key, namespace, value, self.ttl)
+                self._sets_since_evict += 1
+                if self._sets_since_evict >= DB_EVICT_INTERVAL:
+                    self._sets_since_evict = 0
+                    await asyncio.to_thread(LLMCache.evict, self.max_entries)
+            self.stats["sets"] += 1
+        except Exception as e:
+            log.warning(f"LLM cache set failed: {e}")
+            self.stats["errors"] += 1
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "backend": self.backend,
+            "ttl": self.ttl,
+            "max_entries": self.max_entries,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+
+AI_GRADING_CACHE = LLMResultCache(
+    backend=AI_GRADING_CACHE_BACKEND,
+    ttl=AI_GRADING_CACHE_TTL,
+    max_entries=AI_GRADING_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,243 @@
+import logging
+from typing import Callable, Optional
+
+from pydantic import BaseModel
+
+from open_webui.config import RAG_EMBEDDING_CONTENT_PREFIX, RAG_EMBEDDING_QUERY_PREFIX
+from open_webui.env import SRC_LOG_LEVELS
+from open_webui.models.longterm_memory import LongtermMemories, LongtermMemoryModel
+from open_webui.retrieval.vector.factory import VECTOR_DB_CLIENT
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+# 向量库不支持过滤检索时多取一些候选，在 Python 中过滤后仍能凑够 k 条
+SEARCH_OVERSAMPLE = 4
+SEARCH_MAX_CANDIDATES = 200
+
+
+class LongtermMemorySearchResult(BaseModel):
+    memory: LongtermMemoryModel
+    score: Optional[float] = None  # 语义相似度，标签/时间回退结果为 None
+
+
+def get_collection_name(user_id: str) -> str:
+    return f"longterm-memory-{user_id}"
+
+
+def get_tag_key(tag: str) -> str:
+    """每个标签单独存成一个 metadata 键，便于向量库按等值条件过滤"""
+    return f"tag_{tag}"
+
+
+def get_index_metadata(memory: LongtermMemoryModel) -> dict:
+    return {
+        "namespace": memory.namespace,
+        "tags": ",".join(memory.tags),
+        **{get_tag_key(tag): True for tag in memory.tags},
+        "created_at": memory.created_at,
+        "updated_at": memory.updated_at,
+    }
+
+
+def index_memories(
+    embedding_function: Optional[Callable],
+    memories: list[LongtermMemoryModel],
+    user=None,
+) -> int:
+    """
+    把长期记忆写入向量库（每个用户一个 collection）
+    向量库只是检索索引，写入失败不影响数据库中的记忆，可通过 reindex 修复
+    """
+    if embedding_function is None or not memories:
+        return 0
+
+    by_user: dict[str, list[LongtermMemoryModel]] = {}
+    for memory in memories:
+        by_user.setdefault(memory.user_id, []).append(memory)
+
+    indexed = 0
+    for user_id, user_memories in by_user.items():
+        try:
+            vectors = embedding_function(
+                [memory.text for memory in user_memories],
+                prefix=RAG_EMBEDDING_CONTENT_PREFIX,
+                user=user,
+            )
+            VECTOR_DB_CLIENT.upsert(
+                collection_name=get_collection_name(user_id),
+                items=[
+                    {
+                        "id": memory.id,
+                        "text": memory.text,
+                        "vector": vector,
+                        "metadata": get_index_metadata(memory),
+                    }
+                    for memory, vector in zip(user_memories, vectors)
+                ],
+            )
+            indexed += len(user_memories)
+        except Exception as e:
+            log.warning(f"Failed to index longterm memories for user {user_id}: {e}")
+
+    return indexed
+
+
+def delete_memory_from_index(user_id: str, memory_id: str) -> None:
+    try:
+        VECTOR_DB_CLIENT.delete(
+            collection_name=get_collection_name(user_id), ids=[memory_id]
+        )
+    except Exception as e:
+        log.warning(f"Failed to delete longterm memory {memory_id} from index: {e}")
+
+
+def update_memory_index(
+    embedding_function: Optional[Callable], memory: LongtermMemoryModel, user=None
+) -> None:
+    if not index_memories(embedding_function, [memory], user):
+        # 无法重新生成向量时移除旧向量，避免按过期文本命中，可通过 reindex 恢复
+        delete_memory_from_index(memory.user_id, memory.id)
+
+
+def reindex_user_memories(embedding_function: Callable, user_id: str, user=None) -> int:
+    try:
+        VECTOR_DB_CLIENT.delete_collection(get_collection_name(user_id))
+    except Exception as e:
+        log.debug(f"No longterm memory collection to reset for {user_id}: {e}")
+
+    return index_memories(
+        embedding_function, LongtermMemories.get_memories_by_user_id(user_id), user
+    )
+
+
+def _get_search_filters(
+    tags: Optional[list[str]], namespace: Optional[str]
+) -> list[Optional[dict]]:
+    """标签之间是"任一命中"，每个标签一个等值过滤条件，分别检索后合并"""
+    base = {"namespace": namespace} if namespace else {}
+    if tags:
+        return [{**base, get_tag_key(tag): True} for tag in tags]
+    return [base or None]
+
+
+def _search_index(
+    user_id: str,
+    vector: list,
+    k: int,
+    tags: Optional[list[str]],
+    namespace: Optional[str],
+) -> list[tuple[str, Optional[float]]]:
+    """
+    在向量库中检索，返回按相似度排序的 (id, score)
+    支持过滤检索的向量库把标签/namespace 条件下推；否则多取候选，由调用方过滤
+    """
+    collection_name = get_collection_name(user_id)
+    if not getattr(VECTOR_DB_CLIENT, "supports_search_filter", False):
+        limit = k
+        if tags or namespace:
+            limit = min(k * SEARCH_OVERSAMPLE, SEARCH_MAX_CANDIDATES)
+        results = [
+            VECTOR_DB_CLIENT.search(
+                collection_name=collection_name, vectors=[vector], limit=limit
+            )
+        ]
+    else:
+        results = [
+            VECTOR_DB_CLIENT.search(
+                collection_name=collection_name,
+                vectors=[vector],
+                limit=k,
+                filter=filter,
+            )
+            for filter in _get_search_filters(tags, namespace)
+        ]
+
+    scores: dict[str, Optional[float]] = {}
+    for result in results:
+        if not result or not result.ids:
+            continue
+        ids = result.ids[0]
+        distances = (result.distances or [[None] * len(ids)])[0]
+        for id, distance in zip(ids, distances):
+            if id not in scores or (distance or 0) > (scores[id] or 0):
+                scores[id] = distance
+
+    if len(results) == 1:
+        return list(scores.items())
+    # 多个标签分别检索的结果按分数（越大越相似）合并
+    return sorted(scores.items(), key=lambda item: item[1] or 0, reverse=True)
+
+
+def _matches(
+    memory: LongtermMemoryModel,
+    user_id: str,
+    tags: Optional[list[str]],
+    namespace: Optional[str],
+) -> bool:
+    if memory.user_id != user_id:
+        return False
+    if namespace and memory.namespace != namespace:
+        return False
+    if tags and not any(tag in memory.tags for tag in tags):
+        return False
+    return True
+
+
+def search_longterm_memories(
+    embedding_function: Optional[Callable],
+    user_id: str,
+    query: Optional[str] = None,
+    tags: Optional[list[str]] = None,
+    namespace: Optional[str] = None,
+    k: int = 5,
+    user=None,
+) -> list[LongtermMemorySearchResult]:
+    """
+    混合检索：语义 top-k + 标签/namespace 过滤
+
+    - 有 query 时在该用户的向量 collection 中检索，标签和 namespace 作为向量库过滤条件
+      （向量库不支持时退回到多取候选后在 Python 中过滤）
+    - 没有 query、向量库不可用或候选不足 k 条时，用标签过滤（按更新时间）补齐
+    """
+    results: list[LongtermMemorySearchResult] = []
+
+    if query and embedding_function is not None:
+        try:
+            vector = embedding_function(
+                query, prefix=RAG_EMBEDDING_QUERY_PREFIX, user=user
+            )
+            hits = _search_index(user_id, vector, k, tags, namespace)
+        except Exception as e:
+            log.warning(f"Longterm memory vector search failed for {user_id}: {e}")
+            hits = []
+
+        if hits:
+            memories = {
+                memory.id: memory
+                for memory in LongtermMemories.get_memories_by_ids(
+                    [id for id, _ in hits]
+                )
+            }
+
+            for id, score in hits:
+                memory = memories.get(id)
+                if memory and _matches(memory, user_id, tags, namespace):
+                    results.append(
+                        LongtermMemorySearchResult(memory=memory, score=score)
+                    )
+                    if len(results) >= k:
+                        return results
+
+    if len(results) < k:
+        seen = {result.memory.id for result in results}
+        for memory in LongtermMemories.search_memories_by_tags(
+            user_id, tags or [], limit=k + len(seen), namespace=namespace
+        ):
+            if memory.id not in seen:
+                results.append(LongtermMemorySearchResult(memory=memory))
+                if len(results) >= k:
+                    break
+
+    return results
@@ -0,0 +1,397 @@
+import logging
+import threading
+import time
+from typing import Optional, Sequence
+
+from sqlalchemy import update
+
+from open_webui.config import TIKTOKEN_ENCODING_NAME
+from open_webui.env import LLM_MODEL_PRICES, LLM_MODEL_TOKENIZERS, SRC_LOG_LEVELS
+from open_webui.internal.db import get_db
+from open_webui.models.turns import Turn
+from open_webui.models.usage_logs import UsageLog, UsageLogs
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+
+####################
+# Price Table
+####################
+
+# 美元 / 百万 tokens：(输入, 输出)，按最长前缀匹配模型 id
+DEFAULT_MODEL_PRICES = {
+    "gpt-5": (1.25, 10.0),
+    "gpt-5-mini": (0.25, 2.0),
+    "gpt-5-nano": (0.05, 0.4),
+    "gpt-4.1": (2.0, 8.0),
+    "gpt-4.1-mini": (0.4, 1.6),
+    "gpt-4.1-nano": (0.1, 0.4),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-3.5-turbo": (0.5, 1.5),
+    "o1": (15.0, 60.0),
+    "o3": (2.0, 8.0),
+    "o3-mini": (1.1, 4.4),
+    "o4-mini": (1.1, 4.4),
+}
+
+# turn.cost 以微分（百万分之一美分）为单位存储整数
+TURN_COST_UNITS_PER_USD = 100 * 1_000_000
+
+
+def _load_prices() -> dict[str, tuple[float, float]]:
+    prices = dict(DEFAULT_MODEL_PRICES)
+    for model, price in (LLM_MODEL_PRICES or {}).items():
+        try:
+            if isinstance(price, dict):
+                prices[model] = (float(price["input"]), float(price["output"]))
+            else:
+                prices[model] = (float(price[0]), float(price[1]))
+        except Exception as e:
+            log.warning(f"Ignoring invalid price for model {model}: {e}")
+    return prices
+
+
+MODEL_PRICES = _load_prices()
+
+
+def _normalize_model_id(model: Optional[str]) -> str:
+    # 去掉 "openai/gpt-4o" 这类连接前缀
+    return (model or "").lower().rsplit("/", 1)[-1]
+
+
+def _match_prefix(model: Optional[str], table: dict):
+    model_id = _normalize_model_id(model)
+    best = None
+    for prefix in table:
+        if model_id.startswith(prefix.lower()) and (
+            best is None or len(prefix) > len(best)
+        ):
+            best = prefix
+    return table[best] if best is not None else None
+
+
+def get_model_price(model: Optional[str]) -> Optional[tuple[float, float]]:
+    return _match_prefix(model, MODEL_PRICES)
+
+
+def compute_cost_usd(model: Optional[str], tokens_in: int, tokens_out: int) -> float:
+    """未知模型的成本记为 0"""
+    price = get_model_price(model)
+    if price is None:
+        return 0.0
+    return (tokens_in * price[0] + tokens_out * price[1]) / 1_000_000
+
+
+def usd_to_turn_cost(cost_usd: float) -> int:
+    return int(round(cost_usd * TURN_COST_UNITS_PER_USD))
+
+
+####################
+# Tokenizers
+####################
+
+# 模型前缀到 tokenizer，未匹配的模型使用 TIKTOKEN_ENCODING_NAME
+DEFAULT_MODEL_TOKENIZERS = {
+    "gpt-5": "o200k_base",
+    "gpt-4.1": "o200k_base",
+    "gpt-4o": "o200k_base",
+    "o1": "o200k_base",
+    "o3": "o200k_base",
+    "o4": "o200k_base",
+    "gpt-4": "cl100k_base",
+    "gpt-3.5": "cl100k_base",
+}
+
+MODEL_TOKENIZERS = {**DEFAULT_MODEL_TOKENIZERS, **(LLM_MODEL_TOKENIZERS or {})}
+
+
+class EstimateTokenizer:
+    """tokenizer 不可用时的估算：非 ASCII 字符按 1 token，ASCII 按 4 字符 1 token"""
+
+    name = "estimate"
+
+    def count_batch(self, texts: Sequence[str]) -> list[int]:
+        counts = []
+        for text in texts:
+            non_ascii = sum(1 for ch in text if ord(ch) > 127)
+            ascii_chars = len(text) - non_ascii
+            counts.append(non_ascii + (ascii_chars + 3) // 4)
+        return counts
+
+
+class TiktokenTokenizer:
+    def __init__(self, name: str):
+        import tiktoken
+
+        self.name = name
+        self.encoding = tiktoken.get_encoding(name)
+
+    def count_batch(self, texts: Sequence[str]) -> list[int]:
+        # encode_ordinary 不会因文本中出现 "<|endoftext|>" 等特殊标记而报错，
+        # batch 版本在线程池中并行编码
+        return [
+            len(tokens) for tokens in self.encoding.encode_ordinary_batch(list(texts))
+        ]
+
+
+class HFTokenizer:
+    def __init__(self, name: str):
+        from tokenizers import Tokenizer
+
+        self.name = name
+        self.tokenizer = Tokenizer.from_pretrained(name.removeprefix("hf:"))
+
+    def count_batch(self, texts: Sequence[str]) -> list[int]:
+        return [
+            len(encoding.ids)
+            for encoding in self.tokenizer.encode_batch(
+                list(texts), add_special_tokens=False
+            )
+        ]
+
+
+_tokenizers: dict[str, object] = {}
+_tokenizers_lock = threading.Lock()
+
+
+def get_tokenizer_name(model: Optional[str] = None) -> str:
+    return _match_prefix(model, MODEL_TOKENIZERS) or str(TIKTOKEN_ENCODING_NAME.value)
+
+
+def get_tokenizer(name: str):
+    """按编码名懒加载并缓存 tokenizer，加载失败时缓存估算器，避免反复重试"""
+    tokenizer = _tokenizers.get(name)
+    if tokenizer is not None:
+        return tokenizer
+
+    with _tokenizers_lock:
+        tokenizer = _tokenizers.get(name)
+        if tokenizer is None:
+            try:
+                if name.startswith("hf:"):
+                    tokenizer = HFTokenizer(name)
+                else:
+                    tokenizer = TiktokenTokenizer(name)
+            except Exception as e:
+                log.warning(f"Tokenizer {name} unavailable, estimating tokens: {e}")
+                tokenizer = EstimateTokenizer()
+            _tokenizers[name] = tokenizer
+    return tokenizer
+
+
+def count_tokens_batch(
+    texts: Sequence[Optional[str]], model: Optional[str] = None
+) -> list[int]:
+    """一次编码多条文本（同一模型），空文本计 0"""
+    tokenizer = get_tokenizer(get_tokenizer_name(model))
+
+    indexes = [i for i, text in enumerate(texts) if text]
+    counts = [0] * len(texts)
+    if indexes:
+        for i, count in zip(
+            indexes, tokenizer.count_batch([texts[i] for i in indexes])
+        ):
+            counts[i] = count
+    return counts
+
+
+def count_tokens(text: Optional[str], model: Optional[str] = None) -> int:
+    return count_tokens_batch([text], model)[0]
+
+
+def count_tokens_by_model(items: Sequence[tuple[Optional[str], Optional[str]]]):
+    """[(model, text)] → 与输入同序的 token 数，按模型分组批量编码"""
+    groups: dict[str, list[int]] = {}
+    for i, (model, _) in enumerate(items):
+        groups.setdefault(get_tokenizer_name(model), []).append(i)
+
+    counts = [0] * len(items)
+    for name, indexes in groups.items():
+        # 同一 tokenizer 的模型共用一次批量编码
+        model = items[indexes[0]][0]
+        for i, count in zip(
+            indexes, count_tokens_batch([items[i][1] for i in indexes], model)
+        ):
+            counts[i] = count
+    return counts
+
+
+####################
+# Backfill
+####################
+
+
+def _iter_chunks(db_model, batch_size: int, columns):
+    """按主键游标分批读取，每批单独查询"""
+    last_id = None
+    while True:
+        with get_db() as db:
+            query = db.query(*columns)
+            if last_id is not None:
+                query = query.filter(db_model.id > last_id)
+            rows = query.order_by(db_model.id.asc()).limit(batch_size).all()
+
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield rows
+        if len(rows) < batch_size:
+            return
+
+
+def _get_prompt_turns(db, turns) -> dict[str, str]:
+    """每个 assistant turn 对应的 user turn 内容（meta.user_turn_id，或同 session 中之前最近的一条）"""
+    prompts = {}
+
+    user_turn_ids = {
+        turn.meta.get("user_turn_id")
+        for turn in turns
+        if isinstance(turn.meta, dict) and turn.meta.get("user_turn_id")
+    }
+    by_id = dict(
+        db.query(Turn.id, Turn.content).filter(Turn.id.in_(user_turn_ids)).all()
+        if user_turn_ids
+        else []
+    )
+
+    session_user_turns: dict[str, list] = {}
+    for row in (
+        db.query(Turn.session_id, Turn.created_at, Turn.content)
+        .filter(
+            Turn.session_id.in_({turn.session_id for turn in turns}),
+            Turn.role == "user",
+        )
+        .order_by(Turn.created_at.asc())
+        .all()
+    ):
+        session_user_turns.setdefault(row.session_id, []).append(row)
+
+    for turn in turns:
+        user_turn_id = (turn.meta or {}).get("user_turn_id")
+        if user_turn_id in by_id:
+            prompts[turn.id] = by_id[user_turn_id]
+            continue
+        previous = [
+            row
+            for row in session_user_turns.get(turn.session_id, [])
+            if row.created_at <= turn.created_at
+        ]
+        prompts[turn.id] = previous[-1].content if previous else ""
+    return prompts
+
+
+def backfill_token_usage(batch_size: int = 500, recount: bool = False) -> dict:
+    """
+    分批重算已有 turn / usage_log 的 tokens 和成本，并重建日用量聚合
+
+    - assistant turn：tokens 来自上游 usage（meta.usage_source == "provider"）的保留，
+      其余用 tokenizer 重新计数（recount=True 时全部重新计数）；成本一律按价格表重算
+    - usage_log：有 turn_id 的同步对应 turn 的 tokens，再按价格表计算 cost_usd
+    每批一个事务，可重复执行
+    """
+    started_at = time.monotonic()
+    stats = {"turns": 0, "usage_logs": 0, "rollups": 0}
+
+    turn_columns = [
+        Turn.id,
+        Turn.session_id,
+        Turn.role,
+        Turn.content,
+        Turn.model,
+        Turn.tokens_in,
+        Turn.tokens_out,
+        Turn.created_at,
+        Turn.meta,
+    ]
+    for rows in _iter_chunks(Turn, batch_size, turn_columns):
+        turns = [row for row in rows if row.role == "assistant"]
+        if not turns:
+            continue
+
+        with get_db() as db:
+            stale = [
+                turn
+                for turn in turns
+                if recount or (turn.meta or {}).get("usage_source") != "provider"
+            ]
+            prompts = _get_prompt_turns(db, stale) if stale else {}
+            counts = count_tokens_by_model(
+                [(turn.model, prompts[turn.id]) for turn in stale]
+                + [(turn.model, turn.content) for turn in stale]
+            )
+            recounted = {
+                turn.id: (counts[i], counts[len(stale) + i])
+                for i, turn in enumerate(stale)
+            }
+
+            values = []
+            for turn in turns:
+                tokens_in, tokens_out = recounted.get(
+                    turn.id, (turn.tokens_in or 0, turn.tokens_out or 0)
+                )
+                meta = dict(turn.meta or {})
+                if turn.id in recounted:
+                    meta["usage_source"] = "tokenizer"
+                values.append(
+                    {
+                        "id": turn.id,
+                        "tokens_in": tokens_in,
+                        "tokens_out": tokens_out,
+                        "cost": usd_to_turn_cost(
+                            compute_cost_usd(turn.model, tokens_in, tokens_out)
+                        ),
+                        "meta": meta,
+                    }
+                )
+
+            db.execute(update(Turn), values)
+            db.commit()
+            stats["turns"] += len(values)
+
+    log_columns = [
+        UsageLog.id,
+        UsageLog.model,
+        UsageLog.tokens_in,
+        UsageLog.tokens_out,
+        UsageLog.turn_id,
+    ]
+    for rows in _iter_chunks(UsageLog, batch_size, log_columns):
+        with get_db() as db:
+            turn_ids = {row.turn_id for row in rows if row.turn_id}
+            turn_tokens = (
+                {
+                    row.id: (row.tokens_in or 0, row.tokens_out or 0)
+                    for row in db.query(Turn.id, Turn.tokens_in, Turn.tokens_out)
+                    .filter(Turn.id.in_(turn_ids))
+                    .all()
+                }
+                if turn_ids
+                else {}
+            )
+
+            values = []
+            for row in rows:
+                tokens_in, tokens_out = turn_tokens.get(
+                    row.turn_id, (row.tokens_in or 0, row.tokens_out or 0)
+                )
+                values.append(
+                    {
+                        "id": row.id,
+                        "tokens_in": tokens_in,
+                        "tokens_out": tokens_out,
+                        "cost_usd": compute_cost_usd(row.model, tokens_in, tokens_out),
+                    }
+                )
+
+            db.execute(update(UsageLog), values)
+            db.commit()
+            stats["usage_logs"] += len(values)
+
+    # 明细的 tokens / 成本变了，日聚合整体重建
+    stats["rollups"] = UsageLogs.rebuild_rollups()
+    stats["elapsed_ms"] = round((time.monotonic() - started_at) * 1000, 2)
+    log.info(f"Token usage backfill finished: {stats}")
+    return stats
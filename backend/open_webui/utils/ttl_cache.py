@@ -0,0 +1,101 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Callable, Optional
+
+from open_webui.env import REDIS_KEY_PREFIX, SRC_LOG_LEVELS
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MAIN"])
+
+
+class TTLCache:
+    """
+    Short-lived cache for JSON-serializable read results.
+
+    Uses Redis when the app has a connection (shared across workers),
+    otherwise a per-process dict. Values expire after `ttl` seconds;
+    a ttl of 0 disables caching.
+    """
+
+    def __init__(self, namespace: str, ttl: int):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.prefix = f"{REDIS_KEY_PREFIX}:ttl_cache:{namespace}"
+        self._local: dict[str, tuple[float, Any]] = {}
+
+    def _get_redis(self, request):
+        if request is None:
+            return None
+        return getattr(request.app.state, "redis", None)
+
+    async def get(self, request, key: str) -> Optional[Any]:
+        if not self.ttl:
+            return None
+
+        redis = self._get_redis(request)
+        if redis is not None:
+            try:
+                value = await redis.get(f"{self.prefix}:{key}")
+                return json.loads(value) if value is not None else None
+            except Exception as e:
+                log.warning(f"TTL cache get failed: {e}")
+                return None
+
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._local.pop(key, None)
+            return None
+        return value
+
+    async def set(self, request, key: str, value: Any) -> None:
+        if not self.ttl:
+            return
+
+        redis = self._get_redis(request)
+        if redis is not None:
+            try:
+                await redis.set(
+                    f"{self.prefix}:{key}",
+                    json.dumps(value, ensure_ascii=False),
+                    ex=self.ttl,
+                )
+            except Exception as e:
+                log.warning(f"TTL cache set failed: {e}")
+            return
+
+        now = time.monotonic()
+        # 顺带清理过期条目，防止 key 组合（分页参数）无限增长
+        for k in [k for k, (expires_at, _) in self._local.items() if expires_at <= now]:
+            self._local.pop(k, None)
+        self._local[key] = (now + self.ttl, value)
+
+    async def get_or_set(self, request, key: str, loader: Callable[[], Any]) -> Any:
+        value = await self.get(request, key)
+        if value is None:
+            # loader 是同步的数据库查询，放到线程里执行以免阻塞事件循环
+            value = await asyncio.to_thread(loader)
+            await self.set(request, key, value)
+        return value
+
+    async def invalidate(self, request, key: Optional[str] = None) -> None:
+        redis = self._get_redis(request)
+        if redis is not None:
+            try:
+                if key is not None:
+                    await redis.delete(f"{self.prefix}:{key}")
+                else:
+                    keys = [k async for k in redis.scan_iter(match=f"{self.prefix}:*")]
+                    if keys:
+                        await redis.delete(*keys)
+            except Exception as e:
+                log.warning(f"TTL cache invalidate failed: {e}")
+
+        if key is not None:
+            self._local.pop(key, None)
+        else:
+            self._local.clear()
@@ -0,0 +1,307 @@
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional, Sequence, Union
+
+from sqlalchemy import func, tuple_
+
+from open_webui.env import (
+    SRC_LOG_LEVELS,
+    TURN_ARCHIVE_BATCH_SIZE,
+    TURN_ARCHIVE_HORIZON_DAYS,
+)
+from open_webui.internal.db import get_db
+from open_webui.models.turn_archives import TurnArchiveModel, TurnArchives
+from open_webui.models.turns import (
+    Turn,
+    TurnModel,
+    Turns,
+    get_month_start,
+    get_next_month_start,
+)
+from open_webui.storage.provider import Storage
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+DAY_SECONDS = 24 * 60 * 60
+
+# 归档文件中以 JSON 字符串保存的列
+JSON_COLUMNS = ("tool_calls", "meta")
+
+# 热表至少保留的天数：归档按整月删除，避免删到仍可能写入的当月数据
+MIN_HORIZON_DAYS = 31
+
+
+def get_archive_schema():
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("id", pa.string()),
+            ("session_id", pa.string()),
+            ("user_id", pa.string()),
+            ("assignment_id", pa.string()),
+            ("mode", pa.string()),
+            ("role", pa.string()),
+            ("content", pa.string()),
+            ("tool_calls", pa.string()),
+            ("model", pa.string()),
+            ("tokens_in", pa.int64()),
+            ("tokens_out", pa.int64()),
+            ("cost", pa.int64()),
+            ("created_at", pa.int64()),
+            ("meta", pa.string()),
+        ]
+    )
+
+
+####################
+# Archival
+####################
+
+
+def _iter_month_rows(
+    period_start: int, period_end: int, batch_size: int
+) -> Iterator[List[dict]]:
+    """
+    按 (user_id, created_at, id) 游标分批读取一个月的 turns
+
+    文件内按用户有序，每批一个 row group，读取单个用户时可按统计信息跳过其他 row group
+    """
+    user_id = func.coalesce(Turn.user_id, "")
+    cursor = None
+    while True:
+        with get_db() as db:
+            query = db.query(Turn, user_id.label("user_id")).filter(
+                Turn.created_at >= period_start, Turn.created_at < period_end
+            )
+            if cursor is not None:
+                query = query.filter(tuple_(user_id, Turn.created_at, Turn.id) > cursor)
+            rows = (
+                query.order_by(user_id, Turn.created_at, Turn.id)
+                .limit(batch_size)
+                .all()
+            )
+
+        if not rows:
+            return
+
+        last_turn, last_user_id = rows[-1]
+        cursor = (last_user_id, last_turn.created_at, last_turn.id)
+        yield [
+            {
+                "id": turn.id,
+                "session_id": turn.session_id,
+                "user_id": turn_user_id,
+                "assignment_id": turn.assignment_id,
+                "mode": turn.mode,
+                "role": turn.role,
+                "content": turn.content,
+                "tool_calls": json.dumps(turn.tool_calls or [], ensure_ascii=False),
+                "model": turn.model,
+                "tokens_in": turn.tokens_in or 0,
+                "tokens_out": turn.tokens_out or 0,
+                "cost": turn.cost or 0,
+                "created_at": turn.created_at,
+                "meta": json.dumps(turn.meta or {}, ensure_ascii=False),
+            }
+            for turn, turn_user_id in rows
+        ]
+
+        if len(rows) < batch_size:
+            return
+
+
+def archive_month(
+    period_start: int, batch_size: int = TURN_ARCHIVE_BATCH_SIZE
+) -> Optional[TurnArchiveModel]:
+    """
+    把一个自然月的 turns 写成 Parquet (zstd) 上传到 Storage，再登记归档并移出热表
+
+    上传成功后才在同一事务中删除热表数据并登记归档；中途失败时热表不变，
+    已上传但未登记的文件不会被读取。删除的行数与导出的不一致时整体回滚
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    period_start = get_month_start(period_start)
+    period_end = get_next_month_start(period_start)
+    period = datetime.fromtimestamp(period_start, tz=timezone.utc).strftime("%Y%m")
+
+    schema = get_archive_schema()
+    fd, tmp_path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+
+    try:
+        row_count = 0
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            for rows in _iter_month_rows(period_start, period_end, batch_size):
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                row_count += len(rows)
+
+        if not row_count:
+            return None
+
+        size = os.path.getsize(tmp_path)
+        with open(tmp_path, "rb") as f:
+            _, path = Storage.upload_file(
+                f,
+                f"turn-archive-{period}-{uuid.uuid4().hex[:8]}.parquet",
+                {"OpenWebUI-Archive": "turn", "OpenWebUI-Period": period},
+            )
+
+        with get_db() as db:
+            deleted = Turns.delete_turns_in_range(
+                db, period_start, period_end, batch_size=batch_size
+            )
+            if deleted != row_count:
+                # 导出后该月又写入了行，删除会丢掉未导出的数据；回滚，下次运行重新归档
+                db.rollback()
+                log.error(
+                    f"Turn archive {period}: exported {row_count} rows but "
+                    f"{deleted} are in the hot table, rolled back"
+                )
+                try:
+                    Storage.delete_file(path)
+                except Exception as e:
+                    log.warning(f"Failed to delete unused turn archive {path}: {e}")
+                return None
+
+            archive = TurnArchives.insert_archive(
+                db, period_start, period_end, path, row_count, size
+            )
+            db.commit()
+
+        log.info(f"Archived {row_count} turns for {period} to {path} ({size} bytes)")
+        return archive
+    finally:
+        os.remove(tmp_path)
+
+
+def archive_turns(
+    horizon_days: int = TURN_ARCHIVE_HORIZON_DAYS,
+    batch_size: int = TURN_ARCHIVE_BATCH_SIZE,
+) -> List[TurnArchiveModel]:
+    """归档所有早于 horizon_days 的整月（可重复执行，已归档的月份在热表中不再有数据）"""
+    Turns.ensure_partitions()
+
+    if not horizon_days:
+        return []
+    horizon_days = max(horizon_days, MIN_HORIZON_DAYS)
+
+    # 只归档完全早于截止时间的月份
+    cutoff = get_month_start(int(time.time()) - horizon_days * DAY_SECONDS)
+    with get_db() as db:
+        oldest = (
+            db.query(func.min(Turn.created_at))
+            .filter(Turn.created_at < cutoff)
+            .scalar()
+        )
+
+    archives = []
+    if oldest is None:
+        return archives
+
+    period_start = get_month_start(oldest)
+    while period_start < cutoff:
+        archive = archive_month(period_start, batch_size=batch_size)
+        if archive:
+            archives.append(archive)
+        period_start = get_next_month_start(period_start)
+    return archives
+
+
+####################
+# Query Facade
+####################
+
+
+def _read_archive(
+    archive: TurnArchiveModel,
+    start_time: int,
+    end_time: int,
+    user_id: Optional[str] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> List[dict]:
+    import pyarrow.parquet as pq
+
+    filters = [("created_at", ">=", start_time), ("created_at", "<", end_time)]
+    if user_id is not None:
+        filters.append(("user_id", "==", user_id))
+
+    path = Storage.get_file(archive.path)
+    # 较早的归档文件可能缺少后来新增的列，缺失的列读为 None
+    names = set(pq.read_schema(path).names)
+    columns = list(columns) if columns else get_archive_schema().names
+    missing = [c for c in columns if c not in names]
+
+    table = pq.read_table(
+        path, columns=[c for c in columns if c in names], filters=filters
+    )
+    rows = table.to_pylist()
+    for row in rows:
+        for column in missing:
+            row[column] = None
+        for column in JSON_COLUMNS:
+            if isinstance(row.get(column), str):
+                row[column] = json.loads(row[column])
+    return rows
+
+
+def iter_turns_by_user_and_date(
+    user_id: str,
+    start_time: int,
+    end_time: int,
+    batch_size: int = 500,
+    columns: Optional[Sequence[str]] = None,
+) -> Iterator[List[Union[TurnModel, dict]]]:
+    """
+    与 Turns.iter_turns_by_user_and_date 相同的分批接口，范围覆盖已归档月份时先读归档
+
+    归档的月份早于热表中的任何数据，按 created_at 的顺序与热表一致
+    """
+    if columns:
+        unknown = [c for c in columns if c not in Turn.__table__.columns]
+        if unknown:
+            raise ValueError(f"Unknown turn columns: {unknown}")
+        read_columns = list(dict.fromkeys([*columns, "created_at", "id"]))
+    else:
+        read_columns = get_archive_schema().names
+
+    for archive in TurnArchives.get_archives_in_range(start_time, end_time):
+        rows = _read_archive(archive, start_time, end_time, user_id, read_columns)
+        rows.sort(key=lambda row: (row["created_at"], row["id"]))
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i : i + batch_size]
+            if columns:
+                yield [{c: row[c] for c in columns} for row in batch]
+            else:
+                yield [TurnModel.model_validate(row) for row in batch]
+
+    yield from Turns.iter_turns_by_user_and_date(
+        user_id, start_time, end_time, batch_size=batch_size, columns=columns
+    )
+
+
+def get_turns_by_user_and_date(
+    user_id: str, start_time: int, end_time: int
+) -> List[TurnModel]:
+    return [
+        turn
+        for batch in iter_turns_by_user_and_date(user_id, start_time, end_time)
+        for turn in batch
+    ]
+
+
+def get_active_user_turn_counts(start_time: int, end_time: int) -> dict[str, int]:
+    counts = Turns.get_active_user_turn_counts(start_time, end_time)
+    for archive in TurnArchives.get_archives_in_range(start_time, end_time):
+        for row in _read_archive(archive, start_time, end_time, columns=["user_id"]):
+            if row["user_id"]:
+                counts[row["user_id"]] = counts.get(row["user_id"], 0) + 1
+    return counts
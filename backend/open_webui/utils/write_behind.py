@@ -0,0 +1,288 @@
+import asyncio
+from collections import deque
+import logging
+import time
+import uuid
+from typing import Optional
+
+from open_webui.env import (
+    ENABLE_LLM_PROXY_WRITE_BEHIND,
+    LLM_PROXY_WRITE_BEHIND_BATCH_SIZE,
+    LLM_PROXY_WRITE_BEHIND_INTERVAL_MS,
+    LLM_PROXY_WRITE_BEHIND_MAX_BUFFER,
+    LLM_PROXY_WRITE_BEHIND_MAX_RETRIES,
+    SRC_LOG_LEVELS,
+)
+from open_webui.internal.db import get_db
+from open_webui.models.sessions import SessionForm, SessionModel, Sessions
+from open_webui.models.turns import TurnForm, TurnModel, Turns
+from open_webui.models.usage_logs import UsageLogForm, UsageLogModel, UsageLogs
+
+log = logging.getLogger(__name__)
+log.setLevel(SRC_LOG_LEVELS["MODELS"])
+
+# 内存中保留的最近死信条数（全部死信记录都会写入错误日志）
+DEAD_LETTER_LIMIT = 1000
+
+
+class WriteBehindRecorder:
+    """
+    Buffers turn and usage records from the LLM proxy and writes them in
+    batched multi-row inserts, one transaction per flush. Sessions are
+    written synchronously, so every worker can see them right away.
+
+    A flush runs every `interval_ms` or as soon as `batch_size` records are
+    buffered. `stop()` flushes whatever is left and is called from the app
+    lifespan on shutdown. When the recorder is not running (disabled, or
+    outside the app lifespan) records are written synchronously.
+
+    A failed flush is retried with exponential backoff. After `max_retries`
+    failures the batch is written one record at a time, and records that
+    still fail are dead-lettered: logged in full and kept in `dead_letters`.
+    At most `max_buffer` records are buffered; beyond that new records are
+    dead-lettered instead of growing the buffer while the database is down.
+
+    Records are buffered per worker process, so a hard crash can lose at most
+    one interval of records, and buffered turns are only visible to reads in
+    the same worker (see `get_pending_turns`). Ids and timestamps are assigned
+    at record time, so callers can return them immediately.
+    """
+
+    def __init__(
+        self,
+        interval_ms: int,
+        batch_size: int,
+        enabled: bool = True,
+        max_buffer: int = 10000,
+        max_retries: int = 5,
+    ):
+        self.interval = interval_ms / 1000
+        self.batch_size = batch_size
+        self.enabled = enabled
+        self.max_buffer = max_buffer
+        self.max_retries = max_retries
+
+        self.turns: list[TurnModel] = []
+        self.usage_logs: list[UsageLogModel] = []
+        # 正在写入、尚未提交的 turns，读取时与缓冲区一起合并
+        self._flushing_turns: list[TurnModel] = []
+        self.dead_letters: deque = deque(maxlen=DEAD_LETTER_LIMIT)
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._flush_lock = asyncio.Lock()
+        self._failures = 0
+        self._retry_at = 0.0
+
+        self.metrics = {
+            "flushes": 0,
+            "records": 0,
+            "errors": 0,
+            "dead_lettered": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "max_batch": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self.turns) + len(self.usage_logs)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    ####################
+    # Lifecycle
+    ####################
+
+    def start(self) -> None:
+        if not self.enabled or self.running:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        log.info(
+            f"Write-behind recorder started "
+            f"(interval={self.interval}s, batch_size={self.batch_size})"
+        )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            # 不取消任务，避免打断正在进行的写入；让循环完成当前 flush 后退出
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        # 关闭前把缓冲区全部写入；连续失败的批次会在重试上限后转入死信，循环必然结束
+        while len(self):
+            await self.flush()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if time.monotonic() >= self._retry_at:
+                await self.flush()
+
+    ####################
+    # Recording
+    ####################
+
+    def _buffer(self, records: list, record) -> None:
+        if not self.running:
+            records.append(record)
+            self._write(*self._drain())
+            return
+
+        if len(self) >= self.max_buffer:
+            self._dead_letter(record, "write-behind buffer is full")
+            return
+
+        records.append(record)
+        if len(self) >= self.batch_size:
+            self._wakeup.set()
+
+    def record_session(self, user_id: str, form_data: SessionForm) -> SessionModel:
+        session = SessionModel(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            assignment_id=form_data.assignment_id,
+            mode=form_data.mode,
+            started_at=int(time.time()),
+            policy_snapshot=form_data.policy_snapshot,
+            meta=form_data.meta,
+        )
+        # 每个对话只创建一次 session，同步写入以便其他 worker 的后续请求能读到
+        with get_db() as db:
+            Sessions.insert_sessions(db, [session])
+            db.commit()
+        return session
+
+    def record_turn(self, form_data: TurnForm) -> TurnModel:
+        turn = TurnModel(
+            id=str(uuid.uuid4()),
+            **form_data.model_dump(),
+            created_at=int(time.time()),
+        )
+        self._buffer(self.turns, turn)
+        return turn
+
+    def record_usage(self, form_data: UsageLogForm) -> UsageLogModel:
+        entry = UsageLogModel(
+            id=str(uuid.uuid4()),
+            **form_data.model_dump(exclude={"metadata"}),
+            created_at=int(time.time()),
+            metadata_json=form_data.metadata,
+        )
+        self._buffer(self.usage_logs, entry)
+        return entry
+
+    def get_pending_turns(self, session_id: str) -> list[TurnModel]:
+        """本进程中尚未提交的该 session 的 turns"""
+        return [
+            turn
+            for turn in self._flushing_turns + self.turns
+            if turn.session_id == session_id
+        ]
+
+    ####################
+    # Flushing
+    ####################
+
+    def _drain(self) -> tuple[list, list]:
+        batch = (self.turns, self.usage_logs)
+        self.turns, self.usage_logs = [], []
+        return batch
+
+    def _write(self, turns: list[TurnModel], usage_logs: list[UsageLogModel]) -> None:
+        with get_db() as db:
+            Turns.insert_turns(db, turns)
+            UsageLogs.insert_logs(db, usage_logs)
+            db.commit()
+
+    def _dead_letter(self, record, error) -> None:
+        self.dead_letters.append(record)
+        self.metrics["dead_lettered"] += 1
+        log.error(
+            f"Write-behind dead letter {type(record).__name__} ({error}): "
+            f"{record.model_dump_json()}"
+        )
+
+    def _write_each(
+        self, turns: list[TurnModel], usage_logs: list[UsageLogModel]
+    ) -> None:
+        """逐条写入，单条失败不影响其他记录，失败的记录转入死信"""
+        for record in [*turns, *usage_logs]:
+            try:
+                if isinstance(record, TurnModel):
+                    self._write([record], [])
+                else:
+                    self._write([], [record])
+            except Exception as e:
+                self._dead_letter(record, e)
+
+    async def flush(self) -> bool:
+        async with self._flush_lock:
+            turns, usage_logs = self._drain()
+            count = len(turns) + len(usage_logs)
+            if not count:
+                return True
+
+            self._flushing_turns = turns
+            started_at = time.monotonic()
+            try:
+                await asyncio.to_thread(self._write, turns, usage_logs)
+            except Exception as e:
+                log.exception(f"Write-behind flush of {count} records failed: {e}")
+                self.metrics["errors"] += 1
+                self._failures += 1
+
+                if self._failures >= self.max_retries:
+                    # 多次整批失败，逐条写入以隔离出写不进去的记录
+                    self._failures = 0
+                    self._retry_at = 0.0
+                    await asyncio.to_thread(self._write_each, turns, usage_logs)
+                else:
+                    # 放回缓冲区头部，退避后重试
+                    self.turns[:0] = turns
+                    self.usage_logs[:0] = usage_logs
+                    self._retry_at = (
+                        time.monotonic() + self.interval * 2**self._failures
+                    )
+                return False
+            finally:
+                self._flushing_turns = []
+
+            self._failures = 0
+            self._retry_at = 0.0
+            elapsed_ms = round((time.monotonic() - started_at) * 1000, 2)
+            self.metrics["flushes"] += 1
+            self.metrics["records"] += count
+            self.metrics["last_flush_ms"] = elapsed_ms
+            self.metrics["max_flush_ms"] = max(self.metrics["max_flush_ms"], elapsed_ms)
+            self.metrics["max_batch"] = max(self.metrics["max_batch"], count)
+            return True
+
+    def get_stats(self) -> dict:
+        return {
+            **self.metrics,
+            "running": self.running,
+            "buffered": len(self),
+            "interval_ms": int(self.interval * 1000),
+            "batch_size": self.batch_size,
+            "max_buffer": self.max_buffer,
+        }
+
+
+LLM_PROXY_RECORDER = WriteBehindRecorder(
+    interval_ms=LLM_PROXY_WRITE_BEHIND_INTERVAL_MS,
+    batch_size=LLM_PROXY_WRITE_BEHIND_BATCH_SIZE,
+    enabled=ENABLE_LLM_PROXY_WRITE_BEHIND,
+    max_buffer=LLM_PROXY_WRITE_BEHIND_MAX_BUFFER,
+    max_retries=LLM_PROXY_WRITE_BEHIND_MAX_RETRIES,
+)